@@ -436,6 +436,12 @@ class IBrainCommunicationAdapter(object):  # pragma: no cover
         """
         raise NotImplementedError("This method was not implemented in the concrete implementation")
 
+    def flush_buffers(self):  # -> None:
+        """
+        Writes the device parameters buffered since the last flush to the neuronal simulator
+        """
+        raise NotImplementedError("This method was not implemented in the concrete implementation")
+
     def shutdown(self):
         """
         Shuts down the brain communication adapter
@@ -86,9 +86,11 @@ def load_py_network(path):
     :param path: path to the .py file
     """
     global __brain_index
+    hbp_nrp_cle.common.invalidate_resources()
     hbp_nrp_cle.common.refresh_resources()
     brain_module = imp.load_source('__brain_model' + str(__brain_index), path)
     __brain_index += 1
+    hbp_nrp_cle.common.brain_changed()
     return brain_module
 
 
@@ -98,6 +100,7 @@ def clear_populations(brain_module):
 
     :param brain_module: The brain module
     """
+    hbp_nrp_cle.common.brain_changed()
     try:
         for population_id in brain_module.populations_keys:
             del brain_module.__dict__[population_id]
@@ -113,6 +116,7 @@ def setup_access_to_population(brain_module, **populations):
     :param brain_module: The brain module
     :param populations: A dictionary of the populations and their ids
     """
+    hbp_nrp_cle.common.brain_changed()
     try:
         circuit = brain_module.circuit
         logger.debug("Found circuit")
@@ -29,6 +29,7 @@ implementations of the brain simulator adapter.
 import logging
 from hbp_nrp_cle.brainsim.BrainInterface \
     import IBrainCommunicationAdapter, ICustomDevice
+from .__NeuronSelection import NeuronSelection
 
 logger = logging.getLogger(__name__)
 
@@ -82,7 +83,7 @@ class AbstractCommunicationAdapter(IBrainCommunicationAdapter):
             return populations
 
         concrete_type = self._get_device_type(device_type)
-        if not isinstance(populations, list):
+        if not isinstance(populations, (list, NeuronSelection)):
             device = concrete_type.create_new_device(populations, **params)
             logger.info("Communication object with type \"%s\" requested (device)",
                         device_type)
@@ -183,6 +184,13 @@ class AbstractCommunicationAdapter(IBrainCommunicationAdapter):
         for detector in self.__finalizable_devices:
             detector.finalize_refresh(t)
 
+    def flush_buffers(self):
+        """
+        Writes the device parameters buffered since the last flush to the neuronal simulator.
+        Devices write their parameters immediately unless the concrete adapter buffers them.
+        """
+        pass
+
     @property
     def detector_devices(self):
         """
@@ -0,0 +1,88 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+This module contains a selection of single neurons that is represented by index arrays
+"""
+
+import numpy
+
+__author__ = ''
+
+
+class NeuronSelection(object):
+    """
+    Represents a sequence of single neurons taken from populations by index. It behaves like a
+    list of single neuron views, but the views are only created on access.
+    """
+
+    def __init__(self, parts, brain_adapter):
+        """
+        Creates a new neuron selection
+
+        :param parts: A list of tuples of a population and the indices of the selected neurons
+        :param brain_adapter: The brain communication adapter used to create views
+        """
+        merged = []
+        for population, selected in parts:
+            selected = numpy.asarray(selected, dtype=numpy.int64).reshape(-1)
+            if merged and merged[-1][0] is population:
+                merged[-1] = (population, numpy.concatenate((merged[-1][1], selected)))
+            else:
+                merged.append((population, selected))
+        self.__parts = merged
+        self.__adapter = brain_adapter
+        self.__ends = numpy.cumsum([len(indices) for _, indices in merged], dtype=numpy.int64)
+
+    @property
+    def parts(self):
+        """
+        Gets the populations and the index arrays of the selected neurons
+        """
+        return self.__parts
+
+    def __len__(self):
+        return int(self.__ends[-1]) if len(self.__ends) else 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in xrange(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("neuron selection index out of range")
+        part = int(numpy.searchsorted(self.__ends, index, side='right'))
+        population, indices = self.__parts[part]
+        start = int(self.__ends[part]) - len(indices)
+        return self.__adapter.create_view(population, int(indices[index - start]))
+
+    def __iter__(self):
+        create_view = self.__adapter.create_view
+        for population, indices in self.__parts:
+            for index in indices.tolist():
+                yield create_view(population, index)
+
+    def __repr__(self):
+        return "NeuronSelection({0})".format(
+            ", ".join("{0}{1}".format(population, indices.tolist())
+                      for population, indices in self.__parts))
@@ -5,6 +5,7 @@ This package contains the simulator independent implementations for the brain ad
 __author__ = "Sebastian Krach"
 
 from .__AbstractCommunicationAdapter import AbstractCommunicationAdapter
+from .__NeuronSelection import NeuronSelection
 # pylint: disable=import-error
 import enum
 
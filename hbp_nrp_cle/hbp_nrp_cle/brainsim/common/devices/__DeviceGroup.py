@@ -32,11 +32,58 @@ import numpy
 __author__ = 'DimitriProbst, Sebastian Krach'
 
 
+def values_differ(old, new, tolerance=0.0):
+    """
+    Checks whether the new values differ from the old values by more than the given tolerance
+
+    :param old: The old value or a numpy array of old values
+    :param new: The new value or a numpy array of new values
+    :param tolerance: The tolerance relative to the larger magnitude of both values, 0 to only
+     accept equal values
+    :return: A boolean or a boolean numpy array
+    """
+    if not tolerance:
+        return old != new
+    try:
+        return numpy.abs(new - old) > tolerance * numpy.maximum(numpy.abs(old), numpy.abs(new))
+    except TypeError:
+        return old != new
+
+
+def _as_numeric(value):
+    """
+    Converts the given value to a numpy array if it is a number or a flat sequence of numbers
+
+    :param value: The value
+    :return: A numpy array or None, if the value is not numeric
+    """
+    if isinstance(value, basestring) or value is None:
+        return None
+    try:
+        values = numpy.asarray(value)
+    except ValueError:
+        return None
+    if values.dtype.kind not in 'biuf' or values.ndim > 1:
+        return None
+    return values
+
+
 class DeviceGroup(IDeviceGroup):
     """
     Gathers multiple devices of the same type to a group.
     The class receives the property values as slice, tuple, list, numpy array
     and returns the property values as numpy array.
+
+    Numeric values assigned to the whole group are kept in numpy arrays, one per attribute, that
+    are shared with all subgroups. Reading such an attribute returns a read-only view on that
+    array rather than querying every device, and writing it pushes the whole array to the
+    simulator at once. Only the devices whose values differ from the stored values by more than
+    the tolerance of the group are written.
+
+    Values written to a device directly rather than through the group are not seen by the group
+    unless the device drops the values of its group, as the devices of the nest group do, or it
+    has been accessed through an integer index of the group. Otherwise the group keeps returning
+    and diffing against the values last assigned through it.
     """
 
     def __init__(self, cls, devices):
@@ -47,6 +94,9 @@ class DeviceGroup(IDeviceGroup):
         self.__dict__['_spec'] = None
         self.__dict__['device_type'] = cls
         self.__dict__['devices'] = devices
+        self.__dict__['_values'] = {}
+        self.__dict__['_index'] = None
+        self.__dict__['tolerance'] = 0.0
 
     @classmethod
     def create_new_device_group(cls, populations, nested_device_type, params):
@@ -74,6 +124,8 @@ class DeviceGroup(IDeviceGroup):
         if isinstance(index, (slice, numpy.ndarray)):
             return self.create_subgroup(index)
         elif isinstance(index, int):
+            # the device may be written directly, bypassing the values of this group
+            self.__dict__['_values'].clear()
             return self.devices[index]
         else:
             raise TypeError
@@ -97,17 +149,55 @@ class DeviceGroup(IDeviceGroup):
         :return: A new device group representing a subset of the devices represented
         by this device group
         """
-        return type(self)(self.device_type, self.devices[selection])
+        positions = numpy.arange(len(self.devices))[selection]
+        group = type(self)(self.device_type, [self.devices[i] for i in positions])
+        # the subgroup shares the values of this group
+        index = self.__dict__['_index']
+        group.__dict__['_values'] = self.__dict__['_values']
+        group.__dict__['_index'] = positions if index is None else index[positions]
+        group.__dict__['tolerance'] = self.__dict__['tolerance']
+        return group
 
     def get(self, attrname):
         """
         Gets the specified attribute of all devices in the device group
 
         :param attrname: The attribute to get
-        :return: A list with all the values for the given attribute for all the devices
-        in this device group
+        :return: A read-only numpy array with all the values for the given attribute for all the
+        devices in this device group, or a list if the values are not numeric
+        """
+        values = self.__stored(attrname)
+        if values is not None:
+            view = values.view()
+            view.flags.writeable = False
+            return view
+        return self._gather(attrname)
+
+    def __stored(self, attrname):
+        """
+        Gets the stored values of the specified attribute for the devices of this group
+
+        :param attrname: The name of the attribute
+        :return: A numpy array or None, if no values are stored
         """
-        return [getattr(device, attrname) for device in self.devices]
+        values = self.__dict__['_values'].get(attrname)
+        index = self.__dict__['_index']
+        if values is not None and index is not None:
+            values = values[index]
+        return values
+
+    def _gather(self, attrname):
+        """
+        Gets the specified attribute from all devices in the device group
+
+        :param attrname: The attribute to get
+        :return: A numpy array with the values if they are numeric, otherwise a list
+        """
+        values = [getattr(device, attrname) for device in self.devices]
+        array = _as_numeric(values)
+        if array is None or array.ndim != 1:
+            return values
+        return array
 
     def __setattr__(self, attrname, value):
         # This is needed to enable a device group reset.
@@ -128,14 +218,76 @@ class DeviceGroup(IDeviceGroup):
         :param value: The value that should be assigned to the attribute.
         If this value is indexable, each device is assigned the respective index of the value
         """
-        if hasattr(value, '__getitem__'):
-            i = 0
-            for device in self.devices:
-                setattr(device, attrname, value[i])
-                i += 1
+        values = _as_numeric(value)
+        if values is None or (values.ndim == 1 and len(values) != len(self.devices)):
+            self.__dict__['_values'].pop(attrname, None)
+            if hasattr(value, '__getitem__'):
+                i = 0
+                for device in self.devices:
+                    setattr(device, attrname, value[i])
+                    i += 1
+            else:
+                for device in self.devices:
+                    setattr(device, attrname, value)
+            return
+        old = self.__stored(attrname)
+        if old is not None:
+            changed = numpy.flatnonzero(values_differ(old, values, self.__dict__['tolerance']))
+            if len(changed) == 0:
+                return
+            if len(changed) < len(old):
+                values = numpy.broadcast_to(values, old.shape)[changed]
+                self.__store(attrname, values, changed)
+                self._push(attrname, values, changed)
+                return
+        self.__store(attrname, values)
+        if values.ndim == 0:
+            self._push(attrname, values.item())
         else:
-            for device in self.devices:
+            self._push(attrname, values)
+
+    def __store(self, attrname, values, positions=None):
+        """
+        Stores the given values of the specified attribute in the values of the group
+
+        :param attrname: The name of the attribute
+        :param values: A numpy array with one value per device or a single value for all devices
+        :param positions: The positions of the devices the values belong to or None for all
+         devices of this group
+        """
+        cache = self.__dict__['_values']
+        index = self.__dict__['_index']
+        if index is None and positions is None:
+            stored = numpy.empty(len(self.devices), dtype=numpy.result_type(values, float))
+            stored[:] = values
+            cache[attrname] = stored
+        elif attrname in cache:
+            stored = cache[attrname]
+            if positions is not None:
+                index = positions if index is None else index[positions]
+            if numpy.can_cast(values.dtype, stored.dtype):
+                stored[index] = values
+            else:
+                del cache[attrname]
+
+    def _push(self, attrname, values, positions=None):
+        """
+        Writes the given values of the specified attribute to the devices of this group
+
+        :param attrname: The name of the attribute
+        :param values: A numpy array with one value per device or a single value for all devices
+        :param positions: A numpy array with the positions of the devices to write or None to
+         write all devices of this group
+        """
+        devices = self.devices
+        if positions is not None:
+            devices = [devices[i] for i in positions]
+        if isinstance(values, numpy.ndarray):
+            for device, value in zip(devices, values.tolist()):
                 setattr(device, attrname, value)
+        else:
+            for device in devices:
+                setattr(device, attrname, values)
 
     def refresh(self, t):
         """
@@ -211,6 +363,7 @@ class DeviceGroup(IDeviceGroup):
         for device in self.devices:
             device._disconnect() # pylint: disable=protected-access
         self.devices[:] = []
+        self.__dict__['_values'].clear()
 
     def reset(self, transfer_function_manager):
         """
@@ -225,6 +378,7 @@ class DeviceGroup(IDeviceGroup):
             reset_device = device.reset(transfer_function_manager)
             reset_devices.append(reset_device)
             changes = changes or (reset_device is not device)
+        self.__dict__['_values'].clear()
         if not changes:
             return self
         return type(self)(self.device_type, reset_devices)
@@ -29,6 +29,7 @@ moduleauthor: krach@fzi.de
 from hbp_nrp_cle.brainsim import IBrainControlAdapter
 from hbp_nrp_cle.brainsim.nengo.NengoInfo import is_population, NengoPopulationInfo
 from hbp_nrp_cle.brainsim.nengo import NengoBrainLoader
+from hbp_nrp_cle import context as sim_context
 
 import nengo
 
@@ -45,13 +46,16 @@ class NengoControlAdapter(IBrainControlAdapter):
     Represents a controller object for the neuronal simulator
     """
 
-    def __init__(self, nengo_simulation_state):
+    def __init__(self, nengo_simulation_state, context=None):
         """
         Initializes the Nengo control adapter
 
         :param sim: The simulator module
+        :param context: The simulation context the brain is loaded into, the active context by
+                        default
         """
         self.__is_initialized = False
+        self.__context = context if context is not None else sim_context.current()
 
         self._nengo_simulation_state = nengo_simulation_state
         self._params = {'dt': 0.001}
@@ -81,10 +85,9 @@ class NengoControlAdapter(IBrainControlAdapter):
 
         if extension == ".py":
             self._nengo_simulation_state.load_brain(brain_file)
-            import hbp_nrp_cle.tf_framework.config as tf_config
-            tf_config.brain_populations = {}
+            self.__context.brain_populations = {}
             NengoBrainLoader.setup_access_to_population(
-                tf_config.brain_root, *self.get_populations())
+                self.__context.brain_root, *self.get_populations())
         else:
             msg = "Neuronal network format {0} not supported".format(extension)
             raise Exception(msg)
@@ -152,10 +155,9 @@ class NengoControlAdapter(IBrainControlAdapter):
 
         :return: A list of population infos
         """
-        import hbp_nrp_cle.tf_framework.config as config
         populations = []
-        for member in dir(config.brain_root):
-            candidate = getattr(config.brain_root, member)
+        for member in dir(self.__context.brain_root):
+            candidate = getattr(self.__context.brain_root, member)
             self.__find_all_populations(candidate, member, populations)
         return populations
 
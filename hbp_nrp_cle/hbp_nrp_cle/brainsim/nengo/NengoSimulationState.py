@@ -28,6 +28,7 @@ moduleauthor: krach@fzi.de
 
 from hbp_nrp_cle.brainsim.common import InternalBrainException
 from hbp_nrp_cle.brainsim.nengo import NengoBrainLoader
+from hbp_nrp_cle import context as sim_context
 
 import nengo
 import logging
@@ -42,10 +43,14 @@ class NengoSimulationState(object):
     Holds information about the Nengo simulation state
     """
 
-    def __init__(self):
+    def __init__(self, context=None):
         """
         Init
+
+        :param context: The simulation context the brain is loaded into, the active context by
+                        default
         """
+        self._context = context if context is not None else sim_context.current()
         self._simulator = None
         self._simulator_factory = None
         self._root_network = None
@@ -62,18 +67,17 @@ class NengoSimulationState(object):
 
         :param brain_file: The Python file containing the network
         """
-        import hbp_nrp_cle.tf_framework.config as tf_config
-        tf_config.brain_root = NengoBrainLoader.load_py_network(brain_file)
+        self._context.brain_root = NengoBrainLoader.load_py_network(brain_file)
 
         self._root_network = nengo.Network()
 
         with self._root_network:
-            nengo.Network.add(tf_config.brain_root.circuit)
+            nengo.Network.add(self._context.brain_root.circuit)
 
         logger.info("Saving brain source")
 
         with open(brain_file) as source:
-            tf_config.brain_source = source.read()
+            self._context.brain_source = source.read()
 
         logger.info("Resetting Nengo simulator")
         self._simulator = None
@@ -32,7 +32,7 @@ from hbp_nrp_cle.brainsim.pynn import PyNNPopulationInfo
 from hbp_nrp_cle.brainsim.pynn.PyNNInfo import is_population
 import hbp_nrp_cle.brainsim as brainsim
 
-import hbp_nrp_cle.tf_framework.config as tf_config
+from hbp_nrp_cle import context as sim_context
 
 import logging
 from os import path
@@ -48,16 +48,19 @@ class PyNNControlAdapter(IBrainControlAdapter):
     Represents a controller object for the neuronal simulator
     """
 
-    def __init__(self, sim):
+    def __init__(self, sim, context=None):
         """
         Initializes the PyNN control adapter
 
         :param sim: The simulator module
+        :param context: The simulation context the brain is loaded into, the active context by
+                        default
         """
         self.__is_initialized = False
         self.__is_alive = False
         self.__rank = None
         self._sim = sim
+        self.__context = context if context is not None else sim_context.current()
 
     def load_populations(self, **populations):
         """
@@ -71,22 +74,22 @@ class PyNNControlAdapter(IBrainControlAdapter):
         """
 
         # check if a valid brain is loaded
-        if tf_config.brain_root is None:
+        if self.__context.brain_root is None:
             raise Exception("No brain is currently loaded, cannot add Populations.")
 
-        if not hasattr(tf_config.brain_root, 'circuit'):
+        if not hasattr(self.__context.brain_root, 'circuit'):
             raise AttributeError("No circuit is found in the currently loaded brain:"
                                  "Cannot add Populations.")
 
         # valid brain found, load populations
-        tf_config.brain_populations = self.populations_using_json_slice(populations)
+        self.__context.brain_populations = self.populations_using_json_slice(populations)
 
-        if not hasattr(tf_config.brain_root, 'populations_keys'):
-            tf_config.brain_root.populations_keys = []
-        BrainLoader.clear_populations(tf_config.brain_root)
+        if not hasattr(self.__context.brain_root, 'populations_keys'):
+            self.__context.brain_root.populations_keys = []
+        BrainLoader.clear_populations(self.__context.brain_root)
 
         BrainLoader.setup_access_to_population(
-            tf_config.brain_root, **self.populations_using_python_slice(populations))
+            self.__context.brain_root, **self.populations_using_python_slice(populations))
 
     def load_brain(self, brain_file, **populations):
         """
@@ -102,7 +105,7 @@ class PyNNControlAdapter(IBrainControlAdapter):
             self.__load_py_brain(brain_file)
 
             # load new populations if any, otherwise reload current ones (if any)
-            pops = populations if populations else tf_config.brain_populations
+            pops = populations if populations else self.__context.brain_populations
             if pops:
                 self.load_populations(**pops)
         else:
@@ -119,11 +122,11 @@ class PyNNControlAdapter(IBrainControlAdapter):
         if not self.__is_initialized:
             self.initialize()
 
-        tf_config.brain_root = BrainLoader.load_py_network(brain_file)
+        self.__context.brain_root = BrainLoader.load_py_network(brain_file)
 
         logger.info("Saving brain source")
         with open(brain_file) as source:
-            tf_config.brain_source = source.read()
+            self.__context.brain_source = source.read()
 
     def initialize(self, **params):
         """
@@ -195,8 +198,8 @@ class PyNNControlAdapter(IBrainControlAdapter):
         :return: A list of population infos
         """
         populations = []
-        for member in dir(tf_config.brain_root):
-            candidate = getattr(tf_config.brain_root, member)
+        for member in dir(self.__context.brain_root):
+            candidate = getattr(self.__context.brain_root, member)
             self.__find_all_populations(candidate, member, populations)
         return populations
 
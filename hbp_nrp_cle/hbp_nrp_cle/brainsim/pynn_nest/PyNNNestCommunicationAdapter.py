@@ -32,6 +32,7 @@ from hbp_nrp_cle.brainsim.BrainInterface import ILeakyIntegratorAlpha, \
     IFixedSpikeGenerator, ISpikeRecorder, IPoissonSpikeGenerator
 
 from hbp_nrp_cle.brainsim.pynn.PyNNCommunicationAdapter import PyNNCommunicationAdapter
+from .devices.__NestDeviceGroup import NestWriteBuffer, PyNNNestDeviceGroup, PyNNNestDevice
 from .devices import PyNNNestACSource, PyNNNestDCSource, PyNNNestNCSource, \
     PyNNNestLeakyIntegratorAlpha, PyNNNestLeakyIntegratorExp, PyNNNestFixedSpikeGenerator, \
     PyNNNestPopulationRate, PyNNNestSpikeRecorder, PyNNNestPoissonSpikeGenerator
@@ -60,11 +61,86 @@ class PyNNNestCommunicationAdapter(PyNNCommunicationAdapter):
                      ISpikeRecorder: PyNNNestSpikeRecorder,
                      IPoissonSpikeGenerator: PyNNNestPoissonSpikeGenerator}
 
+    def __init__(self):
+        """
+        Initializes the communication adapter with its own buffer for the parameter writes of
+        its devices
+        """
+        super(PyNNNestCommunicationAdapter, self).__init__()
+        self.__write_buffer = NestWriteBuffer()
+
+    @property
+    def write_buffer(self):
+        """
+        Gets the buffer the devices of this adapter write their parameters to
+        """
+        return self.__write_buffer
+
     def initialize(self):
         """
-        Marks the PyNN adapter as initialized
+        Marks the PyNN adapter as initialized. From now on, the parameter writes to devices are
+        buffered until the buffers are flushed.
         """
         super(PyNNNestCommunicationAdapter, self).initialize()
+        self.__write_buffer.enabled = True
+
+    def flush_buffers(self):
+        """
+        Writes the device parameters buffered since the last flush to nest, one call per
+        parameter
+        """
+        self.__write_buffer.flush()
+
+    def shutdown(self):
+        """
+        Shuts down the brain communication adapter and drops the pending parameter writes
+        """
+        self.__write_buffer.enabled = False
+        self.__write_buffer.discard()
+        super(PyNNNestCommunicationAdapter, self).shutdown()
+
+    def register_spike_source(self, populations, spike_generator_type, **params):
+        """
+        Requests a communication object with the given spike generator type
+        for the given set of neurons
+
+        :param populations: A reference to the populations to which the spike generator
+         should be connected
+        :param spike_generator_type: A spike generator type (see documentation
+         or a list of allowed values)
+        :param params: A dictionary of configuration parameters
+        :return: A communication object or a group of objects
+        """
+        return self.__attach(super(PyNNNestCommunicationAdapter, self).register_spike_source(
+            populations, spike_generator_type, **params))
+
+    def register_spike_sink(self, populations, spike_detector_type, **params):
+        """
+        Requests a communication object with the given spike detector type
+        for the given set of neurons
+
+        :param populations: A reference to the populations which should be connected
+         to the spike detector
+        :param spike_detector_type: A spike detector type (see documentation
+         for a list of allowed values)
+        :param params: A dictionary of configuration parameters
+        :return: A communication object or a group of objects
+        """
+        return self.__attach(super(PyNNNestCommunicationAdapter, self).register_spike_sink(
+            populations, spike_detector_type, **params))
+
+    def __attach(self, device):
+        """
+        Lets the given device or device group write through the buffer of this adapter
+
+        :param device: The device, device group or populations of a custom device
+        :return: The given device
+        """
+        if isinstance(device, PyNNNestDeviceGroup):
+            device.use_write_buffer(self.__write_buffer)
+        elif isinstance(device, PyNNNestDevice):
+            device.write_buffer = self.__write_buffer
+        return device
 
     def _get_device_type(self, device_type):
         """
@@ -59,5 +59,18 @@ def nrp_pynn_setup(timestep=DEFAULT_TIMESTEP, min_delay=DEFAULT_MIN_DELAY, **ext
     # call the actual PyNN setup with our overridden parameters, return rank
     return pynn_setup(timestep, min_delay, **extra_params)
 
+
+def nrp_reseed(seed):
+    """
+    Reseeds the RNGs of an already set up Nest kernel, e.g. in a forked replica of a simulation
+    whose brain has already been built.
+
+    :param seed: The new RNG seed
+    """
+    config.rng_seed = seed
+    rng_seed_count = nest.GetKernelStatus(['total_num_virtual_procs'])[0]
+    nest.SetKernelStatus({'grng_seed': seed, 'rng_seeds': [seed] * rng_seed_count})
+
+
 # override the setup call
 sim.setup = nrp_pynn_setup
@@ -28,13 +28,118 @@ improved performance when updating device parameters of multiple devices
 """
 
 from hbp_nrp_cle.brainsim.common.devices import DeviceGroup
+from hbp_nrp_cle.brainsim.common.devices.__DeviceGroup import values_differ
+from collections import OrderedDict
 from mpi4py import MPI
+import threading
 import nest
 import numpy
 
 __author__ = "Georg Hinkel"
 
 
+def _notify_remote(device_ids, params):
+    """
+    Notifies the remote brain processes to call SetStatus with the given parameters
+
+    :param device_ids: A sequence of device ids
+    :param params: A dictionary of parameters for all devices or a list with one dictionary of
+     parameters per device
+    """
+    for rank in xrange(MPI.COMM_WORLD.Get_size()):
+        if rank == MPI.COMM_WORLD.Get_rank():
+            continue
+
+        # send the data required to call SetStatus on each process
+        MPI.COMM_WORLD.send({'command': 'SetStatus', 'ids': device_ids, 'params': params},
+                            dest=rank, tag=100)
+
+
+class NestWriteBuffer(object):
+    """
+    Combines the parameter writes to nest devices until they are flushed, so that every
+    parameter is written to nest with a single call per flush. While the buffer is disabled,
+    writes are passed to nest immediately.
+
+    Every communication adapter has its own buffer, which it hands to the devices it creates.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.__lock = threading.Lock()
+        self.__pending = OrderedDict()
+        self.__remote = OrderedDict()
+
+    def write(self, device_ids, params, mpi_aware=False):
+        """
+        Writes the given parameters to the given devices
+
+        :param device_ids: A sequence of device ids
+        :param params: A dictionary of parameters that are set for all of the devices
+        :param mpi_aware: True, if the write should be repeated in the remote brain processes
+        """
+        if not self.enabled:
+            if mpi_aware:
+                _notify_remote(device_ids, params)
+            # perform the nest command in this process regardless of configuration
+            nest.SetStatus(device_ids, params)
+            return
+        with self.__lock:
+            for name, value in params.iteritems():
+                pending = self.__pending.setdefault(name, OrderedDict())
+                for device_id in device_ids:
+                    pending[device_id] = value
+                if mpi_aware:
+                    self.__remote.setdefault(name, set()).update(device_ids)
+
+    def write_values(self, device_ids, name, values):
+        """
+        Writes one value of the given parameter to each of the given devices
+
+        :param device_ids: A sequence of device ids
+        :param name: The name of the parameter in nest
+        :param values: A sequence of values, one for each device
+        """
+        if not self.enabled:
+            nest.SetStatus(device_ids, name, values)
+            return
+        with self.__lock:
+            pending = self.__pending.setdefault(name, OrderedDict())
+            for device_id, value in zip(device_ids, values):
+                pending[device_id] = value
+
+    def flush(self):
+        """
+        Writes all pending parameters to nest, one call to nest and one message to each remote
+        brain process per parameter
+        """
+        with self.__lock:
+            if not self.__pending:
+                return
+            pending, self.__pending = self.__pending, OrderedDict()
+            remote, self.__remote = self.__remote, OrderedDict()
+        for name, values in pending.iteritems():
+            device_ids = list(values.iterkeys())
+            nest.SetStatus(device_ids, [{name: value} for value in values.itervalues()])
+            remote_ids = remote.get(name)
+            if remote_ids:
+                device_ids = [i for i in device_ids if i in remote_ids]
+                _notify_remote(device_ids, [{name: values[i]} for i in device_ids])
+
+    def discard(self):
+        """
+        Drops all pending writes
+        """
+        with self.__lock:
+            self.__pending = OrderedDict()
+            self.__remote = OrderedDict()
+
+
+# the buffer of the devices that have not been created by a communication adapter, it is never
+# enabled, so their writes are passed to nest immediately
+_unbuffered = NestWriteBuffer()
+
+
 def create_transformation(nest_name, transform=None):
     """
     Specifies a value transform to the given nest name
@@ -44,63 +149,78 @@ def create_transformation(nest_name, transform=None):
     :return: a pair of getter and setter functions that will perform the corresponding nest
      operations
     """
-    if transform is None:
-        def getter(device_ids):
-            """
-            Gets the attribute values for the given device ids
-
-            :param device_ids: A sequence of device ids
-            :return: A sequence of values for the individual devices
-            """
-            return nest.GetStatus(device_ids, nest_name)
-
-        def setter(device_ids, value):
-            """
-            Sets the attribute values for the given device ids
-
-            :param device_ids: A sequence of device ids
-            :param value: A sequence of values for the individual devices
-            """
-            if hasattr(value, '__getitem__'):
-                vals = []
-                for i in range(0, len(device_ids)):
-                    vals.append({nest_name: value[i]})
-                nest.SetStatus(device_ids, vals)
-            else:
-                nest.SetStatus(device_ids, {nest_name: value})
-        return {'get': getter, 'set': setter}
-    else:
-        def getter(device_ids):
-            """
-            Gets the attribute values for the given device ids
-
-            :param device_ids: A sequence of device ids
-            :return: A sequence of values for the individual devices
-            """
-            return numpy.asarray(nest.GetStatus(device_ids, nest_name)) / transform
-
-        def setter(device_ids, value):
-            """
-            Sets the attribute values for the given device ids
-
-            :param device_ids: A sequence of device ids
-            :param value: A sequence of values for the individual devices
-            """
-            if hasattr(value, '__getitem__'):
-                vals = []
-                for i in range(0, len(device_ids)):
-                    vals.append({nest_name: value[i] * transform})
-                nest.SetStatus(device_ids, vals)
-            else:
-                nest.SetStatus(device_ids, {nest_name: value * transform})
-        return {'get': getter, 'set': setter}
+    def getter(device_ids, write_buffer):
+        """
+        Gets the attribute values for the given device ids
+
+        :param device_ids: A sequence of device ids
+        :param write_buffer: The write buffer of the devices
+        :return: A numpy array of values for the individual devices
+        """
+        # pending writes would not be visible otherwise
+        write_buffer.flush()
+        values = numpy.asarray(nest.GetStatus(device_ids, nest_name))
+        if transform is not None:
+            values = values / transform
+        return values
+
+    def setter(device_ids, value, write_buffer):
+        """
+        Sets the attribute values for the given device ids
+
+        :param device_ids: A sequence of device ids
+        :param value: A sequence of values for the individual devices or a single value
+        :param write_buffer: The write buffer of the devices
+        """
+        if hasattr(value, '__getitem__'):
+            values = numpy.asarray(value, dtype=float)
+            if transform is not None:
+                values = values * transform
+            write_buffer.write_values(device_ids, nest_name, values)
+        else:
+            if transform is not None:
+                value = value * transform
+            write_buffer.write(device_ids, {nest_name: value})
+    return {'get': getter, 'set': setter}
 
 
 class PyNNNestDeviceGroup(DeviceGroup):
     """
     This class provides an optimized device group behavior
+
+    The devices drop the values of their group when they are written directly, so the group
+    neither returns nor diffs against outdated values.
     """
 
+    def __init__(self, cls, devices):
+        """
+        Initializes a device group and registers it as the owner of its devices. The group
+        writes through the write buffer of its devices.
+        """
+        super(PyNNNestDeviceGroup, self).__init__(cls, devices)
+        self.__dict__['write_buffer'] = devices[0].write_buffer if devices else _unbuffered
+        self._own(devices)
+
+    def use_write_buffer(self, write_buffer):
+        """
+        Lets this group and its devices write through the given buffer
+
+        :param write_buffer: The write buffer
+        """
+        self.__dict__['write_buffer'] = write_buffer
+        for device in self.devices:
+            device.write_buffer = write_buffer
+
+    def _own(self, devices):
+        """
+        Lets the given devices drop the values of this group when they are written directly
+
+        :param devices: The devices of this group
+        """
+        values = self.__dict__['_values']
+        for device in devices:
+            device.__dict__['_group_values'] = values
+
     def create_subgroup(self, selection):
         """
         Creates a sub-devicegroup for the given indices
@@ -109,12 +229,11 @@ class PyNNNestDeviceGroup(DeviceGroup):
         :return: A new device group representing a subset of the devices represented
         by this device group
         """
-        devices = self.devices[selection]
-        group = type(self)(self.device_type, devices)
-        device_ids = []
-        for d in devices:
-            device_ids.append(d.device_id)
-        group.__dict__['_device_ids'] = device_ids
+        group = super(PyNNNestDeviceGroup, self).create_subgroup(selection)
+        # the subgroup shares the values of this group, which the devices have to drop
+        group._own(group.devices)  # pylint: disable=protected-access
+        group.__dict__['write_buffer'] = self.__dict__['write_buffer']
+        group.__dict__['_device_ids'] = [d.device_id for d in group.devices]
         return group
 
     def connect(self, neurons, **params):
@@ -125,20 +244,42 @@ class PyNNNestDeviceGroup(DeviceGroup):
         :param params: additional parameters for the connection
         """
         super(PyNNNestDeviceGroup, self).connect(neurons, **params)
-        device_ids = []
-        for d in self.__dict__['devices']:
-            device_ids.append(d.device_id)
-        self.__dict__['_device_ids'] = device_ids
+        self.__dict__['_device_ids'] = [d.device_id for d in self.__dict__['devices']]
 
-    def get(self, attrname):
+    def _gather(self, attrname):
         """
-        Gets the specified attribute of all devices in the device group
+        Gets the specified attribute of all devices with a single call to nest
 
         :param attrname: The attribute to get
         :return: A numpy array with all the values for the given attribute for all the devices
         in this device group
         """
-        return self.device_type.transformations[attrname]['get'](self.__dict__['_device_ids'])
+        return self.device_type.transformations[attrname]['get'](self.__dict__['_device_ids'],
+                                                                 self.__dict__['write_buffer'])
+
+    def _push(self, attrname, values, positions=None):
+        """
+        Writes the given values of the specified attribute with a single call to nest
+
+        :param attrname: The name of the attribute
+        :param values: A numpy array with one value per device or a single value for all devices
+        :param positions: A numpy array with the positions of the devices to write or None to
+         write all devices of this group
+        """
+        devices = self.devices
+        device_ids = self.__dict__['_device_ids']
+        if positions is not None:
+            devices = [devices[i] for i in positions]
+            device_ids = [device_ids[i] for i in positions]
+        self.device_type.transformations[attrname]['set'](device_ids, values,
+                                                          self.__dict__['write_buffer'])
+        # the devices are bypassed, so they need to know which values nest has now
+        if isinstance(values, numpy.ndarray):
+            values = values.tolist()
+        else:
+            values = [values] * len(devices)
+        for device, value in zip(devices, values):
+            device.written[attrname] = value
 
     def set(self, attrname, value):
         """
@@ -148,7 +289,9 @@ class PyNNNestDeviceGroup(DeviceGroup):
         :param value: The value that should be assigned to the attribute.
         If this value is indexable, each device is assigned the respective index of the value
         """
-        self.device_type.transformations[attrname]['set'](self.__dict__['_device_ids'], value)
+        if attrname not in self.device_type.transformations:
+            raise KeyError(attrname)
+        super(PyNNNestDeviceGroup, self).set(attrname, value)
 
 
 class PyNNNestDevice(object):
@@ -160,6 +303,42 @@ class PyNNNestDevice(object):
     # default attribute for MPI awareness set to false
     mpi_aware = False
 
+    # the relative change of a parameter below which the new value is not written to nest
+    tolerance = 0.0
+
+    # the buffer the parameter writes go through, set by the communication adapter
+    write_buffer = _unbuffered
+
+    @property
+    def written(self):
+        """
+        Gets a dictionary with the parameter values last written to nest
+        """
+        written = self.__dict__.get('_written')
+        if written is None:
+            written = self.__dict__['_written'] = {}
+        return written
+
+    def _parameter_changed(self, name, value, current):
+        """
+        Checks whether the given value of a parameter differs from the value last written to nest
+        by more than the tolerance of this device and records it as written if it does
+
+        :param name: The name of the parameter
+        :param value: The new value
+        :param current: The value of the parameter if it has not been written yet
+        :return: True, if the value needs to be written to nest, otherwise False
+        """
+        written = self.written
+        if not values_differ(written.get(name, current), value, self.tolerance):
+            return False
+        written[name] = value
+        # the values the group of this device has stored for its devices are outdated now
+        group_values = self.__dict__.get('_group_values')
+        if group_values is not None:
+            group_values.pop(name, None)
+        return True
+
     @classmethod
     def create_new_device_group(cls, populations, params):
         """
@@ -189,19 +368,8 @@ class PyNNNestDevice(object):
 
         This emulates PyNN-like behavior as SetStatus must be invoked in all processes to
         have an impact on the simulation as we cannot guarantee the location of each neuron.
-        """
-
-        # default single-process or non MPI-aware (e.g. MUSIC) instance
-        if self.mpi_aware:
-            for rank in xrange(MPI.COMM_WORLD.Get_size()):
-                if rank == MPI.COMM_WORLD.Get_rank():
-                    continue
 
-                # send the data required to call SetStatus on each process
-                MPI.COMM_WORLD.send({'command': 'SetStatus', 'ids': neuron_ids, 'params': params},
-                                    dest=rank, tag=100)
-
-        # perform the nest command in this process regardless of configuration
-        # The nest device is only available as protected property of the PyNN device
-        # pylint: disable=protected-access, no-member
-        nest.SetStatus(neuron_ids, params)
+        The write goes through the write buffer, so it may only reach nest when the buffer is
+        flushed before the next simulation step.
+        """
+        self.write_buffer.write(neuron_ids, params, self.mpi_aware)
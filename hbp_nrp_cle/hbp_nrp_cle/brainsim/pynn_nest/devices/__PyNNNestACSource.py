@@ -68,7 +68,7 @@ class PyNNNestACSource(PyNNNestDevice, PyNNACSource):
 
         :param value: float
         """
-        if value != self.amplitude:
+        if self._parameter_changed('amplitude', value, self.amplitude):
             self._parameters["amplitude"] = value
             # The nest device is only available as protected property of the PyNN device
             # pylint: disable=protected-access
@@ -90,7 +90,7 @@ class PyNNNestACSource(PyNNNestDevice, PyNNACSource):
 
         :param value: float
         """
-        if self.offset != value:
+        if self._parameter_changed('offset', value, self.offset):
             self._parameters["offset"] = value
             # The nest device is only available as protected property of the PyNN device
             # pylint: disable=protected-access
@@ -112,7 +112,7 @@ class PyNNNestACSource(PyNNNestDevice, PyNNACSource):
 
         :param value: float
         """
-        if self.frequency != value:
+        if self._parameter_changed('frequency', value, self.frequency):
             self._parameters['frequency'] = value
             # The nest device is only available as protected property of the PyNN device
             # pylint: disable=protected-access
@@ -134,7 +134,7 @@ class PyNNNestACSource(PyNNNestDevice, PyNNACSource):
 
         :param value: float
         """
-        if self.phase != value:
+        if self._parameter_changed('phase', value, self.phase):
             self._parameters['phase'] = value
             # The nest device is only available as protected property of the PyNN device
             # pylint: disable=protected-access
@@ -64,7 +64,7 @@ class PyNNNestDCSource(PyNNNestDevice, PyNNDCSource):
 
         :param value: float
         """
-        if self.amplitude != value:
+        if self._parameter_changed('amplitude', value, self.amplitude):
             self._parameters["amplitude"] = value
             # The nest device is only available as protected property of the PyNN device
             # pylint: disable=protected-access
@@ -155,7 +155,7 @@ class IntegratedNestDCCurrentGenerator(PyNNNestDevice, PyNNDCSource):
 
         :param value: float
         """
-        if self.amplitude != value:
+        if self._parameter_changed('amplitude', value, self.amplitude):
             self._parameters["amplitude"] = value
             self.SetStatus(list(self._generator.all_cells), {"I_e": 1000.0 * value})
 
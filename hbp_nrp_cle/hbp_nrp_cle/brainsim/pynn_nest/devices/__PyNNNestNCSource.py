@@ -54,10 +54,11 @@ class PyNNNestNCSource(PyNNNestDevice, PyNNNCSource):
 
         :param value: float
         """
-        self._generator.mean = value
-        # The nest device is only available as protected property of the PyNN device
-        # pylint: disable=protected-access
-        self.SetStatus(self._generator._device, {'mean': 1000.0 * value})
+        if self._parameter_changed('mean', value, self.mean):
+            self._generator.mean = value
+            # The nest device is only available as protected property of the PyNN device
+            # pylint: disable=protected-access
+            self.SetStatus(self._generator._device, {'mean': 1000.0 * value})
 
     def sim(self):
         """
@@ -74,7 +75,8 @@ class PyNNNestNCSource(PyNNNestDevice, PyNNNCSource):
 
         :param value: float
         """
-        self._generator.stdev = value
-        # The nest device is only available as protected property of the PyNN device
-        # pylint: disable=protected-access
-        self.SetStatus(self._generator._device, {'std': 1000.0 * value})
+        if self._parameter_changed('stdev', value, self.stdev):
+            self._generator.stdev = value
+            # The nest device is only available as protected property of the PyNN device
+            # pylint: disable=protected-access
+            self.SetStatus(self._generator._device, {'std': 1000.0 * value})
@@ -165,6 +165,17 @@ class IClosedLoopControl(object):  # pragma: no cover
         """
         raise NotImplementedError("Method not implemented")
 
+    def step_latency_histograms(self, reset=False):
+        """
+        Gets the latency histograms of the step phases (robot wait, brain run, device refresh,
+        robot buffer refresh and transfer functions) over the recorded window
+
+        :param reset: If True, the recorded window is cleared afterwards
+        :return: A dictionary mapping each phase to its sample count and p50, p90, p99 and max
+          durations in seconds
+        """
+        raise NotImplementedError("Method not implemented")
+
     def wait_step(self, timeout=None):  # -> None
         """
         Wait for the currently running simulation step to end.
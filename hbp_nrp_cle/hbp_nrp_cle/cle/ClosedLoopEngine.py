@@ -27,22 +27,45 @@ Implementation of the closed loop engine.
 
 __author__ = 'Georg Hinkel'
 
-import hbp_nrp_cle as cle
 from hbp_nrp_cle.cle.DeterministicClosedLoopEngine import DeterministicClosedLoopEngine
+from hbp_nrp_cle import context as sim_context
 import time
 import logging
-import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from hbp_nrp_cle.cle.CLEInterface import ForcedStopException
+from hbp_nrp_cle.cle.PhaseLatencyRecorder import ROBOT_WAIT, BRAIN_RUN, DEVICE_REFRESH, \
+    ROBOT_BUFFER_REFRESH, TRANSFER_FUNCTIONS
 
 logger = logging.getLogger('hbp_nrp_cle')
 
 
+class PipelineStepResult(namedtuple('PipelineStepResult',
+                                    ['step', 'time', 'tf_step', 'tf_time', 'tf_data_versions'])):
+    """
+    The result of a pipelined CLE step
+
+    :param step: The index of the simulation step that has just been run
+    :param time: The simulation time after the step
+    :param tf_step: The index of the last step whose Transfer Functions have completed, or None
+    :param tf_time: The simulation time passed to these Transfer Functions, or None
+    :param tf_data_versions: A dictionary mapping each Transfer Function name to the index of
+      the step whose data it has seen when it last ran
+    """
+    __slots__ = ()
+
+
 # pylint: disable=R0902
 # the attributes are reasonable in this case
 class ClosedLoopEngine(DeterministicClosedLoopEngine):
     """
     Implementation of the closed loop engine that runs Transfer Functions, brain
-    simulation and world simulation all in parallel for best effort performance
+    simulation and world simulation all in parallel for best effort performance.
+
+    The Transfer Functions of a step run on the data of that step. With the default maximum
+    staleness of 1, the brain and world simulation of step N+1 run while the Transfer Functions
+    of step N are still running, so their outputs may reach the simulations one step late. A
+    maximum staleness of 0 is a strict mode in which they complete before the next step starts.
     """
 
     def __init__(self,
@@ -51,7 +74,9 @@ class ClosedLoopEngine(DeterministicClosedLoopEngine):
                  brain_control_adapter,
                  brain_comm_adapter,
                  transfer_function_manager,
-                 dt):
+                 dt,
+                 max_staleness=1,
+                 context=None):
         """
         Create an instance of the cle.
 
@@ -61,40 +86,86 @@ class ClosedLoopEngine(DeterministicClosedLoopEngine):
         :param brain_comm_adapter: an instance of IBrainCommunicationAdapter
         :param transfer_function_manager: an instance of ITransferFunctionManager
         :param dt: The CLE time step in seconds
+        :param max_staleness: The number of steps (0 or 1) the simulations may run ahead of the
+          Transfer Functions, 1 by default
+        :param context: The simulation context holding the simulation clock, the active context by
+          default
         """
         super(ClosedLoopEngine, self).__init__(robot_control_adapter, robot_comm_adapter,
                                                brain_control_adapter, brain_comm_adapter,
-                                               transfer_function_manager, dt)
+                                               transfer_function_manager, dt, context)
+
+        self.__max_staleness = None
+        self.max_staleness = max_staleness
+
+        self.__tf_executor = None
+        self.__tf_future = None
+        self.__tf_step = None
+        self.__tf_time = None
+        self.__tf_data_versions = {}
+        self.__step = 0
+        self.__last_step_result = None
+
+    @property
+    def max_staleness(self):
+        """
+        Gets the number of steps the simulations may run ahead of the Transfer Functions
+        """
+        return self.__max_staleness
+
+    @max_staleness.setter
+    def max_staleness(self, value):
+        """
+        Sets the number of steps the simulations may run ahead of the Transfer Functions
+
+        :param value: The new maximum staleness, either 0 or 1
+        """
+        if value not in (0, 1):
+            raise ValueError("The maximum staleness must be either 0 or 1 steps")
+        self.__max_staleness = value
 
-        self.__tf_thread = None
-        self.__tf_start_event = threading.Event()
-        self.__tf_done_event = threading.Event()
+    @property
+    def last_step_result(self):
+        """
+        Gets the result of the last simulation step as a PipelineStepResult, or None
+        """
+        return self.__last_step_result
 
     def run_step(self, timestep):
         """
         Runs both simulations for the given time step in seconds.
 
+        If step coalescing is enabled and no transfer function is due within the next steps,
+        these steps are run as a single step of both simulations.
+
         :param timestep: simulation time, in seconds
         :return: Updated simulation time, otherwise -1
         """
-        clk = cle.clock
+        clk = self.context.clock
+        step = self.__step
+        latencies = self.phase_latencies
 
-        self.__tf_start_event.set()
+        steps = 1
+        if self.coalesce_steps:
+            # pending Transfer Functions may still change when the next ones are due
+            self.__wait_tfs()
+            steps = max(self._coalescible_steps(clk, timestep), 1)
+            if steps > 1:
+                logger.debug("Run step: coalescing %d steps", steps)
+        duration = timestep * steps
 
         # robot simulation
         logger.debug("Run step: Robot simulation.")
-        self.rca_future = self.rca.run_step_async(timestep)
-        self.rcm.refresh_buffers(clk)
+        self.rca_future = self.rca.run_step_async(duration)
 
-        # brain simulation
+        # brain simulation, overlaps with the Transfer Functions of the previous step
         logger.debug("Run step: Brain simulation")
         start = time.time()
-        self.bca.run_step(timestep * 1000.0)
-        self.bcm.refresh_buffers(clk)
-        self._bca_elapsed_time += time.time() - start
-
-        # update clock
-        cle.clock += timestep
+        self.bcm.flush_buffers()
+        self.bca.run_step(duration * 1000.0)
+        brain_end = time.time()
+        latencies.record(BRAIN_RUN, brain_end - start)
+        self._bca_elapsed_time += brain_end - start
 
         # wait for all thread to finish
         logger.debug("Run_step: waiting on Control thread")
@@ -104,34 +175,129 @@ class ClosedLoopEngine(DeterministicClosedLoopEngine):
             self._rca_elapsed_time += f.end - f.start
         except ForcedStopException:
             logger.warn("Simulation was brutally stopped.")
+        latencies.record(ROBOT_WAIT, time.time() - brain_end)
+
+        # the buffers must not change while Transfer Functions read them
+        self.__wait_tfs()
 
-        self.__tf_done_event.wait()
-        self.__tf_done_event.clear()
+        start = time.time()
+        self.rcm.refresh_buffers(clk)
+        refresh_start = time.time()
+        self.bcm.refresh_buffers(clk)
+        refresh_end = time.time()
+        latencies.record(ROBOT_BUFFER_REFRESH, refresh_start - start)
+        latencies.record(DEVICE_REFRESH, refresh_end - refresh_start)
+        self._bca_elapsed_time += refresh_end - refresh_start
+
+        # update clock
+        for _ in xrange(steps):
+            self.context.clock += timestep
+        self.__step += steps
+
+        # transfer functions
+        if steps == 1:
+            logger.debug("Run step: Transfer functions")
+            self.__submit_tfs(step, clk)
+            if self.__max_staleness == 0:
+                self.__wait_tfs()
+
+        self.__last_step_result = PipelineStepResult(step, self.context.clock,
+                                                     self.__tf_step, self.__tf_time,
+                                                     dict(self.__tf_data_versions))
 
         logger.debug("Run_step: done !")
-        return cle.clock
+        return self.context.clock
+
+    def __submit_tfs(self, step, clk):
+        """
+        Starts the Transfer Functions of the given step on the Transfer Function thread
 
-    def __run_tfs(self):
+        :param step: The index of the step whose data the Transfer Functions see
+        :param clk: The simulation time for the Transfer Functions
+        """
+        if self.__tf_executor is None:
+            self.__tf_executor = ThreadPoolExecutor(max_workers=1)
+        self.__tf_future = self.__tf_executor.submit(self.__run_tfs, step, clk)
+
+    def __run_tfs(self, step, clk):
         """
         Runs the Transfer Functions. To be executed in a separate thread
+
+        :param step: The index of the step whose data the Transfer Functions see
+        :param clk: The simulation time for the Transfer Functions
+        """
+        start = time.time()
+        tfs_due = self.tfm.next_due_time() <= clk
+        tfs = [tf for tf in self.tfm.transfer_functions() if tf.params]
+        last_runs = [tf.params[0] for tf in tfs]
+        with sim_context.activate(self.context):
+            self.tfm.run_robot_to_neuron(clk)
+            self.tfm.run_neuron_to_robot(clk)
+        # a Transfer Function has run in this step if it has stored a new simulation time
+        ran = [tf.name for tf, last_run in zip(tfs, last_runs) if tf.params[0] != last_run]
+        # the latency is only recorded if any Transfer Function was due
+        return step, clk, time.time() - start if tfs_due else None, ran
+
+    def __wait_tfs(self):
+        """
+        Waits for the pending Transfer Functions, if any, and records the data they have seen
+        """
+        f = self.__tf_future
+        if f is None:
+            return
+        self.__tf_future = None
+        step, clk, duration, ran = f.result()
+        if duration is not None:
+            self.phase_latencies.record(TRANSFER_FUNCTIONS, duration)
+        self.__tf_step = step
+        self.__tf_time = clk
+        for name in ran:
+            self.__tf_data_versions[name] = step
+
+    def stop(self, forced=False):
+        """
+        Stops the orchestrated simulations. Also waits for the current
+        simulation step and its pending Transfer Functions to end.
+
+        :param forced: If set, the CLE instance cancels pending tasks
+        """
+        super(ClosedLoopEngine, self).stop(forced)
+        self.__wait_tfs()
+
+    def prepare_fork(self):
+        """
+        Waits for the pending Transfer Functions and the work of the other background threads,
+        which are not forked with the process
+        """
+        self.__wait_tfs()
+        super(ClosedLoopEngine, self).prepare_fork()
+
+    def reset_after_fork(self):
+        """
+        Drops the Transfer Function thread and the other background threads inherited from the
+        parent of a forked process
+        """
+        self.__tf_executor = None
+        self.__tf_future = None
+        super(ClosedLoopEngine, self).reset_after_fork()
+
+    def reset(self):
+        """
+        Reset the orchestrated simulations (stops them before resetting).
+        """
+        super(ClosedLoopEngine, self).reset()
+        self.__step = 0
+        self.__tf_step = None
+        self.__tf_time = None
+        self.__tf_data_versions.clear()
+        self.__last_step_result = None
+
+    def shutdown(self):
+        """
+        Shuts down both simulations.
         """
-        clk = cle.clock
-        while not self.stopped_flag.isSet():
-            self.__tf_start_event.wait()
-            self.__tf_start_event.clear()
-            try:
-                # transfer functions
-                logger.debug("Run step: Transfer functions")
-                self.tfm.run_robot_to_neuron(clk)
-                self.tfm.run_neuron_to_robot(clk)
-            finally:
-                self.__tf_done_event.set()
-
-    def start(self):
-        """
-        Starts the orchestrated simulations
-        """
-        if super(ClosedLoopEngine, self).start():
-            self.__tf_thread = threading.Thread(target=self.__run_tfs)
-            self.__tf_thread.setDaemon(True)
-            self.__tf_thread.start()
+        super(ClosedLoopEngine, self).shutdown()
+        if self.__tf_executor is not None:
+            self.__tf_executor.shutdown(wait=True)
+            self.__tf_executor = None
+            self.__tf_future = None
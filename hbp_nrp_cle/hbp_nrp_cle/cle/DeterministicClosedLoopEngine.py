@@ -36,8 +36,11 @@ from hbp_nrp_cle.cle.CLEInterface import IClosedLoopControl, ForcedStopException
 from hbp_nrp_cle.cle.CLEInterface import BrainTimeoutException
 
 from hbp_nrp_cle.cle.__helper import get_tf_elapsed_times
+from hbp_nrp_cle.cle.WallClockPacer import WallClockPacer
+from hbp_nrp_cle.cle.PhaseLatencyRecorder import PhaseLatencyRecorder, ROBOT_WAIT, BRAIN_RUN, \
+    DEVICE_REFRESH, ROBOT_BUFFER_REFRESH, TRANSFER_FUNCTIONS
 from hbp_nrp_cle.robotsim.GazeboHelper import GazeboHelper
-import hbp_nrp_cle as cle
+from hbp_nrp_cle import context as sim_context
 
 logger = logging.getLogger('hbp_nrp_cle')
 
@@ -54,13 +57,17 @@ class DeterministicClosedLoopEngine(IClosedLoopControl):
     # default simulation timestep in seconds (20 ms)
     DEFAULT_TIMESTEP = 0.02
 
+    # maximum number of steps run as a single step when step coalescing is enabled
+    DEFAULT_MAX_COALESCED_STEPS = 50
+
     def __init__(self,
                  robot_control_adapter,
                  robot_comm_adapter,
                  brain_control_adapter,
                  brain_comm_adapter,
                  transfer_function_manager,
-                 dt
+                 dt,
+                 context=None
                  ):
         """
         Create an instance of the cle.
@@ -71,6 +78,8 @@ class DeterministicClosedLoopEngine(IClosedLoopControl):
         :param brain_comm_adapter: an instance of IBrainCommunicationAdapter
         :param transfer_function_manager: an instance of ITransferFunctionManager
         :param dt: The CLE time step in seconds
+        :param context: The simulation context holding the simulation clock, the active context by
+          default
         """
         self.rca = robot_control_adapter
         self.rca_future = None
@@ -80,6 +89,9 @@ class DeterministicClosedLoopEngine(IClosedLoopControl):
         self.tfm = transfer_function_manager
         # default timestep
         self.timestep = dt
+        # run consecutive steps without due transfer functions as one step
+        self.coalesce_steps = False
+        self.max_coalesced_steps = DeterministicClosedLoopEngine.DEFAULT_MAX_COALESCED_STEPS
 
         # stop flag ask the main loop to stop
         self.stop_flag = threading.Event()
@@ -89,8 +101,9 @@ class DeterministicClosedLoopEngine(IClosedLoopControl):
         self.stopped_flag = threading.Event()
         self.stopped_flag.set()
 
-        # global clock
-        cle.clock = 0.0
+        # simulation clock
+        self.context = context if context is not None else sim_context.current()
+        self.context.clock = 0.0
 
         self.initialized = False
 
@@ -106,14 +119,19 @@ class DeterministicClosedLoopEngine(IClosedLoopControl):
 
         self._rca_elapsed_time = 0.0
         self._bca_elapsed_time = 0.0
+        # per-step durations of the step phases
+        self.phase_latencies = PhaseLatencyRecorder()
+        # wall clock pacing of the main loop, disabled by default
+        self.pacer = WallClockPacer()
         self.__network_file = None
         self.__network_configuration = None
 
         self.__initial_robot_poses = None
 
         # This is to be eventually removed, as communications towards gazebo should
-        # be done from inside the RosControlAdapter
-        self.gazebo_helper = GazeboHelper()
+        # be done from inside the RosControlAdapter. It is created on first use, so that the
+        # CLE can be run headless on mock adapters without any gazebo services.
+        self.__gazebo_helper = None
 
         self.__start_thread = None
         self.__start_future = None
@@ -130,7 +148,7 @@ class DeterministicClosedLoopEngine(IClosedLoopControl):
         self.rca.initialize()
         self.bca.initialize()
         self.tfm.initialize('tfnode')
-        cle.clock = 0.0
+        self.context.clock = 0.0
         self.start_time = 0.0
         self.elapsed_time = 0.0
         self.initialized = True
@@ -196,22 +214,66 @@ class DeterministicClosedLoopEngine(IClosedLoopControl):
         """
         Runs both simulations for the given time step in seconds.
 
+        If step coalescing is enabled and no transfer function is due within the next steps,
+        these steps are run as a single step of both simulations.
+
         :param timestep: simulation time, in seconds
         :return: Updated simulation time, otherwise -1
         """
-        clk = cle.clock
+        clk = self.context.clock
+        steps = self._coalescible_steps(clk, timestep) if self.coalesce_steps else 0
+        if steps < 2:
+            return self.__run_steps(clk, timestep, 1, True)
+        logger.debug("Run step: coalescing %d steps", steps)
+        return self.__run_steps(clk, timestep, steps, False)
+
+    def _coalescible_steps(self, clk, timestep):
+        """
+        Computes the number of upcoming steps in which no transfer function is due
+
+        :param clk: The current simulation time
+        :param timestep: The time step in seconds
+        :return: The number of steps, at most max_coalesced_steps
+        """
+        due = self.tfm.next_due_time()
+        steps = 0
+        while clk < due and steps < self.max_coalesced_steps:
+            # accumulate the same way as the clock to obtain identical step times
+            clk += timestep
+            steps += 1
+        return steps
+
+    def __run_steps(self, clk, timestep, steps, run_tfs):
+        """
+        Runs both simulations for the given number of time steps at once
+
+        :param clk: The current simulation time
+        :param timestep: The time step in seconds
+        :param steps: The number of time steps to run
+        :param run_tfs: True, if the transfer functions should run after the simulations
+        :return: Updated simulation time
+        """
+        latencies = self.phase_latencies
+        duration = timestep * steps
 
         # robot simulation
         logger.debug("Run step: Robot simulation.")
-        self.rca_future = self.rca.run_step_async(timestep)
+        self.rca_future = self.rca.run_step_async(duration)
+        start = time.time()
         self.rcm.refresh_buffers(clk)
+        brain_start = time.time()
+        latencies.record(ROBOT_BUFFER_REFRESH, brain_start - start)
 
         # brain simulation
         logger.debug("Run step: Brain simulation")
-        start = time.time()
-        self.bca.run_step(timestep * 1000.0)
+        self.bcm.flush_buffers()
+        self.bca.run_step(duration * 1000.0)
+        refresh_start = time.time()
         self.bcm.refresh_buffers(clk)
-        self._bca_elapsed_time += time.time() - start
+        brain_end = time.time()
+        latencies.record(BRAIN_RUN, refresh_start - brain_start)
+        latencies.record(DEVICE_REFRESH, brain_end - refresh_start)
+        self._bca_elapsed_time += brain_end - brain_start
 
         # wait for all thread to finish
         logger.debug("Run_step: waiting on Control thread")
@@ -221,17 +283,24 @@ class DeterministicClosedLoopEngine(IClosedLoopControl):
             self._rca_elapsed_time += f.end - f.start
         except ForcedStopException:
             logger.warn("Simulation was brutally stopped.")
-
-        # transfer functions
-        logger.debug("Run step: Transfer functions")
-        self.tfm.run_robot_to_neuron(clk)
-        self.tfm.run_neuron_to_robot(clk)
+        tf_start = time.time()
+        latencies.record(ROBOT_WAIT, tf_start - brain_end)
+
+        # transfer functions, their latency is only recorded if any of them is due
+        if run_tfs:
+            logger.debug("Run step: Transfer functions")
+            tfs_due = self.tfm.next_due_time() <= clk
+            self.tfm.run_robot_to_neuron(clk)
+            self.tfm.run_neuron_to_robot(clk)
+            if tfs_due:
+                latencies.record(TRANSFER_FUNCTIONS, time.time() - tf_start)
 
         # update clock
-        cle.clock += timestep
+        for _ in xrange(steps):
+            self.context.clock += timestep
 
         logger.debug("Run_step: done !")
-        return cle.clock
+        return self.context.clock
 
     def shutdown(self):
         """
@@ -244,6 +313,22 @@ class DeterministicClosedLoopEngine(IClosedLoopControl):
         self.rca.shutdown()
         self.bca.shutdown()
 
+    def prepare_fork(self):
+        """
+        Waits for the work of the background threads, which are not forked with the process.
+        The simulation must not be running.
+        """
+        if self.running:
+            raise Exception("The simulation must not be running while the process is forked")
+        self.tfm.prepare_fork()
+
+    def reset_after_fork(self):
+        """
+        Drops the background threads inherited from the parent of a forked process, new ones are
+        started when they are needed
+        """
+        self.tfm.reset_after_fork()
+
     def start(self):
         """
         Starts the orchestrated simulations
@@ -271,8 +356,12 @@ class DeterministicClosedLoopEngine(IClosedLoopControl):
             self.stop_flag.clear()
             self.stopped_flag.clear()
             self.start_time = time.time()
-            while not self.stop_flag.isSet():
-                self.run_step(self.timestep)
+            self.pacer.start(self.context.clock)
+            with sim_context.activate(self.context):
+                while not self.stop_flag.isSet():
+                    self.run_step(self.timestep)
+                    self.pacer.pace(self.context.clock)
+                    self.context.overloaded = self.pacer.lagging
             self.__start_future.set_result(None)
         # pylint: disable=broad-except
         except Exception as e:
@@ -316,11 +405,14 @@ class DeterministicClosedLoopEngine(IClosedLoopControl):
         self.rca.reset()
         self.bca.reset()
         self.tfm.reset()
-        cle.clock = 0.0
+        self.context.clock = 0.0
         self.start_time = 0.0
         self.elapsed_time = 0.0
         self._rca_elapsed_time = 0.0
         self._bca_elapsed_time = 0.0
+        self.phase_latencies.reset()
+        self.pacer.reset()
+        self.context.overloaded = False
         logger.info("CLE reset")
 
     def reset_world(self, sdf_world_string=""):
@@ -361,7 +453,7 @@ class DeterministicClosedLoopEngine(IClosedLoopControl):
         """
         Get the current simulation time.
         """
-        return cle.clock
+        return self.context.clock
 
     @property
     def running(self):
@@ -379,6 +471,63 @@ class DeterministicClosedLoopEngine(IClosedLoopControl):
             return self.elapsed_time + time.time() - self.start_time
         return self.elapsed_time
 
+    @property
+    def real_time_factor(self):
+        """
+        Gets the target ratio of simulation time to wall clock time of the main loop, None if
+        the loop runs as fast as possible
+        """
+        return self.pacer.real_time_factor
+
+    @real_time_factor.setter
+    def real_time_factor(self, value):
+        """
+        Sets the target ratio of simulation time to wall clock time of the main loop
+
+        :param value: The new real-time factor (e.g. 1.0, 0.5 or 2.0), or None to run as fast
+          as possible
+        """
+        self.pacer.real_time_factor = value
+
+    @property
+    def overrun_steps(self):
+        """
+        Gets the number of paced steps that took longer than their wall clock budget
+        """
+        return self.pacer.overrun_steps
+
+    @property
+    def overrun_time(self):
+        """
+        Gets the total time in seconds by which the paced steps exceeded their budget
+        """
+        return self.pacer.overrun_time
+
+    @property
+    def pacing_drift(self):
+        """
+        Gets the wall clock time in seconds the paced loop is behind its target
+        """
+        return self.pacer.drift
+
+    @property
+    def gazebo_helper(self):
+        """
+        Gets the helper used to communicate with gazebo
+        """
+        if self.__gazebo_helper is None:
+            self.__gazebo_helper = GazeboHelper()
+        return self.__gazebo_helper
+
+    @gazebo_helper.setter
+    def gazebo_helper(self, value):
+        """
+        Sets the helper used to communicate with gazebo
+
+        :param value: The new gazebo helper
+        """
+        self.__gazebo_helper = value
+
     @property
     def initial_robot_poses(self):
         """
@@ -421,6 +570,16 @@ class DeterministicClosedLoopEngine(IClosedLoopControl):
         """
         return self._rca_elapsed_time
 
+    def step_latency_histograms(self, reset=False):
+        """
+        Gets the latency histograms of the step phases over the recorded window
+
+        :param reset: If True, the recorded window is cleared afterwards
+        :return: A dictionary mapping each phase to its sample count and p50, p90, p99 and max
+          durations in seconds
+        """
+        return self.phase_latencies.histograms(reset)
+
     def wait_step(self, timeout=None):
         """
         Wait for the currently running simulation step to end.
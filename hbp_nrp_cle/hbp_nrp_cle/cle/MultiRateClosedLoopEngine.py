@@ -0,0 +1,173 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+Implementation of a closed loop engine that runs the world simulation, the brain simulation and
+the transfer functions at different rates.
+"""
+
+__author__ = ''
+
+import time
+import logging
+from hbp_nrp_cle.cle.DeterministicClosedLoopEngine import DeterministicClosedLoopEngine
+from hbp_nrp_cle.cle.CLEInterface import ForcedStopException
+from hbp_nrp_cle.cle.PhaseLatencyRecorder import ROBOT_WAIT, BRAIN_RUN, DEVICE_REFRESH, \
+    ROBOT_BUFFER_REFRESH, TRANSFER_FUNCTIONS
+
+logger = logging.getLogger('hbp_nrp_cle')
+
+
+def period_to_ticks(period, dt):
+    """
+    Converts a period into a number of base ticks
+
+    :param period: The period in seconds, or None for a period of one tick
+    :param dt: The base tick in seconds
+    :return: The number of base ticks of the period
+    :except ValueError: if the period is not a positive integer multiple of the base tick
+    """
+    if period is None:
+        return 1
+    ticks = int(round(period / dt))
+    if ticks < 1 or abs(ticks * dt - period) > 1e-9:
+        raise ValueError("The period {0} is not an integer multiple of the base tick {1}"
+                         .format(period, dt))
+    return ticks
+
+
+# pylint: disable=R0902
+# the attributes are reasonable in this case
+class MultiRateClosedLoopEngine(DeterministicClosedLoopEngine):
+    """
+    Implementation of the closed loop engine that steps the world simulation, the brain
+    simulation and the transfer functions each with their own period. All periods are integer
+    multiples of the CLE time step, which serves as base tick. An adapter is only called on its
+    own ticks, in between the buffered data of its last step is kept.
+    """
+
+    def __init__(self,
+                 robot_control_adapter,
+                 robot_comm_adapter,
+                 brain_control_adapter,
+                 brain_comm_adapter,
+                 transfer_function_manager,
+                 dt,
+                 physics_period=None,
+                 brain_period=None,
+                 tf_period=None,
+                 context=None):
+        """
+        Create an instance of the cle.
+
+        :param robot_control_adapter: an instance of IRobotContolAdapter
+        :param robot_comm_adapter: an instance of IRobotCommunicationAdapter
+        :param brain_control_adapter: an instance of IBrainContolAdapter
+        :param brain_comm_adapter: an instance of IBrainCommunicationAdapter
+        :param transfer_function_manager: an instance of ITransferFunctionManager
+        :param dt: The CLE base tick in seconds
+        :param physics_period: The world simulation period in seconds, defaults to dt
+        :param brain_period: The brain simulation period in seconds, defaults to dt
+        :param tf_period: The transfer function period in seconds, defaults to dt
+        :param context: The simulation context holding the simulation clock, the active context by
+          default
+        """
+        super(MultiRateClosedLoopEngine, self).__init__(robot_control_adapter,
+                                                        robot_comm_adapter,
+                                                        brain_control_adapter,
+                                                        brain_comm_adapter,
+                                                        transfer_function_manager, dt, context)
+        self.physics_ticks = period_to_ticks(physics_period, dt)
+        self.brain_ticks = period_to_ticks(brain_period, dt)
+        self.tf_ticks = period_to_ticks(tf_period, dt)
+        self.__tick = 0
+
+    def run_step(self, timestep):
+        """
+        Runs one base tick of the given length in seconds. Each simulation is advanced by its
+        whole period on the first tick of that period.
+
+        :param timestep: The base tick, in seconds
+        :return: Updated simulation time, otherwise -1
+        """
+        clk = self.context.clock
+        tick = self.__tick
+        latencies = self.phase_latencies
+        physics_due = tick % self.physics_ticks == 0
+
+        # robot simulation
+        if physics_due:
+            logger.debug("Run step: Robot simulation.")
+            self.rca_future = self.rca.run_step_async(timestep * self.physics_ticks)
+            start = time.time()
+            self.rcm.refresh_buffers(clk)
+            latencies.record(ROBOT_BUFFER_REFRESH, time.time() - start)
+
+        # brain simulation
+        if tick % self.brain_ticks == 0:
+            logger.debug("Run step: Brain simulation")
+            start = time.time()
+            self.bcm.flush_buffers()
+            self.bca.run_step(timestep * self.brain_ticks * 1000.0)
+            refresh_start = time.time()
+            self.bcm.refresh_buffers(clk)
+            brain_end = time.time()
+            latencies.record(BRAIN_RUN, refresh_start - start)
+            latencies.record(DEVICE_REFRESH, brain_end - refresh_start)
+            self._bca_elapsed_time += brain_end - start
+
+        # wait for the robot simulation to finish
+        if physics_due:
+            logger.debug("Run_step: waiting on Control thread")
+            start = time.time()
+            try:
+                f = self.rca_future
+                f.result()
+                self._rca_elapsed_time += f.end - f.start
+            except ForcedStopException:
+                logger.warn("Simulation was brutally stopped.")
+            latencies.record(ROBOT_WAIT, time.time() - start)
+
+        # transfer functions
+        if tick % self.tf_ticks == 0:
+            logger.debug("Run step: Transfer functions")
+            start = time.time()
+            tfs_due = self.tfm.next_due_time() <= clk
+            self.tfm.run_robot_to_neuron(clk)
+            self.tfm.run_neuron_to_robot(clk)
+            if tfs_due:
+                latencies.record(TRANSFER_FUNCTIONS, time.time() - start)
+
+        # update clock
+        self.context.clock += timestep
+        self.__tick = tick + 1
+
+        logger.debug("Run_step: done !")
+        return self.context.clock
+
+    def reset(self):
+        """
+        Reset the orchestrated simulations (stops them before resetting).
+        """
+        super(MultiRateClosedLoopEngine, self).reset()
+        self.__tick = 0
@@ -0,0 +1,105 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+This module contains a fixed-size recorder for the durations of the CLE step phases
+"""
+
+__author__ = ''
+
+import numpy as np
+
+ROBOT_WAIT = 'robot_wait'
+BRAIN_RUN = 'brain_run'
+DEVICE_REFRESH = 'device_refresh'
+ROBOT_BUFFER_REFRESH = 'robot_buffer_refresh'
+TRANSFER_FUNCTIONS = 'transfer_functions'
+
+PHASES = (ROBOT_WAIT, BRAIN_RUN, DEVICE_REFRESH, ROBOT_BUFFER_REFRESH, TRANSFER_FUNCTIONS)
+
+
+class PhaseLatencyRecorder(object):
+    """
+    Keeps the durations of the last steps of every CLE phase in a ring buffer
+    """
+
+    DEFAULT_WINDOW = 1000
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        """
+        Creates a new recorder
+
+        :param window: The number of steps kept per phase
+        """
+        if window <= 0:
+            raise ValueError("The latency window must contain at least one step")
+        self.__window = window
+        self.__samples = dict((phase, np.zeros(window)) for phase in PHASES)
+        self.__counts = dict((phase, 0) for phase in PHASES)
+
+    @property
+    def window(self):
+        """
+        Gets the number of steps kept per phase
+        """
+        return self.__window
+
+    def record(self, phase, duration):
+        """
+        Records the duration of a phase
+
+        :param phase: The phase, one of PHASES
+        :param duration: The duration of the phase in seconds
+        """
+        count = self.__counts[phase]
+        self.__samples[phase][count % self.__window] = duration
+        self.__counts[phase] = count + 1
+
+    def histograms(self, reset=False):
+        """
+        Computes the latency histograms of the recorded window
+
+        :param reset: If True, the window is cleared afterwards
+        :return: A dictionary mapping each phase to a dictionary with the number of samples and
+          the p50, p90, p99 and max durations in seconds
+        """
+        result = {}
+        for phase in PHASES:
+            count = min(self.__counts[phase], self.__window)
+            samples = self.__samples[phase][:count]
+            if count:
+                p50, p90, p99 = np.percentile(samples, [50, 90, 99])
+                result[phase] = {'count': count, 'p50': p50, 'p90': p90, 'p99': p99,
+                                 'max': samples.max()}
+            else:
+                result[phase] = {'count': 0, 'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'max': 0.0}
+        if reset:
+            self.reset()
+        return result
+
+    def reset(self):
+        """
+        Clears the recorded window
+        """
+        for phase in PHASES:
+            self.__counts[phase] = 0
@@ -0,0 +1,238 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+Runs replicas of an initialized closed loop engine in forked processes
+"""
+
+__author__ = ''
+
+import os
+import sys
+import time
+import random
+import select
+import logging
+import traceback
+import multiprocessing
+import cPickle as pickle
+from collections import namedtuple
+
+import numpy
+
+import hbp_nrp_cle.tf_framework as nrp
+from hbp_nrp_cle import context as sim_context
+from hbp_nrp_cle.brainsim import config as brain_config
+
+logger = logging.getLogger('hbp_nrp_cle')
+
+
+class ReplicaResult(namedtuple('ReplicaResult',
+                               ['index', 'seed', 'steps', 'simulation_time', 'wall_time',
+                                'csv_recorders', 'error'])):
+    """
+    The result of a single replica
+
+    :param index: The index of the replica
+    :param seed: The RNG seed the replica has been run with
+    :param steps: The number of steps the replica has run
+    :param simulation_time: The simulation time at the end of the replica
+    :param wall_time: The wall clock time in seconds the replica took to run its steps
+    :param csv_recorders: The recorded CSV data, a list of file name, headers and the path of the
+      recorded file for each CSV recorder as returned by dump_csv_recorder_to_files
+    :param error: The formatted traceback if the replica failed, otherwise None
+    """
+    __slots__ = ()
+
+
+def seed_python_rngs(seed):
+    """
+    Seeds the random number generators of python and numpy with the given seed
+
+    :param seed: The RNG seed
+    """
+    random.seed(seed)
+    numpy.random.seed(seed % (2 ** 32))
+
+
+class ReplicaEnsemble(object):
+    """
+    Runs replicas of an initialized closed loop engine. The brain, the devices and the Transfer
+    Functions are set up once in the parent process. Each replica is a forked copy-on-write
+    child process that only reseeds the random number generators and runs the engine for a
+    fixed number of steps. The parent collects the CSV recorder output and timing of every
+    replica.
+
+    The background threads of the engine, e.g. the Transfer Function threads and the CSV writer,
+    are not forked with the process. The parent waits for their work before forking and every
+    replica drops them, so it starts its own threads when they are needed.
+
+    The engine must not hold connections to other processes, so it should use a mock or
+    stand-in robot. Simulator state that was seeded during the initialization has to be
+    reseeded by the given reseed function, e.g. NEST is reseeded by
+    hbp_nrp_cle.brainsim.pynn_nest.nrp_reseed.
+    """
+
+    def __init__(self, engine, reseed=seed_python_rngs):
+        """
+        Creates a new ensemble
+
+        :param engine: The initialized closed loop engine
+        :param reseed: A function called with the seed of the replica in every replica before
+          the steps are run
+        """
+        self.__engine = engine
+        self.__reseed = reseed
+        self.__wall_time = 0.0
+
+    @property
+    def engine(self):
+        """
+        Gets the closed loop engine of the ensemble
+        """
+        return self.__engine
+
+    @property
+    def wall_time(self):
+        """
+        Gets the wall clock time in seconds of the last run of the ensemble
+        """
+        return self.__wall_time
+
+    def run(self, seeds, steps, max_parallel=None):
+        """
+        Runs a replica for every given seed
+
+        :param seeds: The RNG seeds of the replicas
+        :param steps: The number of steps each replica runs
+        :param max_parallel: The maximum number of replicas running at the same time, by default
+          the number of cores
+        :return: A list of replica results in the order of the seeds
+        """
+        if not self.__engine.initialized:
+            raise Exception("The closed loop engine must be initialized before forking replicas")
+        if max_parallel is None:
+            max_parallel = multiprocessing.cpu_count()
+        if max_parallel < 1:
+            raise ValueError("At least one replica must be allowed to run")
+
+        self.__engine.prepare_fork()
+        start = time.time()
+        pending = list(enumerate(seeds))
+        running = {}
+        results = []
+        # flush the output buffers, otherwise their content is written by every replica
+        sys.stdout.flush()
+        sys.stderr.flush()
+        while pending or running:
+            while pending and len(running) < max_parallel:
+                index, seed = pending.pop(0)
+                pid, read_fd = self.__fork(index, seed, steps)
+                running[read_fd] = (index, seed, pid)
+            # collect whichever replica finishes first, so that the next one can start
+            ready, _, _ = select.select(list(running), [], [])
+            index, seed, pid = running.pop(ready[0])
+            results.append(self.__collect(index, seed, pid, ready[0]))
+        self.__wall_time = time.time() - start
+        results.sort(key=lambda result: result.index)
+        return results
+
+    def __fork(self, index, seed, steps):
+        """
+        Forks a replica
+
+        :param index: The index of the replica
+        :param seed: The RNG seed of the replica
+        :param steps: The number of steps to run
+        :return: The process id of the replica and the file descriptor to read its result from
+        """
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            # the child never returns, so a failure cannot be mistaken for the parent
+            os.close(read_fd)
+            status = 0
+            try:
+                result = self.__run_replica(index, seed, steps)
+                with os.fdopen(write_fd, 'wb') as result_file:
+                    pickle.dump(result, result_file, pickle.HIGHEST_PROTOCOL)
+            # pylint: disable=broad-except
+            except BaseException:
+                status = 1
+            finally:
+                os._exit(status)  # pylint: disable=protected-access
+        os.close(write_fd)
+        return pid, read_fd
+
+    def __run_replica(self, index, seed, steps):
+        """
+        Runs the steps of a replica in the forked process
+
+        :param index: The index of the replica
+        :param seed: The RNG seed of the replica
+        :param steps: The number of steps to run
+        :return: The replica result
+        """
+        engine = self.__engine
+        start = time.time()
+        # pylint: disable=broad-except
+        try:
+            engine.reset_after_fork()
+            nrp.reset_csv_recorders_after_fork()
+            brain_config.rng_seed = seed
+            if self.__reseed is not None:
+                self.__reseed(seed)
+            with sim_context.activate(engine.context):
+                start = time.time()
+                for _ in xrange(steps):
+                    engine.run_step(engine.timestep)
+                wall_time = time.time() - start
+                csv = nrp.dump_csv_recorder_to_files()
+            return ReplicaResult(index, seed, steps, engine.simulation_time, wall_time, csv,
+                                 None)
+        except Exception:
+            return ReplicaResult(index, seed, steps, engine.simulation_time,
+                                 time.time() - start, [], traceback.format_exc())
+
+    @staticmethod
+    def __collect(index, seed, pid, read_fd):
+        """
+        Collects the result of a replica
+
+        :param index: The index of the replica
+        :param seed: The RNG seed of the replica
+        :param pid: The process id of the replica
+        :param read_fd: The file descriptor to read the result from
+        :return: The replica result
+        """
+        with os.fdopen(read_fd, 'rb') as result_file:
+            data = result_file.read()
+        _, status = os.waitpid(pid, 0)
+        if data:
+            result = pickle.loads(data)
+            if result.error is not None:
+                logger.error("Replica %d with seed %s failed:\n%s", index, seed, result.error)
+            return result
+        error = "Replica process exited with status {0} without a result".format(status)
+        logger.error("Replica %d with seed %s failed: %s", index, seed, error)
+        return ReplicaResult(index, seed, 0, None, None, [], error)
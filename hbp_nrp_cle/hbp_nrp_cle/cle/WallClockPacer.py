@@ -0,0 +1,174 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+This module contains the wall clock pacing of the CLE main loop
+"""
+
+__author__ = ''
+
+import time
+
+
+class WallClockPacer(object):
+    """
+    Paces a simulation loop to a target real-time factor.
+
+    The pacer keeps an anchor in wall clock and simulation time and sleeps after each step until
+    the wall clock time that corresponds to the reached simulation time. Because the sleep target
+    is computed from the anchor, time lost in slow steps is made up in later steps instead of being
+    forgotten. Steps that take longer than their wall clock budget are counted as overruns.
+    """
+
+    def __init__(self, real_time_factor=None, clock=time.time, sleep=time.sleep):
+        """
+        Creates a new pacer
+
+        :param real_time_factor: The ratio of simulation time to wall clock time, or None to
+          run as fast as possible
+        :param clock: The wall clock
+        :param sleep: The function used to sleep
+        """
+        self.__clock = clock
+        self.__sleep = sleep
+        self.__real_time_factor = None
+        self.__anchor_wall = None
+        self.__anchor_sim = 0.0
+        self.__step_wall = None
+        self.__step_sim = 0.0
+        self.__drift = 0.0
+        self.__lagging = False
+        self.__overrun_steps = 0
+        self.__overrun_time = 0.0
+        self.real_time_factor = real_time_factor
+
+    @property
+    def real_time_factor(self):
+        """
+        Gets the target ratio of simulation time to wall clock time, None if pacing is disabled
+        """
+        return self.__real_time_factor
+
+    @real_time_factor.setter
+    def real_time_factor(self, value):
+        """
+        Sets the target ratio of simulation time to wall clock time. The pacing is re-anchored
+        at the next step.
+
+        :param value: The new real-time factor, or None to disable the pacing
+        """
+        if value is not None and value <= 0:
+            raise ValueError("The real-time factor must be positive")
+        self.__real_time_factor = value
+        self.__anchor_wall = None
+        self.__lagging = False
+
+    @property
+    def drift(self):
+        """
+        Gets the wall clock time in seconds the loop is behind its target after the last step,
+        negative if the loop is ahead
+        """
+        return self.__drift
+
+    @property
+    def lagging(self):
+        """
+        Gets a value indicating whether the loop fell behind its target by more than the wall
+        clock budget of the last step, i.e. whether the lost time was not made up by sleeping
+        """
+        return self.__lagging
+
+    @property
+    def overrun_steps(self):
+        """
+        Gets the number of steps that took longer than their wall clock budget
+        """
+        return self.__overrun_steps
+
+    @property
+    def overrun_time(self):
+        """
+        Gets the total time in seconds by which the overrun steps exceeded their budget
+        """
+        return self.__overrun_time
+
+    def start(self, sim_time):
+        """
+        Anchors the pacing at the given simulation time and the current wall clock time
+
+        :param sim_time: The current simulation time
+        """
+        self.__anchor_wall = self.__clock()
+        self.__anchor_sim = sim_time
+        self.__step_wall = self.__anchor_wall
+        self.__step_sim = sim_time
+        self.__drift = 0.0
+
+    def pace(self, sim_time):
+        """
+        Accounts for the step that reached the given simulation time and sleeps until its wall
+        clock target
+
+        :param sim_time: The simulation time after the step
+        """
+        rtf = self.__real_time_factor
+        if rtf is None:
+            # keep track of the steps so that pacing switched on later anchors at the last step
+            self.__step_wall = self.__clock()
+            self.__step_sim = sim_time
+            return
+        if self.__anchor_wall is None:
+            if self.__step_wall is None:
+                self.start(self.__step_sim)
+            else:
+                # re-anchor at the previous step
+                self.__anchor_wall = self.__step_wall
+                self.__anchor_sim = self.__step_sim
+        now = self.__clock()
+
+        over = (now - self.__step_wall) - (sim_time - self.__step_sim) / rtf
+        if over > 0:
+            self.__overrun_steps += 1
+            self.__overrun_time += over
+
+        target = self.__anchor_wall + (sim_time - self.__anchor_sim) / rtf
+        if target > now:
+            self.__sleep(target - now)
+            now = self.__clock()
+        self.__drift = now - target
+        self.__lagging = self.__drift > (sim_time - self.__step_sim) / rtf
+        self.__step_wall = now
+        self.__step_sim = sim_time
+
+    def reset(self):
+        """
+        Clears the overrun statistics and the anchor
+        """
+        self.__anchor_wall = None
+        self.__step_wall = None
+        self.__step_sim = 0.0
+        self.__drift = 0.0
+        self.__lagging = False
+        self.__overrun_steps = 0
+        self.__overrun_time = 0.0
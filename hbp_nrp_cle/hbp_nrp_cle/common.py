@@ -28,16 +28,47 @@ import sys
 import os
 
 
+# True once the resources folder has been looked up, reset by invalidate_resources
+_resources_refreshed = False
+
+# incremented by brain_changed whenever a brain or its populations are loaded
+brain_version = 0
+
+
 def refresh_resources():
     """
     It checks if the resources folders has files, if so, the resources path will be added.
+    The lookup is done only once until the resources are invalidated, so that this function can
+    be called on every transfer function run.
     """
+    global _resources_refreshed  # pylint: disable=global-statement
+    if _resources_refreshed:
+        return
     __resources_path = os.path.join(
             os.environ['NRP_SIMULATION_DIR'], "resources")
     if os.path.exists(__resources_path):
         if os.listdir(__resources_path) != []:
             if __resources_path not in sys.path:
                 sys.path.insert(0, __resources_path)
+    _resources_refreshed = True
+
+
+def invalidate_resources():
+    """
+    Forces the next call of refresh_resources to look up the resources folder again. This must
+    be called whenever user code is (re)loaded or the contents of the resources folder change.
+    """
+    global _resources_refreshed  # pylint: disable=global-statement
+    _resources_refreshed = False
+
+
+def brain_changed():
+    """
+    Notes that the loaded brain or its populations have changed. Selections of brain variables
+    memoized for earlier brain versions are not used anymore.
+    """
+    global brain_version  # pylint: disable=global-statement
+    brain_version += 1
 
 
 class UserCodeException(Exception):
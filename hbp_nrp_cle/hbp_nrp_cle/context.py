@@ -0,0 +1,140 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+This module contains the simulation context. A simulation context owns the state of a single
+simulation that used to be kept in module level variables, i.e. the simulation clock, the active
+transfer function manager, the loaded brain and the last simulation time received from the robot
+simulation. Several contexts can be used in one process to run several simulations side by side.
+
+The module level variables are still supported: the default context stores its state in them, so
+code that uses ``hbp_nrp_cle.clock`` or ``hbp_nrp_cle.tf_framework.config`` keeps working as long
+as no other context is activated.
+"""
+
+import threading
+from contextlib import contextmanager
+
+__author__ = ''
+
+
+class SimulationContext(object):
+    """
+    Holds the state of a single simulation
+    """
+
+    def __init__(self):
+        """
+        Creates a new, empty simulation context
+        """
+        self.clock = 0.0
+        self.active_node = None
+        self.brain_root = None
+        self.brain_source = None
+        self.brain_populations = None
+        self.robot_sim_time = 0.0
+        self.csv_recorders = []
+        self.overloaded = False
+
+    def activate(self):
+        """
+        Activates this context for the current thread until the returned context manager is left.
+        Transfer functions defined while a context is active are added to its transfer function
+        manager.
+
+        :return: A context manager
+        """
+        return activate(self)
+
+
+def _legacy_property(module_name, attribute):
+    """
+    Creates a property that stores its value in a module level variable
+
+    :param module_name: The name of the module holding the variable
+    :param attribute: The name of the variable
+    """
+    def __module():
+        """
+        Imports the module lazily, as it may depend on this module
+        """
+        return __import__(module_name, fromlist=[attribute])
+
+    def __get(_):
+        return getattr(__module(), attribute)
+
+    def __set(_, value):
+        setattr(__module(), attribute, value)
+
+    return property(__get, __set)
+
+
+class _DefaultSimulationContext(SimulationContext):
+    """
+    The default simulation context that keeps its state in the module level variables of the
+    previous API
+    """
+
+    # pylint: disable=super-init-not-called
+    def __init__(self):
+        """
+        Creates the default context. The module level variables keep their current values.
+        """
+        self.overloaded = False
+
+    clock = _legacy_property('hbp_nrp_cle', 'clock')
+    active_node = _legacy_property('hbp_nrp_cle.tf_framework.config', 'active_node')
+    brain_root = _legacy_property('hbp_nrp_cle.tf_framework.config', 'brain_root')
+    brain_source = _legacy_property('hbp_nrp_cle.tf_framework.config', 'brain_source')
+    brain_populations = _legacy_property('hbp_nrp_cle.tf_framework.config', 'brain_populations')
+    csv_recorders = _legacy_property('hbp_nrp_cle.tf_framework.config', 'csv_recorders')
+    # the variable lives next to the ROS adapter that updates it, so it is only imported on use
+    robot_sim_time = _legacy_property('hbp_nrp_cle.robotsim.RosCommunicationAdapter', 'sim_time')
+
+
+default_context = _DefaultSimulationContext()
+_local = threading.local()
+
+
+def current():
+    """
+    Gets the simulation context that is active in the current thread
+
+    :return: The active context, or the default context if no other context has been activated
+    """
+    return getattr(_local, 'context', None) or default_context
+
+
+@contextmanager
+def activate(context):
+    """
+    Activates the given context for the current thread until the context manager is left
+
+    :param context: The simulation context
+    """
+    previous = getattr(_local, 'context', None)
+    _local.context = context
+    try:
+        yield context
+    finally:
+        _local.context = previous
@@ -191,6 +191,14 @@ class MockClosedLoopEngine(IClosedLoopControl,
         """
         return 0.0
 
+    def step_latency_histograms(self, reset=False):
+        """
+        Gets the latency histograms of the step phases over the recorded window
+
+        :param reset: If True, the recorded window is cleared afterwards
+        """
+        return {}
+
     def wait_step(self, timeout=None):
         """
         Wait for the currently running simulation step to end.
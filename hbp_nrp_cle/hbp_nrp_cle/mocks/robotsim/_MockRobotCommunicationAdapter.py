@@ -130,6 +130,7 @@ class MockPublishedTopic(IRobotPublishedTopic):
         Initializes the new mock
         """
         self.__sent = []
+        self.num_connections = None
 
     def send_message(self, value):
         """
@@ -146,6 +147,12 @@ class MockPublishedTopic(IRobotPublishedTopic):
         """
         return self.__sent
 
+    def get_num_connections(self):
+        """
+        Gets the number of connections set up for the mocked publisher, None by default
+        """
+        return self.num_connections
+
     def _unregister(self):
         """
         Unregister the Topic. Meaningless for mocks
@@ -175,6 +182,15 @@ class MockSubscribedTopic(IRobotSubscribedTopic):
         if not tf in self.__tfs:
             self.__tfs.append(tf)
 
+    def unregister_tf_trigger(self, tf):
+        """
+        Stops triggering the provided TF in case a new value appears
+
+        :param tf: The transfer function
+        """
+        if tf in self.__tfs:
+            self.__tfs.remove(tf)
+
     @property
     def changed(self):
         """
@@ -27,7 +27,6 @@ This module contains the mock implementation of the robot control adapter
 
 from hbp_nrp_cle.robotsim.RobotInterface import IRobotControlAdapter
 from concurrent.futures import Future
-import math
 
 __author__ = 'NinoCauli'
 
@@ -94,7 +93,8 @@ class MockRobotControlAdapter(IRobotControlAdapter):
         :param dt: The CLE time step in seconds
         :return: Updated simulation time, otherwise -1
         """
-        if math.fmod(dt, self.__time_step) < 1e-10:
+        steps = round(dt / self.__time_step)
+        if steps > 0 and abs(dt - steps * self.__time_step) < 1e-10:
             self.__sim_time = self.__sim_time + dt
             simTime = self.__sim_time
             return simTime
@@ -27,6 +27,7 @@ This module contains the mock implementation of the transfer functions manager
 
 from hbp_nrp_cle.tf_framework._TransferFunctionInterface import ITransferFunctionManager
 from hbp_nrp_cle.mocks.brainsim import MockBrainCommunicationAdapter
+from hbp_nrp_cle import context as sim_context
 import time
 
 __author__ = 'GeorgHinkel'
@@ -47,6 +48,14 @@ class MockTransferFunctionManager(ITransferFunctionManager):
         self.__sleepTime = 1
         self.__publish_error_callback = None
         self.__bca = MockBrainCommunicationAdapter()
+        self.__context = sim_context.current()
+
+    @property
+    def context(self):
+        """
+        Gets the simulation context of the mocked manager
+        """
+        return self.__context
 
     def initialize(self, name):
         """
@@ -68,6 +77,15 @@ class MockTransferFunctionManager(ITransferFunctionManager):
         """
         pass
 
+    def next_due_time(self):
+        """
+        Gets the earliest simulation time at which a transfer function may run. The mocked
+        transfer functions are run in every step.
+
+        :return: Minus infinity
+        """
+        return float('-inf')
+
     def run_neuron_to_robot(self, t):
         """
         Runs the transfer function mocks for neuron to robot direction
@@ -144,6 +162,18 @@ class MockTransferFunctionManager(ITransferFunctionManager):
         """
         pass
 
+    def prepare_fork(self):
+        """
+        Waits for the work of background threads before the process is forked
+        """
+        pass
+
+    def reset_after_fork(self):
+        """
+        Drops the background threads inherited from the parent of a forked process
+        """
+        pass
+
     def shutdown(self):
         """
         Shutdown the tf manager
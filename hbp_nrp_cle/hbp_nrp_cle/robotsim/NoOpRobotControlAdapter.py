@@ -0,0 +1,147 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+Represents a robot control adapter that stands in for the world simulation without simulating
+anything, e.g. to replay recorded robot inputs
+"""
+
+import time
+from concurrent.futures import Future
+
+from hbp_nrp_cle.robotsim.RobotInterface import IRobotControlAdapter
+
+__author__ = ''
+
+
+class NoOpRobotControlAdapter(IRobotControlAdapter):
+    """
+    Represents a robot control adapter without a world simulation. Running a step only advances
+    the simulation time.
+    """
+
+    def __init__(self, time_step=0.001):
+        """
+        Creates a new no-op robot control adapter
+
+        :param time_step: The physics time step in seconds
+        """
+        self.__time_step = time_step
+        self.__sim_time = 0.0
+        self.__robots = None
+
+    def initialize(self):
+        """
+        Initializes the world simulation control adapter
+        """
+        return True
+
+    @property
+    def time_step(self):
+        """
+        Gets the physics simulation time step in seconds
+
+        :return: The physics simulation time step in seconds
+        """
+        return self.__time_step
+
+    def set_time_step(self, time_step):
+        """
+        Sets the physics simulation time step in seconds
+
+        :param time_step: The physics simulation time step in seconds
+        :return: True, as the time step is always updated
+        """
+        self.__time_step = time_step
+        return True
+
+    @property
+    def is_paused(self):
+        """
+        Queries the current status of the physics simulation
+
+        :return: False, as there is no physics simulation that could be paused
+        """
+        return False
+
+    @property
+    def is_alive(self):
+        """
+        Queries the current status of the world simulation
+
+        :return: True
+        """
+        return True
+
+    def run_step(self, dt):
+        """
+        Advances the simulation time by the given CLE time step in seconds
+
+        :param dt: The CLE time step in seconds
+        :return: Updated simulation time
+        """
+        steps = int(round(dt / self.__time_step))
+        if steps > 0 and abs(dt - steps * self.__time_step) < 1e-9:
+            self.__sim_time += dt
+            return self.__sim_time
+        raise ValueError("dt is not multiple of the physics time step")
+
+    def run_step_async(self, dt):
+        """
+        Advances the simulation time by the given CLE time step in seconds
+
+        :param dt: The CLE time step in seconds
+        :return: a completed Future for the result of the step
+        """
+        future = Future()
+        future.start = time.time()
+        future.set_result(self.run_step(dt))
+        future.end = time.time()
+        return future
+
+    def shutdown(self):
+        """
+        Shuts down the world simulation, nothing to be done
+        """
+        pass
+
+    def set_robots(self, robots):
+        """
+        Sets the list of robots
+        """
+        self.__robots = robots
+
+    def reset(self):
+        """
+        Resets the simulation time
+        """
+        self.__sim_time = 0.0
+
+    def reset_world(self, models, lights):
+        """
+        Resets the world excluding the robot, nothing to be done
+
+        :param models: A dictionary containing pairs model_name: model_sdf.
+        :param lights: A dictionary containing pairs light_name: light sdf.
+        """
+        pass
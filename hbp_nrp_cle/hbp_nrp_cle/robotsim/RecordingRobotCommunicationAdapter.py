@@ -0,0 +1,285 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+Represents a robot communication adapter that records the values of the subscribed topics, so
+that they can be replayed without the robot simulation
+"""
+
+import gzip
+import threading
+import cPickle as pickle
+
+from hbp_nrp_cle.robotsim.RobotInterface import IRobotCommunicationAdapter, \
+    IRobotSubscribedTopic, Topic
+
+__author__ = ''
+
+# version of the recorded log format, stored in the first record of a log
+ROBOT_INPUT_LOG_VERSION = 1
+
+
+def get_topic_name(topic):
+    """
+    Gets the name of the given topic
+
+    :param topic: The topic or the name of the topic
+    :return: The name of the topic
+    """
+    return topic.name if isinstance(topic, Topic) else topic
+
+
+def read_robot_input_log(path):
+    """
+    Reads a log written by the recording robot communication adapter
+
+    :param path: The path of the log
+    :return: A generator of tuples of CLE step, simulation time, topic name and value
+    """
+    with gzip.open(path, 'rb') as log:
+        header = pickle.load(log)
+        if header != ('robot_input_log', ROBOT_INPUT_LOG_VERSION):
+            raise Exception("{0} is not a robot input log of version {1}"
+                            .format(path, ROBOT_INPUT_LOG_VERSION))
+        while True:
+            try:
+                yield pickle.load(log)
+            except EOFError:
+                return
+
+
+class RecordingRobotCommunicationAdapter(IRobotCommunicationAdapter):
+    """
+    Wraps a robot communication adapter and logs every value of its subscribed topics that is
+    seen by a transfer function, together with the CLE step and simulation time. The steps are
+    counted by the calls of refresh_buffers, i.e. one per CLE step.
+
+    The log is a gzip compressed sequence of pickled records, thus the recorded messages must be
+    picklable, which is the case for ROS messages.
+    """
+
+    def __init__(self, adapter, path):
+        """
+        Creates a new recording adapter
+
+        :param adapter: The robot communication adapter whose subscribed topics are recorded
+        :param path: The path of the log
+        """
+        super(RecordingRobotCommunicationAdapter, self).__init__()
+        self.__adapter = adapter
+        self.__log = gzip.open(path, 'wb')
+        self.__lock = threading.Lock()
+        self.__step = -1
+        self.__time = None
+        pickle.dump(('robot_input_log', ROBOT_INPUT_LOG_VERSION), self.__log,
+                    pickle.HIGHEST_PROTOCOL)
+
+    @property
+    def adapter(self):
+        """
+        Gets the recorded robot communication adapter
+        """
+        return self.__adapter
+
+    @property
+    def step(self):
+        """
+        Gets the index of the current CLE step, -1 before the first step
+        """
+        return self.__step
+
+    def initialize(self, name):
+        """
+        Initializes the recorded adapter
+
+        :param name: The name of the node
+        """
+        self.__adapter.initialize(name)
+
+    def create_topic_publisher(self, topic, **config):
+        """
+        Creates a publisher object for the given topic. Published values are not recorded.
+
+        :param topic: The topic
+        :param config: Additional configuration for the publisher
+        :return: A publisher object of the recorded adapter
+        """
+        return self.__adapter.register_publish_topic(topic, **config)
+
+    def create_topic_subscriber(self, topic, **config):
+        """
+        Creates a recording subscription object for the given topic
+
+        :param topic: The topic
+        :param config: Additional configuration for the subscriber
+        :return: A subscription object
+        """
+        subscriber = self.__adapter.register_subscribe_topic(topic, **config)
+        return RecordingSubscribedTopic(self, get_topic_name(topic), subscriber)
+
+    def unregister_publish_topic(self, topic):
+        """
+        Unregisters and removes the given publisher topic object.
+
+        :param topic The IRobotPublishedTopic to unregister.
+        """
+        if topic in self.published_topics:
+            self.published_topics.remove(topic)
+        self.__adapter.unregister_publish_topic(topic)
+
+    def unregister_subscribe_topic(self, topic):
+        """
+        Unregisters and removes the given subscriber topic object.
+
+        :param topic The IRobotSubscribedTopic to unregister.
+        """
+        if topic in self.subscribed_topics:
+            self.subscribed_topics.remove(topic)
+        self.__adapter.unregister_subscribe_topic(topic.subscriber)
+
+    def refresh_buffers(self, t):
+        """
+        Starts the next CLE step and refreshes the buffers of the recorded adapter
+
+        :param t: The simulation time
+        """
+        with self.__lock:
+            self.__step += 1
+            self.__time = t
+        self.__adapter.refresh_buffers(t)
+
+    def record(self, name, value):
+        """
+        Records the given value of a subscribed topic for the current CLE step
+
+        :param name: The name of the topic
+        :param value: The value
+        """
+        with self.__lock:
+            if self.__log is not None:
+                pickle.dump((self.__step, self.__time, name, value), self.__log,
+                            pickle.HIGHEST_PROTOCOL)
+
+    def close(self):
+        """
+        Closes the log
+        """
+        with self.__lock:
+            if self.__log is not None:
+                self.__log.close()
+                self.__log = None
+
+    def shutdown(self):
+        """
+        Closes the log and shuts down the recorded adapter
+        """
+        self.close()
+        self.__adapter.shutdown()
+
+
+class RecordingSubscribedTopic(IRobotSubscribedTopic):
+    """
+    Represents a subscribed topic that records each new value when it is read
+    """
+
+    __unset = object()
+
+    def __init__(self, recorder, name, subscriber):
+        """
+        Creates a new recording subscriber
+
+        :param recorder: The recording adapter
+        :param name: The name of the subscribed topic
+        :param subscriber: The recorded subscriber
+        """
+        self.__recorder = recorder
+        self.__name = name
+        self.__subscriber = subscriber
+        self.__recorded = RecordingSubscribedTopic.__unset
+
+    @property
+    def name(self):
+        """
+        Gets the name of the subscribed topic
+        """
+        return self.__name
+
+    @property
+    def subscriber(self):
+        """
+        Gets the recorded subscriber
+        """
+        return self.__subscriber
+
+    @property
+    def changed(self):
+        """
+        Gets a value indicating whether the value of the subscribed topic has changed since the last
+        time step
+        """
+        return self.__subscriber.changed
+
+    @property
+    def value(self):
+        """
+        Gets the current value of the subscribed topic and records it, if it has not been
+        recorded before
+        """
+        value = self.__subscriber.value
+        if value is not self.__recorded:
+            self.__recorded = value
+            self.__recorder.record(self.__name, value)
+        return value
+
+    def register_tf_trigger(self, tf):
+        """
+        Registers to trigger the provided TF in case a new value appears
+
+        :param tf: The transfer function
+        """
+        self.__subscriber.register_tf_trigger(tf)
+
+    def unregister_tf_trigger(self, tf):
+        """
+        Stops triggering the provided TF in case a new value appears
+
+        :param tf: The transfer function
+        """
+        self.__subscriber.unregister_tf_trigger(tf)
+
+    def reset(self, transfer_function_manager):
+        """
+        Resets the subscribed topic
+
+        :param transfer_function_manager: The transfer function manager the subscriber belongs to
+        :return: The reset adapter
+        """
+        self.__subscriber = self.__subscriber.reset(transfer_function_manager)
+        self.__recorded = RecordingSubscribedTopic.__unset
+        return self
+
+    def _unregister(self):
+        """
+        Unregisters the recorded subscriber
+        """
+        self.__subscriber._unregister()  # pylint: disable=protected-access
@@ -0,0 +1,281 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+Represents a robot communication adapter that replays the subscribed topic values recorded by
+the recording robot communication adapter, without a robot simulation
+"""
+
+from collections import defaultdict
+
+from hbp_nrp_cle.robotsim.RobotInterface import IRobotCommunicationAdapter, \
+    IRobotSubscribedTopic, IRobotPublishedTopic
+from hbp_nrp_cle.robotsim.RecordingRobotCommunicationAdapter import read_robot_input_log, \
+    get_topic_name
+from hbp_nrp_cle.tf_framework._TransferFunctionManager import TransferFunctionManager
+
+__author__ = ''
+
+
+class ReplayRobotCommunicationAdapter(IRobotCommunicationAdapter):
+    """
+    Replays a recorded robot input log step by step. In every CLE step, i.e. every call of
+    refresh_buffers, the values recorded for that step are set on the subscribed topics.
+    Published messages are not sent anywhere, the publishers only keep the last message.
+    """
+
+    def __init__(self, path):
+        """
+        Creates a new replay adapter
+
+        :param path: The path of the robot input log
+        """
+        super(ReplayRobotCommunicationAdapter, self).__init__()
+        self.__records = defaultdict(list)
+        self.__last_step = -1
+        for step, _, name, value in read_robot_input_log(path):
+            self.__records[step].append((name, value))
+            self.__last_step = max(self.__last_step, step)
+        self.__subscribers = defaultdict(list)
+        self.__step = -1
+
+    @property
+    def step(self):
+        """
+        Gets the index of the current CLE step, -1 before the first step
+        """
+        return self.__step
+
+    @property
+    def last_step(self):
+        """
+        Gets the last CLE step with recorded values, -1 if the log is empty
+        """
+        return self.__last_step
+
+    @property
+    def finished(self):
+        """
+        Gets a value indicating whether all recorded values have been replayed
+        """
+        return self.__step >= self.__last_step
+
+    def rewind(self):
+        """
+        Restarts the replay from the first step
+        """
+        self.__step = -1
+
+    def initialize(self, name):
+        """
+        Initializes the adapter, nothing to be done for a replay
+
+        :param name: The name of the node
+        """
+        pass
+
+    def create_topic_publisher(self, topic, **config):
+        """
+        Creates a publisher object for the given topic
+
+        :param topic: The topic
+        :param config: Additional configuration for the publisher
+        :return: A publisher object
+        """
+        return ReplayPublishedTopic()
+
+    def create_topic_subscriber(self, topic, **config):
+        """
+        Creates the subscription object for the given topic
+
+        :param topic: The topic
+        :param config: Additional configuration for the subscriber
+        :return: A subscription object
+        """
+        name = get_topic_name(topic)
+        subscriber = ReplaySubscribedTopic(name, config.get('initial_value', None))
+        self.__subscribers[name].append(subscriber)
+        return subscriber
+
+    def unregister_subscribe_topic(self, topic):
+        """
+        Unregisters and removes the given subscriber topic object.
+
+        :param topic The IRobotSubscribedTopic to unregister.
+        """
+        super(ReplayRobotCommunicationAdapter, self).unregister_subscribe_topic(topic)
+        if topic in self.__subscribers[topic.name]:
+            self.__subscribers[topic.name].remove(topic)
+
+    def refresh_buffers(self, t):
+        """
+        Advances the replay to the next CLE step and sets the values recorded for it
+
+        :param t: The simulation time
+        """
+        self.__step += 1
+        for subscriber in self.subscribed_topics:
+            subscriber.reset_changed()
+        for name, value in self.__records.get(self.__step, ()):
+            for subscriber in self.__subscribers[name]:
+                subscriber.replay(value, t)
+
+    def shutdown(self):
+        """
+        Closes any connections created by the adapter, nothing to be done for a replay
+        """
+        pass
+
+
+class ReplayPublishedTopic(IRobotPublishedTopic):
+    """
+    Represents a published topic of a replay. Messages are not sent anywhere.
+    """
+
+    def __init__(self):
+        """
+        Creates a new replay publisher
+        """
+        self.__last_message = None
+        self.__count = 0
+
+    @property
+    def last_message(self):
+        """
+        Gets the last message sent to this topic
+        """
+        return self.__last_message
+
+    @property
+    def count(self):
+        """
+        Gets the number of messages sent to this topic
+        """
+        return self.__count
+
+    def send_message(self, value):
+        """
+        Keeps the given message as the last message of this topic
+
+        :param value: The message
+        """
+        self.__last_message = value
+        self.__count += 1
+
+    def _unregister(self):
+        """
+        Unregisters the topic, nothing to be done for a replay
+        """
+        pass
+
+
+class ReplaySubscribedTopic(IRobotSubscribedTopic):
+    """
+    Represents a subscribed topic of a replay
+    """
+
+    def __init__(self, name, initial_value):
+        """
+        Creates a new replay subscriber
+
+        :param name: The name of the topic
+        :param initial_value: The value before the first recorded value
+        """
+        self.__name = name
+        self.__value = initial_value
+        self.__changed = False
+        self.__tfs = []
+
+    @property
+    def name(self):
+        """
+        Gets the name of the subscribed topic
+        """
+        return self.__name
+
+    @property
+    def changed(self):
+        """
+        Gets a value indicating whether a value has been replayed in the current step
+        """
+        return self.__changed
+
+    @property
+    def value(self):
+        """
+        Gets the last replayed value
+        """
+        return self.__value
+
+    def register_tf_trigger(self, tf):
+        """
+        Registers to trigger the provided TF in case a new value appears
+
+        :param tf: The transfer function
+        """
+        if tf not in self.__tfs:
+            self.__tfs.append(tf)
+
+    def unregister_tf_trigger(self, tf):
+        """
+        Stops triggering the provided TF in case a new value appears
+
+        :param tf: The transfer function
+        """
+        if tf in self.__tfs:
+            self.__tfs.remove(tf)
+
+    def replay(self, value, t):
+        """
+        Sets the given recorded value and runs the triggered transfer functions
+
+        :param value: The recorded value
+        :param t: The simulation time
+        """
+        self.__value = value
+        self.__changed = True
+        for tf in self.__tfs:
+            TransferFunctionManager.run_tf(tf, t)
+
+    def reset_changed(self):
+        """
+        Resets the changed flag at the beginning of a step
+        """
+        self.__changed = False
+
+    def reset(self, transfer_function_manager):
+        """
+        Resets the subscribed topic
+
+        :param transfer_function_manager: The transfer function manager the subscriber belongs to
+        :return: The reset adapter
+        """
+        self.__changed = False
+        self.__value = None
+        return self
+
+    def _unregister(self):
+        """
+        Unregisters the topic, nothing to be done for a replay
+        """
+        pass
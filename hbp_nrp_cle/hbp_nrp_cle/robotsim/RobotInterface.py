@@ -60,6 +60,16 @@ class Topic(object):
         """
         return self.__type
 
+    def equivalent_to(self, other):
+        """
+        Checks whether the given topic refers to the same robot topic as this topic
+
+        :param other: Another topic
+        :return: True, if the topics are interchangeable, otherwise False
+        """
+        return type(other) is type(self) and other.name == self.__name \
+            and other.topic_type is self.__type
+
     def __repr__(self):  # pragma: no cover
         return self.__name + " : " + self.__type.__name__
 
@@ -87,6 +97,16 @@ class PreprocessedTopic(Topic):
         """
         return self.__pre_processing
 
+    def equivalent_to(self, other):
+        """
+        Checks whether the given topic refers to the same robot topic as this topic
+
+        :param other: Another topic
+        :return: True, if the topics are interchangeable, otherwise False
+        """
+        return super(PreprocessedTopic, self).equivalent_to(other) \
+            and other.pre_processor is self.__pre_processing
+
     def _unregister(self):
         """
         INTERNAL USE ONLY: this should never be directly invoked by a user.
@@ -109,6 +129,14 @@ class IRobotPublishedTopic(object):  # pragma: no cover
         """
         raise NotImplementedError("This method was not implemented in the concrete implementation")
 
+    def get_num_connections(self):  # -> int:
+        """
+        Gets the number of subscribers currently connected to the topic
+
+        :return: The number of connections, or None if the publisher cannot tell
+        """
+        return None
+
     def reset(self, transfer_function_manager):
         """
         Resets the published topic
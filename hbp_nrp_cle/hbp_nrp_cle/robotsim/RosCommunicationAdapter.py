@@ -29,6 +29,7 @@ using ROS
 from hbp_nrp_cle.robotsim.RobotInterface import IRobotCommunicationAdapter, \
     Topic, PreprocessedTopic, IRobotSubscribedTopic, IRobotPublishedTopic
 from hbp_nrp_cle.tf_framework._TransferFunctionManager import TransferFunctionManager
+from hbp_nrp_cle import context as sim_context
 import rosgraph_msgs.msg
 import rospy
 import logging
@@ -39,6 +40,7 @@ logger = logging.getLogger(__name__)
 __author__ = 'GeorgHinkel'
 
 
+# The simulation time of the default simulation context
 sim_time = 0.0
 # Receive buffer size for subscriber topics (in bytes). Same as ROS default.
 DEFAULT_SUB_BUFFER_SIZE = 65536
@@ -80,11 +82,15 @@ class RosCommunicationAdapter(IRobotCommunicationAdapter):
             return self.get_topic_type(topic_name, False)
         return None
 
-    def __init__(self):
+    def __init__(self, context=None):
         """
         Create a new RosCommunicationAdapter
+
+        :param context: The simulation context that receives the simulation time, the active
+                        context by default
         """
         IRobotCommunicationAdapter.__init__(self)
+        self.__context = context if context is not None else sim_context.current()
         self.__topic_types = []
         self.__refresh_topic_types()
         self.__clock_listener = None
@@ -110,8 +116,7 @@ class RosCommunicationAdapter(IRobotCommunicationAdapter):
         self.__clock_listener = rospy.Subscriber("/clock", rosgraph_msgs.msg.Clock,
                                                  self.__update_clock)
 
-    @staticmethod
-    def __update_clock(data):
+    def __update_clock(self, data):
         """
         Updates the clock directly from the simulation time
 
@@ -119,9 +124,7 @@ class RosCommunicationAdapter(IRobotCommunicationAdapter):
 
         :param data: The clock message
         """
-        # pylint: disable=global-statement
-        global sim_time
-        sim_time = data.clock.secs + data.clock.nsecs / 1.0e9
+        self.__context.robot_sim_time = data.clock.secs + data.clock.nsecs / 1.0e9
 
     def create_topic_publisher(self, topic, **config):
         """
@@ -157,6 +160,7 @@ class RosCommunicationAdapter(IRobotCommunicationAdapter):
         if isinstance(topic, PreprocessedTopic):
             return RosSubscribedPreprocessedTopic(topic,
                                                   config.get('initial_value', None),
+                                                  context=self.__context,
                                                   **config)
         elif isinstance(topic, str):
             topic_type = self.get_topic_type(topic)
@@ -166,6 +170,7 @@ class RosCommunicationAdapter(IRobotCommunicationAdapter):
             topic = Topic(topic, topic_type)
         return RosSubscribedTopic(topic,
                                   config.get('initial_value', None),
+                                  context=self.__context,
                                   **config)
 
     @property
@@ -228,6 +233,16 @@ class RosPublishedTopic(IRobotPublishedTopic):
         else:
             logger.error("Trying to publish messages on an unregistered topic")
 
+    def get_num_connections(self):
+        """
+        Gets the number of subscribers currently connected to the topic
+
+        :return: The number of connections, 0 if the topic has been unregistered
+        """
+        if self.__pub is None:
+            return 0
+        return self.__pub.get_num_connections()
+
     def _unregister(self):
         """
         Unregister the Topic. After this call, nobody can publish
@@ -276,7 +291,9 @@ class RosSubscribedTopic(IRobotSubscribedTopic):
         :param config: Additional configuration for the subscriber
         :param **queue_size: ROS Subscriber queue_size parameter, please refer to ROS documentation
         :param **buff_size: ROS Subscriber buff_size parameter, please refer to ROS documentation
+        :param **context: The simulation context providing the simulation time for triggered TFs
         """
+        self.__context = config.get('context', None) or sim_context.current()
         self.__changed = False
         self.__value = initial_value
         self.__tfs = []
@@ -299,6 +316,15 @@ class RosSubscribedTopic(IRobotSubscribedTopic):
         if tf not in self.__tfs:
             self.__tfs.append(tf)
 
+    def unregister_tf_trigger(self, tf):
+        """
+        Stops triggering the provided TF in case a new value appears
+
+        :param tf: The transfer function
+        """
+        if tf in self.__tfs:
+            self.__tfs.remove(tf)
+
     def _callback(self, data):
         """
         This method is called whenever new data is available from ROS
@@ -308,9 +334,9 @@ class RosSubscribedTopic(IRobotSubscribedTopic):
         logger.debug("ROS subscriber callback")
         self.__changed = True
         self.__value = data
-        t = sim_time
+        t = self.__context.robot_sim_time
         for tf in self.__tfs:
-            TransferFunctionManager.run_tf(tf, t)
+            TransferFunctionManager.trigger_tf(tf, t)
 
     @property
     def changed(self):
@@ -28,7 +28,6 @@ from hbp_nrp_cle.robotsim.AsynchronousServiceProxy import AsynchonousRospyServic
 from hbp_nrp_cle.robotsim.GazeboHelper import GazeboHelper
 from hbp_nrp_cle.robotsim.RobotInterface import IRobotControlAdapter
 import rospy
-import math
 # pylint: disable=E0611
 from gazebo_msgs.srv import GetPhysicsProperties, GetWorldProperties, \
     SetPhysicsProperties, AdvanceSimulation
@@ -164,12 +163,10 @@ class RosControlAdapter(IRobotControlAdapter):
         :param dt: The CLE time step in seconds
         """
 
-        # implement modulo to avoid floating point precision quirks in math.fmod or from direct %
-        # without this explicit fix, values such as 0.999 % 0.001 != 0.0 due to float accuracy
-        # https://en.wikipedia.org/wiki/Modulo_operation : a - (n * int(a/n))
-        r = dt - (self.__time_step * math.floor(dt / self.__time_step))
-        if r == 0.0:
-            steps = dt / self.__time_step
+        # compare against the nearest number of physics steps to avoid floating point precision
+        # quirks, values such as 0.999 % 0.001 or 0.35 - 350 * 0.001 are not exactly 0.0
+        steps = int(round(dt / self.__time_step))
+        if steps > 0 and abs(dt - steps * self.__time_step) < 1e-9:
             logger.debug("Advancing simulation")
 
             return self.__advance_simulation(steps)
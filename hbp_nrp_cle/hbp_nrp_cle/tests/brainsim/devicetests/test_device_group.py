@@ -21,16 +21,87 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 # ---LICENSE-END
+from hbp_nrp_cle.brainsim.common.devices import DeviceGroup
+from hbp_nrp_cle.brainsim.pynn_nest.devices.__NestDeviceGroup import NestWriteBuffer
 from hbp_nrp_cle.brainsim.pynn_nest.devices.__PyNNNestACSource import PyNNNestACSource
 from hbp_nrp_cle.brainsim.pynn_nest.devices.__PyNNNestDCSource \
     import PyNNNestDCSource, IntegratedNestDCCurrentGenerator
 
+import numpy
 import unittest
 from mock import patch, Mock
 
 __author__ = 'Georg Hinkel'
 
 
+class TestDeviceGroup(unittest.TestCase):
+
+    def setUp(self):
+        self.devices = [Mock(rate=0.0) for _ in range(0, 4)]
+        self.group = DeviceGroup(Mock(), self.devices)
+
+    def test_get_without_values_reads_devices(self):
+        numpy.testing.assert_array_equal([0.0] * 4, self.group.rate)
+        self.devices[2].rate = 7.0
+        numpy.testing.assert_array_equal([0.0, 0.0, 7.0, 0.0], self.group.rate)
+
+    def test_get_non_numeric_values_returns_list(self):
+        for d in self.devices:
+            d.name = "spam"
+        self.assertEqual(["spam"] * 4, self.group.name)
+
+    def test_set_array_is_pushed_and_kept(self):
+        self.group.rate = numpy.array([1.0, 2.0, 3.0, 4.0])
+        self.assertEqual([1.0, 2.0, 3.0, 4.0], [d.rate for d in self.devices])
+        self.assertIsInstance(self.devices[0].rate, float)
+
+        self.devices[0].rate = 42.0
+        rate = self.group.rate
+        numpy.testing.assert_array_equal([1.0, 2.0, 3.0, 4.0], rate)
+        self.assertFalse(rate.flags.writeable)
+
+    def test_set_scalar_is_broadcast(self):
+        self.group.rate = 5
+        self.assertEqual([5] * 4, [d.rate for d in self.devices])
+        numpy.testing.assert_array_equal([5.0] * 4, self.group.rate)
+
+    def test_set_non_numeric_drops_values(self):
+        self.group.rate = [1.0, 2.0, 3.0, 4.0]
+        self.group.rate = ["a", "b", "c", "d"]
+        self.assertEqual(["a", "b", "c", "d"], self.group.rate)
+
+    def test_subgroups_share_values(self):
+        self.group.rate = [1.0, 2.0, 3.0, 4.0]
+        subgroup = self.group[1:4][numpy.array([True, False, True])]
+        self.assertEqual([self.devices[1], self.devices[3]], subgroup.devices)
+        numpy.testing.assert_array_equal([2.0, 4.0], subgroup.rate)
+
+        subgroup.rate = 0.5
+        self.assertEqual([1.0, 0.5, 3.0, 0.5], [d.rate for d in self.devices])
+        numpy.testing.assert_array_equal([1.0, 0.5, 3.0, 0.5], self.group.rate)
+
+    def test_set_writes_changed_devices_only(self):
+        self.group.rate = [1.0, 2.0, 3.0, 4.0]
+        self.devices[0].rate = 42.0
+        self.devices[1].rate = 42.0
+        self.group.rate = [1.0, 5.0, 3.0, 4.0]
+        self.assertEqual([42.0, 5.0, 3.0, 4.0], [d.rate for d in self.devices])
+        numpy.testing.assert_array_equal([1.0, 5.0, 3.0, 4.0], self.group.rate)
+
+    def test_set_respects_tolerance(self):
+        self.group.tolerance = 0.1
+        self.group.rate = 100.0
+        self.group.rate = [105.0, 95.0, 120.0, 100.0]
+        self.assertEqual([100.0, 100.0, 120.0, 100.0], [d.rate for d in self.devices])
+        numpy.testing.assert_array_equal([100.0, 100.0, 120.0, 100.0], self.group.rate)
+        self.assertEqual(0.1, self.group[1:3].tolerance)
+
+    def test_device_access_drops_values(self):
+        self.group.rate = [1.0, 2.0, 3.0, 4.0]
+        self.group[0].rate = 42.0
+        numpy.testing.assert_array_equal([42.0, 2.0, 3.0, 4.0], self.group.rate)
+
+
 @patch("hbp_nrp_cle.brainsim.pynn_nest.devices.__NestDeviceGroup.nest")
 class TestNestDeviceGroup(unittest.TestCase):
 
@@ -52,6 +123,12 @@ class TestNestDeviceGroup(unittest.TestCase):
         for i in range(0, 5):
             self.assertEqual(i, self.device_ids[i])
 
+    def use_buffer(self):
+        write_buffer = NestWriteBuffer()
+        write_buffer.enabled = True
+        self.device.use_write_buffer(write_buffer)
+        return write_buffer
+
     def test_device_group_get_one_nest_get_status(self, mocked_nest):
         mocked_nest.GetStatus.return_value = 42
         frequency = self.device.frequency
@@ -86,9 +163,8 @@ class TestNestDeviceGroup(unittest.TestCase):
         self.assertEqual(1, mocked_nest.SetStatus.call_count)
         call_args = mocked_nest.SetStatus.call_args[0]
         self.assertEqual(self.device_ids, call_args[0])
-        self.assertEqual(5, len(call_args[1]))
-        for i in range(0, 5):
-            self.assertDictEqual({"frequency": val[i]}, call_args[1][i])
+        self.assertEqual("frequency", call_args[1])
+        numpy.testing.assert_array_equal(val, call_args[2])
 
     def test_device_group_multiple_set_transform_one_nest_set_status(self, mocked_nest):
         val = [42, 0, 8, 15, 0]
@@ -96,9 +172,146 @@ class TestNestDeviceGroup(unittest.TestCase):
         self.assertEqual(1, mocked_nest.SetStatus.call_count)
         call_args = mocked_nest.SetStatus.call_args[0]
         self.assertEqual(self.device_ids, call_args[0])
-        self.assertEqual(5, len(call_args[1]))
-        for i in range(0, 5):
-            self.assertDictEqual({"amplitude": val[i] * 1000.0}, call_args[1][i])
+        self.assertEqual("amplitude", call_args[1])
+        numpy.testing.assert_array_equal(numpy.array(val) * 1000.0, call_args[2])
+
+    def test_device_group_get_after_set_does_not_query_nest(self, mocked_nest):
+        self.device.amplitude = [42, 0, 8, 15, 0]
+        amplitude = self.device.amplitude
+        self.assertFalse(mocked_nest.GetStatus.called)
+        numpy.testing.assert_array_equal([42.0, 0.0, 8.0, 15.0, 0.0], amplitude)
+        self.assertRaises(ValueError, amplitude.__setitem__, 0, 1.0)
+
+        self.device.amplitude = 3
+        numpy.testing.assert_array_equal([3.0] * 5, self.device.amplitude)
+        mocked_nest.SetStatus.assert_called_with(self.device_ids, {"amplitude": 3000.0})
+
+    def test_device_subgroup_set_updates_group_values(self, mocked_nest):
+        self.device.frequency = [1, 2, 3, 4, 5]
+        subgroup = self.device[numpy.array([1, 3])]
+        self.assertEqual([1, 3], subgroup._device_ids)
+        numpy.testing.assert_array_equal([2, 4], subgroup.frequency)
+
+        subgroup.frequency = [20, 40]
+        call_args = mocked_nest.SetStatus.call_args[0]
+        self.assertEqual([1, 3], call_args[0])
+        numpy.testing.assert_array_equal([20, 40], call_args[2])
+        numpy.testing.assert_array_equal([1, 20, 3, 40, 5], self.device.frequency)
+        self.assertFalse(mocked_nest.GetStatus.called)
+
+    def test_device_group_writes_changed_devices_only(self, mocked_nest):
+        self.device.frequency = [1, 2, 3, 4, 5]
+        self.device.frequency = [1, 2, 3, 4, 5]
+        self.assertEqual(1, mocked_nest.SetStatus.call_count)
+
+        self.device.frequency = [1, 2, 9, 4, 7]
+        self.assertEqual(2, mocked_nest.SetStatus.call_count)
+        call_args = mocked_nest.SetStatus.call_args[0]
+        self.assertEqual([2, 4], call_args[0])
+        self.assertEqual("frequency", call_args[1])
+        numpy.testing.assert_array_equal([9, 7], call_args[2])
+
+        self.device.amplitude = 3
+        self.device.amplitude = 3
+        self.assertEqual(3, mocked_nest.SetStatus.call_count)
+
+    def test_device_skips_values_written_by_group(self, mocked_nest):
+        self.device.frequency = [1, 2, 3, 4, 5]
+        device = self.device.devices[2]
+        device.frequency = 3
+        self.assertEqual(1, mocked_nest.SetStatus.call_count)
+        device.frequency = 4
+        self.assertEqual(2, mocked_nest.SetStatus.call_count)
+        mocked_nest.SetStatus.assert_called_with([2], {'frequency': 4.0})
+
+    def test_device_write_drops_group_values(self, mocked_nest):
+        self.device.frequency = [1, 2, 3, 4, 5]
+        self.device.devices[1].frequency = 7
+        self.assertEqual(2, mocked_nest.SetStatus.call_count)
+
+        mocked_nest.GetStatus.return_value = [1, 7, 3, 4, 5]
+        numpy.testing.assert_array_equal([1, 7, 3, 4, 5], self.device.frequency)
+        mocked_nest.GetStatus.assert_called_once_with(self.device_ids, "frequency")
+
+        self.device.frequency = [1, 2, 3, 4, 5]
+        self.assertEqual(3, mocked_nest.SetStatus.call_count)
+        call_args = mocked_nest.SetStatus.call_args[0]
+        self.assertEqual(self.device_ids, call_args[0])
+        numpy.testing.assert_array_equal([1, 2, 3, 4, 5], call_args[2])
+
+    def test_device_write_drops_values_of_subgroups(self, mocked_nest):
+        subgroup = self.device[1:3]
+        subgroup.frequency = [2, 3]
+        self.device.devices[2].frequency = 7
+        mocked_nest.GetStatus.return_value = [2, 7]
+        numpy.testing.assert_array_equal([2, 7], subgroup.frequency)
+
+    def test_device_respects_tolerance(self, mocked_nest):
+        device = self.device.devices[0]
+        device.tolerance = 0.01
+        device.phase = 100.0
+        device.phase = 100.5
+        self.assertEqual(1, mocked_nest.SetStatus.call_count)
+        self.assertEqual(100.0, device.phase)
+        device.phase = 0.0
+        self.assertEqual(2, mocked_nest.SetStatus.call_count)
+
+    def test_write_buffer_is_shared_with_devices_and_subgroups(self, mocked_nest):
+        write_buffer = self.use_buffer()
+        self.assertTrue(all(d.write_buffer is write_buffer for d in self.device.devices))
+        self.assertIs(write_buffer, self.device[1:3].write_buffer)
+        self.device.devices[0].write_buffer = NestWriteBuffer()
+        self.device.devices[0].frequency = 7
+        self.assertEqual(1, mocked_nest.SetStatus.call_count)
+
+    def test_buffered_writes_are_combined(self, mocked_nest):
+        write_buffer = self.use_buffer()
+        self.device.frequency = [1, 2, 3, 4, 5]
+        self.device.devices[1].frequency = 7
+        self.device.devices[3].phase = 0.5
+        self.device[0:2].frequency = 9
+        self.assertFalse(mocked_nest.SetStatus.called)
+
+        write_buffer.flush()
+        self.assertEqual(2, mocked_nest.SetStatus.call_count)
+        mocked_nest.SetStatus.assert_any_call(
+            [0, 1, 2, 3, 4], [{"frequency": f} for f in [9, 9, 3, 4, 5]])
+        mocked_nest.SetStatus.assert_any_call([3], [{"phase": 0.5}])
+
+        write_buffer.flush()
+        self.assertEqual(2, mocked_nest.SetStatus.call_count)
+
+    def test_buffered_writes_are_flushed_before_reading(self, mocked_nest):
+        self.use_buffer()
+        self.device.devices[1].frequency = 7
+        self.device.frequency
+        mocked_nest.SetStatus.assert_called_once_with([1], [{"frequency": 7.0}])
+
+    @patch("hbp_nrp_cle.brainsim.pynn_nest.devices.__NestDeviceGroup.MPI")
+    def test_buffered_writes_notify_remote_processes_once(self, mocked_mpi, mocked_nest):
+        mocked_mpi.COMM_WORLD.Get_size.return_value = 3
+        mocked_mpi.COMM_WORLD.Get_rank.return_value = 0
+        write_buffer = self.use_buffer()
+        for device in self.device.devices[0:3]:
+            device.mpi_aware = True
+            device.frequency = 7
+        self.device.devices[4].frequency = 8
+        self.assertFalse(mocked_mpi.COMM_WORLD.send.called)
+
+        write_buffer.flush()
+        mocked_nest.SetStatus.assert_called_once_with(
+            [0, 1, 2, 4], [{"frequency": 7.0}] * 3 + [{"frequency": 8.0}])
+        self.assertEqual(2, mocked_mpi.COMM_WORLD.send.call_count)
+        message = {'command': 'SetStatus', 'ids': [0, 1, 2], 'params': [{"frequency": 7.0}] * 3}
+        mocked_mpi.COMM_WORLD.send.assert_any_call(message, dest=1, tag=100)
+        mocked_mpi.COMM_WORLD.send.assert_any_call(message, dest=2, tag=100)
+
+    def test_device_group_direct_device_access_drops_values(self, mocked_nest):
+        self.device.frequency = [1, 2, 3, 4, 5]
+        self.device[0]
+        mocked_nest.GetStatus.return_value = [1, 2, 3, 4, 5]
+        self.device.frequency
+        mocked_nest.GetStatus.assert_called_once_with(self.device_ids, "frequency")
 
     def test_active_set(self, _):
 
@@ -135,8 +348,9 @@ class TestNestDeviceGroup(unittest.TestCase):
         # corresponds to setting the generator's I_e property
         device_group.set("amplitude", vals)
 
-        device_ids_, vals_ = mock_nest_device_group.SetStatus.call_args[0]
+        device_ids_, name_, vals_ = mock_nest_device_group.SetStatus.call_args[0]
 
         # check that the correct device property has been used while setting
-        self.assertTrue(all(map(lambda dict_: dict_.keys()[0] == device_property, vals_)))
+        self.assertEqual(device_property, name_)
+        numpy.testing.assert_array_equal(numpy.array(vals) * 1000.0, vals_)
 
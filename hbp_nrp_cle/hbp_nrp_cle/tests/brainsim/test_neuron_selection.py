@@ -0,0 +1,69 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+Tests the neuron selection
+"""
+
+import unittest
+import numpy
+from hbp_nrp_cle.brainsim.common import NeuronSelection
+from hbp_nrp_cle.mocks.brainsim import MockBrainCommunicationAdapter
+
+__author__ = ''
+
+
+class TestNeuronSelection(unittest.TestCase):
+
+    def setUp(self):
+        self.bca = MockBrainCommunicationAdapter()
+        self.first = numpy.arange(10)
+        self.second = numpy.arange(100, 110)
+        self.selection = NeuronSelection([(self.first, [1, 2]), (self.first, [7]),
+                                          (self.second, [0, 9])], self.bca)
+
+    def test_parts_are_merged(self):
+        parts = self.selection.parts
+        self.assertEqual(2, len(parts))
+        self.assertIs(self.first, parts[0][0])
+        self.assertEqual([1, 2, 7], parts[0][1].tolist())
+        self.assertEqual([0, 9], parts[1][1].tolist())
+
+    def test_sequence(self):
+        self.assertEqual(5, len(self.selection))
+        self.assertEqual([1, 2, 7, 100, 109], list(self.selection))
+        self.assertEqual(7, self.selection[2])
+        self.assertEqual(100, self.selection[3])
+        self.assertEqual(109, self.selection[-1])
+        self.assertEqual([2, 100], self.selection[1:4:2])
+        self.assertRaises(IndexError, self.selection.__getitem__, 5)
+
+    def test_empty(self):
+        selection = NeuronSelection([], self.bca)
+        self.assertEqual(0, len(selection))
+        self.assertEqual([], list(selection))
+        self.assertRaises(IndexError, selection.__getitem__, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+Smoke test of the closed loop engine benchmark
+"""
+
+import imp
+import os
+import unittest
+
+__author__ = ''
+
+cle_benchmark = imp.load_source(
+    'cle_benchmark', os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, os.pardir,
+                                  'tools', 'cle_benchmark.py'))
+
+
+class TestCLEBenchmark(unittest.TestCase):
+
+    def run_benchmark(self, *args):
+        options = cle_benchmark.create_parser().parse_args(list(args))
+        return cle_benchmark.run_benchmark(options)
+
+    def test_synthetic_workload(self):
+        results = self.run_benchmark('--steps', '30', '--tfs', '2', '--devices', '1',
+                                     '--memory-samples', '3')
+        self.assertEqual(results['steps'], 30)
+        self.assertEqual(len(results['memory']['rss_samples']), 5)
+        self.assertEqual(results['phases']['brain_run']['count'], 30)
+
+    def test_coalesced_steps_do_not_overshoot(self):
+        results = self.run_benchmark('--steps', '30', '--tfs', '2', '--devices', '1',
+                                     '--throttling-rate', '10', '--coalesce',
+                                     '--memory-samples', '3')
+        self.assertEqual(results['steps'], 30)
+        # every sample boundary is crossed by a coalesced step
+        self.assertEqual(len(results['memory']['rss_samples']), 5)
+        self.assertLess(results['phases']['brain_run']['count'], 30)
+
+    def test_pipelined_engine(self):
+        results = self.run_benchmark('--engine', 'pipelined', '--tf-manager', 'mock',
+                                     '--steps', '10')
+        self.assertEqual(results['steps'], 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -52,6 +52,7 @@ class TestDeterministicClosedLoopEngine(unittest.TestCase):
         self.__bca.load_brain = MagicMock()
         self.__bca.load_populations = MagicMock()
         bcm = MockBrainCommunicationAdapter()
+        self.__bcm = bcm
         self.__tfm = MockTransferFunctionManager()
         self.__tfm.hard_reset_brain_devices = MagicMock()
 
@@ -72,6 +73,14 @@ class TestDeterministicClosedLoopEngine(unittest.TestCase):
         self.assertTrue(self.__cle.is_initialized)
         self.assertEqual(self.__cle.run_step(0.01), 0.01)
 
+    def test_buffers_flushed_before_brain_step(self):
+        calls = Mock()
+        self.__bcm.flush_buffers = calls.flush_buffers
+        self.__bca.run_step = calls.run_step
+        self.__cle.initialize("foo")
+        self.__cle.run_step(0.01)
+        self.assertEqual(['flush_buffers', 'run_step'], [c[0] for c in calls.mock_calls])
+
     def test_get_time(self):
         self.__cle.initialize("foo")
         self.assertTrue(self.__cle.is_initialized)
@@ -88,6 +97,19 @@ class TestDeterministicClosedLoopEngine(unittest.TestCase):
         self.__cle.stop()
         self.assertGreater(self.__cle.real_time, 0.0)
 
+    def test_paced_start_stop(self):
+        self.__cle.initialize("foo")
+        self.__tfm.sleep_time = 0
+        self.__cle.real_time_factor = 1.0
+        self.__cle.start()
+        time.sleep(0.5)
+        self.__cle.stop()
+        self.assertLess(self.__cle.simulation_time, 0.6)
+        self.assertGreaterEqual(self.__cle.overrun_steps, 0)
+        self.__cle.reset()
+        self.assertEqual(self.__cle.overrun_steps, 0)
+        self.assertEqual(self.__cle.overrun_time, 0.0)
+
     def test_reset(self):
         self.__cle.initialize("foo")
         self.assertTrue(self.__cle.is_initialized)
@@ -96,6 +118,49 @@ class TestDeterministicClosedLoopEngine(unittest.TestCase):
         self.assertEqual(self.__cle.simulation_time, 0.0)
         self.assertEqual(self.__cle.real_time, 0.0)
 
+    def test_step_latency_histograms(self):
+        self.__cle.initialize("foo")
+        self.__tfm.sleep_time = 0
+        self.__cle.run_step(0.01)
+        self.__cle.run_step(0.01)
+        histograms = self.__cle.step_latency_histograms(reset=True)
+        for phase in ['robot_wait', 'brain_run', 'device_refresh', 'robot_buffer_refresh',
+                      'transfer_functions']:
+            self.assertEqual(histograms[phase]['count'], 2)
+        self.assertEqual(self.__cle.step_latency_histograms()['brain_run']['count'], 0)
+
+    def test_step_coalescing(self):
+        self.__cle.initialize("foo")
+        self.__tfm.sleep_time = 0
+        self.__cle.coalesce_steps = True
+        self.__cle.max_coalesced_steps = 4
+        self.__tfm.next_due_time = Mock(return_value=0.025)
+        self.__cle.rca.run_step_async = Mock(wraps=self.__cle.rca.run_step_async)
+        self.assertAlmostEqual(self.__cle.run_step(0.01), 0.03)
+        self.__cle.rca.run_step_async.assert_called_once_with(0.03)
+        self.assertEqual(self.__tfm.robot_to_neuron_times, [])
+        self.__tfm.next_due_time.return_value = float('inf')
+        self.assertAlmostEqual(self.__cle.run_step(0.01), 0.07)
+        self.__tfm.next_due_time.return_value = 0.0
+        self.assertAlmostEqual(self.__cle.run_step(0.01), 0.08)
+        self.assertEqual(len(self.__tfm.robot_to_neuron_times), 1)
+        self.assertAlmostEqual(self.__tfm.robot_to_neuron_times[0], 0.07)
+        histograms = self.__cle.step_latency_histograms()
+        self.assertEqual(histograms['brain_run']['count'], 3)
+        self.assertEqual(histograms['transfer_functions']['count'], 1)
+
+    def test_tf_latency_requires_due_tfs(self):
+        self.__cle.initialize("foo")
+        self.__tfm.sleep_time = 0
+        self.__tfm.next_due_time = Mock(return_value=float('inf'))
+        self.__cle.run_step(0.01)
+        self.__tfm.next_due_time.return_value = 0.0
+        self.__cle.run_step(0.01)
+        self.__cle.stop()
+        histograms = self.__cle.step_latency_histograms()
+        self.assertEqual(histograms['brain_run']['count'], 2)
+        self.assertEqual(histograms['transfer_functions']['count'], 1)
+
     def test_reset_world_backwards_compatibility(self):
         self.__cle.rca = Mock()
         self.__cle.rca.reset_world = Mock()
@@ -205,10 +270,80 @@ class TestDeterministicClosedLoopEngine(unittest.TestCase):
 
 class TestClosedLoopEngine(TestDeterministicClosedLoopEngine):
     CLE_Class = ClosedLoopEngine
-    
+
     def setUp(self):
-        with patch("hbp_nrp_cle.cle.ClosedLoopEngine.threading"):
-            super(TestClosedLoopEngine, self).setUp()
+        super(TestClosedLoopEngine, self).setUp()
+        self.cle = self._TestDeterministicClosedLoopEngine__cle
+        self.tfm = self._TestDeterministicClosedLoopEngine__tfm
+        self.tfm.sleep_time = 0
+
+    def tearDown(self):
+        self.cle.shutdown()
+        super(TestClosedLoopEngine, self).tearDown()
+
+    def test_invalid_staleness(self):
+        self.assertRaises(ValueError, setattr, self.cle, 'max_staleness', 2)
+
+    def test_step_latency_histograms(self):
+        # the Transfer Functions of the last step are still pending with a staleness of 1
+        self.cle.max_staleness = 0
+        super(TestClosedLoopEngine, self).test_step_latency_histograms()
+
+    def test_step_coalescing(self):
+        self.cle.max_staleness = 0
+        super(TestClosedLoopEngine, self).test_step_coalescing()
+
+    def test_tf_latency_requires_due_tfs(self):
+        self.cle.max_staleness = 0
+        super(TestClosedLoopEngine, self).test_tf_latency_requires_due_tfs()
+
+    def test_default_staleness(self):
+        self.assertEqual(self.cle.max_staleness, 1)
+
+    def test_no_staleness(self):
+        self.cle.initialize("foo")
+        self.cle.max_staleness = 0
+        self.cle.run_step(0.01)
+        self.assertEqual(self.tfm.robot_to_neuron_times, [0.0])
+        self.assertEqual(self.cle.last_step_result.step, 0)
+        self.assertEqual(self.cle.last_step_result.tf_step, 0)
+        self.assertEqual(self.cle.last_step_result.tf_time, 0.0)
+
+    def test_pipelined_steps(self):
+        self.cle.initialize("foo")
+        self.cle.max_staleness = 1
+        self.cle.run_step(0.01)
+        self.assertIsNone(self.cle.last_step_result.tf_step)
+        self.cle.run_step(0.01)
+        self.assertEqual(self.cle.last_step_result.step, 1)
+        self.assertEqual(self.cle.last_step_result.tf_step, 0)
+        self.assertEqual(self.cle.last_step_result.tf_time, 0.0)
+        self.cle.stop()
+        self.assertEqual(self.tfm.robot_to_neuron_times, [0.0, 0.01])
+        self.assertEqual(self.tfm.neuron_to_robot_times, [0.0, 0.01])
+
+    def test_tf_data_versions(self):
+        due = Mock(params=[-float('inf')])
+        due.name = "due"
+        throttled = Mock(params=[0.0])
+        throttled.name = "throttled"
+        self.tfm.transfer_functions = Mock(return_value=[due, throttled])
+
+        def run(t):
+            due.params[0] = t
+        self.tfm.run_robot_to_neuron = run
+        self.cle.initialize("foo")
+        self.cle.max_staleness = 0
+        self.cle.run_step(0.01)
+        self.cle.run_step(0.01)
+        self.assertEqual(self.cle.last_step_result.tf_data_versions, {"due": 1})
+
+    def test_reset_clears_pipeline(self):
+        self.cle.initialize("foo")
+        self.cle.max_staleness = 1
+        self.cle.run_step(0.01)
+        self.cle.reset()
+        self.assertIsNone(self.cle.last_step_result)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,79 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+Unit tests for the multi-rate CLE
+"""
+
+from hbp_nrp_cle.cle.MultiRateClosedLoopEngine import MultiRateClosedLoopEngine, \
+    period_to_ticks
+from hbp_nrp_cle.mocks.robotsim import MockRobotControlAdapter, MockRobotCommunicationAdapter
+from hbp_nrp_cle.mocks.brainsim import MockBrainControlAdapter, MockBrainCommunicationAdapter
+from hbp_nrp_cle.mocks.tf_framework import MockTransferFunctionManager
+
+import unittest
+from mock import Mock, patch
+
+
+class TestMultiRateClosedLoopEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.rca = MockRobotControlAdapter()
+        self.rca.run_step_async = Mock(wraps=self.rca.run_step_async)
+        self.bca = MockBrainControlAdapter()
+        self.bca.run_step = Mock()
+        self.tfm = MockTransferFunctionManager()
+        self.tfm.sleep_time = 0
+
+        with patch('hbp_nrp_cle.cle.DeterministicClosedLoopEngine.GazeboHelper'):
+            self.cle = MultiRateClosedLoopEngine(self.rca, MockRobotCommunicationAdapter(),
+                                                 self.bca, MockBrainCommunicationAdapter(),
+                                                 self.tfm, 0.001, physics_period=0.001,
+                                                 brain_period=0.02, tf_period=0.05)
+        self.cle.initialize()
+
+    def test_period_to_ticks(self):
+        self.assertEqual(period_to_ticks(None, 0.001), 1)
+        self.assertEqual(period_to_ticks(0.02, 0.001), 20)
+        self.assertRaises(ValueError, period_to_ticks, 0.0015, 0.001)
+        self.assertRaises(ValueError, period_to_ticks, 0.0, 0.001)
+
+    def test_rates(self):
+        for _ in range(100):
+            self.cle.run_step(0.001)
+        self.assertAlmostEqual(self.cle.simulation_time, 0.1)
+        self.assertEqual(self.rca.run_step_async.call_count, 100)
+        self.assertEqual(self.bca.run_step.call_count, 5)
+        self.bca.run_step.assert_called_with(20.0)
+        self.assertEqual(len(self.tfm.robot_to_neuron_times), 2)
+        self.assertAlmostEqual(self.tfm.robot_to_neuron_times[1], 0.05)
+
+    def test_reset_restarts_ticks(self):
+        self.cle.run_step(0.001)
+        self.cle.reset()
+        self.cle.run_step(0.001)
+        self.assertEqual(self.bca.run_step.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+Unit tests for the phase latency recorder
+"""
+
+from hbp_nrp_cle.cle.PhaseLatencyRecorder import PhaseLatencyRecorder, PHASES, BRAIN_RUN, \
+    TRANSFER_FUNCTIONS
+
+import unittest
+
+
+class TestPhaseLatencyRecorder(unittest.TestCase):
+
+    def test_invalid_window(self):
+        self.assertRaises(ValueError, PhaseLatencyRecorder, 0)
+
+    def test_empty_histograms(self):
+        histograms = PhaseLatencyRecorder().histograms()
+        self.assertEqual(set(histograms.keys()), set(PHASES))
+        for phase in PHASES:
+            self.assertEqual(histograms[phase]['count'], 0)
+            self.assertEqual(histograms[phase]['max'], 0.0)
+
+    def test_percentiles(self):
+        recorder = PhaseLatencyRecorder(window=100)
+        for i in range(1, 101):
+            recorder.record(BRAIN_RUN, float(i))
+        brain = recorder.histograms()[BRAIN_RUN]
+        self.assertEqual(brain['count'], 100)
+        self.assertAlmostEqual(brain['p50'], 50.5)
+        self.assertAlmostEqual(brain['p90'], 90.1)
+        self.assertAlmostEqual(brain['p99'], 99.01)
+        self.assertEqual(brain['max'], 100.0)
+        self.assertEqual(recorder.histograms()[TRANSFER_FUNCTIONS]['count'], 0)
+
+    def test_ring_buffer_overwrites_oldest(self):
+        recorder = PhaseLatencyRecorder(window=3)
+        for duration in [10.0, 1.0, 2.0, 3.0]:
+            recorder.record(BRAIN_RUN, duration)
+        brain = recorder.histograms()[BRAIN_RUN]
+        self.assertEqual(brain['count'], 3)
+        self.assertEqual(brain['max'], 3.0)
+
+    def test_reset_window(self):
+        recorder = PhaseLatencyRecorder()
+        recorder.record(BRAIN_RUN, 1.0)
+        self.assertEqual(recorder.histograms(reset=True)[BRAIN_RUN]['count'], 1)
+        self.assertEqual(recorder.histograms()[BRAIN_RUN]['count'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
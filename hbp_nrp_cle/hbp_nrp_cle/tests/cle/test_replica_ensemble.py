@@ -0,0 +1,138 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+import os
+import random
+import time
+import unittest
+
+from mock import Mock, patch
+
+import hbp_nrp_cle.tf_framework as nrp
+from hbp_nrp_cle.brainsim import config as brain_config
+from hbp_nrp_cle.cle.DeterministicClosedLoopEngine import DeterministicClosedLoopEngine
+from hbp_nrp_cle.cle.ClosedLoopEngine import ClosedLoopEngine
+from hbp_nrp_cle.cle.ReplicaEnsemble import ReplicaEnsemble
+from hbp_nrp_cle.mocks.robotsim import MockRobotControlAdapter, MockRobotCommunicationAdapter
+from hbp_nrp_cle.mocks.brainsim import MockBrainControlAdapter, MockBrainCommunicationAdapter
+
+__author__ = ''
+
+MockOs = Mock()
+MockOs.environ = {'NRP_SIMULATION_DIR': '/somewhere/near/the/rainbow'}
+
+
+@patch("hbp_nrp_cle.common.os", new=MockOs)
+class TestReplicaEnsemble(unittest.TestCase):
+
+    def setUp(self):
+        tfm = nrp.start_new_tf_manager()
+        bcm = MockBrainCommunicationAdapter()
+        rcm = MockRobotCommunicationAdapter()
+        nrp.set_nest_adapter(bcm)
+        nrp.set_robot_adapter(rcm)
+
+        @nrp.MapCSVRecorder("recorder", filename="values.csv", headers=["time", "seed", "value"])
+        @nrp.Robot2Neuron()
+        def record(t, recorder):
+            recorder.record_entry(t, brain_config.rng_seed, random.random())
+
+        self.engine = DeterministicClosedLoopEngine(MockRobotControlAdapter(), rcm,
+                                                    MockBrainControlAdapter(), bcm, tfm, 0.01)
+        self.engine.initialize()
+
+    def test_engine_must_be_initialized(self):
+        self.engine.initialized = False
+        with self.assertRaises(Exception):
+            ReplicaEnsemble(self.engine).run([1], 1)
+        self.engine.initialized = True
+        with self.assertRaises(ValueError):
+            ReplicaEnsemble(self.engine).run([1], 1, max_parallel=0)
+
+    def test_replicas(self):
+        ensemble = ReplicaEnsemble(self.engine)
+        results = ensemble.run([7, 8, 7], 3, max_parallel=2)
+
+        self.assertEqual([r.index for r in results], [0, 1, 2])
+        self.assertEqual([r.seed for r in results], [7, 8, 7])
+        values = []
+        for result in results:
+            self.assertIsNone(result.error)
+            self.assertEqual(result.steps, 3)
+            self.assertAlmostEqual(result.simulation_time, 0.03)
+            self.assertGreaterEqual(result.wall_time, 0.0)
+            name, headers, path = result.csv_recorders[0]
+            self.assertEqual(name, "values.csv")
+            with open(path) as csv_file:
+                rows = csv_file.read().splitlines()[1:]
+            os.remove(path)
+            self.assertEqual(len(rows), 3)
+            self.assertTrue(all(row.split(",")[1] == str(result.seed) for row in rows))
+            values.append(rows)
+
+        # replicas with the same seed are identical, others are not
+        self.assertEqual(values[0], values[2])
+        self.assertNotEqual(values[0], values[1])
+        # the parent is not advanced by the replicas
+        self.assertEqual(self.engine.simulation_time, 0.0)
+        self.assertGreater(ensemble.wall_time, 0.0)
+
+    def test_replicas_of_pipelined_engine(self):
+        engine = ClosedLoopEngine(MockRobotControlAdapter(), self.engine.rcm,
+                                  MockBrainControlAdapter(), self.engine.bcm, self.engine.tfm,
+                                  0.01)
+        self.addCleanup(engine.shutdown)
+        engine.initialize()
+        # leaves the Transfer Functions of the step running on the Transfer Function thread
+        engine.run_step(0.01)
+
+        results = ReplicaEnsemble(engine).run([1, 2], 2)
+        for result in results:
+            self.assertIsNone(result.error)
+            self.assertAlmostEqual(result.simulation_time, 0.03)
+            for _, _, path in result.csv_recorders:
+                os.remove(path)
+
+    def test_results_are_ordered_by_seed(self):
+        def reseed(seed):
+            # the first replica finishes last
+            time.sleep(0.5 if seed == 1 else 0.0)
+
+        results = ReplicaEnsemble(self.engine, reseed).run([1, 2, 3], 1, max_parallel=2)
+        self.assertEqual([r.seed for r in results], [1, 2, 3])
+        for result in results:
+            self.assertIsNone(result.error)
+            for _, _, path in result.csv_recorders:
+                os.remove(path)
+
+    def test_failing_replica(self):
+        def reseed(seed):
+            raise Exception("cannot seed {0}".format(seed))
+
+        results = ReplicaEnsemble(self.engine, reseed).run([3], 2)
+        self.assertIn("cannot seed 3", results[0].error)
+        self.assertEqual(results[0].csv_recorders, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+Unit tests for the wall clock pacer
+"""
+
+from hbp_nrp_cle.cle.WallClockPacer import WallClockPacer
+
+import unittest
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, duration):
+        self.sleeps.append(duration)
+        self.now += duration
+
+
+class TestWallClockPacer(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def create_pacer(self, rtf):
+        pacer = WallClockPacer(rtf, clock=self.clock.time, sleep=self.clock.sleep)
+        pacer.start(0.0)
+        return pacer
+
+    def test_invalid_factor(self):
+        self.assertRaises(ValueError, WallClockPacer, 0.0)
+
+    def test_disabled(self):
+        pacer = self.create_pacer(None)
+        pacer.pace(1.0)
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_sleeps_spare_time(self):
+        pacer = self.create_pacer(0.5)
+        self.clock.now += 0.01
+        pacer.pace(0.02)
+        self.assertAlmostEqual(self.clock.sleeps[0], 0.03)
+        self.assertAlmostEqual(pacer.drift, 0.0)
+        self.assertEqual(pacer.overrun_steps, 0)
+
+    def test_drift_is_made_up(self):
+        pacer = self.create_pacer(1.0)
+        self.clock.now += 0.05
+        pacer.pace(0.02)
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertEqual(pacer.overrun_steps, 1)
+        self.assertAlmostEqual(pacer.overrun_time, 0.03)
+        self.assertAlmostEqual(pacer.drift, 0.03)
+
+        # a fast step does not sleep until the accumulated drift is absorbed
+        self.clock.now += 0.001
+        pacer.pace(0.04)
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertAlmostEqual(pacer.drift, 0.011)
+
+        self.clock.now += 0.001
+        pacer.pace(0.06)
+        self.assertAlmostEqual(self.clock.sleeps[0], 0.008)
+        self.assertAlmostEqual(pacer.drift, 0.0)
+        self.assertEqual(pacer.overrun_steps, 1)
+
+    def test_lagging(self):
+        pacer = self.create_pacer(1.0)
+        self.clock.now += 0.05
+        pacer.pace(0.02)
+        self.assertTrue(pacer.lagging)
+
+        # the drift is smaller than the budget of the step and can still be made up
+        self.clock.now += 0.001
+        pacer.pace(0.04)
+        self.assertFalse(pacer.lagging)
+
+        self.clock.now += 1.0
+        pacer.pace(0.06)
+        self.assertTrue(pacer.lagging)
+        pacer.reset()
+        self.assertFalse(pacer.lagging)
+
+    def test_enabled_after_unpaced_steps(self):
+        pacer = self.create_pacer(None)
+        for step in range(1, 1001):
+            self.clock.now += 0.001
+            pacer.pace(step * 0.02)
+        self.assertEqual(self.clock.sleeps, [])
+
+        # the pacing is anchored at the last step rather than at the start of the loop
+        pacer.real_time_factor = 1.0
+        self.clock.now += 0.001
+        pacer.pace(1001 * 0.02)
+        self.assertEqual(len(self.clock.sleeps), 1)
+        self.assertAlmostEqual(self.clock.sleeps[0], 0.019)
+        self.assertEqual(pacer.overrun_steps, 0)
+
+    def test_reset(self):
+        pacer = self.create_pacer(2.0)
+        self.clock.now += 1.0
+        pacer.pace(0.02)
+        self.assertEqual(pacer.overrun_steps, 1)
+        pacer.reset()
+        self.assertEqual(pacer.overrun_steps, 0)
+        self.assertEqual(pacer.overrun_time, 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+Tests the recording and replay of robot inputs
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock
+
+from hbp_nrp_cle.robotsim.RobotInterface import Topic
+from hbp_nrp_cle.robotsim.RecordingRobotCommunicationAdapter import \
+    RecordingRobotCommunicationAdapter, read_robot_input_log
+from hbp_nrp_cle.robotsim.ReplayRobotCommunicationAdapter import ReplayRobotCommunicationAdapter
+from hbp_nrp_cle.robotsim.NoOpRobotControlAdapter import NoOpRobotControlAdapter
+from hbp_nrp_cle.mocks.robotsim import MockRobotCommunicationAdapter
+
+__author__ = ''
+
+
+class TestRobotInputReplay(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "inputs.log.gz")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record(self):
+        inner = MockRobotCommunicationAdapter()
+        recorder = RecordingRobotCommunicationAdapter(inner, self.path)
+        recorder.initialize("recorder")
+        self.assertEqual(inner.name, "recorder")
+
+        camera = recorder.register_subscribe_topic(Topic("/camera", str))
+        joints = recorder.register_subscribe_topic("/joints")
+        publisher = recorder.register_publish_topic(Topic("/cmd", float))
+        self.assertEqual(len(inner.subscribed_topics), 2)
+        self.assertIn(publisher, inner.published_topics)
+
+        for step in range(4):
+            recorder.refresh_buffers(step * 0.1)
+            self.assertEqual(recorder.step, step)
+            if step != 2:
+                camera.subscriber.value = "image {0}".format(step)
+            if step == 1:
+                joints.subscriber.value = [1.0, 2.0]
+            # values are recorded once when they are read
+            camera.value
+            camera.value
+            joints.value
+        recorder.unregister_subscribe_topic(joints)
+        self.assertEqual(len(inner.subscribed_topics), 1)
+        recorder.shutdown()
+
+    def test_record(self):
+        self.record()
+        self.assertEqual(list(read_robot_input_log(self.path)), [
+            (0, 0.0, "/camera", "image 0"),
+            (0, 0.0, "/joints", None),
+            (1, 0.1, "/camera", "image 1"),
+            (1, 0.1, "/joints", [1.0, 2.0]),
+            (3, 0.30000000000000004, "/camera", "image 3")
+        ])
+
+    def test_invalid_log(self):
+        import gzip
+        with gzip.open(self.path, 'wb') as log:
+            log.write("no log")
+        with self.assertRaises(Exception):
+            ReplayRobotCommunicationAdapter(self.path)
+
+    def test_replay(self):
+        self.record()
+        replay = ReplayRobotCommunicationAdapter(self.path)
+        replay.initialize("replay")
+        camera = replay.register_subscribe_topic(Topic("/camera", str))
+        joints = replay.register_subscribe_topic("/joints", initial_value=[])
+        publisher = replay.register_publish_topic("/cmd")
+        tf = Mock()
+        tf.active = True
+        tf.elapsed_time = 0.0
+        tf.should_run.return_value = True
+        joints.register_tf_trigger(tf)
+
+        self.assertEqual(replay.last_step, 3)
+        self.assertEqual(joints.value, [])
+
+        replay.refresh_buffers(0.0)
+        self.assertEqual(camera.value, "image 0")
+        self.assertTrue(camera.changed)
+        self.assertIsNone(joints.value)
+
+        replay.refresh_buffers(0.1)
+        self.assertEqual(joints.value, [1.0, 2.0])
+        tf.run.assert_called_with(0.1)
+        self.assertEqual(tf.run.call_count, 2)
+
+        replay.refresh_buffers(0.2)
+        self.assertEqual(camera.value, "image 1")
+        self.assertFalse(camera.changed)
+        self.assertFalse(replay.finished)
+
+        replay.refresh_buffers(0.3)
+        self.assertEqual(camera.value, "image 3")
+        self.assertTrue(replay.finished)
+
+        publisher.send_message(4.2)
+        self.assertEqual(publisher.last_message, 4.2)
+        self.assertEqual(publisher.count, 1)
+
+        replay.rewind()
+        self.assertEqual(replay.step, -1)
+        camera.reset(None)
+        self.assertIsNone(camera.value)
+        replay.unregister_subscribe_topic(camera)
+        replay.refresh_buffers(0.0)
+        self.assertIsNone(camera.value)
+        replay.shutdown()
+
+    def test_no_op_control_adapter(self):
+        rca = NoOpRobotControlAdapter()
+        self.assertTrue(rca.initialize())
+        self.assertTrue(rca.is_alive)
+        self.assertFalse(rca.is_paused)
+        self.assertTrue(rca.set_time_step(0.01))
+        self.assertEqual(rca.time_step, 0.01)
+
+        self.assertAlmostEqual(rca.run_step(0.02), 0.02)
+        future = rca.run_step_async(0.03)
+        self.assertAlmostEqual(future.result(), 0.05)
+        self.assertLessEqual(future.start, future.end)
+        with self.assertRaises(ValueError):
+            rca.run_step(0.015)
+
+        rca.reset()
+        self.assertAlmostEqual(rca.run_step(0.01), 0.01)
+        rca.set_robots({})
+        rca.reset_world({}, {})
+        rca.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
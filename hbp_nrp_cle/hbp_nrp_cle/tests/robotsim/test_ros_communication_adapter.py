@@ -207,6 +207,14 @@ class TestTopicImplementations(unittest.TestCase):
         rpt._unregister()
         self.assertEquals(pub.unregister.call_count, 1)
 
+    @patch('hbp_nrp_cle.robotsim.RosCommunicationAdapter.rospy.Publisher')
+    def test_rpt_get_num_connections(self, mock_rospy_publisher):
+        rpt = RosPublishedTopic(Topic('topic_name', 'topic_type'))
+        mock_rospy_publisher.return_value.get_num_connections.return_value = 3
+        self.assertEquals(rpt.get_num_connections(), 3)
+        rpt._unregister()
+        self.assertEquals(rpt.get_num_connections(), 0)
+
     # Tests for RosPublishedPreprocessedTopic
     @patch('hbp_nrp_cle.robotsim.RosCommunicationAdapter.rospy.Publisher')
     def test_rppt_init(self, mock_rospy_publisher):
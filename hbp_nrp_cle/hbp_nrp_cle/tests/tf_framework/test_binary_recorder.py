@@ -0,0 +1,139 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+Tests for the BinaryRecorder module
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+from mock import MagicMock, patch
+
+import hbp_nrp_cle.tf_framework as nrp
+
+__author__ = ''
+
+
+class TestMapBinaryRecorder(unittest.TestCase):
+
+    def test_mapping(self):
+        mapping = nrp.MapBinaryRecorder("name", "filename", ['header1', 'header2'],
+                                        chunk_size=3)
+        recorder = mapping.create_adapter(None)
+        self.assertTrue(isinstance(recorder, nrp.BinaryRecorder))
+        self.assertEqual(recorder.get_recorder_name(), "filename")
+        self.assertEqual(recorder.get_headers(), ['header1', 'header2'])
+
+    def test_unknown_format(self):
+        with self.assertRaises(Exception):
+            nrp.BinaryRecorder("filename", ['header1'], file_format='xls')
+
+
+class TestBinaryRecorder(unittest.TestCase):
+
+    def load(self, path):
+        self.addCleanup(os.remove, path)
+        with np.load(path) as npz:
+            return npz['values'], npz['reset'], list(npz['headers'])
+
+    def test_cleanup(self):
+        recorder = nrp.BinaryRecorder("values.npz", ['t', 'x', 'y'], chunk_size=2)
+        recorder.record_entry(0.0, 1.0, 2.0)
+        recorder.record_entry([0.1, 1.1, 2.1])
+        recorder.record_entry(np.array([0.2, 1.2, 2.2]))
+        values, reset, headers = self.load(recorder.cleanup())
+
+        np.testing.assert_array_equal(values, [[0.0, 1.0, 2.0], [0.1, 1.1, 2.1], [0.2, 1.2, 2.2]])
+        np.testing.assert_array_equal(reset, [False, False, False])
+        self.assertEqual(headers, ['t', 'x', 'y'])
+
+        values, _, _ = self.load(recorder.cleanup())
+        self.assertEqual(values.shape, (0, 3))
+
+    def test_reset_marker(self):
+        recorder = nrp.BinaryRecorder("values.npz", ['t'], chunk_size=2)
+        recorder.record_entry(1)
+        self.assertIs(recorder.reset('fakeTfManager'), recorder)
+        recorder.record_entry(2)
+        recorder.record_entry(3)
+        values, reset, _ = self.load(recorder.cleanup())
+        np.testing.assert_array_equal(values[:, 0], [1, 2, 3])
+        np.testing.assert_array_equal(reset, [False, True, False])
+
+    def test_erase_on_reset(self):
+        recorder = nrp.BinaryRecorder("values.npz", ['t'], chunk_size=2, erase_on_reset=True)
+        for i in range(3):
+            recorder.record_entry(i)
+        recorder.reset('fakeTfManager')
+        recorder.record_entry(7)
+        values, reset, _ = self.load(recorder.cleanup())
+        np.testing.assert_array_equal(values[:, 0], [7])
+        np.testing.assert_array_equal(reset, [True])
+
+    def test_read_while_recording(self):
+        recorder = nrp.BinaryRecorder("values.npz", ['t', 'x'], dtype=np.float32, chunk_size=4)
+        for i in range(6):
+            recorder.record_entry(i, -i)
+        values, reset = recorder.read()
+        self.assertIsInstance(values, np.memmap)
+        self.assertEqual(values.dtype, np.float32)
+        np.testing.assert_array_equal(values[:, 1], [0, -1, -2, -3, -4, -5])
+        self.assertEqual(len(reset), 6)
+        recorder.record_entry(6, -6)
+        self.assertEqual(len(recorder.read()[0]), 7)
+        recorder.discard()
+
+    def test_discard(self):
+        recorder = nrp.BinaryRecorder("values.npz", ['t'])
+        recorder.record_entry(1)
+        with patch('hbp_nrp_cle.tf_framework._BinaryRecorder.os.remove') as remove:
+            recorder.discard()
+        values, _, _ = self.load(remove.call_args[0][0])
+        np.testing.assert_array_equal(values, [[1]])
+
+    def test_hdf5(self):
+        h5py = MagicMock()
+        datasets = [MagicMock(), MagicMock()]
+        datasets[0].__len__.return_value = 0
+        h5py.File.return_value.create_dataset.side_effect = datasets
+        with patch.dict(sys.modules, {'h5py': h5py}):
+            recorder = nrp.BinaryRecorder("values.h5", ['t', 'x'], file_format='hdf5',
+                                          chunk_size=2)
+            recorder.record_entry(1, 2)
+            recorder.record_entry(3, 4)
+            path = recorder.cleanup()
+        self.addCleanup(os.remove, path)
+
+        self.assertTrue(path.endswith('.h5'))
+        h5py.File.assert_called_once_with(path, 'w', libver='latest')
+        datasets[0].resize.assert_called_once_with(2, axis=0)
+        datasets[0].__setitem__.assert_called_once()
+        datasets[1].resize.assert_called_once_with(2, axis=0)
+        h5py.File.return_value.close.assert_called_once_with()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,196 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+import marshal
+import os
+import shutil
+import tempfile
+import types
+import unittest
+
+from mock import Mock, patch
+
+import hbp_nrp_cle.tf_framework as nrp
+from hbp_nrp_cle.tf_framework import config, TFLoadingException
+from hbp_nrp_cle.tf_framework._CodeCache import CodeCache, module_fingerprint
+from hbp_nrp_cle.mocks.robotsim._MockRobotCommunicationAdapter import \
+    MockRobotCommunicationAdapter
+from hbp_nrp_cle.mocks.brainsim._MockBrainCommunicationAdapter import \
+    MockBrainCommunicationAdapter
+
+__author__ = ''
+
+SOURCE = "@nrp.Robot2Neuron()\ndef cached(t):\n    return t * 2\n"
+
+
+class TestCodeCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.policy = types.ModuleType('policy')
+        self.policy.__version__ = '1'
+        self.compiler = Mock(side_effect=compile)
+
+    def create_cache(self, directory=None):
+        return CodeCache(directory, compiler=self.compiler, policy_modules=[self.policy])
+
+    def test_memory_hit(self):
+        cache = self.create_cache()
+        code = cache.compile(SOURCE, "<cached>")
+        self.assertIs(cache.compile(SOURCE, "<cached>"), code)
+        self.assertEqual(self.compiler.call_count, 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(cache.hit_rate, 0.5)
+
+        cache.compile(SOURCE + "\n", "<cached>")
+        cache.compile(SOURCE, "<renamed>")
+        self.assertEqual(self.compiler.call_count, 3)
+
+    def test_disk_hit(self):
+        code = self.create_cache(self.directory).compile(SOURCE, "<cached>")
+        cache = self.create_cache(self.directory)
+        loaded = cache.compile(SOURCE, "<cached>")
+        self.assertEqual(self.compiler.call_count, 1)
+        self.assertEqual(loaded.co_code, code.co_code)
+        self.assertEqual(cache.hit_rate, 1.0)
+
+    def test_policy_change_invalidates(self):
+        cache = self.create_cache(self.directory)
+        cache.compile(SOURCE)
+        self.policy.__version__ = '2'
+        cache.compile(SOURCE)
+        self.assertEqual(self.compiler.call_count, 1)
+
+        cache.invalidate()
+        cache.compile(SOURCE)
+        self.assertEqual(self.compiler.call_count, 2)
+        self.create_cache(self.directory).compile(SOURCE)
+        self.assertEqual(self.compiler.call_count, 2)
+
+    def test_corrupt_entry_is_recompiled(self):
+        cache = self.create_cache(self.directory)
+        cache.compile(SOURCE)
+        key = cache.key(SOURCE, '<string>')
+        path = os.path.join(self.directory, key + '.code')
+        with open(path, 'wb') as code_file:
+            code_file.write('garbage')
+
+        self.create_cache(self.directory).compile(SOURCE)
+        self.assertEqual(self.compiler.call_count, 2)
+
+    def test_unauthenticated_entry_is_not_loaded(self):
+        cache = self.create_cache(self.directory)
+        key = cache.key(SOURCE, '<string>')
+        path = os.path.join(self.directory, key + '.code')
+        with open(path, 'wb') as code_file:
+            code_file.write('\0' * 32 + marshal.dumps(compile("x = 1", "<planted>", "exec")))
+        os.chmod(path, 0600)
+
+        code = self.create_cache(self.directory).compile(SOURCE)
+        self.assertEqual(self.compiler.call_count, 1)
+        self.assertEqual(code.co_filename, '<string>')
+
+    def test_entry_accessible_by_others_is_not_loaded(self):
+        self.create_cache(self.directory).compile(SOURCE)
+        key = self.create_cache().key(SOURCE, '<string>')
+        os.chmod(os.path.join(self.directory, key + '.code'), 0644)
+
+        self.create_cache(self.directory).compile(SOURCE)
+        self.assertEqual(self.compiler.call_count, 2)
+
+    def test_shared_directory_is_not_used(self):
+        os.chmod(self.directory, 0777)
+        cache = self.create_cache(self.directory)
+        self.assertIsNone(cache.directory)
+        cache.compile(SOURCE)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_directory_is_created_private(self):
+        directory = os.path.join(self.directory, 'tf_code')
+        cache = self.create_cache(directory)
+        self.assertEqual(cache.directory, directory)
+        self.assertEqual(os.stat(directory).st_mode & 0777, 0700)
+        self.assertEqual(os.stat(os.path.join(directory, 'secret')).st_mode & 0777, 0600)
+
+    def test_default_cache_is_in_memory(self):
+        self.assertIsNone(nrp.code_cache.directory)
+
+    def test_capacity(self):
+        cache = CodeCache(None, capacity=1, compiler=self.compiler, policy_modules=[])
+        cache.compile(SOURCE)
+        cache.compile(SOURCE + "\n")
+        cache.compile(SOURCE)
+        self.assertEqual(self.compiler.call_count, 3)
+
+    def test_module_fingerprint(self):
+        module_file = os.path.join(self.directory, 'policy.py')
+        with open(module_file, 'w') as source:
+            source.write('x = 1\n')
+        self.policy.__file__ = module_file + 'c'
+        first = module_fingerprint(self.policy)
+        with open(module_file, 'w') as source:
+            source.write('x = 2\n')
+        self.assertNotEqual(module_fingerprint(self.policy), first)
+        self.assertEqual(module_fingerprint(types.ModuleType('other')), 'other')
+
+
+class TestSetTransferFunctionCompilation(unittest.TestCase):
+
+    def setUp(self):
+        os_mock = Mock()
+        os_mock.environ = {'NRP_SIMULATION_DIR': '/somewhere/near/the/rainbow'}
+        os_mock.path.exists.return_value = False
+        patcher = patch("hbp_nrp_cle.common.os", new=os_mock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        cache = CodeCache(None)
+        patcher = patch("hbp_nrp_cle.tf_framework.code_cache", new=cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = cache
+
+        nrp.start_new_tf_manager()
+        nrp.set_nest_adapter(MockBrainCommunicationAdapter())
+        nrp.set_robot_adapter(MockRobotCommunicationAdapter())
+        nrp.initialize("test")
+
+    def tearDown(self):
+        config.active_node.shutdown()
+
+    def test_source_is_compiled_through_cache(self):
+        nrp.set_transfer_function(SOURCE, None, "cached")
+        nrp.set_transfer_function(SOURCE, None, "cached")
+        self.assertEqual(nrp.get_transfer_function("cached").run(0.25), 0.5)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_syntax_error(self):
+        with self.assertRaises(TFLoadingException):
+            nrp.set_transfer_function("def broken(t:\n", None, "broken")
+        self.assertEqual(self.cache.misses, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -29,6 +29,9 @@ __author__ = ''
 
 import unittest
 import tempfile
+import gzip
+import os
+import threading
 import hbp_nrp_cle
 import hbp_nrp_cle.tf_framework as nrp
 from mock import Mock, patch
@@ -51,13 +54,106 @@ class TestCSVRecorder(unittest.TestCase):
         recorder = nrp.CSVRecorder("dummy.csv", ['header1', 'header2'])
         self.assertEqual(recorder.get_csv_headers(), ['header1,', 'header2,','Simulation_reset\n'])
 
+    def read(self, path, opener=open):
+        self.addCleanup(os.remove, path)
+        with opener(path, 'rb') as csv_file:
+            return csv_file.read()
+
     def test_cleanup(self):
         recorder = nrp.CSVRecorder("dummy_file.csv", ['header1', 'header2'])
         result = recorder.record_entry("tst1","tst2")
-        self.assertEqual(recorder._CSVRecorder__values,[['tst1,', 'tst2\n']])
+        self.assertEqual(recorder._CSVRecorder__values,[('tst1', 'tst2', None)])
         self.assertFalse(recorder._CSVRecorder__reset_since_last_record)
-        recorder.cleanup()
+        path = recorder.cleanup()
         self.assertEqual(recorder._CSVRecorder__values,[])
+        self.assertEqual(self.read(path), 'header1,header2,Simulation_reset\ntst1,tst2\n')
+
+        path = recorder.cleanup()
+        self.assertEqual(self.read(path), 'header1,header2,Simulation_reset\n')
+
+    def test_buffer_is_flushed(self):
+        recorder = nrp.CSVRecorder("dummy_file.csv", ['header1'], buffer_size=2)
+        for i in range(5):
+            recorder.record_entry(i)
+        self.assertEqual(recorder._CSVRecorder__values, [(4, None)])
+        self.assertEqual(self.read(recorder.cleanup()),
+                         'header1,Simulation_reset\n0\n1\n2\n3\n4\n')
+
+    def test_reset_marker(self):
+        recorder = nrp.CSVRecorder("dummy_file.csv", ['header1'], buffer_size=1)
+        recorder.record_entry(1.5)
+        recorder.reset('fakeTfManager')
+        recorder.record_entry(2.5)
+        recorder.record_entry(3.5)
+        self.assertEqual(self.read(recorder.cleanup()),
+                         'header1,Simulation_reset\n1.5\n2.5,RESET\n3.5\n')
+
+    def test_erase_on_reset(self):
+        recorder = nrp.CSVRecorder("dummy_file.csv", ['header1'], erase_on_reset=True,
+                                   buffer_size=2)
+        for i in range(3):
+            recorder.record_entry(i)
+        recorder.reset('fakeTfManager')
+        recorder.record_entry(7)
+        self.assertEqual(self.read(recorder.cleanup()), 'header1,Simulation_reset\n7,RESET\n')
+
+    def test_compress(self):
+        mapping = nrp.MapCSVRecorder("name", "filename", ['header1'], compress=True)
+        recorder = mapping.create_adapter(None)
+        recorder.record_entry('a')
+        path = recorder.cleanup()
+        self.assertTrue(path.endswith('.csv.gz'))
+        self.assertEqual(self.read(path, gzip.open), 'header1,Simulation_reset\na\n')
+
+    def test_mutable_values_are_formatted_when_recorded(self):
+        recorder = nrp.CSVRecorder("dummy_file.csv", ['t', 'state'])
+        state = [0]
+        for t in range(3):
+            state[0] = t
+            recorder.record_entry(t, state)
+        self.assertEqual(self.read(recorder.cleanup()),
+                         't,state,Simulation_reset\n0,[0]\n1,[1]\n2,[2]\n')
+
+    def test_writer_is_stopped_at_exit(self):
+        from hbp_nrp_cle.tf_framework import _CSVRecorder
+        recorder = nrp.CSVRecorder("dummy_file.csv", ['header1'])
+        recorder.record_entry('a')
+        path = recorder.cleanup()
+        _CSVRecorder._stop_writer()
+        self.assertFalse(any(thread.name == "CSVRecorderWriter"
+                             for thread in threading.enumerate()))
+        self.assertEqual(self.read(path), 'header1,Simulation_reset\na\n')
+
+    def test_forked_process_writes_new_file(self):
+        recorder = nrp.CSVRecorder("dummy_file.csv", ['header1'], buffer_size=1)
+        recorder.record_entry('parent')
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            try:
+                os.close(read_fd)
+                nrp.reset_csv_recorders_after_fork()
+                recorder.record_entry('child')
+                os.write(write_fd, recorder.cleanup())
+            finally:
+                os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd, 'rb') as result:
+            child_path = result.read()
+        os.waitpid(pid, 0)
+        recorder.record_entry('parent again')
+        path = recorder.cleanup()
+        self.assertNotEqual(path, child_path)
+        self.assertEqual(self.read(child_path), 'header1,Simulation_reset\nchild\n')
+        self.assertEqual(self.read(path), 'header1,Simulation_reset\nparent\nparent again\n')
+
+    def test_discard(self):
+        recorder = nrp.CSVRecorder("dummy_file.csv", ['header1'])
+        recorder.record_entry('a')
+        with patch('hbp_nrp_cle.tf_framework._CSVRecorder.os.remove') as remove:
+            recorder.discard()
+        path = remove.call_args[0][0]
+        self.assertEqual(self.read(path), 'header1,Simulation_reset\na\n')
 
     def test_reset(self):
         recorder = nrp.CSVRecorder("dummy_file.csv", ['header1', 'header2\n'],erase_on_reset=True)
@@ -27,8 +27,10 @@ from hbp_nrp_cle.tests.tf_framework.husky import Husky
 
 from hbp_nrp_cle.mocks.robotsim import MockRobotCommunicationAdapter
 from hbp_nrp_cle.mocks.brainsim import MockBrainCommunicationAdapter
+from hbp_nrp_cle.tf_framework._NeuronMonitor import PublishingPolicy
 import unittest
-from mock import Mock
+import numpy as np
+from mock import Mock, patch
 
 __author__ = 'GeorgHinkel'
 
@@ -138,6 +140,87 @@ class NeuronMonitorTests(unittest.TestCase):
         my_monitor.unregister()
         self.assertIsNone(my_monitor.device)
 
+    def test_monitor_max_rate(self):
+
+        nrp.start_new_tf_manager()
+        self.init_adapters()
+
+        @nrp.NeuronMonitor(nrp.brain.foo, nrp.population_rate, max_rate=10)
+        def my_monitor(t):
+            return True
+
+        nrp.initialize("test")
+        for step in range(50):
+            my_monitor.run(step * 0.02)
+        self.assertEqual(len(my_monitor.publisher.sent), 10)
+
+    def test_monitor_without_subscribers(self):
+
+        nrp.start_new_tf_manager()
+        self.init_adapters()
+        body = Mock(return_value=True)
+
+        @nrp.NeuronMonitor(nrp.brain.foo, nrp.leaky_integrator_exp)
+        def my_monitor(t):
+            return body(t)
+
+        nrp.initialize("test")
+        my_monitor.publisher.num_connections = 0
+        my_monitor.run(0.02)
+        self.assertEqual(len(my_monitor.publisher.sent), 0)
+        self.assertFalse(body.called)
+
+        my_monitor.publisher.num_connections = 1
+        my_monitor.run(0.04)
+        self.assertEqual(len(my_monitor.publisher.sent), 1)
+
+    @patch('hbp_nrp_cle.tf_framework._NeuronMonitor.spike_event_type')
+    def test_spike_recorder_aggregation(self, event_type):
+
+        nrp.start_new_tf_manager()
+        self.init_adapters()
+
+        @nrp.NeuronMonitor(nrp.brain.foo, nrp.spike_recorder, max_rate=25)
+        def my_monitor(t):
+            return True
+
+        @nrp.NeuronMonitor(nrp.brain.foo, nrp.spike_recorder, max_rate=25, aggregate=False)
+        def my_sampler(t):
+            return True
+
+        nrp.initialize("test")
+        for monitor in (my_monitor, my_sampler):
+            monitor.device = Mock(neurons_count=42)
+            for step in range(4):
+                monitor.device.times = np.array([[step, step * 0.02]])
+                monitor.run(step * 0.02)
+
+        self.assertEqual(len(my_monitor.publisher.sent), 2)
+        self.assertEqual(len(my_sampler.publisher.sent), 2)
+        spikes = [args[2] for args, _ in event_type.call_args_list]
+        self.assertEqual([list(s.neurons) for s in spikes], [[0], [1, 2], [0], [2]])
+        self.assertEqual(list(spikes[1].times), [0.02, 0.04])
+
+    def test_monitor_backoff(self):
+
+        nrp.start_new_tf_manager()
+        self.init_adapters()
+
+        @nrp.NeuronMonitor(nrp.brain.foo, nrp.population_rate)
+        def my_monitor(t):
+            return True
+
+        nrp.initialize("test")
+        nrp.config.active_node.context.overloaded = True
+        try:
+            for step in range(20):
+                my_monitor.run(step * 0.02)
+        finally:
+            nrp.config.active_node.context.overloaded = False
+        # the interval doubles with every message: messages at steps 0, 1, 5 and 13
+        self.assertEqual(len(my_monitor.publisher.sent), 4)
+        self.assertEqual(my_monitor.policy.backoff, 16)
+
     def init_adapters(self):
         brain = MockBrainCommunicationAdapter()
         robot = MockRobotCommunicationAdapter()
@@ -147,5 +230,46 @@ class NeuronMonitorTests(unittest.TestCase):
         m.foo.size = 42
         nrp.config.brain_root = m
 
+
+class PublishingPolicyTests(unittest.TestCase):
+
+    def test_invalid_rate(self):
+        self.assertRaises(Exception, PublishingPolicy, 0)
+        self.assertRaises(Exception, PublishingPolicy, "fast")
+
+    def test_every_step(self):
+        policy = PublishingPolicy()
+        self.assertTrue(all(policy.due(step * 0.02) for step in range(100)))
+
+    def test_max_rate(self):
+        policy = PublishingPolicy(max_rate=20)
+        due = [policy.due(step * 0.01) for step in range(10)]
+        self.assertEqual(due, [True, False, False, False, False] * 2)
+
+    def test_backoff_recovers(self):
+        policy = PublishingPolicy()
+        t = 0.0
+        while policy.backoff < 4:
+            policy.due(t, overloaded=True)
+            t += 0.01
+        due = []
+        for _ in range(8):
+            due.append(policy.due(t))
+            t += 0.01
+        self.assertEqual(due, [False, False, False, True, False, True, True, True])
+        self.assertEqual(policy.backoff, 1)
+
+    def test_backoff_disabled(self):
+        policy = PublishingPolicy(backoff=False)
+        self.assertTrue(all(policy.due(step * 0.02, True) for step in range(10)))
+        self.assertEqual(policy.backoff, 1)
+
+    def test_reset_on_time_jump(self):
+        policy = PublishingPolicy(max_rate=1)
+        self.assertTrue(policy.due(5.0))
+        self.assertFalse(policy.due(5.5))
+        self.assertTrue(policy.due(0.0))
+
+
 if __name__ == "__main__":
     unittest.main()
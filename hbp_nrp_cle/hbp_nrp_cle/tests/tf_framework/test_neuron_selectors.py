@@ -28,8 +28,11 @@ Tests the neuron selectors
 __author__ = 'Georg Hinkel'
 
 import unittest
+import numpy
 from hbp_nrp_cle.tests.tf_framework.test_property_path import Dummy
 import hbp_nrp_cle.tf_framework as nrp
+from hbp_nrp_cle.brainsim.common import NeuronSelection
+from hbp_nrp_cle.brainsim.common.devices import DeviceGroup
 from hbp_nrp_cle.mocks.brainsim import MockBrainCommunicationAdapter
 
 
@@ -84,5 +87,75 @@ class NeuronSelectorTests(unittest.TestCase):
         self.assertEqual(8, result[0])
         self.assertEqual(15, result[1])
 
+    def test_vectorized_mapping(self):
+        root = nrp.brain
+        mapping = nrp.map_neurons(nrp.nrange(0, 2), lambda i: root.item[2 * i + 1])
+        calls = []
+        self.bca.create_view = lambda p, sl: calls.append(sl) or p[sl]
+
+        result = mapping.select(self.dummy, self.bca)
+        self.assertIsInstance(result, NeuronSelection)
+        self.assertEqual(calls, [])
+        self.assertEqual([8, 23], list(result))
+        ((population, indices),) = result.parts
+        self.assertIs(self.dummy.item, population)
+        self.assertEqual([1, 3], indices.tolist())
+
+    def test_vectorized_mapping_with_constant_index(self):
+        mapping = nrp.map_neurons(range(3), lambda i: nrp.brain.item[4])
+
+        self.assertEqual([42, 42, 42], list(mapping.select(self.dummy, self.bca)))
+
+    def test_mapping_without_index_arithmetic(self):
+        root = nrp.brain
+        mappings = [
+            lambda i: root.item[i] if i > 0 else root.item[4],
+            lambda i: root.item[i:i + 1],
+            lambda i: root.item[float(i)],
+            lambda i: nrp.resolve(lambda r: r.item[i:])[0],
+            lambda i: getattr(root, 'item' + str(i))[0]
+        ]
+        self.dummy.item0 = [1]
+        self.dummy.item1 = [2]
+        expected = [[42, 8], [0, 8], None, [0, 8], [1, 2]]
+        for mapping, values in zip(mappings, expected):
+            selector = nrp.map_neurons(range(2), mapping)
+            if values is None:
+                self.assertRaises(TypeError, selector.select, self.dummy, self.bca)
+            else:
+                self.assertEqual(values, list(selector.select(self.dummy, self.bca)))
+
+    def test_mapping_on_non_populations(self):
+        self.bca.is_population = lambda p: False
+        mapping = nrp.map_neurons(range(1, 3), lambda i: nrp.brain.item[i])
+
+        result = mapping.select(self.dummy, self.bca)
+        self.assertEqual([8, 15], result)
+
+    def test_division_by_zero(self):
+        mapping = nrp.map_neurons(range(2), lambda i: nrp.brain.item[1 // i])
+
+        self.assertRaises(ZeroDivisionError, mapping.select, self.dummy, self.bca)
+
+    def test_chain_of_selections(self):
+        root = nrp.brain
+        chain = nrp.chain_neurons(nrp.map_neurons(range(0, 2), lambda i: root.item[i]),
+                                  root.item[4])
+
+        result = chain.select(self.dummy, self.bca)
+        self.assertIsInstance(result, NeuronSelection)
+        self.assertEqual([0, 8, 42], list(result))
+        self.assertEqual(1, len(result.parts))
+        self.assertEqual([0, 1, 4], result.parts[0][1].tolist())
+
+    def test_device_group_for_selection(self):
+        population = numpy.arange(10)
+        selection = NeuronSelection([(population, [3, 5])], self.bca)
+
+        device = self.bca.register_spike_sink(selection, nrp.population_rate)
+        self.assertIsInstance(device, DeviceGroup)
+        self.assertEqual(2, len(device))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,187 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+import unittest
+
+import numpy as np
+from mock import Mock, patch
+
+import hbp_nrp_cle.tf_framework as nrp
+from hbp_nrp_cle.tf_framework import config, TFException
+from hbp_nrp_cle.tf_framework import _ProcessOffload
+from hbp_nrp_cle.robotsim.RobotInterface import Topic
+from hbp_nrp_cle.mocks.robotsim._MockRobotCommunicationAdapter import \
+    MockRobotCommunicationAdapter
+from hbp_nrp_cle.mocks.brainsim._MockBrainCommunicationAdapter import \
+    MockBrainCommunicationAdapter
+from hbp_nrp_cle.tests.tf_framework.MockBrain import MockPopulation
+
+__author__ = ''
+
+MockOs = Mock()
+MockOs.environ = {'NRP_SIMULATION_DIR': '/somewhere/near/the/rainbow'}
+
+
+class Image(object):
+    """
+    A message type resembling sensor_msgs/Image
+    """
+    __slots__ = ['height', 'width', 'data']
+    _type = 'sensor_msgs/Image'
+
+    def __init__(self, height=0, width=0, data=''):
+        self.height = height
+        self.width = width
+        self.data = data
+
+
+class TestSharedMemory(unittest.TestCase):
+
+    def setUp(self):
+        self.segment = _ProcessOffload.SharedMemorySegment()
+
+    def tearDown(self):
+        self.segment.close()
+
+    def test_share_array(self):
+        image = np.arange(240 * 320 * 3, dtype=np.uint8).reshape((240, 320, 3))
+        small = np.arange(10)
+        shared = _ProcessOffload.share([image, small, 42], self.segment)
+        self.assertIsInstance(shared[0], _ProcessOffload._SharedArray)
+        self.assertIs(shared[1], small)
+        self.assertEqual(shared[2], 42)
+
+        restored = _ProcessOffload.restore(shared)
+        self.assertTrue(np.array_equal(restored[0], image))
+        self.assertFalse(restored[0].flags.writeable)
+
+    def test_share_message(self):
+        data = 'x' * (2 * _ProcessOffload.SHARED_MEMORY_THRESHOLD)
+        shared = _ProcessOffload.share(Image(2, 3, data), self.segment)
+        self.assertIsInstance(shared, _ProcessOffload._SharedMessage)
+        self.assertEqual(shared.fields, {'height': 2, 'width': 3})
+
+        restored = _ProcessOffload.restore(shared)
+        self.assertEqual((restored.height, restored.width), (2, 3))
+        self.assertEqual(restored.data, data)
+
+        small = Image(1, 1, 'abc')
+        self.assertIs(_ProcessOffload.share(small, self.segment), small)
+
+    def test_segment_grows(self):
+        first = self.segment.write('a' * 100)
+        second = self.segment.write(np.ones(mmap_size(), dtype=np.uint8))
+        self.assertEqual(first, (0, 100))
+        self.assertEqual(second[0] % 64, 0)
+        self.assertGreaterEqual(self.segment.size, second[0] + second[1])
+        self.segment.clear()
+        self.assertEqual(self.segment.write('b'), (0, 1))
+
+
+def mmap_size():
+    return 3 * _ProcessOffload.mmap.PAGESIZE
+
+
+@patch("hbp_nrp_cle.common.os", new=MockOs)
+class TestProcessOffload(unittest.TestCase):
+
+    def setUp(self):
+        nrp.start_new_tf_manager()
+        self.brain = MockBrainCommunicationAdapter()
+        self.robot = MockRobotCommunicationAdapter()
+        nrp.set_nest_adapter(self.brain)
+        nrp.set_robot_adapter(self.robot)
+        self.brain.__dict__["actors"] = MockPopulation(range(0, 60))
+        config.brain_root = self.brain
+        self.tfm = config.active_node
+        self.tfm.offload_processes = 1
+
+    def tearDown(self):
+        self.tfm.shutdown()
+
+    def test_offload_processes(self):
+        for invalid in [0, -1, 2.0]:
+            with self.assertRaises(ValueError):
+                self.tfm.offload_processes = invalid
+        self.tfm.offload_processes = None
+        self.assertIsNone(self.tfm.offload_processes)
+
+    def test_closure_rejected(self):
+        offset = 1
+
+        with self.assertRaises(Exception):
+            @nrp.Robot2Neuron(offload=True)
+            def closure(t):
+                return t + offset
+
+    def test_run_offloaded(self):
+        @nrp.MapRobotSubscriber("camera", Topic("/camera", Image))
+        @nrp.MapSpikeSource("device", nrp.brain.actors[0], nrp.poisson)
+        @nrp.MapVariable("frames", initial_value=[])
+        @nrp.MapRobotPublisher("publisher", Topic("/count", int))
+        @nrp.Robot2Neuron(offload=True)
+        def detect(t, camera, device, frames, publisher):
+            import os
+            frames.value.append(len(camera.value.data))
+            device.rate = float(ord(camera.value.data[-1]))
+            publisher.send_message(os.getpid())
+            return os.getpid()
+
+        nrp.initialize("test")
+        self.assertTrue(detect.offload)
+
+        data = 'a' * (_ProcessOffload.SHARED_MEMORY_THRESHOLD - 1) + 'b'
+        detect.camera.value = Image(1, len(data), data)
+        pid = detect.run(0.5)
+
+        self.assertTrue(self.tfm.offload_pool.started)
+        self.assertNotEqual(pid, _ProcessOffload.os.getpid())
+        self.assertEqual(detect.frames.value, [len(data)])
+        self.assertEqual(detect.device.rate, float(ord('b')))
+        self.assertEqual(detect.publisher.sent, [pid])
+
+    def test_offloaded_error(self):
+        @nrp.Robot2Neuron(offload=True)
+        def failing(t):
+            raise ValueError("broken")
+
+        nrp.initialize("test")
+        with self.assertRaises(TFException) as cm:
+            failing.run(0.5)
+        self.assertIn("broken", str(cm.exception))
+
+    def test_neuron2robot_offloaded(self):
+        @nrp.MapSpikeSink("device", nrp.brain.actors[0], nrp.leaky_integrator_alpha)
+        @nrp.Neuron2Robot(Topic("/cmd", float), offload=True)
+        def report(t, device):
+            return device.voltage * 2
+
+        nrp.initialize("test")
+        report.device.updates = [(0.0, 0.25)]
+        report.device.refresh(0.0)
+        report.run(0.5)
+        self.assertEqual(report.topic.sent, [0.5])
+
+
+if __name__ == "__main__":
+    unittest.main()
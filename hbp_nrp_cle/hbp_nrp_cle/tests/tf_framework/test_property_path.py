@@ -28,6 +28,8 @@ Tests for the PropertyPath module
 __author__ = 'Georg Hinkel'
 
 import unittest
+from copy import deepcopy
+import hbp_nrp_cle.common
 import hbp_nrp_cle.tf_framework as nrp
 from hbp_nrp_cle.mocks.brainsim import MockBrainCommunicationAdapter
 
@@ -280,6 +282,56 @@ class PropertyPathTests(unittest.TestCase):
         self.assertRaises(Exception, nrp.resolve, 0)
         self.assertRaises(Exception, nrp.resolve, lambda a,b,c: None)
 
+    def test_selection_is_memoized(self):
+        calls = []
+        path = nrp.resolve(lambda root: calls.append(root) or root.item)[1]
+
+        self.assertEqual(8, path.select(self.dummy, self.bca))
+        self.assertEqual(8, path.select(self.dummy, self.bca))
+        self.assertEqual(1, len(calls))
+
+        other = Dummy([1, 2, 3])
+        self.assertEqual(2, path.select(other, self.bca))
+        self.assertEqual(2, len(calls))
+
+        other.item = [4, 5, 6]
+        self.assertEqual(2, path.select(other, self.bca))
+        hbp_nrp_cle.common.brain_changed()
+        self.assertEqual(5, path.select(other, self.bca))
+        self.assertEqual(3, len(calls))
+
+    def test_attribute_chain_is_compiled_once(self):
+        path = nrp.brain.item[2]
+        selector = path._compiled()
+        self.assertIs(selector, path._compiled())
+        self.assertEqual(15, selector(self.dummy, self.bca))
+        self.assertIsNone(selector(Dummy(None), self.bca))
+
+        parent = nrp.brain.item
+        parent.name = "other"
+        self.dummy.other = [3]
+        self.assertEqual(3, parent[0].select(self.dummy, self.bca))
+
+    def test_overridden_select_is_used(self):
+
+        class Selector(nrp.PropertyPath):
+            def select(self, root, bca):
+                return root.item
+
+        path = Selector()[0] + 1
+        self.assertEqual(1, path.select(self.dummy, self.bca))
+
+    def test_caches_do_not_affect_equivalence(self):
+        path = nrp.brain.item[1]
+        other = nrp.brain.item[1]
+        path.select(self.dummy, self.bca)
+
+        self.assertTrue(path.equivalent_to(other))
+        self.assertTrue(other.equivalent_to(path))
+        copy = deepcopy(path)
+        self.assertTrue(copy.equivalent_to(other))
+        self.assertNotIn('_PropertyPath__memo', vars(copy))
+
 
 if __name__ == "__main__":
     unittest.main()
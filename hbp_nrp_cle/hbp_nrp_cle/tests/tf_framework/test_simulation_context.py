@@ -0,0 +1,164 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+import hbp_nrp_cle as cle
+import hbp_nrp_cle.tf_framework as nrp
+from hbp_nrp_cle import context as sim_context
+from hbp_nrp_cle.context import SimulationContext
+from hbp_nrp_cle.tf_framework import config
+from hbp_nrp_cle.cle.DeterministicClosedLoopEngine import DeterministicClosedLoopEngine
+from hbp_nrp_cle.mocks.robotsim import MockRobotControlAdapter, MockRobotCommunicationAdapter
+from hbp_nrp_cle.mocks.brainsim import MockBrainControlAdapter, MockBrainCommunicationAdapter
+from hbp_nrp_cle.mocks.tf_framework import MockTransferFunctionManager
+from hbp_nrp_cle.tests.tf_framework.MockBrain import MockPopulation
+
+import threading
+import unittest
+from mock import Mock, patch
+
+__author__ = ''
+
+MockOs = Mock()
+MockOs.environ = {'NRP_SIMULATION_DIR': '/somewhere/near/the/rainbow'}
+
+
+class FooBrain(object):
+    def __init__(self):
+        self.foo = MockPopulation(range(10))
+
+
+@patch("hbp_nrp_cle.common.os", new=MockOs)
+class TestSimulationContext(unittest.TestCase):
+
+    def setUp(self):
+        nrp.start_new_tf_manager()
+
+    def test_default_context_uses_module_variables(self):
+        context = sim_context.current()
+        self.assertIs(context, sim_context.default_context)
+
+        config.brain_root = "legacy brain"
+        self.assertEqual(context.brain_root, "legacy brain")
+        context.brain_source = "some source"
+        self.assertEqual(config.brain_source, "some source")
+        self.assertEqual(nrp.get_brain_source(), "some source")
+        self.assertIs(context.active_node, config.active_node)
+
+        cle.clock = 4.2
+        self.assertEqual(context.clock, 4.2)
+        context.clock = 0.0
+        self.assertEqual(cle.clock, 0.0)
+
+    def test_activate_restores_previous_context(self):
+        context = SimulationContext()
+        with context.activate():
+            self.assertIs(sim_context.current(), context)
+            with sim_context.activate(SimulationContext()):
+                self.assertIsNot(sim_context.current(), context)
+            self.assertIs(sim_context.current(), context)
+        self.assertIs(sim_context.current(), sim_context.default_context)
+
+    def test_transfer_functions_are_isolated(self):
+        context = SimulationContext()
+        default_tfm = config.active_node
+
+        with context.activate():
+            tfm = nrp.start_new_tf_manager()
+            self.assertIs(tfm.context, context)
+            self.assertIs(context.active_node, tfm)
+
+            @nrp.MapSpikeSink("neuron", nrp.brain.foo[0], nrp.population_rate)
+            @nrp.Neuron2Robot()
+            def isolated(t, neuron):
+                return neuron.rate
+
+            self.assertEqual(nrp.get_transfer_functions(), [isolated])
+
+        self.assertIs(config.active_node, default_tfm)
+        self.assertNotIn(isolated, nrp.get_transfer_functions())
+        self.assertIsNone(nrp.get_transfer_function("isolated"))
+
+        context.brain_root = FooBrain()
+        config.brain_root = None
+        tfm.brain_adapter = MockBrainCommunicationAdapter()
+        tfm.robot_adapter = MockRobotCommunicationAdapter()
+        tfm.initialize("isolated")
+        self.assertEqual(len(tfm.brain_adapter.detector_devices), 1)
+
+    def test_transfer_functions_run_in_their_context_on_other_threads(self):
+        context = SimulationContext()
+        seen = []
+
+        with context.activate():
+            tfm = nrp.start_new_tf_manager()
+
+            @nrp.Robot2Neuron()
+            def remember_context(t):
+                seen.append(sim_context.current())
+
+            tfm.brain_adapter = MockBrainCommunicationAdapter()
+            tfm.robot_adapter = MockRobotCommunicationAdapter()
+            tfm.initialize("threaded")
+
+        worker = threading.Thread(target=remember_context.run, args=(0.0,))
+        worker.start()
+        worker.join()
+
+        self.assertEqual(seen, [context])
+        self.assertIs(sim_context.current(), sim_context.default_context)
+
+    def test_csv_recorders_are_isolated(self):
+        context = SimulationContext()
+        config.csv_recorders = ["legacy"]
+        with context.activate():
+            nrp.start_new_tf_manager()
+            context.csv_recorders.append("isolated")
+        self.assertEqual(config.csv_recorders, ["legacy"])
+        self.assertEqual(sim_context.default_context.csv_recorders, ["legacy"])
+        self.assertEqual(context.csv_recorders, ["isolated"])
+
+    def test_engines_have_separate_clocks(self):
+        engines = []
+        for _ in range(2):
+            engine = DeterministicClosedLoopEngine(MockRobotControlAdapter(),
+                                                   MockRobotCommunicationAdapter(),
+                                                   MockBrainControlAdapter(),
+                                                   MockBrainCommunicationAdapter(),
+                                                   MockTransferFunctionManager(),
+                                                   0.01, SimulationContext())
+            engine.tfm.sleep_time = 0
+            engine.initialize()
+            engines.append(engine)
+
+        cle.clock = 0.0
+        engines[0].run_step(0.01)
+        engines[0].run_step(0.01)
+        engines[1].run_step(0.01)
+
+        self.assertAlmostEqual(engines[0].simulation_time, 0.02)
+        self.assertAlmostEqual(engines[1].simulation_time, 0.01)
+        self.assertEqual(cle.clock, 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+import struct
+import unittest
+from cStringIO import StringIO
+
+import numpy as np
+from mock import Mock, patch
+
+from hbp_nrp_cle.tf_framework import _SpikeEncoding
+from hbp_nrp_cle.tf_framework._SpikeEncoding import SpikeArray, encode_spikes, \
+    spike_offsets, create_event_type
+
+__author__ = ''
+
+
+class FakeSpikeData(object):
+    """
+    Mimics a message generated by genpy
+    """
+    __slots__ = ['neuron', 'time']
+    _slot_types = ['int64', 'float64']
+
+    def __init__(self, neuron, time):
+        self.neuron = neuron
+        self.time = time
+
+
+class FakeSpikeEvent(object):
+    """
+    Mimics a message generated by genpy
+    """
+    __slots__ = ['simulationTime', 'neuronCount', 'spikes', 'monitorName', 'populationName']
+    _slot_types = ['float64', 'int64', 'cle_ros_msgs/SpikeData[]', 'string', 'string']
+
+    def __init__(self, *args):
+        for name, value in zip(FakeSpikeEvent.__slots__, args):
+            setattr(self, name, value)
+
+    def serialize(self, buff):
+        buff.write(struct.pack('<dq', self.simulationTime, self.neuronCount))
+        buff.write(struct.pack('<I', len(self.spikes)))
+        for spike in self.spikes:
+            buff.write(struct.pack('<qd', spike.neuron, spike.time))
+        for name in FakeSpikeEvent.__slots__[3:]:
+            value = getattr(self, name)
+            if isinstance(value, unicode):
+                value = value.encode('utf-8')
+            buff.write(struct.pack('<I', len(value)))
+            buff.write(value)
+
+
+class TestSpikeEncoding(unittest.TestCase):
+
+    def test_encode_array(self):
+        spikes = encode_spikes(np.array([[3.0, 0.1], [7.0, 0.2]]))
+        self.assertEqual(len(spikes), 2)
+        np.testing.assert_array_equal(spikes.neurons, [3, 7])
+        np.testing.assert_array_equal(spikes.times, [0.1, 0.2])
+        self.assertEqual(spikes.neurons.dtype, np.int64)
+
+    def test_encode_empty(self):
+        self.assertEqual(len(encode_spikes(np.array([[], []]).T)), 0)
+        self.assertEqual(len(encode_spikes([])), 0)
+        self.assertEqual(len(encode_spikes([np.array([[], []]).T], np.array([0]))), 0)
+
+    def test_encode_populations(self):
+        populations = [Mock(size=10), Mock(size=5), Mock(size=20)]
+        offsets = spike_offsets(populations)
+        np.testing.assert_array_equal(offsets, [0, 10, 15])
+
+        spikes = encode_spikes([np.array([[1.0, 0.1], [2.0, 0.3]]),
+                                np.array([[], []]).T,
+                                [[4.0, 0.2]]], offsets)
+        np.testing.assert_array_equal(spikes.neurons, [1, 2, 19])
+        np.testing.assert_array_equal(spikes.times, [0.1, 0.3, 0.2])
+
+    def test_spike_array_items(self):
+        spikes = SpikeArray(np.array([4, 2]), np.array([0.5, 0.25]))
+        with patch.object(_SpikeEncoding, 'SpikeData', FakeSpikeData):
+            self.assertEqual([(s.neuron, s.time) for s in spikes], [(4, 0.5), (2, 0.25)])
+            self.assertEqual(spikes[1].neuron, 2)
+            self.assertIsInstance(spikes[1].neuron, int)
+
+    def test_serialize(self):
+        event_type = create_event_type(FakeSpikeEvent, FakeSpikeData)
+        self.assertTrue(issubclass(event_type, FakeSpikeEvent))
+
+        neurons = np.arange(1000) % 37
+        times = np.linspace(0.0, 1.0, 1000)
+        fast = event_type(0.5, 42, SpikeArray(neurons, times), u'm\xf6nitor', 'population')
+        generic = FakeSpikeEvent(0.5, 42, [FakeSpikeData(n, t) for n, t in zip(neurons, times)],
+                                 u'm\xf6nitor', 'population')
+        fast_buff = StringIO()
+        fast.serialize(fast_buff)
+        generic_buff = StringIO()
+        generic.serialize(generic_buff)
+        self.assertEqual(fast_buff.getvalue(), generic_buff.getvalue())
+        self.assertIsInstance(fast.spikes, SpikeArray)
+
+        generic_buff = StringIO()
+        event_type(0.5, 42, [], 'm', 'p').serialize(generic_buff)
+        self.assertEqual(len(generic_buff.getvalue()), 8 + 8 + 4 + 5 + 5)
+
+    def test_unsupported_layout(self):
+        class NestedData(FakeSpikeData):
+            _slot_types = ['int64', 'geometry_msgs/Point']
+
+        class NestedEvent(FakeSpikeEvent):
+            _slot_types = ['std_msgs/Header', 'int64', 'cle_ros_msgs/SpikeData[]', 'string',
+                           'string']
+
+        self.assertIs(create_event_type(FakeSpikeEvent, NestedData), FakeSpikeEvent)
+        self.assertIs(create_event_type(NestedEvent, FakeSpikeData), NestedEvent)
+        event_mock = Mock()
+        self.assertIs(create_event_type(event_mock, FakeSpikeData), event_mock)
+
+
+if __name__ == "__main__":
+    unittest.main()
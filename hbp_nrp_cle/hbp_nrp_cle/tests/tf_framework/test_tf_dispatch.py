@@ -0,0 +1,104 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+import unittest
+
+from mock import Mock, patch
+
+import hbp_nrp_cle.common
+import hbp_nrp_cle.tf_framework as nrp
+from hbp_nrp_cle.tf_framework import config
+from hbp_nrp_cle.mocks.robotsim._MockRobotCommunicationAdapter import \
+    MockRobotCommunicationAdapter
+from hbp_nrp_cle.mocks.brainsim._MockBrainCommunicationAdapter import \
+    MockBrainCommunicationAdapter
+from hbp_nrp_cle.tests.tf_framework.MockBrain import MockPopulation
+
+__author__ = ''
+
+
+class TestTransferFunctionDispatch(unittest.TestCase):
+
+    def setUp(self):
+        self.os = Mock()
+        self.os.environ = {'NRP_SIMULATION_DIR': '/somewhere/near/the/rainbow'}
+        self.os.path.join.return_value = '/somewhere/near/the/rainbow/resources'
+        self.os.path.exists.return_value = False
+        patcher = patch("hbp_nrp_cle.common.os", new=self.os)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        hbp_nrp_cle.common.invalidate_resources()
+
+        nrp.start_new_tf_manager()
+        self.brain = MockBrainCommunicationAdapter()
+        self.robot = MockRobotCommunicationAdapter()
+        nrp.set_nest_adapter(self.brain)
+        nrp.set_robot_adapter(self.robot)
+        self.brain.__dict__["actors"] = MockPopulation(range(0, 60))
+        config.brain_root = self.brain
+        self.tfm = config.active_node
+
+    def tearDown(self):
+        self.tfm.shutdown()
+
+    def test_resources_looked_up_once(self):
+        @nrp.MapSpikeSource("device", nrp.brain.actors[0], nrp.poisson)
+        @nrp.Robot2Neuron()
+        def write_rate(t, device):
+            device.rate = t
+
+        nrp.initialize("test")
+        for step in range(5):
+            self.tfm.run_robot_to_neuron(step * 0.02)
+
+        self.assertEqual(self.os.path.exists.call_count, 1)
+        self.assertAlmostEqual(write_rate.device.rate, 0.08)
+        self.assertEqual(write_rate.params[0], 0.08)
+
+        hbp_nrp_cle.common.invalidate_resources()
+        self.tfm.run_robot_to_neuron(0.1)
+        self.assertEqual(self.os.path.exists.call_count, 2)
+
+    def test_set_transfer_function_invalidates_resources(self):
+        nrp.initialize("test")
+        hbp_nrp_cle.common.refresh_resources()
+        self.assertEqual(self.os.path.exists.call_count, 1)
+
+        source = "@nrp.Robot2Neuron()\ndef reloaded(t):\n    return t\n"
+        nrp.set_transfer_function(source, compile(source, "<string>", "exec"), "reloaded")
+        self.assertEqual(nrp.get_transfer_function("reloaded").run(0.5), 0.5)
+        self.assertEqual(self.os.path.exists.call_count, 2)
+
+    def test_resources_added_to_path(self):
+        self.os.path.exists.return_value = True
+        self.os.listdir.return_value = ['module.py']
+        with patch("hbp_nrp_cle.common.sys") as sys_mock:
+            sys_mock.path = []
+            hbp_nrp_cle.common.refresh_resources()
+            hbp_nrp_cle.common.refresh_resources()
+            self.assertEqual(sys_mock.path, ['/somewhere/near/the/rainbow/resources'])
+        self.assertEqual(self.os.listdir.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
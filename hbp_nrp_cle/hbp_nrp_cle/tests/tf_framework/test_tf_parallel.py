@@ -0,0 +1,203 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+import threading
+import time
+import unittest
+
+from mock import Mock, patch
+
+import hbp_nrp_cle.tf_framework as nrp
+from hbp_nrp_cle.tf_framework import config
+from hbp_nrp_cle.tf_framework import _ConflictGraph
+from hbp_nrp_cle.robotsim.RobotInterface import Topic
+from hbp_nrp_cle.mocks.robotsim._MockRobotCommunicationAdapter import \
+    MockRobotCommunicationAdapter
+from hbp_nrp_cle.mocks.brainsim._MockBrainCommunicationAdapter import \
+    MockBrainCommunicationAdapter
+from hbp_nrp_cle.tests.tf_framework.MockBrain import MockPopulation
+
+__author__ = ''
+
+MockOs = Mock()
+MockOs.environ = {'NRP_SIMULATION_DIR': '/somewhere/near/the/rainbow'}
+
+
+@patch("hbp_nrp_cle.common.os", new=MockOs)
+class TestParallelTransferFunctions(unittest.TestCase):
+
+    def setUp(self):
+        nrp.start_new_tf_manager()
+        self.brain = MockBrainCommunicationAdapter()
+        self.robot = MockRobotCommunicationAdapter()
+        nrp.set_nest_adapter(self.brain)
+        nrp.set_robot_adapter(self.robot)
+        self.brain.__dict__["actors"] = MockPopulation(range(0, 60))
+        config.brain_root = self.brain
+        self.tfm = config.active_node
+
+    def tearDown(self):
+        self.tfm.shutdown()
+
+    def test_max_parallel_tfs(self):
+        self.assertEqual(self.tfm.max_parallel_tfs, 1)
+        for invalid in [0, -1, 2.0, None]:
+            with self.assertRaises(ValueError):
+                self.tfm.max_parallel_tfs = invalid
+        self.tfm.max_parallel_tfs = 4
+        self.assertEqual(self.tfm.max_parallel_tfs, 4)
+
+    def test_schedule(self):
+        @nrp.MapSpikeSource("device", nrp.brain.actors[0], nrp.poisson)
+        @nrp.MapVariable("local", initial_value=0)
+        @nrp.Robot2Neuron()
+        def first(t, device, local):
+            pass
+
+        @nrp.MapSpikeSource("device", nrp.brain.actors[1], nrp.poisson)
+        @nrp.MapVariable("local", initial_value=0)
+        @nrp.MapVariable("shared", initial_value=0, scope=nrp.GLOBAL)
+        @nrp.Robot2Neuron()
+        def second(t, device, local, shared):
+            pass
+
+        @nrp.MapRobotPublisher("publisher", Topic("/cmd", float))
+        @nrp.MapVariable("shared", initial_value=0, scope=nrp.GLOBAL)
+        @nrp.Robot2Neuron()
+        def third(t, publisher, shared):
+            pass
+
+        @nrp.MapRobotSubscriber("subscriber", Topic("/sensor", float))
+        @nrp.Neuron2Robot(Topic("/cmd", float))
+        def fourth(t, subscriber):
+            pass
+
+        @nrp.MapRobotSubscriber("subscriber", Topic("/sensor", float))
+        @nrp.Neuron2Robot(Topic("/other", float))
+        def fifth(t, subscriber):
+            pass
+
+        nrp.initialize("test")
+
+        self.assertEqual(_ConflictGraph.get_resources(first), set([('brain', None)]))
+        self.assertIn(('global', 'shared'), _ConflictGraph.get_resources(second))
+        self.assertIn(('topic', '/cmd'), _ConflictGraph.get_resources(third))
+        self.assertEqual(_ConflictGraph.get_resources(fourth), set([('topic', '/cmd')]))
+
+        levels = _ConflictGraph.schedule([first, second, third, fourth, fifth])
+        self.assertEqual(levels, [[first, fifth], [second], [third], [fourth]])
+
+    def test_concurrent_execution(self):
+        started = [threading.Event(), threading.Event()]
+        seen = []
+
+        @nrp.MapVariable("local", initial_value=0)
+        @nrp.Robot2Neuron()
+        def first(t, local):
+            started[0].set()
+            seen.append(("first", started[1].wait(5)))
+
+        @nrp.MapVariable("local", initial_value=0)
+        @nrp.Robot2Neuron()
+        def second(t, local):
+            started[1].set()
+            seen.append(("second", started[0].wait(5)))
+
+        nrp.initialize("test")
+        self.tfm.max_parallel_tfs = 2
+        self.tfm.run_robot_to_neuron(1.0)
+
+        self.assertEqual(sorted(seen), [("first", True), ("second", True)])
+        self.assertGreater(first.elapsed_time, 0.0)
+        self.assertGreater(second.elapsed_time, 0.0)
+
+    def test_brain_devices_are_not_accessed_concurrently(self):
+        running = []
+        overlaps = []
+
+        for i in range(4):
+            @nrp.MapSpikeSource("device", nrp.brain.actors[i], nrp.poisson)
+            @nrp.Robot2Neuron()
+            def access(t, device):
+                running.append(device)
+                overlaps.append(len(running))
+                time.sleep(0.01)
+                running.remove(device)
+
+            access._func.__name__ = "access_{0}".format(i)
+
+        nrp.initialize("test")
+        self.tfm.max_parallel_tfs = 4
+        self.tfm.run_robot_to_neuron(1.0)
+        self.assertEqual(overlaps, [1, 1, 1, 1])
+
+    def test_conflicting_order(self):
+        order = []
+
+        for i in range(6):
+            @nrp.MapVariable("shared", initial_value=0, scope=nrp.GLOBAL)
+            @nrp.Robot2Neuron()
+            def append(t, shared):
+                shared.value += 1
+                order.append(shared.value)
+
+            append._func.__name__ = "append_{0}".format(i)
+
+        nrp.initialize("test")
+        self.tfm.max_parallel_tfs = 4
+        self.tfm.run_robot_to_neuron(1.0)
+        self.assertEqual(order, [1, 2, 3, 4, 5, 6])
+
+    def test_failing_tfs(self):
+        for max_parallel in [1, 3]:
+            nrp.start_new_tf_manager()
+            nrp.set_nest_adapter(MockBrainCommunicationAdapter())
+            nrp.set_robot_adapter(MockRobotCommunicationAdapter())
+            ran = []
+
+            @nrp.Robot2Neuron()
+            def failing_1(t):
+                raise Exception("fail")
+
+            @nrp.Robot2Neuron()
+            def running(t):
+                ran.append(t)
+
+            @nrp.Robot2Neuron()
+            def failing_2(t):
+                raise Exception("fail")
+
+            tfm = config.active_node
+            nrp.initialize("test")
+            tfm.max_parallel_tfs = max_parallel
+            with patch("hbp_nrp_cle.tf_framework._TransferFunction.TransferFunction.excepthook"):
+                tfm.run_robot_to_neuron(1.0)
+
+            self.assertEqual(ran, [1.0])
+            self.assertEqual([tf.name for tf in tfm.flawed], ["failing_1", "failing_2"])
+            self.assertEqual(tfm.r2n, [running])
+            tfm.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+import unittest
+
+from mock import Mock, patch
+
+import hbp_nrp_cle.tf_framework as nrp
+from hbp_nrp_cle.tf_framework import config, TFLoadingException
+from hbp_nrp_cle.tf_framework._PropertyPath import equivalent
+from hbp_nrp_cle.robotsim.RobotInterface import Topic, PreprocessedTopic
+from hbp_nrp_cle.mocks.robotsim._MockRobotCommunicationAdapter import \
+    MockRobotCommunicationAdapter
+from hbp_nrp_cle.mocks.brainsim._MockBrainCommunicationAdapter import \
+    MockBrainCommunicationAdapter
+from hbp_nrp_cle.tests.tf_framework.MockBrain import MockPopulation
+
+__author__ = ''
+
+SOURCE = """
+@nrp.MapRobotSubscriber("camera", Topic('/husky/camera', list))
+@nrp.MapSpikeSource("device", nrp.brain.actors[{0}], nrp.poisson)
+@nrp.Robot2Neuron()
+def transform_camera(t, camera, device):
+    device.rate = {1}
+"""
+
+TRIGGERED_SOURCE = """
+@nrp.MapRobotSubscriber("camera", Topic('/husky/camera', list))
+@nrp.MapVariable("runs", initial_value=[])
+@nrp.Robot2Neuron(triggers="camera")
+def on_image(t, camera, runs):
+    runs.value.append({0})
+"""
+
+N2R_SOURCE = """
+@nrp.MapSpikeSink("neuron", nrp.brain.actors[2], nrp.leaky_integrator_alpha)
+@nrp.Neuron2Robot(Topic('/husky/cmd_vel', list))
+def linear_twist(t, neuron):
+    return [{0}]
+"""
+
+
+class TestTransferFunctionReload(unittest.TestCase):
+
+    def setUp(self):
+        os_mock = Mock()
+        os_mock.environ = {'NRP_SIMULATION_DIR': '/somewhere/near/the/rainbow'}
+        os_mock.path.exists.return_value = False
+        patcher = patch("hbp_nrp_cle.common.os", new=os_mock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        nrp.start_new_tf_manager()
+        self.brain = MockBrainCommunicationAdapter()
+        self.robot = MockRobotCommunicationAdapter()
+        nrp.set_nest_adapter(self.brain)
+        nrp.set_robot_adapter(self.robot)
+        self.brain.__dict__["actors"] = MockPopulation(range(0, 60))
+        config.brain_root = self.brain
+        self.tfm = config.active_node
+        nrp.initialize("test")
+
+    def tearDown(self):
+        self.tfm.shutdown()
+
+    @staticmethod
+    def load(source, name, *args):
+        source = source.format(*args)
+        nrp.set_transfer_function(source, compile(source, "<string>", "exec"), name)
+        return nrp.get_transfer_function(name)
+
+    def test_unchanged_mappings_are_reused(self):
+        old = self.load(SOURCE, "transform_camera", 0, 1.0)
+        device = old.device
+        camera = old.camera
+
+        new = self.load(SOURCE, "transform_camera", 0, 2.0)
+        self.assertIsNot(new, old)
+        self.assertIs(new.device, device)
+        self.assertIs(new.camera, camera)
+        self.assertIs(new.device.spec, new.params[2].spec)
+        self.assertEqual(self.brain.generator_devices, [device])
+        self.assertEqual(self.robot.subscribed_topics, [camera])
+        self.assertEqual(self.tfm.r2n, [new])
+        self.assertFalse(old.active)
+        self.assertTrue(new.active)
+
+        self.tfm.run_robot_to_neuron(0.1)
+        self.assertEqual(device.rate, 2.0)
+
+    def test_changed_mappings_are_recreated(self):
+        old = self.load(SOURCE, "transform_camera", 0, 1.0)
+        device = old.device
+        camera = old.camera
+
+        new = self.load(SOURCE, "transform_camera", 1, 1.0)
+        self.assertIsNot(new.device, device)
+        self.assertIs(new.camera, camera)
+        self.assertEqual(self.brain.generator_devices, [new.device])
+
+    def test_main_topic_is_reused(self):
+        old = self.load(N2R_SOURCE, "linear_twist", 1)
+        publisher = old.topic
+        sink = old.neuron
+
+        new = self.load(N2R_SOURCE, "linear_twist", 2)
+        self.assertIs(new.topic, publisher)
+        self.assertIs(new.neuron, sink)
+        self.assertIsNone(old.topic)
+        self.assertEqual(self.robot.published_topics, [publisher])
+
+        self.tfm.run_neuron_to_robot(0.1)
+        self.assertEqual(publisher.sent, [[2]])
+
+    def test_triggers_move_to_new_tf(self):
+        old = self.load(TRIGGERED_SOURCE, "on_image", "'old'")
+        new = self.load(TRIGGERED_SOURCE, "on_image", "'new'")
+        self.assertIs(new.camera, old.camera)
+
+        new.camera.value = [1, 2, 3]
+        self.assertEqual(new.runs.value, ['new'])
+        self.assertEqual(old.runs.value, [])
+
+    def test_failed_reload_restores_previous(self):
+        old = self.load(SOURCE, "transform_camera", 0, 1.0)
+        source = SOURCE.format(0, 1.0).replace("t, camera", "camera")
+        with self.assertRaises(TFLoadingException):
+            nrp.set_transfer_function(source, compile(source, "<string>", "exec"),
+                                      "transform_camera")
+        self.assertIs(nrp.get_transfer_function("transform_camera"), old)
+        self.assertTrue(old.active)
+        self.assertEqual(self.tfm.r2n, [old])
+        self.assertEqual(self.brain.generator_devices, [old.device])
+        self.assertEqual(self.robot.subscribed_topics, [old.camera])
+
+        self.tfm.run_robot_to_neuron(0.1)
+        self.assertEqual(old.device.rate, 1.0)
+
+    def test_failed_rename_keeps_adapters_of_previous(self):
+        old = self.load(SOURCE, "transform_camera", 0, 1.0)
+        self.load(N2R_SOURCE, "linear_twist", 1)
+        source = SOURCE.format(0, 2.0).replace("transform_camera", "renamed")
+        with patch.object(self.tfm, "activate_tf", side_effect=Exception("failed")):
+            with self.assertRaises(TFLoadingException):
+                nrp.set_transfer_function(source, compile(source, "<string>", "exec"),
+                                          "renamed", old_name="transform_camera")
+        self.assertIsNone(nrp.get_transfer_function("renamed"))
+        self.assertIs(nrp.get_transfer_function("transform_camera"), old)
+        self.assertEqual(self.tfm.r2n, [old])
+        self.assertIn(old.device, self.brain.generator_devices)
+        self.assertEqual(self.robot.subscribed_topics, [old.camera])
+
+    def test_equivalent(self):
+        self.assertTrue(equivalent(nrp.brain.actors[1:3], nrp.brain.actors[1:3]))
+        self.assertFalse(equivalent(nrp.brain.actors[1:3], nrp.brain.actors[1:4]))
+        self.assertFalse(equivalent(nrp.brain.actors, nrp.brain.sensors))
+        self.assertTrue(equivalent(nrp.map_neurons(range(2), lambda i: nrp.brain.actors[i]),
+                                   nrp.map_neurons(range(2), lambda i: nrp.brain.actors[i])))
+        self.assertFalse(equivalent(nrp.map_neurons(range(2), lambda i: nrp.brain.actors[i]),
+                                    nrp.map_neurons(range(2), lambda i: nrp.brain.sensors[i])))
+        self.assertTrue(equivalent({'weight': [1.0, 2.0]}, {'weight': [1.0, 2.0]}))
+        self.assertFalse(equivalent({'weight': 1.0}, {'weight': nrp.brain.actors}))
+        self.assertTrue(equivalent(Topic('/a', list), Topic('/a', list)))
+        self.assertFalse(equivalent(Topic('/a', list), Topic('/a', dict)))
+        self.assertFalse(equivalent(Topic('/a', list), PreprocessedTopic('/a', list, abs)))
+
+
+if __name__ == "__main__":
+    unittest.main()
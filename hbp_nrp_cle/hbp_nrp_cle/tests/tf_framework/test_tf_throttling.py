@@ -22,7 +22,8 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 # ---LICENSE-END
 import hbp_nrp_cle.tf_framework as nrp
-from hbp_nrp_cle.tf_framework import config
+from hbp_nrp_cle.tf_framework import config, TransferFunction
+from hbp_nrp_cle.tf_framework._TimerQueue import VersionedList
 from hbp_nrp_cle.tests.tf_framework.husky import Husky
 
 from hbp_nrp_cle.mocks.robotsim._MockRobotCommunicationAdapter import MockRobotCommunicationAdapter, \
@@ -76,4 +77,95 @@ class TestTransferFunctionThrottling(unittest.TestCase):
         self.assertFalse(throttled_tf.should_run(0.1))
         self.assertFalse(throttled_tf.should_run(1.0))
         self.assertTrue(throttled_tf.should_run(1.1))
-        self.assertTrue(throttled_tf.should_run(42.0))
\ No newline at end of file
+        self.assertTrue(throttled_tf.should_run(42.0))
+
+    def test_next_due_time(self):
+        self.assertEqual(config.active_node.next_due_time(), float('inf'))
+
+        @nrp.Neuron2Robot(throttling_rate=10)
+        def throttled_tf(t):
+            pass
+
+        @nrp.Neuron2Robot(throttling_rate=2)
+        def slow_tf(t):
+            pass
+
+        throttled_tf.active = True
+        slow_tf.active = True
+        self.assertEqual(config.active_node.next_due_time(), float('-inf'))
+
+        throttled_tf.run(1.0)
+        slow_tf.run(1.0)
+        self.assertAlmostEqual(throttled_tf.next_run_time, 1.1)
+        self.assertAlmostEqual(config.active_node.next_due_time(), 1.1)
+
+        throttled_tf.active = False
+        self.assertAlmostEqual(config.active_node.next_due_time(), 1.5)
+
+    def test_throttling_rate_change(self):
+        @nrp.Neuron2Robot(throttling_rate=10)
+        def throttled_tf(t):
+            pass
+
+        self.assertEqual(throttled_tf.throttling_rate, 10)
+        generation = TransferFunction.schedule_generation
+        throttled_tf.run(1.0)
+        throttled_tf.throttling_rate = 2
+        self.assertAlmostEqual(throttled_tf.next_run_time, 1.5)
+        self.assertGreater(TransferFunction.schedule_generation, generation)
+        with self.assertRaises(Exception):
+            throttled_tf.throttling_rate = -1
+        throttled_tf.throttling_rate = None
+        self.assertIsNone(throttled_tf.throttling_rate)
+        self.assertAlmostEqual(throttled_tf.next_run_time, 1.0001)
+
+    def test_only_due_tfs_are_run(self):
+        @nrp.Neuron2Robot()
+        def fast_tf(t):
+            pass
+
+        @nrp.Neuron2Robot(throttling_rate=1)
+        def slow_tf(t):
+            pass
+
+        fast_tf.active = True
+        slow_tf.active = True
+        touched = []
+        run_if_due = TransferFunction.run_if_due
+
+        def record(tf, t):
+            touched.append(tf.name)
+            run_if_due(tf, t)
+
+        def run_steps(first, last):
+            del touched[:]
+            for step in range(first, last):
+                config.active_node.run_neuron_to_robot(step * 0.02)
+
+        with patch.object(TransferFunction, 'run_if_due', new=record):
+            run_steps(0, 50)
+            self.assertEqual(touched.count('fast_tf'), 50)
+            self.assertEqual(touched.count('slow_tf'), 1)
+
+            slow_tf.throttling_rate = 10
+            run_steps(50, 60)
+            self.assertEqual(touched.count('slow_tf'), 2)
+
+            slow_tf.active = False
+            run_steps(60, 120)
+            self.assertEqual(touched.count('slow_tf'), 0)
+            self.assertEqual(touched.count('fast_tf'), 60)
+
+    def test_tf_lists_are_versioned(self):
+        tfs = VersionedList([1, 2, 3])
+        versions = [tfs.version]
+        tfs.append(4)
+        versions.append(tfs.version)
+        tfs.remove(1)
+        versions.append(tfs.version)
+        tfs[0] = 5
+        versions.append(tfs.version)
+        del tfs[:]
+        versions.append(tfs.version)
+        self.assertEqual(len(set(versions)), 5)
+        self.assertEqual(tfs, [])
@@ -0,0 +1,146 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+import threading
+import time
+import unittest
+
+from mock import Mock, patch
+
+import hbp_nrp_cle.tf_framework as nrp
+from hbp_nrp_cle.tf_framework import config
+from hbp_nrp_cle.tf_framework._TriggerQueue import TriggerQueue, TriggerStatistics
+from hbp_nrp_cle.tf_framework._TransferFunctionManager import TransferFunctionManager
+from hbp_nrp_cle.robotsim.RobotInterface import Topic
+from hbp_nrp_cle.mocks.robotsim._MockRobotCommunicationAdapter import \
+    MockRobotCommunicationAdapter
+from hbp_nrp_cle.mocks.brainsim._MockBrainCommunicationAdapter import \
+    MockBrainCommunicationAdapter
+
+__author__ = ''
+
+MockOs = Mock()
+MockOs.environ = {'NRP_SIMULATION_DIR': '/somewhere/near/the/rainbow'}
+
+
+@patch("hbp_nrp_cle.common.os", new=MockOs)
+class TestTriggerQueue(unittest.TestCase):
+
+    def setUp(self):
+        nrp.start_new_tf_manager()
+        nrp.set_nest_adapter(MockBrainCommunicationAdapter())
+        nrp.set_robot_adapter(MockRobotCommunicationAdapter())
+        self.tfm = config.active_node
+        self.queue = TriggerQueue()
+        self.runs = []
+        self.starts = []
+        self.release = threading.Event()
+        self.release.set()
+
+        @nrp.MapRobotSubscriber("camera", Topic("/camera", str))
+        @nrp.Neuron2Robot(triggers="camera")
+        def triggered(t, camera):
+            self.starts.append(time.time())
+            self.runs.append(t)
+            self.release.wait(5)
+
+        nrp.initialize("test")
+        self.tf = triggered
+
+    def tearDown(self):
+        self.queue.shutdown()
+        self.tfm.shutdown()
+
+    def test_limits_validated(self):
+        with self.assertRaises(ValueError):
+            TriggerQueue(max_rate=0)
+        with self.assertRaises(ValueError):
+            self.queue.configure(self.tf, max_depth=0)
+
+    def test_registered_with_manager(self):
+        self.assertIs(self.tf.trigger_queue, self.tfm.trigger_queue)
+        self.assertNotIn(self.tf, self.tfm.n2r)
+
+        TransferFunctionManager.trigger_tf(self.tf, 0.5)
+        self.assertTrue(self.tfm.trigger_queue.flush(5))
+        self.assertEqual(self.runs, [0.5])
+        self.assertEqual(self.tfm.trigger_queue.statistics(self.tf),
+                         TriggerStatistics(1, 1, 0, 0))
+
+        self.tfm.trigger_queue = None
+        self.assertIsNone(self.tf.trigger_queue)
+        TransferFunctionManager.trigger_tf(self.tf, 1.0)
+        self.assertEqual(self.runs, [0.5, 1.0])
+
+    def test_triggers_coalesce(self):
+        self.release.clear()
+        self.queue.trigger(self.tf, 0.1)
+        while not self.runs:
+            time.sleep(0.001)
+        for t in [0.2, 0.3, 0.4]:
+            self.queue.trigger(self.tf, t)
+        self.assertEqual(self.queue.pending, 1)
+        self.release.set()
+
+        self.assertTrue(self.queue.flush(5))
+        self.assertEqual(self.runs, [0.1, 0.4])
+        self.assertEqual(self.queue.statistics(self.tf), TriggerStatistics(4, 2, 2, 0))
+
+    def test_queue_depth(self):
+        self.queue.configure(self.tf, max_depth=2)
+        self.release.clear()
+        self.queue.trigger(self.tf, 0.1)
+        while not self.runs:
+            time.sleep(0.001)
+        for t in [0.2, 0.3, 0.4]:
+            self.queue.trigger(self.tf, t)
+        self.release.set()
+
+        self.assertTrue(self.queue.flush(5))
+        self.assertEqual(self.runs, [0.1, 0.2, 0.4])
+        self.assertEqual(self.queue.statistics(self.tf).coalesced, 1)
+
+    def test_max_rate(self):
+        self.queue.configure(self.tf, max_rate=20)
+        self.queue.trigger(self.tf, 0.1)
+        self.assertTrue(self.queue.flush(5))
+        self.queue.trigger(self.tf, 0.2)
+        self.assertTrue(self.queue.flush(5))
+        self.assertEqual(self.runs, [0.1, 0.2])
+        self.assertGreaterEqual(self.starts[1] - self.starts[0], 0.045)
+
+    def test_dropped(self):
+        self.tfm.activate_tf(self.tf, False)
+        self.queue.trigger(self.tf, 0.1)
+        self.tfm.activate_tf(self.tf, True)
+        self.queue.trigger(self.tf, 0.2)
+        self.queue.trigger(self.tf, 0.2)
+        self.assertTrue(self.queue.flush(5))
+        stats = self.queue.statistics(self.tf)
+        self.assertEqual(stats.triggered, 3)
+        self.assertEqual(stats.run, 1)
+        self.assertEqual(stats.dropped + stats.coalesced, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
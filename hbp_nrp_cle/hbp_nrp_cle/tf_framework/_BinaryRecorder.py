@@ -0,0 +1,413 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+This module contains the mapping of a binary recorder object to input parameters. Unlike the CSV
+recorder, the binary recorder stores numeric columns in numpy chunks and writes them to HDF5 or
+numpy files.
+"""
+
+__author__ = ''
+
+from ._MappingSpecification import ParameterMappingSpecification
+from ._CleanableTransferFunctionParameter import ICleanableTransferFunctionParameter
+
+import logging
+import os
+import shutil
+import struct
+import tempfile
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class MapBinaryRecorder(ParameterMappingSpecification):
+    """
+    Class to map a binary recorder object to transfer function parameters
+    """
+
+    def __init__(self, parameter_name, filename, headers, dtype=np.float64, file_format='npz',
+                 chunk_size=4096, erase_on_reset=False):
+        """
+        Maps a parameter to a recorder of numeric columns. A transfer function using it could
+        look like this:
+
+        @nrp.MapRobotSubscriber("joint_state",
+                                Topic('/joint_states',
+                                sensor_msgs.msg.JointState))
+        @nrp.MapBinaryRecorder("recorder",
+                               filename="joint_positions.h5",
+                               headers=["time", "position"],
+                               file_format="hdf5")
+        @nrp.Robot2Neuron()
+        def joint_state_monitor(t, joint_state, recorder):
+            recorder.record_entry(t, joint_state.value.position[0])
+
+        :param parameter_name: the name of the parameter
+        :param filename: the name of the file to write
+        :param headers: An array of string containing the names of the columns
+        :param dtype: The numpy data type of the columns
+        :param file_format: Either npz or hdf5
+        :param chunk_size: The number of rows kept in memory before they are written
+        :param erase_on_reset: A value indicating whether the recorder should erase its contents
+        when the simulation is reset
+        """
+        super(MapBinaryRecorder, self).__init__(parameter_name)
+        self.filename = filename
+        self.headers = headers
+        self.__dtype = dtype
+        self.__file_format = file_format
+        self.__chunk_size = chunk_size
+        self.__erase_on_reset = erase_on_reset
+
+    def create_adapter(self, transfer_function_manager):  # pylint: disable=unused-argument
+        """
+        Replaces the current mapping operator with the mapping result
+
+        :return: A ready to use BinaryRecorder object
+        """
+        return BinaryRecorder(self.filename, self.headers, self.__dtype, self.__file_format,
+                              self.__chunk_size, self.__erase_on_reset)
+
+    def create_tf(self):
+        """
+        Creates a TF in case the TF specification has been omitted
+        """
+        from hbp_nrp_cle.tf_framework._Neuron2Robot import Neuron2Robot
+        return Neuron2Robot()
+
+
+class _GrowableArrayFile(object):
+    """
+    A .npy file that rows can be appended to. The header has a fixed size and is rewritten after
+    every append, so that the file can be memory-mapped by readers at any time.
+    """
+
+    HEADER_SIZE = 128
+
+    def __init__(self, path, dtype, columns=None):
+        """
+        Creates the file
+
+        :param path: The path of the file
+        :param dtype: The data type of the array
+        :param columns: The number of columns or None for a one-dimensional array
+        """
+        self.path = path
+        self.rows = 0
+        self.__dtype = np.dtype(dtype)
+        self.__columns = columns
+        self.__stream = open(path, 'w+b')
+        self.__write_header()
+
+    @property
+    def shape(self):
+        """
+        Gets the current shape of the stored array
+        """
+        return (self.rows,) if self.__columns is None else (self.rows, self.__columns)
+
+    def __write_header(self):
+        """
+        Writes the npy header for the current number of rows
+        """
+        header = repr({'descr': np.lib.format.dtype_to_descr(self.__dtype),
+                       'fortran_order': False,
+                       'shape': self.shape})
+        header = header.ljust(_GrowableArrayFile.HEADER_SIZE - 11) + '\n'
+        self.__stream.seek(0)
+        self.__stream.write(np.lib.format.magic(1, 0) + struct.pack('<H', len(header)) + header)
+
+    def append(self, array):
+        """
+        Appends the given rows
+
+        :param array: The rows
+        """
+        self.__stream.seek(0, os.SEEK_END)
+        self.__stream.write(np.ascontiguousarray(array, self.__dtype).tostring())
+        self.rows += len(array)
+        self.__write_header()
+        self.__stream.flush()
+
+    def truncate(self):
+        """
+        Removes all rows
+        """
+        self.rows = 0
+        self.__stream.truncate(_GrowableArrayFile.HEADER_SIZE)
+        self.__write_header()
+        self.__stream.flush()
+
+    def read(self):
+        """
+        Gets a read-only memory map of the stored rows
+        """
+        if self.rows == 0:
+            return np.empty(self.shape, self.__dtype)
+        return np.load(self.path, mmap_mode='r')
+
+    def close(self):
+        """
+        Closes the file
+        """
+        self.__stream.close()
+
+
+class _NpzSink(object):
+    """
+    Appends the chunks to growable numpy files, which are bundled into a npz file at the end
+    """
+
+    def __init__(self, dtype, headers, chunk_size):  # pylint: disable=unused-argument
+        self.__headers = headers
+        self.__directory = tempfile.mkdtemp(prefix='binary_recorder_')
+        self.__values = _GrowableArrayFile(os.path.join(self.__directory, 'values.npy'),
+                                           dtype, len(headers))
+        self.__reset = _GrowableArrayFile(os.path.join(self.__directory, 'reset.npy'), np.bool_)
+
+    def append(self, values, reset):
+        """
+        Appends the given rows and reset markers
+        """
+        self.__values.append(values)
+        self.__reset.append(reset)
+
+    def truncate(self):
+        """
+        Removes all rows
+        """
+        self.__values.truncate()
+        self.__reset.truncate()
+
+    def read(self):
+        """
+        Gets memory maps of the recorded values and reset markers
+        """
+        return self.__values.read(), self.__reset.read()
+
+    def finish(self):
+        """
+        Writes the npz file and removes the intermediate files
+
+        :return: The path of the npz file
+        """
+        handle, path = tempfile.mkstemp(suffix='.npz', prefix='binary_recorder_')
+        values, reset = self.read()
+        with os.fdopen(handle, 'wb') as npz_file:
+            np.savez(npz_file, values=values, reset=reset, headers=np.array(self.__headers))
+        del values, reset
+        self.__values.close()
+        self.__reset.close()
+        shutil.rmtree(self.__directory, ignore_errors=True)
+        return path
+
+
+class _Hdf5Sink(object):
+    """
+    Appends the chunks to resizable datasets of a HDF5 file
+    """
+
+    def __init__(self, dtype, headers, chunk_size):
+        import h5py
+
+        handle, self.__path = tempfile.mkstemp(suffix='.h5', prefix='binary_recorder_')
+        os.close(handle)
+        columns = len(headers)
+        self.__file = h5py.File(self.__path, 'w', libver='latest')
+        self.__values = self.__file.create_dataset('values', (0, columns), dtype=dtype,
+                                                   maxshape=(None, columns),
+                                                   chunks=(chunk_size, columns))
+        self.__values.attrs['headers'] = [str(header) for header in headers]
+        self.__reset = self.__file.create_dataset('reset', (0,), dtype=np.bool_,
+                                                  maxshape=(None,), chunks=(chunk_size,))
+        # allows readers to open the file while it is written, if the HDF5 library supports it
+        try:
+            self.__file.swmr_mode = True
+        except (AttributeError, ValueError):
+            pass
+
+    def append(self, values, reset):
+        """
+        Appends the given rows and reset markers
+        """
+        start = len(self.__values)
+        end = start + len(values)
+        self.__values.resize(end, axis=0)
+        self.__values[start:end] = values
+        self.__reset.resize(end, axis=0)
+        self.__reset[start:end] = reset
+        self.__file.flush()
+
+    def truncate(self):
+        """
+        Removes all rows
+        """
+        self.__values.resize(0, axis=0)
+        self.__reset.resize(0, axis=0)
+        self.__file.flush()
+
+    def read(self):
+        """
+        Gets the datasets of the recorded values and reset markers, which load on slicing
+        """
+        return self.__values, self.__reset
+
+    def finish(self):
+        """
+        Closes the HDF5 file
+
+        :return: The path of the HDF5 file
+        """
+        self.__file.close()
+        return self.__path
+
+
+class BinaryRecorder(ICleanableTransferFunctionParameter):
+    """
+    Records rows of numeric values into a npz or HDF5 file
+    """
+
+    formats = {'npz': _NpzSink, 'hdf5': _Hdf5Sink}
+
+    def __init__(self, filename, headers, dtype=np.float64, file_format='npz', chunk_size=4096,
+                 erase_on_reset=False):
+        """
+        Creates a new binary recorder
+
+        :param string filename: the filename to save to.
+        :param string[] headers: the name of the columns.
+        :param dtype: The numpy data type of the columns
+        :param string file_format: Either npz or hdf5
+        :param int chunk_size: The number of rows kept in memory before they are written
+        :param bool erase_on_reset: A value indicating whether the recorder should
+        erase its contents when the simulation is reset
+        """
+        if file_format not in BinaryRecorder.formats:
+            raise Exception("Unsupported binary recorder format {0}, use one of {1}"
+                            .format(file_format, ", ".join(sorted(BinaryRecorder.formats))))
+        self.__filename = filename
+        self.__headers = list(headers)
+        self.__dtype = dtype
+        self.__file_format = file_format
+        self.__chunk_size = max(1, chunk_size)
+        self.__erase_on_reset = erase_on_reset
+        self.__chunk = np.empty((self.__chunk_size, len(self.__headers)), dtype)
+        self.__reset_marks = np.zeros(self.__chunk_size, np.bool_)
+        self.__row = 0
+        self.__reset_since_last_record = False
+        self.__sink = None
+
+    def record_entry(self, *values):
+        """
+        Records a row. The values are either given as individual arguments or as a single
+        sequence or array with one value per column.
+
+        :param values: The values to record
+        """
+        row = self.__row
+        if len(values) == 1:
+            self.__chunk[row] = values[0]
+        else:
+            # considerably faster than the generic conversion of a tuple by numpy
+            self.__chunk[row] = np.fromiter(values, self.__dtype, len(values))
+        if self.__reset_since_last_record:
+            self.__reset_marks[row] = True
+            self.__reset_since_last_record = False
+        self.__row = row + 1
+        if self.__row == self.__chunk_size:
+            self.__flush()
+
+    def __flush(self):
+        """
+        Writes the buffered rows
+        """
+        if self.__sink is None:
+            self.__sink = BinaryRecorder.formats[self.__file_format](
+                self.__dtype, self.__headers, self.__chunk_size)
+        row = self.__row
+        if row:
+            self.__sink.append(self.__chunk[:row], self.__reset_marks[:row])
+            self.__reset_marks[:row] = False
+            self.__row = 0
+
+    def read(self):
+        """
+        Writes the buffered rows and gets the recorded values and reset markers without copying
+        them into memory: memory maps for npz recordings, datasets for HDF5 recordings
+
+        :return: A tuple of the values with one column per header and the reset markers
+        """
+        self.__flush()
+        return self.__sink.read()
+
+    def get_recorder_name(self):
+        """
+        Returns the recorder filename
+
+        :return string filename: filename of the file specified by the user
+        """
+        return self.__filename
+
+    def get_headers(self):
+        """
+        Returns the recorder's column names
+
+        :return string[] headers: The column names
+        """
+        return self.__headers
+
+    # pylint: disable=unused-argument
+    def reset(self, tf_manager):
+        """
+        Resets the recorder
+        """
+        self.__reset_since_last_record = True
+        if self.__erase_on_reset:
+            self.__reset_marks[:] = False
+            self.__row = 0
+            if self.__sink is not None:
+                self.__sink.truncate()
+
+        return self
+
+    def cleanup(self):
+        """
+        Writes the remaining rows and closes the recorded file. Rows recorded afterwards go to a
+        new file.
+
+        :return string path: The path of the recorded file, the caller takes ownership of it
+        """
+        self.__flush()
+        sink = self.__sink
+        self.__sink = None
+        return sink.finish()
+
+    def discard(self):
+        """
+        Cleans up the recorder and deletes the recorded file
+        """
+        path = self.cleanup()
+        if isinstance(path, basestring) and os.path.exists(path):
+            os.remove(path)
@@ -29,17 +29,27 @@ __author__ = 'Daniel Peppicelli, Georg Hinkel'
 from ._MappingSpecification import ParameterMappingSpecification
 from ._CleanableTransferFunctionParameter import ICleanableTransferFunctionParameter
 
+import Queue
+import atexit
+import gzip
 import logging
+import os
+import tempfile
+import threading
 
 logger = logging.getLogger(__name__)
 
+# values of these types cannot change after they were recorded and are formatted when written
+_IMMUTABLE_SCALARS = (int, long, float, bool, basestring, type(None))
+
 
 class MapCSVRecorder(ParameterMappingSpecification):
     """
     Class to map a CSV recorder object to transfer function parameters
     """
 
-    def __init__(self, parameter_name, filename, headers, erase_on_reset=False):
+    def __init__(self, parameter_name, filename, headers, erase_on_reset=False,
+                 buffer_size=1024, compress=False):
         """
         Maps a parameter to a variable in the specified scope (per-default: the transfer function)
         and if the variable does not yet exist initializes it with the provided value.
@@ -62,11 +72,15 @@ class MapCSVRecorder(ParameterMappingSpecification):
         in the CSV file
         :param erase_on_reset: A value indicating whether the csv recorder should erase its contents
         when the simulation is reset
+        :param buffer_size: The number of rows kept in memory before they are written to disk
+        :param compress: A value indicating whether the recorded file should be gzip compressed
         """
         super(MapCSVRecorder, self).__init__(parameter_name)
         self.filename = filename
         self.headers = headers
         self.__erase_on_reset = erase_on_reset
+        self.__buffer_size = buffer_size
+        self.__compress = compress
 
     def create_adapter(self, transfer_function_manager):  # pylint: disable=unused-argument
         """
@@ -74,7 +88,8 @@ class MapCSVRecorder(ParameterMappingSpecification):
 
         :return: A ready to use CSVRecorder object
         """
-        return CSVRecorder(self.filename, self.headers, self.__erase_on_reset)
+        return CSVRecorder(self.filename, self.headers, self.__erase_on_reset,
+                           self.__buffer_size, self.__compress)
 
     def create_tf(self):
         """
@@ -84,12 +99,151 @@ class MapCSVRecorder(ParameterMappingSpecification):
         return Neuron2Robot()
 
 
+class _CSVFile(object):
+    """
+    The temporary file a CSV recorder writes to. It is only accessed by the writer thread.
+    """
+
+    # the files of an older generation have been inherited from the parent of a forked process
+    generation = 0
+
+    def __init__(self, header, compress):
+        suffix = '.csv.gz' if compress else '.csv'
+        handle, self.path = tempfile.mkstemp(suffix=suffix, prefix='csv_recorder_')
+        os.close(handle)
+        self.header = header
+        self.compress = compress
+        self.stream = None
+        self.error = None
+        self.generation = _CSVFile.generation
+
+    def open(self):
+        """
+        (Re-)creates the file and writes the header
+        """
+        self.close()
+        self.stream = gzip.open(self.path, 'wb') if self.compress else open(self.path, 'wb')
+        self.stream.write(self.header)
+
+    def write(self, rows):
+        """
+        Formats and appends the given rows
+
+        :param rows: A list of value tuples, the last item of which is the reset marker or None
+        """
+        if self.stream is None:
+            self.open()
+        lines = []
+        for row in rows:
+            values = row if row[-1] is not None else row[:-1]
+            lines.append(','.join(str(val) for val in values) + '\n')
+        self.stream.write(''.join(lines))
+
+    def close(self):
+        """
+        Closes the file
+        """
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+
+class _CSVWriter(object):
+    """
+    Writes the rows of all CSV recorders on a background thread. The queue is bounded so that
+    recording blocks rather than growing the memory if the disk cannot keep up.
+    """
+
+    def __init__(self, max_chunks=64):
+        self.__queue = Queue.Queue(max_chunks)
+        self.__thread = None
+        self.__lock = threading.Lock()
+
+    def submit(self, operation, csv_file, argument=None):
+        """
+        Queues an operation for the given file
+
+        :param operation: One of write, truncate or close
+        :param csv_file: The file
+        :param argument: The rows to write or the event to set when the file is closed
+        """
+        with self.__lock:
+            if self.__thread is None or not self.__thread.is_alive():
+                self.__thread = threading.Thread(target=self.__run, name="CSVRecorderWriter")
+                self.__thread.daemon = True
+                self.__thread.start()
+        self.__queue.put((operation, csv_file, argument))
+
+    def stop(self):
+        """
+        Processes the queued operations and stops the writer thread
+        """
+        with self.__lock:
+            thread = self.__thread
+            self.__thread = None
+        if thread is not None and thread.is_alive():
+            self.__queue.put(None)
+            thread.join()
+
+    def __run(self):
+        """
+        Processes the queued operations until the stop sentinel is received
+        """
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                return
+            operation, csv_file, argument = item
+            # pylint: disable=broad-except
+            try:
+                if operation == 'close':
+                    if csv_file.stream is None and csv_file.error is None:
+                        csv_file.open()
+                    csv_file.close()
+                elif csv_file.error is None:
+                    if operation == 'write':
+                        csv_file.write(argument)
+                    else:
+                        csv_file.open()
+            except Exception as e:
+                logger.exception(e)
+                csv_file.error = e
+            finally:
+                if operation == 'close':
+                    argument.set()
+
+
+_writer = _CSVWriter()
+
+
+@atexit.register
+def _stop_writer():
+    """
+    Stops the writer thread before the interpreter shuts down
+    """
+    _writer.stop()
+
+
+def reset_after_fork():
+    """
+    Makes the CSV recorders usable in a forked process. The writer thread does not exist in the
+    forked process and its queue may be locked, so a new writer is created. The files of the
+    parent process are dropped without closing their streams, which share their file
+    descriptors with the parent, and the recorders start new files.
+    """
+    global _writer  # pylint: disable=global-statement
+    _writer = _CSVWriter()
+    _CSVFile.generation += 1
+
+
 class CSVRecorder(ICleanableTransferFunctionParameter):
     """
-    Record value and memory and dump them to a temporary file when asked to.
+    Records values into a temporary CSV file. Rows are buffered in memory and written in chunks
+    by a background thread, the file is handed out when the recorder is cleaned up.
     """
 
-    def __init__(self, filename, headers, erase_on_reset=False):
+    def __init__(self, filename, headers, erase_on_reset=False, buffer_size=1024,
+                 compress=False):
         """
         Constructor. Pretty straightforward,
 
@@ -97,6 +251,8 @@ class CSVRecorder(ICleanableTransferFunctionParameter):
         :param string[] headers: the name of the columns.
         :param bool erase_on_reset: A value indicating whether the csv recorder should
         erase its contents when the simulation is reset
+        :param int buffer_size: The number of rows kept in memory before they are written
+        :param bool compress: A value indicating whether the file should be gzip compressed
         """
         self.__filename = filename
         self.__reset_since_last_record = False
@@ -104,29 +260,44 @@ class CSVRecorder(ICleanableTransferFunctionParameter):
         self.__headers = [headers + ['Simulation_reset\n']]
         self.__headers = [
             item for sublist in self.__headers for item in sublist]
-        self.__values = []
         self.__erase_on_reset = erase_on_reset
+        self.__buffer_size = max(1, buffer_size)
+        self.__compress = compress
+        self.__values = []
+        self.__file = None
 
     def record_entry(self, *values):
         """
-        Record the values provided (in memory) and creates the appropriate
-        array to add to the values buffer
+        Record the values provided, the row is written to disk once the buffer is full
 
         :param string[] values : Values to record
         """
-        # listify the values since they are tuples
-        values = list(values)
-        if self.__reset_since_last_record:
-            values.append('RESET')
-
-        # add a comma
-        values = [str(val) + ',' for val in values]
-
-        # in the last value we replace the comma with a newline
-        values[-1] = values[-1].replace(',', '\n') if values[-1] else ""
-
+        # the rows are written later, so values that may still change are formatted right away
+        values = tuple(val if isinstance(val, _IMMUTABLE_SCALARS) else str(val)
+                       for val in values)
+        values = values + ('RESET' if self.__reset_since_last_record else None,)
         self.__reset_since_last_record = False
         self.__values.append(values)
+        if len(self.__values) >= self.__buffer_size:
+            self.__flush()
+
+    def __own_file(self):
+        """
+        Drops the file of this recorder if it belongs to the parent of a forked process
+        """
+        if self.__file is not None and self.__file.generation != _CSVFile.generation:
+            self.__file = None
+
+    def __flush(self):
+        """
+        Hands the buffered rows over to the writer thread
+        """
+        self.__own_file()
+        if self.__file is None:
+            self.__file = _CSVFile(''.join(self.__headers), self.__compress)
+        rows = self.__values
+        self.__values = []
+        _writer.submit('write', self.__file, rows)
 
     def get_csv_recorder_name(self):
         """
@@ -150,26 +321,39 @@ class CSVRecorder(ICleanableTransferFunctionParameter):
         Resets the recorder
         """
         self.__reset_since_last_record = True
+        self.__own_file()
         if self.__erase_on_reset:
-            header = self.__headers
             del self.__values[:]
-            self.__values.append(header)
+            if self.__file is not None:
+                _writer.submit('truncate', self.__file)
 
         return self
 
     def cleanup(self):
         """
-        Retrieves the csv data recorded values and cleans up the values buffer
+        Writes the remaining recorded values and closes the recorded file. Values recorded
+        afterwards go to a new file.
 
-        :return string[] values: A string array containing the properly formatted
-        comma separated recorder values
+        :return string path: The path of the CSV file including the header line, the caller
+        takes ownership of the file
         """
-        # expand the array of values which is an array of arrays
-        # we have a newline character already appended to the values
-        # in the appropriate place to signal when the current line ends
-        values = [item for sublist in self.__values for item in sublist]
+        self.__own_file()
+        if self.__values or self.__file is None:
+            self.__flush()
+        csv_file = self.__file
+        self.__file = None
 
-        # flush the buffer which holds the values
-        del self.__values[:]
+        closed = threading.Event()
+        _writer.submit('close', csv_file, closed)
+        closed.wait()
+        if csv_file.error is not None:
+            raise csv_file.error
+        return csv_file.path
 
-        return values
+    def discard(self):
+        """
+        Cleans up the recorder and deletes the recorded file
+        """
+        path = self.cleanup()
+        if isinstance(path, basestring) and os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,329 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+This module contains a content-addressed cache for the compiled code of transfer functions.
+Code objects are kept in memory and optionally on disk, keyed by a hash of the source and the
+versions of the compiler and of the restriction policy.
+"""
+
+__author__ = ''
+
+from collections import OrderedDict
+from RestrictedPython import compile_restricted, RCompile, RestrictionMutator
+import hashlib
+import hmac
+import logging
+import marshal
+import os
+import stat
+import sys
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+SECRET_FILE = 'secret'
+
+
+def private_cache_directory():
+    """
+    Gets the default directory to persist compiled code in, inside the cache directory of the
+    current user
+
+    :return: The path of the directory
+    """
+    return os.path.join(os.path.expanduser('~'), '.cache', 'hbp_nrp_cle', 'tf_code')
+
+
+def is_private(path):
+    """
+    Checks that the given file or directory is no symbolic link, is owned by the current user and
+    cannot be accessed by anybody else
+
+    :param path: The path
+    :return: True, if the path is private to the current user, otherwise False
+    """
+    try:
+        status = os.lstat(path)
+    except OSError:
+        return False
+    return not stat.S_ISLNK(status.st_mode) and status.st_uid == os.getuid() \
+        and not status.st_mode & (stat.S_IRWXG | stat.S_IRWXO)
+
+
+def module_fingerprint(module):
+    """
+    Computes a fingerprint of the given module that changes whenever its source changes
+
+    :param module: The module
+    :return: A string identifying the module version
+    """
+    path = getattr(module, '__file__', None)
+    if isinstance(path, basestring):
+        if path.endswith(('.pyc', '.pyo')) and os.path.exists(path[:-1]):
+            path = path[:-1]
+        try:
+            with open(path, 'rb') as module_file:
+                return hashlib.sha1(module_file.read()).hexdigest()
+        except IOError:
+            pass
+    return str(getattr(module, '__version__', getattr(module, '__name__', '')))
+
+
+class CodeCache(object):
+    """
+    Caches the compiled code of transfer functions
+    """
+
+    def __init__(self, directory=None, capacity=256, compiler=compile_restricted,
+                 policy_modules=(RCompile, RestrictionMutator)):
+        """
+        Creates a new code cache
+
+        :param directory: The directory in which compiled code is persisted or None to keep
+         compiled code only in memory. The directory is created private to the current user and
+         is not used if anybody else can access it.
+        :param capacity: The maximum number of code objects kept in memory
+        :param compiler: The compiler, a function taking the source, filename and mode
+        :param policy_modules: The modules whose changes invalidate the compiled code
+        """
+        self.__directory = None
+        self.__secret = None
+        self.__capacity = capacity
+        self.__compiler = compiler
+        self.__policy_modules = list(policy_modules)
+        self.__version = None
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+        if directory is not None:
+            self.__open(directory)
+
+    @property
+    def directory(self):
+        """
+        Gets the directory in which compiled code is persisted or None
+        """
+        return self.__directory
+
+    def __open(self, directory):
+        """
+        Prepares the given directory to persist compiled code in and reads the secret that
+        authenticates the persisted code, creating both if necessary
+
+        :param directory: The directory
+        """
+        secret_path = os.path.join(directory, SECRET_FILE)
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory, 0700)
+            if not is_private(directory):
+                logger.warn("Not persisting compiled code, %s is accessible by other users",
+                            directory)
+                return
+            if not os.path.exists(secret_path):
+                handle = os.open(secret_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0600)
+                with os.fdopen(handle, 'wb') as secret_file:
+                    secret_file.write(os.urandom(32))
+            if not is_private(secret_path):
+                logger.warn("Not persisting compiled code, %s is accessible by other users",
+                            secret_path)
+                return
+            with open(secret_path, 'rb') as secret_file:
+                self.__secret = secret_file.read()
+            self.__directory = directory
+        except (IOError, OSError) as e:
+            logger.warn("Not persisting compiled code: " + str(e))
+
+    def __sign(self, data):
+        """
+        Computes the authentication code of the given persisted data
+
+        :param data: The marshalled code
+        :return: The authentication code
+        """
+        return hmac.new(self.__secret, data, hashlib.sha256).digest()
+
+    @property
+    def version(self):
+        """
+        Gets the fingerprint of the interpreter, the compiler and the policy modules that is
+        part of every cache key
+        """
+        if self.__version is None:
+            digest = hashlib.sha1(sys.version)
+            digest.update(str(marshal.version))
+            digest.update(getattr(self.__compiler, '__module__', None) or '')
+            digest.update(getattr(self.__compiler, '__name__', None) or repr(self.__compiler))
+            for module in self.__policy_modules:
+                digest.update(module_fingerprint(module))
+            self.__version = digest.hexdigest()
+        return self.__version
+
+    @property
+    def hits(self):
+        """
+        Gets the number of compilations that were answered from the cache
+        """
+        return self.__hits
+
+    @property
+    def misses(self):
+        """
+        Gets the number of compilations that had to run the compiler
+        """
+        return self.__misses
+
+    @property
+    def hit_rate(self):
+        """
+        Gets the share of compilations answered from the cache, or 0.0 if nothing was compiled
+        """
+        total = self.__hits + self.__misses
+        return float(self.__hits) / total if total else 0.0
+
+    def key(self, source, filename):
+        """
+        Computes the cache key for the given source
+
+        :param source: The source code
+        :param filename: The filename recorded in the code object
+        :return: The cache key as hexadecimal string
+        """
+        if isinstance(source, unicode):
+            source = source.encode('utf-8')
+        digest = hashlib.sha1(self.version)
+        digest.update(filename)
+        digest.update('\0')
+        digest.update(source)
+        return digest.hexdigest()
+
+    def compile(self, source, filename='<string>'):
+        """
+        Compiles the given source, unless its compiled code is already cached
+
+        :param source: The source code of the transfer function
+        :param filename: The filename recorded in the code object
+        :return: The code object
+        """
+        key = self.key(source, filename)
+        with self.__lock:
+            code = self.__entries.pop(key, None)
+            if code is not None:
+                self.__entries[key] = code
+                self.__hits += 1
+                return code
+
+        code = self.__load(key)
+        if code is None:
+            code = self.__compiler(source, filename, 'exec')
+            self.__store(key, code)
+            hit = False
+        else:
+            hit = True
+
+        with self.__lock:
+            if hit:
+                self.__hits += 1
+            else:
+                self.__misses += 1
+            self.__entries[key] = code
+            while len(self.__entries) > self.__capacity:
+                self.__entries.popitem(last=False)
+        logger.debug("Compiled %s (cache hit: %s, hit rate %.2f)", filename, hit, self.hit_rate)
+        return code
+
+    def invalidate(self):
+        """
+        Drops the code held in memory and recomputes the fingerprint of the policy modules, e.g.
+        after they have been reloaded
+        """
+        with self.__lock:
+            self.__entries.clear()
+            self.__version = None
+
+    def __path(self, key):
+        """
+        Gets the file in which the code for the given key is persisted
+
+        :param key: The cache key
+        """
+        return os.path.join(self.__directory, key + '.code')
+
+    def __load(self, key):
+        """
+        Loads the code for the given key from disk. Only code that is private to the current user
+        and carries a valid authentication code is loaded.
+
+        :param key: The cache key
+        :return: The code object or None, if it is not persisted, unreadable or not trusted
+        """
+        if self.__directory is None:
+            return None
+        path = self.__path(key)
+        if not os.path.exists(path):
+            return None
+        if not (is_private(self.__directory) and is_private(path)):
+            logger.warn("Ignoring compiled code %s accessible by other users", path)
+            return None
+        try:
+            with open(path, 'rb') as code_file:
+                data = code_file.read()
+        except IOError:
+            return None
+        signature, data = data[:32], data[32:]
+        if hmac.compare_digest(signature, self.__sign(data)):
+            try:
+                return marshal.loads(data)
+            except (EOFError, ValueError, TypeError):
+                pass
+        logger.warn("Discarding corrupt compiled code " + path)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+    def __store(self, key, code):
+        """
+        Persists the code for the given key, failures only cost a later recompilation
+
+        :param key: The cache key
+        :param code: The code object
+        """
+        if self.__directory is None:
+            return
+        path = self.__path(key)
+        data = marshal.dumps(code)
+        try:
+            # write to a temporary file first so that readers never see a partial entry, the
+            # temporary file is only accessible by the current user
+            handle, temp_path = tempfile.mkstemp(dir=self.__directory)
+            with os.fdopen(handle, 'wb') as code_file:
+                code_file.write(self.__sign(data))
+                code_file.write(data)
+            os.rename(temp_path, path)
+        except (IOError, OSError) as e:
+            logger.debug("Cannot persist compiled code: " + str(e))
@@ -0,0 +1,120 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+This module computes which transfer functions may run concurrently. Two transfer functions
+conflict if they share a resource that at least one of them may write, i.e. a device, a robot
+topic they publish to or a variable of the global scope.
+
+All brain devices count as a single resource: reading a device queries the brain simulator as
+well, e.g. when a recorder is refreshed or a device group reads its values and flushes the
+pending writes, and the simulator must not be called from several threads at once.
+"""
+
+__author__ = ''
+
+from hbp_nrp_cle.brainsim.BrainInterface import IBrainDevice, ICustomDevice
+from hbp_nrp_cle.robotsim.RobotInterface import Topic, IRobotPublishedTopic, \
+    IRobotSubscribedTopic
+from ._GlobalData import GlobalDataReference, LocalDataReference
+from ._Robot2Neuron import MapRobotPublisher
+
+
+def _topic_key(publisher):
+    """
+    Gets the resource key of a topic publisher
+
+    :param publisher: The publisher
+    :return: The name of the published topic if it is known, otherwise the publisher itself
+    """
+    # the spec is the mapping of a publisher parameter or the topic of a main topic publisher
+    topic = getattr(publisher, 'spec', None)
+    if isinstance(topic, MapRobotPublisher):
+        topic = topic.topic
+    if isinstance(topic, Topic):
+        return 'topic', topic.name
+    if isinstance(topic, basestring):
+        return 'topic', topic
+    return 'object', id(publisher)
+
+
+def get_resources(tf):
+    """
+    Gets the resources the given transfer function may write to, where the brain simulator is a
+    single resource for all brain devices
+
+    :param tf: The transfer function
+    :return: A set of resource keys
+    """
+    resources = set()
+    main_topic = getattr(tf, 'topic', None)
+    if isinstance(main_topic, IRobotPublishedTopic):
+        resources.add(_topic_key(main_topic))
+    for param in tf.params[1:]:
+        if isinstance(param, GlobalDataReference):
+            resources.add(('global', param.global_key))
+        elif isinstance(param, IRobotPublishedTopic):
+            resources.add(_topic_key(param))
+        elif isinstance(param, (IBrainDevice, ICustomDevice)):
+            resources.add(('brain', None))
+        elif not isinstance(param, (LocalDataReference, IRobotSubscribedTopic)):
+            resources.add(('object', id(param)))
+    return resources
+
+
+def get_schedule_key(tfs):
+    """
+    Gets a key that changes whenever the schedule of the given transfer functions may change
+
+    :param tfs: The transfer functions
+    :return: A hashable key
+    """
+    return tuple((id(tf), id(getattr(tf, 'topic', None))) + tuple(id(p) for p in tf.params[1:])
+                 for tf in tfs)
+
+
+def schedule(tfs):
+    """
+    Partitions the given transfer functions into levels. The transfer functions of a level do not
+    conflict and may run concurrently. A transfer function is placed in the level after the last
+    level containing a conflicting transfer function that precedes it, so that conflicting
+    transfer functions still run in the given order.
+
+    :param tfs: The transfer functions in sequential order
+    :return: A list of levels, each a list of transfer functions in sequential order
+    """
+    levels = []
+    level_resources = []
+    for tf in tfs:
+        resources = get_resources(tf)
+        index = 0
+        for i in xrange(len(levels) - 1, -1, -1):
+            if not resources.isdisjoint(level_resources[i]):
+                index = i + 1
+                break
+        if index == len(levels):
+            levels.append([])
+            level_resources.append(set())
+        levels[index].append(tf)
+        level_resources[index].update(resources)
+    return levels
@@ -222,6 +222,13 @@ class GlobalDataReference(DataReference):
         if self.__global_key not in self.__data_dict:
             self.reset(None)
 
+    @property
+    def global_key(self):
+        """
+        Gets the key of the variable in the global scope
+        """
+        return self.__global_key
+
     def _value_getter(self):
         """
         Gets the value associated with this parameter
@@ -67,6 +67,17 @@ class ParameterMappingSpecification(object):
         """
         raise NotImplementedError("This method was not implemented in the concrete implementation")
 
+    # pylint: disable=no-self-use, unused-argument
+    def is_equivalent(self, other):
+        """
+        Gets a value indicating whether the adapter created for the given mapping can be reused
+        for this mapping, e.g. when a transfer function is reloaded
+
+        :param other: The mapping of the existing adapter
+        :return: True, if the adapter of the given mapping may be reused, otherwise False
+        """
+        return False
+
     @property
     def name(self):
         """
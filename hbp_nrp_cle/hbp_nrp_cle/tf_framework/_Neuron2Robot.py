@@ -34,7 +34,8 @@ from hbp_nrp_cle.brainsim.BrainInterface import IFixedSpikeGenerator, \
     IDCSource, IACSource, INCSource, IPopulationRate, ISpikeInjector, \
     ICustomDevice, IBrainCommunicationAdapter, ISpikeRecorder, IRawSignal
 from ._MappingSpecification import ParameterMappingSpecification
-from . import config
+from ._PropertyPath import equivalent
+from hbp_nrp_cle import context as sim_context
 from ._TransferFunction import TransferFunction
 import sys
 
@@ -105,13 +106,25 @@ class MapSpikeSink(ParameterMappingSpecification):
         """
         return True
 
+    def is_equivalent(self, other):
+        """
+        Gets a value indicating whether the device created for the given mapping can be reused
+        for this mapping
+
+        :param other: The mapping of the existing device
+        :return: True, if the mapping refers to the same kind of device at the same neurons
+        """
+        return type(other) is type(self) and equivalent(other.neurons, self.__value) \
+            and equivalent(other.device_type, self.__device_type) \
+            and equivalent(other.config, self.__config)
+
     def create_adapter(self, transfer_function_manager):
         """
         Replaces the current mapping operator with the mapping result
         """
         adapter = transfer_function_manager.brain_adapter
         assert isinstance(adapter, IBrainCommunicationAdapter)
-        neurons = self.neurons.select(config.brain_root, adapter)
+        neurons = self.neurons.select(transfer_function_manager.context.brain_root, adapter)
         return adapter.register_spike_sink(neurons,
                                            self.device_type,
                                            **self.config)
@@ -137,7 +150,7 @@ class MapSpikeSource(MapSpikeSink):
         """
         adapter = transfer_function_manager.brain_adapter
         assert isinstance(adapter, IBrainCommunicationAdapter)
-        neurons = self.neurons.select(config.brain_root, adapter)
+        neurons = self.neurons.select(transfer_function_manager.context.brain_root, adapter)
         print neurons
         return adapter.register_spike_source(neurons,
                                              self.device_type,
@@ -164,14 +177,15 @@ class Neuron2Robot(TransferFunction):
     Class to represent a transfer function from neurons to robot
     """
 
-    def __init__(self, robot_topic=None, triggers=None, throttling_rate=None):
+    def __init__(self, robot_topic=None, triggers=None, throttling_rate=None, offload=False):
         """
         Defines a new transfer function from robots to neurons
 
         :param robot_topic: the robot topic reference
         :param other_topics: other topics required by this transfer function
+        :param offload: True, if the body should be run in a worker process
         """
-        super(Neuron2Robot, self).__init__(triggers, throttling_rate)
+        super(Neuron2Robot, self).__init__(triggers, throttling_rate, offload)
         if robot_topic is not None:
             assert isinstance(robot_topic, (Topic, str))
         self.__main_topic = robot_topic
@@ -201,7 +215,7 @@ class Neuron2Robot(TransferFunction):
         :return The transfer function object
         """
 
-        self._init_function(func, config.active_node.n2r)
+        self._init_function(func, sim_context.current().active_node.n2r)
         return self
 
     def __repr__(self):  # pragma: no cover
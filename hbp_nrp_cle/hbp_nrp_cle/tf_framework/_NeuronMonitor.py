@@ -30,11 +30,12 @@ import sys
 from ._TransferFunction import TransferFunction
 from ._Neuron2Robot import MapSpikeSink
 from ._Robot2Neuron import MapRobotPublisher
-from hbp_nrp_cle.tf_framework import config
+from hbp_nrp_cle import context as sim_context
 from hbp_nrp_cle.brainsim.BrainInterface import ISpikeRecorder, ILeakyIntegratorAlpha, \
     ILeakyIntegratorExp, IPopulationRate
 from hbp_nrp_cle.robotsim.RobotInterface import Topic
-from cle_ros_msgs.msg import SpikeRate, SpikeEvent, SpikeData
+from ._SpikeEncoding import encode_spikes, spike_offsets, spike_event_type, concatenate_spikes
+from cle_ros_msgs.msg import SpikeRate, SpikeEvent
 
 
 logger = logging.getLogger(__name__)
@@ -46,21 +47,119 @@ LEAKY_INTEGRATOR_ALPHA_TOPIC = "/monitor/leaky_integrator_alpha"
 LEAKY_INTEGRATOR_EXP_TOPIC = "/monitor/leaky_integrator_exp"
 POPULATION_RATE_TOPIC = "/monitor/population_rate"
 
+# the largest factor by which a monitor stretches its publishing interval while the simulation
+# loop cannot keep up with its real-time factor
+MAX_BACKOFF = 16
+
+
+class PublishingPolicy(object):
+    """
+    Decides in which simulation steps a neuron monitor publishes.
+
+    The interval between two messages is at least the inverse of the maximum rate and at least one
+    simulation step. While the simulation loop lags behind its real-time factor, the interval is
+    doubled with every message up to a maximum factor, and it shrinks again in the same way once
+    the loop has caught up.
+    """
+
+    def __init__(self, max_rate=None, backoff=True, max_backoff=MAX_BACKOFF):
+        """
+        Creates a new publishing policy
+
+        :param max_rate: The maximum publishing rate in hertz or None to publish in every step
+        :param backoff: True, if the interval should grow while the simulation is overloaded
+        :param max_backoff: The maximum factor applied to the interval
+        """
+        if max_rate is not None and \
+                not (isinstance(max_rate, (int, float)) and max_rate > 0):
+            raise Exception("The maximum rate of a monitor should be a frequency in hertz")
+        self.__max_rate = max_rate
+        self.__interval = 1.0 / max_rate if max_rate is not None else 0.0
+        self.__backoff_enabled = backoff
+        self.__max_backoff = max_backoff
+        self.__backoff = 1
+        self.__next = -float('inf')
+        self.__last = None
+        self.__step = 0.0
+
+    @property
+    def max_rate(self):
+        """
+        Gets the maximum publishing rate in hertz, or None if the monitor publishes in every step
+        """
+        return self.__max_rate
+
+    @property
+    def backoff(self):
+        """
+        Gets the factor by which the publishing interval is currently stretched
+        """
+        return self.__backoff
+
+    def reset(self):
+        """
+        Forgets the time of the last message and the back-off
+        """
+        self.__backoff = 1
+        self.__next = -float('inf')
+        self.__last = None
+        self.__step = 0.0
+
+    def due(self, t, overloaded=False):
+        """
+        Steps the policy to the simulation time t and decides whether a message is due
+
+        :param t: The simulation time
+        :param overloaded: True, if the simulation loop currently lags behind its real-time factor
+        :return: True, if the monitor should publish in this step
+        """
+        last = self.__last
+        if last is not None:
+            if t < last:
+                # the simulation has been reset
+                self.reset()
+            else:
+                self.__step = t - last
+        self.__last = t
+        # half a step of tolerance absorbs the rounding errors of the accumulated clock
+        if t + 0.5 * self.__step < self.__next:
+            return False
+        if self.__backoff_enabled:
+            if overloaded:
+                self.__backoff = min(2 * self.__backoff, self.__max_backoff)
+            elif self.__backoff > 1:
+                self.__backoff //= 2
+        self.__next = t + max(self.__interval, self.__step) * self.__backoff
+        return True
+
 
 class NeuronMonitor(TransferFunction):
     """
     Class to represent transfer functions used for monitoring neurons
+
+    A monitor publishes at most at its maximum rate and not at all while nobody is subscribed to
+    its topic. Its function is only run in steps where a message is due. The spikes of a spike
+    recorder are collected in the steps in between and published together in the next message,
+    unless aggregation is disabled.
     """
 
-    def __init__(self, neurons, monitor_type):
+    def __init__(self, neurons, monitor_type, max_rate=None, aggregate=True, backoff=True):
         """
         Defines a new transfer function from robots to neurons
 
         :param neurons: The neurons that should be monitored
         :param monitor_type: The type of monitor that should be injected
+        :param max_rate: The maximum publishing rate in hertz, None to publish in every step
+        :param aggregate: True, if the spikes of the steps without message should be published
+          with the next message, otherwise they are dropped
+        :param backoff: True, if the monitor should publish less often while the simulation loop
+          lags behind its real-time factor
         """
         super(NeuronMonitor, self).__init__()
         self.__count = 0
+        self.__policy = PublishingPolicy(max_rate, backoff)
+        self.__aggregate = aggregate and monitor_type is ISpikeRecorder
+        self.__pending = []
 
         cfg = {}
         _topic = None
@@ -86,6 +185,8 @@ class NeuronMonitor(TransferFunction):
         self.__publisher_spec = MapRobotPublisher("publisher", Topic(_topic, _type))
         self.__device_spec = MapSpikeSink("device", neurons, monitor_type, **cfg)
         self.__neurons = None
+        self.__offsets = None
+        self.__context = None
 
         self.device = None
         self.publisher = None
@@ -97,7 +198,8 @@ class NeuronMonitor(TransferFunction):
         :param func: The function body for this transfer function
         :return The transfer function object
         """
-        self._init_function(func, config.active_node.n2r)
+        self.__context = sim_context.current()
+        self._init_function(func, self.__context.active_node.n2r)
         if self.__publisher_spec not in self._params:
             self._params.append(self.__publisher_spec)
         if self.__device_spec not in self._params:
@@ -108,6 +210,13 @@ class NeuronMonitor(TransferFunction):
         return "{0} monitors {1}" \
             .format(self.name, self.__device_spec.neurons)
 
+    @property
+    def policy(self):
+        """
+        Gets the policy that decides when this monitor publishes
+        """
+        return self.__policy
+
     def initialize(self, tfm, bca_changed, rca_changed):
         """
         Initializes this transfer function to be used with the given TFM
@@ -116,7 +225,9 @@ class NeuronMonitor(TransferFunction):
         :param bca_changed: True, if the brain communication adapter has changed
         :param rca_changed: True, if the robot communication adapter has changed
         """
+        super(NeuronMonitor, self).initialize(tfm, bca_changed, rca_changed)
         if bca_changed:
+            del self.__pending[:]
             if hasattr(self.device, 'neurons'):
 
                 self.__neurons = self.device.neurons
@@ -125,8 +236,13 @@ class NeuronMonitor(TransferFunction):
                     self.__count = sum(self.device.neurons_count)
                 else:
                     self.__count = self.device.neurons_count
+                if type(self.__neurons) is list:
+                    self.__offsets = spike_offsets(self.__neurons)
+                else:
+                    self.__offsets = None
             else:
                 self.__neurons = None
+                self.__offsets = None
                 self.__count = None
 
     def get_population_name(self):
@@ -151,6 +267,16 @@ class NeuronMonitor(TransferFunction):
                 population_label += ", " + str(label)
         return population_label
 
+    def __collect_spikes(self):
+        """
+        Adds the spikes recorded in the last step to the spikes of the next message
+        """
+        spikes = self.device.times
+        offsets = self.__offsets
+        if type(spikes) is list and offsets is None:
+            offsets = spike_offsets(self.device.neurons)
+        self.__pending.append(encode_spikes(spikes, offsets))
+
     def __send_spike_recorder(self, t):
         """
         Sends spike data to the given spike recorder monitoring topic
@@ -158,20 +284,11 @@ class NeuronMonitor(TransferFunction):
         :param t: The simulation time
         :return:
         """
-        spikes = self.device.times
-        #if hasattr(spikes, "__getitem__"):
-        if type(spikes) is list:
-            offset = 0
-            msgs = []
-            for i, spikelist in enumerate(spikes):
-                msgs.extend(SpikeData(int(spike[0]) + offset, spike[1])
-                            for spike in spikelist)
-                offset += self.device.neurons[i].size
-        else:
-            msgs = [SpikeData(int(spike[0]), spike[1]) for spike in spikes]
-        self.publisher.send_message(SpikeEvent(
-            t, self.__count, msgs, self.name,
-            self.get_population_name()))
+        self.__collect_spikes()
+        spikes = concatenate_spikes(self.__pending)
+        self.__pending = []
+        self.publisher.send_message(spike_event_type(
+            t, self.__count, spikes, self.name, self.get_population_name()))
 
     def __send_leaky_integrator(self, t):
         """
@@ -200,9 +317,19 @@ class NeuronMonitor(TransferFunction):
         # pylint: disable=broad-except
         try:
             self._params[0] = t
+            due = self.__policy.due(t, self.__context.overloaded)
+            if self.publisher.get_num_connections() == 0:
+                self.__pending = []
+                return
+            if not due:
+                if self.__aggregate:
+                    self.__collect_spikes()
+                return
             return_value = self._func(*self._params[:-2])
             if return_value is not None:
                 self.__handler(t)
+            else:
+                self.__pending = []
         except Exception, e:
             self._handle_error(e, sys.exc_info()[2])
 
@@ -216,5 +343,5 @@ class NeuronMonitor(TransferFunction):
         the topic not being published, without a device it won't be usable anyway.
         """
         if self.device is not None:
-            config.active_node.brain_adapter.unregister_spike_sink(self.device)
+            self.__context.active_node.brain_adapter.unregister_spike_sink(self.device)
             self.device = None
@@ -27,12 +27,179 @@ This module contains the supported neuron selectors
 
 __author__ = 'GeorgHinkel'
 
-from hbp_nrp_cle.tf_framework._PropertyPath import PropertyPath
+import operator
+import inspect
+import numpy
+from hbp_nrp_cle.tf_framework._PropertyPath import PropertyPath, IndexPathSegment, \
+    _path_state, _selector
+from hbp_nrp_cle.brainsim.common import NeuronSelection
+
+
+def _not_vectorizable(*_):
+    """
+    Rejects any use of a mapping item other than integer arithmetic
+    """
+    raise TypeError("The mapping cannot be evaluated for all items at once")
+
+
+class _ItemExpression(object):
+    """
+    Stands in for the item passed to a neuron mapping and records the integer arithmetic applied
+    to it, so that the mapping can be evaluated for all items at once
+    """
+
+    def __init__(self, evaluate=None):
+        """
+        Creates a new item expression
+
+        :param evaluate: A function computing the expression for an array of items
+        """
+        self.evaluate = evaluate or (lambda items: items)
+
+    __nonzero__ = __int__ = __long__ = __float__ = __index__ = __hash__ = _not_vectorizable
+    __str__ = __repr__ = __unicode__ = __format__ = __oct__ = __hex__ = _not_vectorizable
+    __eq__ = __ne__ = __lt__ = __le__ = __gt__ = __ge__ = __cmp__ = _not_vectorizable
+
+
+def _item_operator(op, reflected=False):
+    """
+    Creates an arithmetic operator of item expressions
+
+    :param op: The binary operator
+    :param reflected: True, if the item expression is the right operand
+    :return: The operator method
+    """
+    def apply(self, other):
+        """
+        Combines the item expression with an integer or another item expression
+        """
+        if isinstance(other, _ItemExpression):
+            evaluate_other = other.evaluate
+        elif isinstance(other, (int, long)) and not isinstance(other, bool):
+            def evaluate_other(items):  # pylint: disable=unused-argument
+                """
+                Evaluates the integer for all items
+                """
+                return other
+        else:
+            return NotImplemented
+        evaluate_self = self.evaluate
+        if reflected:
+            return _ItemExpression(lambda items: op(evaluate_other(items), evaluate_self(items)))
+        return _ItemExpression(lambda items: op(evaluate_self(items), evaluate_other(items)))
+    return apply
+
+
+for _name, _op in [('add', operator.add), ('sub', operator.sub), ('mul', operator.mul),
+                   ('div', operator.div), ('floordiv', operator.floordiv),
+                   ('mod', operator.mod)]:
+    setattr(_ItemExpression, '__{0}__'.format(_name), _item_operator(_op))
+    setattr(_ItemExpression, '__r{0}__'.format(_name), _item_operator(_op, True))
+_ItemExpression.__neg__ = lambda self: _ItemExpression(lambda items: -self.evaluate(items))
+_ItemExpression.__pos__ = lambda self: self
+
+
+def _depends_on_item(value, seen=None):
+    """
+    Checks whether the given value refers to an item expression
+
+    :param value: A path, a collection, a function or any other value
+    :param seen: The ids of the values checked already
+    :return: True, if an item expression is found
+    """
+    if isinstance(value, _ItemExpression):
+        return True
+    seen = seen if seen is not None else set()
+    if id(value) in seen:
+        return False
+    seen.add(id(value))
+    if isinstance(value, PropertyPath):
+        children = _path_state(value).values()
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        children = value
+    elif isinstance(value, dict):
+        children = value.keys() + value.values()
+    elif isinstance(value, slice):
+        children = (value.start, value.stop, value.step)
+    elif inspect.isfunction(value):
+        children = [cell.cell_contents for cell in value.func_closure or ()] + \
+            list(value.func_defaults or ())
+    else:
+        return False
+    return any(_depends_on_item(child, seen) for child in children)
+
+
+def _vectorize(mapping):
+    """
+    Tries to express the given mapping as a fixed parent path indexed by integer arithmetic on
+    the mapping item
+
+    :param mapping: The mapping function of a neuron selector
+    :return: A tuple of the parent path and a function computing the indices for an array of
+     items, or None if the mapping cannot be expressed this way
+    """
+    # pylint: disable=broad-except
+    try:
+        path = mapping(_ItemExpression())
+    except Exception:
+        return None
+    if type(path) is not IndexPathSegment or _depends_on_item(path.parent):
+        return None
+    index = path.index
+    if isinstance(index, _ItemExpression):
+        return path.parent, index.evaluate
+    if isinstance(index, (int, long)) and not isinstance(index, bool):
+        return path.parent, lambda items: numpy.full(len(items), index, dtype=numpy.int64)
+    return None
+
+
+def _select_neurons(path, root, bca):
+    """
+    Selects the given path, representing a single neuron of a population as neuron selection
+
+    :param path: The path
+    :param root: The brain root element
+    :param bca: The brain info
+    :return: A neuron selection, or the selected value if the path does not select a single
+     neuron of a population
+    """
+    if type(path) is IndexPathSegment and isinstance(path.index, (int, long)) \
+            and not isinstance(path.index, bool):
+        parent = path.parent.select(root, bca)
+        if parent is not None and bca.is_population(parent):
+            return NeuronSelection([(parent, [path.index])], bca)
+    return path.select(root, bca)
+
+
+def _concatenate(selections, bca):
+    """
+    Concatenates the given selections in linear time
+
+    :param selections: A list of selected neurons or lists of them
+    :param bca: The brain info
+    :return: A neuron selection if all selections are neuron selections, otherwise a list
+    """
+    if selections and all(isinstance(selected, NeuronSelection) for selected in selections):
+        parts = []
+        for selected in selections:
+            parts.extend(selected.parts)
+        return NeuronSelection(parts, bca)
+    result = []
+    for selected in selections:
+        if isinstance(selected, (list, NeuronSelection)):
+            result.extend(selected)
+        else:
+            result.append(selected)
+    return result
 
 
 class MapNeuronSelector(PropertyPath):
     """
     The mapping operator to map a sequence of neurons
+
+    If the mapping indexes a population by integer arithmetic on the item, such as
+    lambda i: nrp.brain.sensors[2 * i + 1], it is evaluated for all items at once and the
+    neurons are selected as a single index array.
     """
 
     # The following is a bug in pylint
@@ -67,26 +234,60 @@ class MapNeuronSelector(PropertyPath):
         """
         return "mapping " + repr(self.mapping)
 
-    def select(self, root, bca):
+    def _compile(self):
         """
-        Selects the neurons based on the given brain root
-        :param root: The brain root element
-        :param bca: The brain info
-        :return: A list of neurons based on the mapper
+        Compiles the selection of the neurons
+
+        :return: A function selecting the neurons for a brain root and a brain info
         """
-        result = []
-        nrange = self.neuron_range
-        if isinstance(nrange, PropertyPath):
-            nrange = nrange.select(root, bca)
-        if isinstance(nrange, int):
-            nrange = range(0, nrange)
-        for item in nrange:
-            neurons = self.mapping(item).select(root, bca)
-            if isinstance(neurons, list):
-                result = result + neurons
-            else:
-                result.append(neurons)
-        return result
+        nrange = self.__neuron_range
+        select_range = _selector(nrange) if isinstance(nrange, PropertyPath) \
+            else lambda root, bca: nrange
+        mapping = self.__mapping
+        vectorized = _vectorize(mapping)
+
+        def select(root, bca):
+            """
+            Selects the neurons based on the given brain root
+            """
+            items = select_range(root, bca)
+            if isinstance(items, int):
+                items = range(0, items)
+            if vectorized is not None:
+                selected = _select_vectorized(vectorized, items, root, bca)
+                if selected is not None:
+                    return selected
+            return _concatenate([_select_neurons(mapping(item), root, bca) for item in items],
+                                bca)
+        return select
+
+
+def _select_vectorized(vectorized, items, root, bca):
+    """
+    Selects the neurons of a vectorized mapping for all items at once
+
+    :param vectorized: The parent path and the index function of the mapping
+    :param items: The items of the mapping
+    :param root: The brain root element
+    :param bca: The brain info
+    :return: The selected neurons, or None if the items are not integers
+    """
+    items = numpy.asarray(items)
+    if items.ndim != 1 or items.dtype.kind not in 'iu':
+        return None
+    parent_path, evaluate = vectorized
+    try:
+        with numpy.errstate(all='raise'):
+            indices = numpy.asarray(evaluate(items), dtype=numpy.int64)
+    except FloatingPointError:
+        # let the mapping raise the error item by item
+        return None
+    parent = parent_path.select(root, bca)
+    if parent is None:
+        return [None] * len(indices)
+    if bca.is_population(parent):
+        return NeuronSelection([(parent, indices)], bca)
+    return [parent[index] for index in indices.tolist()]
 
 
 class ChainNeuronSelector(PropertyPath):
@@ -117,20 +318,20 @@ class ChainNeuronSelector(PropertyPath):
         """
         return '[%s]' % (','.join(repr(s) for s in self.selectors),)
 
-    def select(self, root, bca):
-        """
-        Selects the neurons based on the given brain root
-        :param root: The brain root element
-        :param bca: The brain info
-        """
-        result = []
-        selectors = self.selectors
-        if isinstance(selectors, PropertyPath):
-            selectors = selectors.select(root, bca)
-        for selector in selectors:
-            selected = selector.select(root, bca)
-            if isinstance(selected, list):
-                result = result + selected
-            else:
-                result.append(selected)
-        return result
+    def _compile(self):
+        """
+        Compiles the selection of the neurons
+
+        :return: A function selecting the neurons for a brain root and a brain info
+        """
+        selectors = self.__selectors
+        select_selectors = _selector(selectors) if isinstance(selectors, PropertyPath) \
+            else lambda root, bca: selectors
+
+        def select(root, bca):
+            """
+            Selects the neurons based on the given brain root
+            """
+            return _concatenate([_select_neurons(selector, root, bca)
+                                 for selector in select_selectors(root, bca)], bca)
+        return select
@@ -0,0 +1,539 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+This module runs the bodies of transfer functions in a pool of worker processes. The parameters
+of an offloaded transfer function are replaced by snapshots in the worker: subscribed topics
+carry their current value, variables their value and brain devices the values of their readable
+properties. Attribute assignments and method calls on the parameters are recorded in the worker
+and applied to the actual parameters in the simulation process once the body has returned.
+Large numpy arrays and image payloads are passed through memory mapped files in /dev/shm
+instead of being pickled.
+"""
+
+__author__ = ''
+
+from hbp_nrp_cle.robotsim.RobotInterface import IRobotSubscribedTopic
+from hbp_nrp_cle.brainsim.BrainInterface import IBrainDevice, IDeviceGroup
+from ._GlobalData import DataReference
+import importlib
+import marshal
+import mmap
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import traceback
+import types
+import weakref
+import numpy as np
+
+# Arrays and payloads smaller than this number of bytes are pickled
+SHARED_MEMORY_THRESHOLD = 64 * 1024
+
+# The device properties that are copied into the worker processes
+DEVICE_PROPERTIES = ('active', 'rate', 'amplitude', 'mean', 'spiked', 'times', 'voltage',
+                     'value')
+
+_ALIGNMENT = 64
+
+
+class OffloadedTFException(Exception):
+    """
+    Exception class used to report an error raised by a transfer function in a worker process
+    """
+
+    def __init__(self, message, remote_traceback=None):
+        super(OffloadedTFException, self).__init__(message)
+        self.remote_traceback = remote_traceback
+
+
+def _shared_memory_directory():
+    """
+    Gets the directory in which the shared memory segments are created
+
+    :return: /dev/shm if it is available, otherwise the temporary directory
+    """
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+class SharedMemorySegment(object):
+    """
+    Represents a memory mapped file that the simulation process writes the large inputs of a
+    transfer function call to. The segment grows as needed and is reused for later calls.
+    """
+
+    def __init__(self, directory=None):
+        """
+        Creates a new, empty segment
+
+        :param directory: The directory of the backing file, /dev/shm by default
+        """
+        if directory is None:
+            directory = _shared_memory_directory()
+        self.__fd, self.__path = tempfile.mkstemp(prefix='nrp_tf_', dir=directory)
+        self.__size = 0
+        self.__map = None
+        self.__offset = 0
+
+    @property
+    def path(self):
+        """
+        Gets the path of the file backing this segment
+        """
+        return self.__path
+
+    @property
+    def size(self):
+        """
+        Gets the current size of this segment in bytes
+        """
+        return self.__size
+
+    def clear(self):
+        """
+        Releases the contents of this segment so that it can be written from the start
+        """
+        self.__offset = 0
+
+    def write(self, data):
+        """
+        Appends the given data to this segment
+
+        :param data: A string or numpy array
+        :return: A tuple of the offset and the length of the written data
+        """
+        if isinstance(data, str):
+            data = np.frombuffer(data, dtype=np.uint8)
+        else:
+            data = np.ascontiguousarray(data).reshape(-1).view(np.uint8)
+        offset = self.__offset
+        length = data.size
+        self.__reserve(offset + length)
+        np.frombuffer(self.__map, dtype=np.uint8, count=length, offset=offset)[:] = data
+        self.__offset = offset + length + (-length % _ALIGNMENT)
+        return offset, length
+
+    def __reserve(self, size):
+        """
+        Grows the backing file and its mapping to at least the given size
+
+        :param size: The required size in bytes
+        """
+        if size <= self.__size:
+            return
+        size = max(size, 2 * self.__size)
+        size += -size % mmap.PAGESIZE
+        os.ftruncate(self.__fd, size)
+        # the previous mapping stays valid until all arrays created from it are released
+        self.__map = mmap.mmap(self.__fd, size)
+        self.__size = size
+
+    def close(self):
+        """
+        Closes this segment and removes its backing file
+        """
+        self.__map = None
+        os.close(self.__fd)
+        try:
+            os.unlink(self.__path)
+        except OSError:
+            pass
+
+
+_worker_maps = {}
+
+
+def _map_segment(path, end):
+    """
+    Maps the given segment into the current worker process
+
+    :param path: The path of the backing file
+    :param end: The number of bytes that must be accessible
+    :return: A read-only memory map of the segment
+    """
+    mapped = _worker_maps.get(path)
+    if mapped is None or len(mapped) < end:
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _worker_maps[path] = mapped
+    return mapped
+
+
+class _SharedArray(object):
+    """
+    Stands in for a numpy array that was written to a shared memory segment
+    """
+
+    def __init__(self, path, offset, length, dtype, shape):
+        self.path = path
+        self.offset = offset
+        self.length = length
+        self.dtype = dtype
+        self.shape = shape
+
+    def restore(self):
+        """
+        Gets a read-only array that views the shared memory segment
+        """
+        mapped = _map_segment(self.path, self.offset + self.length)
+        dtype = np.dtype(self.dtype)
+        return np.frombuffer(mapped, dtype=dtype, count=self.length // dtype.itemsize,
+                             offset=self.offset).reshape(self.shape)
+
+
+class _SharedMessage(object):
+    """
+    Stands in for a ROS message such as sensor_msgs/Image whose data payload was written to a
+    shared memory segment
+    """
+
+    def __init__(self, message_type, fields, path, offset, length):
+        self.message_type = message_type
+        self.fields = fields
+        self.path = path
+        self.offset = offset
+        self.length = length
+
+    def restore(self):
+        """
+        Recreates the message in the worker process
+        """
+        message = self.message_type(**self.fields)
+        mapped = _map_segment(self.path, self.offset + self.length)
+        message.data = mapped[self.offset:self.offset + self.length]
+        return message
+
+
+def share(value, segment):
+    """
+    Prepares the given value to be sent to a worker process. Large numpy arrays and ROS messages
+    with large data payloads are written to the given segment, lists and tuples are searched
+    for such values.
+
+    :param value: The value to send
+    :param segment: The shared memory segment
+    :return: A picklable representation of the value
+    """
+    if isinstance(value, np.ndarray):
+        if value.nbytes >= SHARED_MEMORY_THRESHOLD and not value.dtype.hasobject:
+            offset, length = segment.write(value)
+            return _SharedArray(segment.path, offset, length, value.dtype.str, value.shape)
+        return value
+    if type(value) in (list, tuple):
+        return type(value)(share(item, segment) for item in value)
+    slots = getattr(value, '__slots__', None)
+    if slots and 'data' in slots and hasattr(value, '_type'):
+        data = value.data
+        if isinstance(data, str) and len(data) >= SHARED_MEMORY_THRESHOLD:
+            fields = dict((slot, getattr(value, slot)) for slot in slots if slot != 'data')
+            offset, length = segment.write(data)
+            return _SharedMessage(type(value), fields, segment.path, offset, length)
+    return value
+
+
+def restore(value):
+    """
+    Restores a value prepared by :func:`share` in a worker process
+
+    :param value: The value as received by the worker
+    :return: The value
+    """
+    if isinstance(value, (_SharedArray, _SharedMessage)):
+        return value.restore()
+    if type(value) in (list, tuple):
+        return type(value)(restore(item) for item in value)
+    return value
+
+
+def snapshot(param, segment):
+    """
+    Takes a snapshot of the readable state of the given transfer function parameter
+
+    :param param: The parameter
+    :param segment: The shared memory segment for large values
+    :return: A dictionary of attribute values and the names of the attributes to write back
+    """
+    if isinstance(param, IRobotSubscribedTopic):
+        return {'value': share(param.value, segment), 'changed': param.changed}, ()
+    if isinstance(param, DataReference):
+        # the value may be changed in place, so it is always written back
+        return {'value': param.value, 'name': param.name}, ('value',)
+    if isinstance(param, IBrainDevice):
+        state = {}
+        device_type = type(param)
+        if isinstance(param, IDeviceGroup):
+            device_type = param.device_type
+            state['__len__'] = len(param)
+        for name in DEVICE_PROPERTIES:
+            if hasattr(device_type, name):
+                # pylint: disable=broad-except
+                try:
+                    state[name] = share(getattr(param, name), segment)
+                except Exception:
+                    pass
+        return state, ()
+    return {}, ()
+
+
+class _ParameterProxy(object):
+    """
+    Stands in for a transfer function parameter in a worker process. Reads are served from the
+    snapshot of the parameter, writes and method calls are recorded.
+    """
+
+    def __init__(self, index, path, state, writes):
+        """
+        Creates a new proxy
+
+        :param index: The index of the parameter
+        :param path: The indices that lead from the parameter to the proxied object
+        :param state: The snapshot of the proxied object
+        :param writes: The list the writes are recorded to
+        """
+        object.__setattr__(self, '_index', index)
+        object.__setattr__(self, '_path', path)
+        object.__setattr__(self, '_state', state)
+        object.__setattr__(self, '_writes', writes)
+
+    def __getattr__(self, name):
+        if name in self._state:
+            return self._state[name]
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        def record_call(*args, **kwargs):
+            """
+            Records a method call on the proxied object
+            """
+            self._writes.append((self._index, self._path, 'call', name, (args, kwargs)))
+        return record_call
+
+    def __setattr__(self, name, value):
+        self._state[name] = value
+        self._writes.append((self._index, self._path, 'set', name, value))
+
+    def __getitem__(self, key):
+        state = {}
+        for name, value in self._state.iteritems():
+            # pylint: disable=broad-except
+            try:
+                state[name] = value[key]
+            except Exception:
+                pass
+        return _ParameterProxy(self._index, self._path + (key,), state, self._writes)
+
+    def __len__(self):
+        if '__len__' not in self._state:
+            raise TypeError("The length of this parameter is not known in a worker process")
+        return self._state['__len__']
+
+
+_functions = {}
+
+
+def _load_function(module, name, code, defaults):
+    """
+    Gets the function for the given marshalled code, using the globals of the given module
+
+    :param module: The name of the module the function was defined in
+    :param name: The name of the function
+    :param code: The marshalled code object
+    :param defaults: The default values of the function parameters
+    """
+    key = (module, name, code)
+    func = _functions.get(key)
+    if func is None:
+        if module not in sys.modules:
+            importlib.import_module(module)
+        func = types.FunctionType(marshal.loads(code), vars(sys.modules[module]), name, defaults)
+        if len(_functions) > 64:
+            _functions.clear()
+        _functions[key] = func
+    return func
+
+
+def run_offloaded(module, name, code, defaults, t, snapshots):
+    """
+    Runs a transfer function body in a worker process
+
+    :param module: The name of the module the function was defined in
+    :param name: The name of the function
+    :param code: The marshalled code object
+    :param defaults: The default values of the function parameters
+    :param t: The simulation time
+    :param snapshots: The snapshots of the remaining parameters
+    :return: A tuple of an error message and traceback, the return value and the recorded writes
+    """
+    # pylint: disable=broad-except
+    try:
+        func = _load_function(module, name, code, defaults)
+        writes = []
+        proxies = []
+        for index, (state, write_back) in enumerate(snapshots, 1):
+            state = dict((key, restore(value)) for key, value in state.iteritems())
+            proxies.append((_ParameterProxy(index, (), state, writes), write_back))
+        return_value = func(t, *[proxy for proxy, _ in proxies])
+        for proxy, write_back in proxies:
+            # pylint: disable=protected-access
+            for attribute in write_back:
+                writes.append((proxy._index, (), 'set', attribute, proxy._state[attribute]))
+        return None, return_value, writes
+    except Exception as e:
+        return ("{0}: {1}".format(type(e).__name__, e), traceback.format_exc()), None, None
+
+
+def apply_writes(params, writes):
+    """
+    Applies the writes recorded in a worker process to the actual parameters
+
+    :param params: The parameters of the transfer function
+    :param writes: The recorded writes
+    """
+    for index, path, kind, name, payload in writes:
+        target = params[index]
+        for key in path:
+            target = target[key]
+        if kind == 'set':
+            setattr(target, name, payload)
+        else:
+            getattr(target, name)(*payload[0], **payload[1])
+
+
+class OffloadPool(object):
+    """
+    Represents the pool of worker processes that offloaded transfer functions are run in
+    """
+
+    def __init__(self, processes=None):
+        """
+        Creates a new pool. The worker processes are started when the first transfer function
+        is run and stopped again by a shutdown.
+
+        :param processes: The number of worker processes, the number of CPUs by default
+        """
+        self.__processes = processes
+        self.__pool = None
+        self.__lock = threading.Lock()
+        self.__segments = []
+        self.__free_segments = []
+        self.__code = weakref.WeakKeyDictionary()
+
+    @property
+    def processes(self):
+        """
+        Gets the number of worker processes
+        """
+        return self.__processes
+
+    @processes.setter
+    def processes(self, value):
+        """
+        Sets the number of worker processes
+
+        :param value: The number of processes or None to use one process per CPU
+        """
+        if value is not None and (not isinstance(value, int) or value < 1):
+            raise ValueError("The number of worker processes must be at least 1")
+        if value != self.__processes and self.__pool is not None:
+            raise Exception("The number of worker processes cannot be changed while they run")
+        self.__processes = value
+
+    @property
+    def started(self):
+        """
+        Gets a value indicating whether the worker processes have been started
+        """
+        return self.__pool is not None
+
+    def __acquire(self, func):
+        """
+        Gets the pool, a free segment and the marshalled code of the given function
+
+        :param func: The transfer function body
+        """
+        with self.__lock:
+            if self.__pool is None:
+                self.__pool = multiprocessing.Pool(self.__processes)
+            if self.__free_segments:
+                segment = self.__free_segments.pop()
+            else:
+                segment = SharedMemorySegment()
+                self.__segments.append(segment)
+            code = self.__code.get(func)
+            if code is None:
+                code = self.__code[func] = marshal.dumps(func.func_code)
+            return self.__pool, segment, code
+
+    def run(self, func, params):
+        """
+        Runs the given transfer function body in a worker process and applies the writes to
+        the parameters
+
+        :param func: The transfer function body
+        :param params: The parameters, starting with the simulation time
+        :return: The return value of the transfer function body
+        """
+        pool, segment, code = self.__acquire(func)
+        try:
+            snapshots = [snapshot(param, segment) for param in params[1:]]
+            error, return_value, writes = pool.apply_async(
+                run_offloaded,
+                (func.__module__, func.__name__, code, func.func_defaults, params[0], snapshots)
+            ).get()
+        finally:
+            segment.clear()
+            with self.__lock:
+                self.__free_segments.append(segment)
+        if error is not None:
+            raise OffloadedTFException(*error)
+        apply_writes(params, writes)
+        return return_value
+
+    def reset_after_fork(self):
+        """
+        Makes the pool usable in a forked process. The worker processes and the threads of the
+        pool belong to the parent process, so new ones are started when they are needed. The
+        shared memory segments are dropped without removing them, as the parent still uses them.
+        """
+        self.__lock = threading.Lock()
+        self.__pool = None
+        self.__segments = []
+        self.__free_segments = []
+
+    def shutdown(self):
+        """
+        Stops the worker processes and removes the shared memory segments
+        """
+        with self.__lock:
+            if self.__pool is not None:
+                self.__pool.terminate()
+                self.__pool.join()
+                self.__pool = None
+            for segment in self.__segments:
+                segment.close()
+            del self.__segments[:]
+            del self.__free_segments[:]
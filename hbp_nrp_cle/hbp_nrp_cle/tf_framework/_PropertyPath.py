@@ -29,13 +29,23 @@ __author__ = 'GeorgHinkel'
 
 from copy import deepcopy
 import inspect
+import hbp_nrp_cle.common
 
 
 class PropertyPath(object):
     """
     Represents the path to a specified sub object
+
+    A path is compiled into a function of the brain root and the brain info when it is selected
+    for the first time, and the result of the last selection is kept until the brain root or the
+    brain info change or a new brain version is loaded. Subclasses should therefore override
+    _compile rather than select.
     """
 
+    # the compiled selection and the memoized result, these are no path segments
+    __compiled = None
+    __memo = None
+
     def __getattr__(self, item):
         """
         Gets the attribute with the specified name
@@ -256,7 +266,23 @@ class PropertyPath(object):
         """
         return "(root)"
 
-    # pylint: disable=unused-argument, no-self-use
+    def equivalent_to(self, other):
+        """
+        Checks whether the given path is structurally identical to this path, i.e. whether it
+        consists of the same segments with equivalent arguments. Unlike the == operator, this
+        does not create a new path.
+
+        :param other: Another path
+        :return: True, if both paths select the same elements, otherwise False
+        """
+        if type(self) is not type(other):
+            return False
+        mine = _path_state(self)
+        theirs = _path_state(other)
+        if set(mine) != set(theirs):
+            return False
+        return all(equivalent(mine[key], theirs[key]) for key in mine)
+
     def select(self, root, bca):
         """
         Selects the path represented by this instance started from the given root object
@@ -264,17 +290,122 @@ class PropertyPath(object):
         :param root: The specified root object
         :param bca: The brain info
         """
-        return root
+        memo = self.__memo
+        version = hbp_nrp_cle.common.brain_version
+        if memo is not None and memo[0] == version and memo[1] is root and memo[2] is bca:
+            return memo[3]
+        value = self._compiled()(root, bca)
+        self.__memo = (version, root, bca, value)
+        return value
+
+    def _compiled(self):
+        """
+        Gets the compiled selection of this path, compiling it on first use
+
+        :return: A function selecting the path for a brain root and a brain info
+        """
+        compiled = self.__compiled
+        if compiled is None:
+            compiled = self.__compiled = self._compile()
+        return compiled
+
+    def _invalidate(self):
+        """
+        Discards the compiled selection and the memoized result of this path
+        """
+        self.__compiled = None
+        self.__memo = None
+
+    # pylint: disable=no-self-use
+    def _compile(self):
+        """
+        Compiles the selection of this path
+
+        :return: A function selecting the path for a brain root and a brain info
+        """
+        return _select_root
+
+    def _path_steps(self):
+        """
+        Gets the path this path is based on and the attribute and index steps leading from it to
+        this path
+
+        :return: A tuple of the base path and a list of (is_index, name or index) tuples
+        """
+        return self, []
 
     def __deepcopy__(self, memo):
         cls = self.__class__
         result = cls.__new__(cls)
         memo[id(self)] = result
-        for k, v in self.__dict__.items():
+        for k, v in _path_state(self).items():
             setattr(result, k, deepcopy(v, memo))
         return result
 
 
+# pylint: disable=unused-argument
+def _select_root(root, bca):
+    """
+    Selects the root path
+    """
+    return root
+
+
+_CACHE_ATTRIBUTES = ('_PropertyPath__compiled', '_PropertyPath__memo')
+
+
+def _path_state(path):
+    """
+    Gets the attributes of the given path that define its selection
+
+    :param path: The path
+    :return: A dictionary of the attributes without the compiled selection and memoized result
+    """
+    return dict((key, value) for key, value in vars(path).items()
+                if key not in _CACHE_ATTRIBUTES)
+
+
+def _selector(path):
+    """
+    Gets a function selecting the given path. Paths that override select instead of _compile are
+    selected through their select method.
+
+    :param path: The path
+    :return: A function of the brain root and the brain info
+    """
+    if type(path).select.im_func is not PropertyPath.select.im_func:
+        return path.select
+    return path._compiled()  # pylint: disable=protected-access
+
+
+def _compile_steps(base, steps):
+    """
+    Compiles a chain of attribute and index steps into a single function
+
+    :param base: The path the steps start from
+    :param steps: A list of (is_index, name or index) tuples
+    :return: A function selecting the end of the chain for a brain root and a brain info
+    """
+    select_base = None if type(base) is PropertyPath else _selector(base)
+
+    def select(root, bca):
+        """
+        Selects the chain by applying the steps one after another
+        """
+        value = root if select_base is None else select_base(root, bca)
+        for is_index, key in steps:
+            if value is None:
+                return None
+            if not is_index:
+                value = getattr(value, key)
+            elif bca.is_population(value):
+                value = bca.create_view(value, key)
+            else:
+                value = value[key]
+        return value
+    return select
+
+
 class AttributePathSegment(PropertyPath):
     """
     Represents an attribute segment in a property path
@@ -309,6 +440,7 @@ class AttributePathSegment(PropertyPath):
         :param value: The new attribute name
         """
         self.__name = value
+        self._invalidate()
 
     def __repr__(self):
         """
@@ -316,17 +448,23 @@ class AttributePathSegment(PropertyPath):
         """
         return repr(self.__parent) + "." + self.name
 
-    def select(self, root, bca):
+    def _path_steps(self):
         """
-        Selects the path represented by this instance started from the given root object
+        Gets the path this path is based on and the attribute and index steps leading from it to
+        this path
 
-        :param root: The specified root object
-        :param bca: The brain info
+        :return: A tuple of the base path and a list of (is_index, name or index) tuples
         """
-        parent = self.__parent.select(root, bca)
-        if parent is None:
-            return None
-        return getattr(parent, self.name)
+        base, steps = self.__parent._path_steps()  # pylint: disable=protected-access
+        return base, steps + [(False, self.__name)]
+
+    def _compile(self):
+        """
+        Compiles the selection of this path
+
+        :return: A function selecting the path for a brain root and a brain info
+        """
+        return _compile_steps(*self._path_steps())
 
 
 class ConstantSegment(PropertyPath):
@@ -347,14 +485,14 @@ class ConstantSegment(PropertyPath):
         """
         return repr(self.__value)
 
-    def select(self, root, bca):
+    def _compile(self):
         """
-        Selects the path represented by this instance started from the given root object
+        Compiles the selection of this path
 
-        :param root: The specified root object
-        :param bca: The brain info
+        :return: A function selecting the path for a brain root and a brain info
         """
-        return self.__value
+        value = self.__value
+        return lambda root, bca: value
 
 
 class CallSegment(PropertyPath):
@@ -379,18 +517,24 @@ class CallSegment(PropertyPath):
         """
         return repr(self.__parent) + "(" + ", ".join(map(repr, self.__args)) + ")"
 
-    def select(self, root, bca):
+    def _compile(self):
         """
-        Selects the path represented by this instance started from the given root object
+        Compiles the selection of this path
 
-        :param root: The specified root object
-        :param bca: The brain info
+        :return: A function selecting the path for a brain root and a brain info
         """
-        parent = self.__parent.select(root, bca)
-        if parent is None:
-            return None
-        args = [arg.select(root, bca) for arg in self.__args]
-        return parent(*args)
+        select_parent = _selector(self.__parent)
+        select_args = [_selector(arg) for arg in self.__args]
+
+        def select(root, bca):
+            """
+            Selects the function and calls it with the selected arguments
+            """
+            parent = select_parent(root, bca)
+            if parent is None:
+                return None
+            return parent(*[select_arg(root, bca) for select_arg in select_args])
+        return select
 
 
 class EqualsSegment(PropertyPath):
@@ -434,16 +578,16 @@ class EqualsSegment(PropertyPath):
         """
         return repr(self.__left) + self.operator_name() + repr(self.__right)
 
-    def select(self, root, bca):
+    def _compile(self):
         """
-        Gets the value for this property path for the given brain root and adapter
+        Compiles the selection of this path
 
-        :param root: The root module of the brain
-        :param bca: The brain control adapter
+        :return: A function selecting the path for a brain root and a brain info
         """
-        left = self.__left.select(root, bca)
-        right = self.__right.select(root, bca)
-        return self.operate(left, right)
+        select_left = _selector(self.__left)
+        select_right = _selector(self.__right)
+        operate = self.operate
+        return lambda root, bca: operate(select_left(root, bca), select_right(root, bca))
 
 
 class NotEqualsSegment(EqualsSegment):
@@ -627,14 +771,13 @@ class CustomSegment(PropertyPath):
         """
         return "(custom)"
 
-    def select(self, root, bca):
+    def _compile(self):
         """
-        Selects the path represented by this instance started from the given root object
+        Compiles the selection of this path
 
-        :param root: The specified root object
-        :param bca: The brain info
+        :return: A function selecting the path for a brain root and a brain info
         """
-        return self.__fun(root, bca)
+        return self.__fun
 
 
 class IndexPathSegment(PropertyPath):
@@ -666,20 +809,23 @@ class IndexPathSegment(PropertyPath):
         """
         return self.__parent.__repr__() + "[" + self.__index.__repr__() + "]"
 
-    def select(self, root, bca):
+    def _path_steps(self):
         """
-        Selects the path represented by this instance started from the given root object
+        Gets the path this path is based on and the attribute and index steps leading from it to
+        this path
 
-        :param root: The specified root object
-        :param bca: The brain info
+        :return: A tuple of the base path and a list of (is_index, name or index) tuples
         """
-        parent = self.__parent.select(root, bca)
-        if parent is None:
-            return None
-        if bca.is_population(parent):
-            return bca.create_view(parent, self.__index)
-        else:
-            return parent[self.__index]
+        base, steps = self.__parent._path_steps()  # pylint: disable=protected-access
+        return base, steps + [(True, self.__index)]
+
+    def _compile(self):
+        """
+        Compiles the selection of this path
+
+        :return: A function selecting the path for a brain root and a brain info
+        """
+        return _compile_steps(*self._path_steps())
 
     @property
     def parent(self):
@@ -707,14 +853,61 @@ class RangeSegment(PropertyPath):
                                                   repr(self.__stop),
                                                   repr(self.__step))
 
-    def select(self, root, bca):
+    def _compile(self):
         """
-        Selects the path represented by this instance started from the given root object
+        Compiles the selection of this path
 
-        :param root: The specified root object
-        :param bca: The brain info
+        :return: A function selecting the path for a brain root and a brain info
         """
-        start = self.__start.select(root, bca)
-        stop = self.__stop.select(root, bca)
-        step = self.__step.select(root, bca)
-        return range(start, stop, step or 1)
+        select_start = _selector(self.__start)
+        select_stop = _selector(self.__stop)
+        select_step = _selector(self.__step)
+        return lambda root, bca: range(select_start(root, bca), select_stop(root, bca),
+                                       select_step(root, bca) or 1)
+
+
+_CODE_ATTRIBUTES = ('co_argcount', 'co_flags', 'co_code', 'co_names', 'co_varnames',
+                    'co_freevars', 'co_cellvars')
+
+
+def equivalent(first, second):
+    """
+    Checks whether the given values are equivalent. Property paths and objects implementing
+    equivalent_to are compared structurally, functions by their code and the values they
+    capture, and any other value by equality
+
+    :param first: The first value
+    :param second: The second value
+    :return: True, if both values are equivalent, otherwise False
+    """
+    # pylint: disable=too-many-return-statements
+    if first is second:
+        return True
+    if isinstance(first, PropertyPath):
+        return first.equivalent_to(second)
+    if getattr(type(first), 'equivalent_to', None) is not None:
+        return first.equivalent_to(second)
+    if inspect.iscode(first):
+        # line numbers are ignored so that moving code around does not matter
+        return inspect.iscode(second) and \
+            all(getattr(first, attr) == getattr(second, attr) for attr in _CODE_ATTRIBUTES) \
+            and equivalent(first.co_consts, second.co_consts)
+    if inspect.isfunction(first):
+        if not inspect.isfunction(second) or not equivalent(first.func_code, second.func_code):
+            return False
+        return equivalent(first.func_defaults, second.func_defaults) and \
+            equivalent([cell.cell_contents for cell in first.func_closure or ()],
+                       [cell.cell_contents for cell in second.func_closure or ()])
+    if isinstance(first, (list, tuple)):
+        return type(first) is type(second) and len(first) == len(second) and \
+            all(equivalent(a, b) for a, b in zip(first, second))
+    if isinstance(first, dict):
+        return isinstance(second, dict) and set(first) == set(second) and \
+            all(equivalent(first[key], second[key]) for key in first)
+    if isinstance(second, PropertyPath):
+        return False
+    try:
+        return bool(first == second)
+    except ValueError:
+        # element-wise comparisons such as for numpy arrays
+        return bool((first == second).all())
@@ -29,9 +29,10 @@ neuronal simulator
 __author__ = 'Georg Hinkel'
 
 from hbp_nrp_cle.robotsim.RobotInterface import Topic, IRobotCommunicationAdapter
-from . import config
+from hbp_nrp_cle import context as sim_context
 from ._TransferFunction import TransferFunction
 from ._MappingSpecification import ParameterMappingSpecification
+from ._PropertyPath import equivalent
 
 import logging
 logger = logging.getLogger(__name__)
@@ -77,6 +78,17 @@ class MapRobotPublisher(ParameterMappingSpecification):
         """
         return True
 
+    def is_equivalent(self, other):
+        """
+        Gets a value indicating whether the adapter created for the given mapping can be reused
+        for this mapping
+
+        :param other: The mapping of the existing adapter
+        :return: True, if the mapping refers to the same topic with the same configuration
+        """
+        return type(other) is type(self) and equivalent(other.topic, self.__value) \
+            and equivalent(other.config, self.__config)
+
     def create_adapter(self, transfer_function_manager):
         """
         Creates the adapter for this mapping operator
@@ -124,7 +136,7 @@ class Robot2Neuron(TransferFunction):
         :param func: The function implementing the transfer function
         :return: The transfer function object
         """
-        self._init_function(func, config.active_node.r2n)
+        self._init_function(func, sim_context.current().active_node.r2n)
         return self
 
     def __repr__(self):  # pragma: no cover
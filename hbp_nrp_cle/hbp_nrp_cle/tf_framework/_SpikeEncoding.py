@@ -0,0 +1,213 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+This module encodes the spikes recorded by a spike recorder into monitoring messages without
+creating a Python object per spike. Spikes are kept in numpy arrays and written to the message
+buffer as a packed record array.
+"""
+
+__author__ = ''
+
+from cle_ros_msgs.msg import SpikeEvent, SpikeData
+from cStringIO import StringIO
+import struct
+import numpy as np
+
+# the wire format of the primitive ROS message field types, all little endian and unpadded
+_PRIMITIVE_TYPES = {
+    'bool': '?', 'byte': 'i1', 'char': 'u1', 'int8': 'i1', 'uint8': 'u1',
+    'int16': '<i2', 'uint16': '<u2', 'int32': '<i4', 'uint32': '<u4',
+    'int64': '<i8', 'uint64': '<u8', 'float32': '<f4', 'float64': '<f8',
+    'time': '<u8', 'duration': '<i8'
+}
+_LENGTH = struct.Struct('<I')
+
+
+class SpikeArray(object):
+    """
+    A read-only sequence of spikes backed by an array of neuron ids and an array of spike times.
+    Items are created as SpikeData messages on access only.
+    """
+
+    def __init__(self, neurons, times):
+        """
+        Creates a new spike array
+
+        :param neurons: The neuron ids as integer array
+        :param times: The spike times as float array of the same length
+        """
+        self.neurons = neurons
+        self.times = times
+
+    def __len__(self):
+        return len(self.neurons)
+
+    def __getitem__(self, index):
+        return SpikeData(int(self.neurons[index]), float(self.times[index]))
+
+    def __iter__(self):
+        for neuron, time in zip(self.neurons.tolist(), self.times.tolist()):
+            yield SpikeData(neuron, time)
+
+    def tostring(self, dtype):
+        """
+        Packs the spikes into the wire format of a SpikeData array
+
+        :param dtype: The numpy record type of a single SpikeData message
+        :return: The packed spikes
+        """
+        records = np.empty(len(self.neurons), dtype)
+        neuron_field, time_field = dtype.names
+        records[neuron_field] = self.neurons
+        records[time_field] = self.times
+        return records.tostring()
+
+
+def spike_offsets(populations):
+    """
+    Computes the offset of the neuron ids of every population when the populations are merged
+
+    :param populations: The list of populations
+    :return: An integer array with the offset of every population
+    """
+    sizes = np.array([population.size for population in populations], dtype=np.int64)
+    return np.cumsum(sizes) - sizes
+
+
+def encode_spikes(spikes, offsets=None):
+    """
+    Converts the spikes recorded by a spike recorder into a spike array
+
+    :param spikes: A two-column array of neuron ids and times, or a list of such arrays for
+     a spike recorder that records multiple populations
+    :param offsets: The neuron id offsets of the populations if spikes is a list
+    :return: A spike array
+    """
+    if type(spikes) is list:
+        arrays = [np.asarray(population, dtype=np.float64).reshape(-1, 2)
+                  for population in spikes]
+        if not arrays:
+            return SpikeArray(np.empty(0, np.int64), np.empty(0, np.float64))
+        merged = np.concatenate(arrays)
+        counts = [len(array) for array in arrays]
+        neurons = merged[:, 0].astype(np.int64) + np.repeat(offsets[:len(arrays)], counts)
+    else:
+        merged = np.asarray(spikes, dtype=np.float64).reshape(-1, 2)
+        neurons = merged[:, 0].astype(np.int64)
+    return SpikeArray(neurons, merged[:, 1])
+
+
+def concatenate_spikes(arrays):
+    """
+    Merges the given spike arrays into a single spike array, keeping their order
+
+    :param arrays: A list of spike arrays
+    :return: A spike array with the spikes of all arrays
+    """
+    if len(arrays) == 1:
+        return arrays[0]
+    if not arrays:
+        return SpikeArray(np.empty(0, np.int64), np.empty(0, np.float64))
+    return SpikeArray(np.concatenate([array.neurons for array in arrays]),
+                      np.concatenate([array.times for array in arrays]))
+
+
+def _record_type(message_type):
+    """
+    Gets the numpy record type matching the wire format of the given message type
+
+    :param message_type: A message class generated by genpy
+    :return: The record type or None, if the message contains non-primitive fields
+    """
+    slot_types = getattr(message_type, '_slot_types', None)
+    if not isinstance(slot_types, list) or len(slot_types) != 2 or \
+            any(slot_type not in _PRIMITIVE_TYPES for slot_type in slot_types):
+        return None
+    return np.dtype([(str(name), _PRIMITIVE_TYPES[slot_type])
+                     for name, slot_type in zip(message_type.__slots__, slot_types)])
+
+
+def create_event_type(event_type=SpikeEvent, data_type=SpikeData):
+    """
+    Creates a spike event message type that serializes spike arrays in a single write. If the
+    message layout is not supported, the given spike event type is used directly.
+
+    :param event_type: The generated spike event message type
+    :param data_type: The generated spike data message type
+    :return: The message type
+    """
+    if not isinstance(event_type, type):
+        return event_type
+    record_type = _record_type(data_type)
+    slots = list(getattr(event_type, '__slots__', []))
+    slot_types = list(getattr(event_type, '_slot_types', []))
+    if record_type is None or 'spikes' not in slots:
+        return event_type
+    prefix = list(zip(slots, slot_types))[:slots.index('spikes')]
+    if any(slot_type != 'string' and slot_type not in _PRIMITIVE_TYPES
+           for _, slot_type in prefix):
+        return event_type
+
+    def spikes_offset(message):
+        """
+        Computes the position of the spikes array in the serialized message
+        """
+        offset = 0
+        for name, slot_type in prefix:
+            if slot_type == 'string':
+                value = getattr(message, name)
+                if isinstance(value, unicode):
+                    value = value.encode('utf-8')
+                offset += _LENGTH.size + len(value)
+            else:
+                offset += np.dtype(_PRIMITIVE_TYPES[slot_type]).itemsize
+        return offset
+
+    def serialize(self, buff):
+        """
+        Serializes the message into the given buffer, writing the spikes as packed records
+
+        :param buff: The buffer
+        """
+        spikes = self.spikes
+        if not isinstance(spikes, SpikeArray):
+            return event_type.serialize(self, buff)
+        self.spikes = []
+        try:
+            head = StringIO()
+            event_type.serialize(self, head)
+            offset = spikes_offset(self)
+        finally:
+            self.spikes = spikes
+        data = head.getvalue()
+        buff.write(data[:offset])
+        buff.write(_LENGTH.pack(len(spikes)))
+        buff.write(spikes.tostring(record_type))
+        buff.write(data[offset + _LENGTH.size:])
+
+    return type('Array' + event_type.__name__, (event_type,),
+                {'__slots__': (), 'serialize': serialize})
+
+
+spike_event_type = create_event_type()
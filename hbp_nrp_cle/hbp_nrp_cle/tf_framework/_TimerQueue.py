@@ -0,0 +1,155 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+This module keeps track of the simulation times at which the time-triggered transfer functions
+are due, so that a step only needs to look at the transfer functions that actually run.
+"""
+
+__author__ = ''
+
+from ._TransferFunction import TransferFunction
+import heapq
+
+
+class VersionedList(list):
+    """
+    A list that counts the modifications made to it
+    """
+
+    def __init__(self, *args):
+        super(VersionedList, self).__init__(*args)
+        self.version = 0
+
+    def __modifies(method):  # pylint: disable=no-self-argument
+        """
+        Wraps the given list method so that it increments the version
+        """
+        def modify(self, *args):
+            """
+            Calls the list method and increments the version
+            """
+            self.version += 1
+            return method(self, *args)  # pylint: disable=not-callable
+        modify.__name__ = method.__name__
+        modify.__doc__ = method.__doc__
+        return modify
+
+    append = __modifies(list.append)
+    extend = __modifies(list.extend)
+    insert = __modifies(list.insert)
+    remove = __modifies(list.remove)
+    pop = __modifies(list.pop)
+    sort = __modifies(list.sort)
+    reverse = __modifies(list.reverse)
+    __setitem__ = __modifies(list.__setitem__)
+    __delitem__ = __modifies(list.__delitem__)
+    __setslice__ = __modifies(list.__setslice__)
+    __delslice__ = __modifies(list.__delslice__)
+    __iadd__ = __modifies(list.__iadd__)
+    __imul__ = __modifies(list.__imul__)
+
+
+class TimerQueue(object):
+    """
+    Keeps the active transfer functions of a list in a priority queue ordered by the simulation
+    time at which they are due next. The queue is rebuilt whenever the list is modified or the
+    activation or throttling of a transfer function changes.
+    """
+
+    def __init__(self, tfs):
+        """
+        Creates a new timer queue
+
+        :param tfs: The list of transfer functions, a VersionedList
+        """
+        self.__tfs = tfs
+        self.__heap = []
+        self.__indices = {}
+        self.__version = None
+
+    def invalidate(self):
+        """
+        Forces a rebuild of the queue, e.g. after the simulation time was reset
+        """
+        self.__version = None
+
+    def __update(self):
+        """
+        Rebuilds the queue if the transfer functions have changed since it was built
+        """
+        version = (self.__tfs.version, TransferFunction.schedule_generation)
+        if version != self.__version:
+            self.__indices = dict((id(tf), index) for index, tf in enumerate(self.__tfs))
+            self.__heap = [(tf.next_run_time, index, tf)
+                           for index, tf in enumerate(self.__tfs) if tf.active]
+            heapq.heapify(self.__heap)
+            self.__version = version
+
+    def pop_due(self, t):
+        """
+        Removes the transfer functions due at the given simulation time from the queue
+
+        :param t: The simulation time
+        :return: The due transfer functions in the order of the list
+        """
+        self.__update()
+        heap = self.__heap
+        due = []
+        while heap and heap[0][0] <= t:
+            entry = heapq.heappop(heap)
+            tf = entry[2]
+            next_run_time = tf.next_run_time
+            if next_run_time > t:
+                # the transfer function has run in the meantime, e.g. through a trigger
+                heapq.heappush(heap, (next_run_time, entry[1], tf))
+            else:
+                due.append(entry)
+        due.sort()
+        return [due_entry[2] for due_entry in due]
+
+    def push(self, tfs):
+        """
+        Puts the given transfer functions back into the queue after they have run
+
+        :param tfs: The transfer functions previously returned by pop_due
+        """
+        if (self.__tfs.version, TransferFunction.schedule_generation) != self.__version:
+            # the queue is rebuilt from the list anyway
+            return
+        for tf in tfs:
+            heapq.heappush(self.__heap, (tf.next_run_time, self.__indices[id(tf)], tf))
+
+    def next_due_time(self):
+        """
+        Gets the earliest simulation time at which a transfer function of the list may be due
+
+        :return: The simulation time, or infinity if the list has no active transfer function
+        """
+        self.__update()
+        heap = self.__heap
+        # correct the entries of transfer functions that have run outside of the manager
+        while heap and heap[0][0] != heap[0][2].next_run_time:
+            tf = heap[0][2]
+            heapq.heapreplace(heap, (tf.next_run_time, heap[0][1], tf))
+        return heap[0][0] if heap else float('inf')
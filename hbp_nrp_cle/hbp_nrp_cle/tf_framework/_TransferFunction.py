@@ -29,9 +29,11 @@ import inspect
 import textwrap
 import logging
 import hbp_nrp_cle.common
+from hbp_nrp_cle import context as sim_context
 from hbp_nrp_cle.tf_framework import TFException, TFRunningException
 from abc import abstractmethod
 import sys
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -57,7 +59,10 @@ class TransferFunction(object):
 
     excepthook = __default_excepthook
 
-    def __init__(self, triggers=None, throttling_rate=None):
+    # incremented whenever the activation or the throttling of a transfer function changes
+    schedule_generation = 0
+
+    def __init__(self, triggers=None, throttling_rate=None, offload=False):
         self._params = []
         self._func = None
         self.__active = False
@@ -66,6 +71,11 @@ class TransferFunction(object):
         self.__elapsed_time = 0.0
         self.__updated_since_last_error = True
         self.__publish_error_callback = None
+        self.__offload = offload
+        self.__offload_pool = None
+        self.__invoke = None
+        self.__trigger_queue = None
+        self.__context = None
         self.__triggers = triggers
         if triggers is None:
             self.__triggers = ["t"]
@@ -73,12 +83,9 @@ class TransferFunction(object):
             self.__triggers = [self.__triggers]
         elif not isinstance(triggers, list):
             raise Exception("The triggers should be a list of parameters that trigger execution")
-        if isinstance(throttling_rate, (int, float)) and throttling_rate > 0:
-            self.__min_delta_t = 1.0 / throttling_rate
-        elif throttling_rate is None:
-            self.__min_delta_t = 0.0001
-        else:
-            raise Exception("Throttling should be a maximum frequency of TF execution in hertz")
+        self.__throttling_rate = None
+        self.__min_delta_t = 0.0001
+        self.throttling_rate = throttling_rate
 
     def should_run(self, t):
         """
@@ -89,6 +96,49 @@ class TransferFunction(object):
         """
         return self._params[0] + self.__min_delta_t <= t
 
+    @property
+    def next_run_time(self):
+        """
+        Gets the earliest simulation time at which this TF may run again
+
+        :return: The simulation time of the next possible execution
+        """
+        return self._params[0] + self.__min_delta_t
+
+    @property
+    def offload(self):
+        """
+        Gets a value indicating whether the body of this transfer function is run in a worker
+        process of the transfer function manager
+        """
+        return self.__offload
+
+    @property
+    def throttling_rate(self):
+        """
+        Gets or sets the maximum frequency of execution of this transfer function in hertz, or
+        None if it is not throttled
+        """
+        return self.__throttling_rate
+
+    @throttling_rate.setter
+    def throttling_rate(self, throttling_rate):
+        """
+        Sets the maximum frequency of execution of this transfer function
+
+        :param throttling_rate: The frequency in hertz or None to run in every step
+        """
+        if isinstance(throttling_rate, (int, float)) and throttling_rate > 0:
+            min_delta_t = 1.0 / throttling_rate
+        elif throttling_rate is None:
+            min_delta_t = 0.0001
+        else:
+            raise Exception("Throttling should be a maximum frequency of TF execution in hertz")
+        self.__throttling_rate = throttling_rate
+        if min_delta_t != self.__min_delta_t:
+            self.__min_delta_t = min_delta_t
+            TransferFunction.schedule_generation += 1
+
     @property
     def name(self):
         """
@@ -117,6 +167,23 @@ class TransferFunction(object):
         """
         return self.__triggers
 
+    @property
+    def trigger_queue(self):
+        """
+        Gets or sets the queue that runs this transfer function when it is triggered by a
+        device, or None if it is run directly by the device
+        """
+        return self.__trigger_queue
+
+    @trigger_queue.setter
+    def trigger_queue(self, queue):
+        """
+        Sets the queue that runs this transfer function when it is triggered by a device
+
+        :param queue: The trigger queue or None
+        """
+        self.__trigger_queue = queue
+
     @property
     def elapsed_time(self):
         """
@@ -200,6 +267,8 @@ class TransferFunction(object):
 
         """
         if bool_value is not None and type(bool_value) == bool:
+            if bool_value != self.__active:
+                TransferFunction.schedule_generation += 1
             self.__active = bool_value
 
     @abstractmethod
@@ -227,12 +296,16 @@ class TransferFunction(object):
             args = inspect.getargspec(func).args
             if args[0] != "t":
                 raise Exception("The first parameter of a transfer function must be the time!")
+            if self.__offload and func.func_closure:
+                raise Exception("A transfer function that uses variables of an enclosing scope "
+                                "cannot be run in a worker process")
             self._params = list(args)
             for t in self.__triggers:
                 if t not in self._params:
                     raise Exception("The specified trigger {0} is invalid, "
                                     "there is no parameter with that name".format(t))
             self._params[0] = -float('inf')
+            self.__invoke = None
         else:
             raise Exception("It is not allowed to change the underlying function of a Transfer "
                             "Function after it has been initially set.")
@@ -247,21 +320,67 @@ class TransferFunction(object):
             if param != "t" and type(param) == str:
                 raise Exception("Parameter %s was not mapped properly" % param)
 
+    def __bind(self):
+        """
+        Creates the trampoline that stores the simulation time and calls the body with the
+        parameters of this transfer function
+
+        :return: The trampoline
+        """
+        func = self._func
+        params = self._params
+        pool = self.__offload_pool
+
+        if pool is None:
+            def invoke(t):
+                """
+                Runs the body in the simulation process
+                """
+                params[0] = t
+                return func(*params)
+        else:
+            def invoke(t):
+                """
+                Runs the body in a worker process
+                """
+                params[0] = t
+                return pool.run(func, params)
+        self.__invoke = invoke
+        return invoke
+
     def run(self, t):  # -> None:
         """
         Runs this transfer function at the given simulation time
 
         :param t: The simulation time
         """
+        # transfer functions run on worker, trigger and subscriber threads as well, so the
+        # context of their manager is activated unless it is already active
+        context = self.__context
         # pylint: disable=broad-except
         try:
             hbp_nrp_cle.common.refresh_resources()
-            self._params[0] = t
-            return self._func(*self._params)
+            if context is None or sim_context.current() is context:
+                return (self.__invoke or self.__bind())(t)
+            with sim_context.activate(context):
+                return (self.__invoke or self.__bind())(t)
         except Exception, e:
             self._handle_error(e, sys.exc_info()[2])
             raise TFRunningException(str(e))
 
+    def run_if_due(self, t):  # -> None:
+        """
+        Runs this transfer function if it is active and due at the given simulation time and
+        adds the wall clock time of the run to its elapsed time
+
+        :param t: The simulation time
+        """
+        # the attributes are accessed directly as this is called for every TF in every step
+        if self.__active and self._params[0] + self.__min_delta_t <= t:
+            start = time.time()
+            self.run(t)
+            self.__elapsed_time += time.time() - start
+
     def _handle_error(self, e, tb):
         """
         Handles the given exception
@@ -280,7 +399,11 @@ class TransferFunction(object):
         :param bca_changed: True, if the brain communication adapter has changed
         :param rca_changed: True, if the robot communication adapter has changed
         """
-        pass
+        context = getattr(tfm, 'context', None)
+        self.__context = context if isinstance(context, sim_context.SimulationContext) else None
+        if self.__offload:
+            self.__offload_pool = tfm.offload_pool
+            self.__invoke = None
 
     @abstractmethod
     def unregister(self):
@@ -49,6 +49,15 @@ class ITransferFunctionManager(object):  # pragma: no cover
         """
         raise NotImplementedError("This method was not implemented in the concrete implementation")
 
+    def next_due_time(self):
+        """
+        Gets the earliest simulation time at which any of the active, time-triggered transfer
+        functions may run
+
+        :return: The simulation time, or infinity if no such transfer function exists
+        """
+        raise NotImplementedError("This method was not implemented in the concrete implementation")
+
     def initialize(self, name):  # -> None:
         """
         Initializes the transfer Function node with the given name
@@ -57,7 +66,7 @@ class ITransferFunctionManager(object):  # pragma: no cover
         """
         raise NotImplementedError("This method was not implemented in the concrete implementation")
 
-    def initialize_tf(self, tf, activation=True):
+    def initialize_tf(self, tf, activation=True, previous=None):
         """
         Initializes the given transfer function
 
@@ -66,6 +75,7 @@ class ITransferFunctionManager(object):  # pragma: no cover
 
         :param tf: The transfer function
         :param activation: The desired activation state; True for activated, False otherwise
+        :param previous: The transfer function replaced by tf, if any
         """
         raise NotImplementedError("This method was not implemented in the concrete implementation")
 
@@ -83,6 +93,18 @@ class ITransferFunctionManager(object):  # pragma: no cover
         """
         raise NotImplementedError("This method was not implemented in the concrete implementation")
 
+    def prepare_fork(self):
+        """
+        Waits for the work of background threads before the process is forked
+        """
+        raise NotImplementedError("This method was not implemented in the concrete implementation")
+
+    def reset_after_fork(self):
+        """
+        Drops the background threads inherited from the parent of a forked process
+        """
+        raise NotImplementedError("This method was not implemented in the concrete implementation")
+
     def shutdown(self):
         """
         Shuts down the Transfer Function manager
@@ -101,6 +123,13 @@ class ITransferFunctionManager(object):  # pragma: no cover
         """
         raise NotImplementedError("This method was not implemented in the concrete implementation")
 
+    @property
+    def context(self):
+        """
+        Gets the simulation context this manager belongs to
+        """
+        raise NotImplementedError("This method was not implemented in the concrete implementation")
+
     @property
     def brain_adapter(self):
         """
@@ -29,13 +29,21 @@ __author__ = 'GeorgHinkel'
 
 from hbp_nrp_cle.robotsim.RobotInterface import IRobotCommunicationAdapter
 from hbp_nrp_cle.brainsim.BrainInterface import IBrainCommunicationAdapter, IBrainDevice
-from hbp_nrp_cle.tf_framework import FlawedTransferFunction
+from hbp_nrp_cle.tf_framework import FlawedTransferFunction, TransferFunction
 from ._TransferFunctionInterface import ITransferFunctionManager
+from . import _ConflictGraph
+from ._ProcessOffload import OffloadPool
+from ._TimerQueue import VersionedList, TimerQueue
+from ._TriggerQueue import TriggerQueue
+from ._PropertyPath import equivalent
 from . import BrainParameterException
 from . import TFRunningException
+from hbp_nrp_cle import context as sim_context
+import hbp_nrp_cle.common
 import itertools
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
@@ -45,19 +53,109 @@ class TransferFunctionManager(ITransferFunctionManager):
     Represents a transfer functions node
     """
 
-    def __init__(self):  # -> None:
+    def __init__(self, context=None):  # -> None:
         """
         Creates a new transfer functions node
+
+        :param context: The simulation context this node belongs to, the active context by default
         """
 
-        self.__n2r = []
-        self.__r2n = []
+        self.__n2r = VersionedList()
+        self.__r2n = VersionedList()
         self.__silent = []
         self.__flawed = []
         self.__robotAdapter = None
         self.__nestAdapter = None
         self.__initialized = False
         self.__global_data = {}
+        self.__context = context if context is not None else sim_context.current()
+        self.__max_parallel_tfs = 1
+        self.__executor = None
+        self.__schedules = {}
+        self.__offload_pool = OffloadPool()
+        self.__timers = {id(self.__n2r): TimerQueue(self.__n2r),
+                         id(self.__r2n): TimerQueue(self.__r2n)}
+        self.__trigger_queue = TriggerQueue()
+
+    @property
+    def context(self):
+        """
+        Gets the simulation context this node belongs to
+        """
+        return self.__context
+
+    @property
+    def max_parallel_tfs(self):
+        """
+        Gets or sets the maximum number of transfer functions run concurrently. With 1, the
+        transfer functions are run sequentially on the calling thread.
+
+        Transfer functions that map brain devices, whether they read or write them, never run
+        concurrently with each other, as every device access may call the brain simulator.
+        Transfer functions accessing the brain simulator in other ways, e.g. through the
+        populations of the brain module, must not be run in parallel.
+        """
+        return self.__max_parallel_tfs
+
+    @max_parallel_tfs.setter
+    def max_parallel_tfs(self, value):
+        """
+        Sets the maximum number of transfer functions run concurrently. Transfer functions
+        mapping brain devices are still run one after another.
+
+        :param value: The number of threads, 1 to run the transfer functions sequentially
+        """
+        if not isinstance(value, int) or value < 1:
+            raise ValueError("The number of parallel transfer functions must be at least 1")
+        if value != self.__max_parallel_tfs and self.__executor is not None:
+            self.__executor.shutdown(wait=True)
+            self.__executor = None
+        self.__max_parallel_tfs = value
+
+    @property
+    def offload_processes(self):
+        """
+        Gets or sets the number of worker processes for transfer functions that are offloaded.
+        None uses one process per CPU.
+        """
+        return self.__offload_pool.processes
+
+    @offload_processes.setter
+    def offload_processes(self, value):
+        """
+        Sets the number of worker processes for offloaded transfer functions
+
+        :param value: The number of processes or None to use one process per CPU
+        """
+        self.__offload_pool.processes = value
+
+    @property
+    def offload_pool(self):
+        """
+        Gets the pool of worker processes that offloaded transfer functions are run in
+        """
+        return self.__offload_pool
+
+    @property
+    def trigger_queue(self):
+        """
+        Gets or sets the queue that runs the transfer functions triggered by devices. If set to
+        None, the transfer functions are run directly on the thread of the triggering device.
+        """
+        return self.__trigger_queue
+
+    @trigger_queue.setter
+    def trigger_queue(self, queue):
+        """
+        Sets the queue that runs the transfer functions triggered by devices
+
+        :param queue: The trigger queue or None
+        """
+        if queue is not self.__trigger_queue and self.__trigger_queue is not None:
+            self.__trigger_queue.shutdown()
+        self.__trigger_queue = queue
+        for tf in self.transfer_functions():
+            tf.trigger_queue = queue
 
     @property
     def n2r(self):  # -> list:
@@ -104,23 +202,43 @@ class TransferFunctionManager(ITransferFunctionManager):
         :param tf: the transfer function
         :param t: The simulation time
         """
-        if tf.active and tf.should_run(t):
+        if isinstance(tf, TransferFunction):
+            tf.run_if_due(t)
+        elif tf.active and tf.should_run(t):
             start = time.time()
             tf.run(t)
             tf.elapsed_time += time.time() - start
 
+    @staticmethod
+    def trigger_tf(tf, t):  # -> None:
+        """
+        Runs the given transfer function because a device it is triggered by has received a new
+        value. If the transfer function has a trigger queue, the run is queued instead.
+
+        :param tf: the transfer function
+        :param t: The simulation time
+        """
+        if isinstance(tf, TransferFunction) and tf.trigger_queue is not None:
+            tf.trigger_queue.trigger(tf, t)
+        else:
+            TransferFunctionManager.run_tf(tf, t)
+
+    def next_due_time(self):
+        """
+        Gets the earliest simulation time at which any of the active, time-triggered transfer
+        functions may run
+
+        :return: The simulation time, or infinity if no such transfer function exists
+        """
+        return min(timer.next_due_time() for timer in self.__timers.itervalues())
+
     def run_neuron_to_robot(self, t):  # -> None:
         """
         Runs the transfer functions from the neuronal simulator towards the robot
 
         :param t: The simulation time
         """
-        for _n2r in self.__n2r:
-            try:
-                TransferFunctionManager.run_tf(_n2r, t)
-            except TFRunningException as tf_exception:
-                self.__flawed.append(FlawedTransferFunction(_n2r.name, _n2r.source, tf_exception))
-                self.__n2r.remove(_n2r)
+        self.__run_tfs(self.__n2r, t)
 
     def run_robot_to_neuron(self, t):  # -> None:
         """
@@ -128,12 +246,84 @@ class TransferFunctionManager(ITransferFunctionManager):
 
         :param t:  The simulation time
         """
-        for _r2n in self.__r2n:
-            try:
-                TransferFunctionManager.run_tf(_r2n, t)
-            except TFRunningException as tf_exception:
-                self.__flawed.append(FlawedTransferFunction(_r2n.name, _r2n.source, tf_exception))
-                self.__r2n.remove(_r2n)
+        self.__run_tfs(self.__r2n, t)
+
+    def __run_tfs(self, tfs, t):
+        """
+        Runs the given transfer functions that are due and moves the failing ones to the flawed
+        transfer functions
+
+        :param tfs: The list of transfer functions
+        :param t: The simulation time
+        """
+        timer = self.__timers[id(tfs)]
+        due = timer.pop_due(t)
+        try:
+            if self.__max_parallel_tfs > 1 and len(due) > 1:
+                failed = self.__run_tfs_parallel(tfs, due, t)
+            else:
+                failed = []
+                for tf in due:
+                    tf_exception = TransferFunctionManager.__try_run_tf(tf, t)
+                    if tf_exception is not None:
+                        failed.append((tf, tf_exception))
+        finally:
+            timer.push(due)
+        for tf, tf_exception in failed:
+            self.__flawed.append(FlawedTransferFunction(tf.name, tf.source, tf_exception))
+            tfs.remove(tf)
+
+    @staticmethod
+    def __try_run_tf(tf, t):
+        """
+        Runs the given transfer function
+
+        :param tf: The transfer function
+        :param t: The simulation time
+        :return: The exception raised by the transfer function, or None
+        """
+        try:
+            TransferFunctionManager.run_tf(tf, t)
+        except TFRunningException as tf_exception:
+            return tf_exception
+        return None
+
+    def __run_tfs_parallel(self, tfs, due, t):
+        """
+        Runs the due transfer functions on a thread pool. Transfer functions that write to the
+        same devices, topics or global variables run in their sequential order, the others run
+        concurrently.
+
+        :param tfs: The list of transfer functions
+        :param due: The transfer functions of the list that are due
+        :param t: The simulation time
+        :return: A list of the failed transfer functions and their exceptions in sequential order
+        """
+        key = _ConflictGraph.get_schedule_key(tfs)
+        cached = self.__schedules.get(id(tfs))
+        if cached is None or cached[0] != key:
+            cached = (key, _ConflictGraph.schedule(tfs))
+            self.__schedules[id(tfs)] = cached
+        if self.__executor is None:
+            self.__executor = ThreadPoolExecutor(max_workers=self.__max_parallel_tfs)
+
+        due = set(id(tf) for tf in due)
+        failed = []
+        for level in cached[1]:
+            level = [tf for tf in level if id(tf) in due]
+            if not level:
+                continue
+            if len(level) == 1:
+                results = [(level[0], TransferFunctionManager.__try_run_tf(level[0], t))]
+            else:
+                futures = [(tf, self.__executor.submit(TransferFunctionManager.__try_run_tf,
+                                                       tf, t))
+                           for tf in level]
+                results = [(tf, future.result()) for tf, future in futures]
+            failed.extend((tf, e) for tf, e in results if e is not None)
+        order = dict((id(tf), i) for i, tf in enumerate(tfs))
+        failed.sort(key=lambda result: order[id(result[0])])
+        return failed
 
     @property
     def robot_adapter(self):  # -> IRobotCommunicationAdapter:
@@ -200,7 +390,7 @@ class TransferFunctionManager(ITransferFunctionManager):
 
         return proper_tfs if not flawed else proper_tfs + self.__flawed
 
-    def initialize_tf(self, tf, activation=True):
+    def initialize_tf(self, tf, activation=True, previous=None):
         """
         Initializes the given transfer function
 
@@ -209,19 +399,27 @@ class TransferFunctionManager(ITransferFunctionManager):
 
         :param tf: The transfer function
         :param activation: desired activation state; True for activated, False otherwise
+        :param previous: The transfer function replaced by tf, if any. Its adapters are taken
+         over by tf where the parameter mappings are equivalent.
         """
         logger.info("Initialize transfer function " + repr(tf))
         tf.check_params()
         tf.elapsed_time = 0.0
+        reusable = TransferFunctionManager.__reusable_adapters(previous)
 
         if hasattr(tf, 'topic') and tf.topic is not None:
             saved = tf.topic
-            tf.topic = self.__robotAdapter.register_publish_topic(saved)
+            tf.topic = TransferFunctionManager.__claim_adapter(
+                reusable, lambda spec: equivalent(spec, saved))
+            if tf.topic is None:
+                tf.topic = self.__robotAdapter.register_publish_topic(saved)
             tf.topic.spec = saved
 
         for i in range(1, len(tf.params)):
             param = tf.params[i]
-            tf.params[i] = tf.params[i].create_adapter(self)
+            tf.params[i] = TransferFunctionManager.__claim_adapter(reusable, param.is_equivalent)
+            if tf.params[i] is None:
+                tf.params[i] = param.create_adapter(self)
             tf.params[i].spec = param
             tf.__dict__[param.name] = tf.params[i]
 
@@ -233,9 +431,41 @@ class TransferFunctionManager(ITransferFunctionManager):
             self.__silent.append(tf)
 
         tf.initialize(self, True, True)
+        tf.trigger_queue = self.__trigger_queue
         self.activate_tf(tf, activation)
         self._update_trigger(tf)
 
+    @staticmethod
+    def __reusable_adapters(tf):
+        """
+        Gets the adapters of the given transfer function that may be taken over by another
+        transfer function
+
+        :param tf: The transfer function or None
+        :return: A list of adapters
+        """
+        if tf is None:
+            return []
+        adapters = [param for param in tf.params[1:] if hasattr(param, 'spec')]
+        topic = getattr(tf, 'topic', None)
+        if topic is not None and hasattr(topic, 'spec'):
+            adapters.append(topic)
+        return adapters
+
+    @staticmethod
+    def __claim_adapter(adapters, is_equivalent):
+        """
+        Removes the first adapter created for an equivalent mapping from the given adapters
+
+        :param adapters: The list of available adapters
+        :param is_equivalent: A predicate on the mapping of an adapter
+        :return: The adapter or None, if no such adapter exists
+        """
+        for i, adapter in enumerate(adapters):
+            if is_equivalent(adapter.spec):
+                return adapters.pop(i)
+        return None
+
     @staticmethod
     def _update_trigger(tf):
         """
@@ -310,6 +540,7 @@ class TransferFunctionManager(ITransferFunctionManager):
             return
 
         logger.info("Initialize transfer functions node " + name)
+        hbp_nrp_cle.common.invalidate_resources()
 
         if not isinstance(self.__nestAdapter, IBrainCommunicationAdapter):
             raise Exception("The brain adapter is configured incorrectly")
@@ -353,6 +584,28 @@ class TransferFunctionManager(ITransferFunctionManager):
         # Wire transfer functions from neuronal simulation to world simulation
         for tf in itertools.chain(self.__r2n, self.__n2r):
             self.__reset_tf(tf)
+        for timer in self.__timers.itervalues():
+            timer.invalidate()
+        if self.__trigger_queue is not None:
+            self.__trigger_queue.clear()
+
+    def prepare_fork(self):
+        """
+        Waits for the pending triggered transfer functions, as the thread running them is not
+        forked with the process
+        """
+        if self.__trigger_queue is not None:
+            self.__trigger_queue.flush()
+
+    def reset_after_fork(self):
+        """
+        Drops the threads and worker processes inherited from the parent of a forked process,
+        new ones are started when they are needed
+        """
+        self.__executor = None
+        self.__offload_pool.reset_after_fork()
+        if self.__trigger_queue is not None:
+            self.__trigger_queue.reset_after_fork()
 
     def shutdown(self):
         """
@@ -363,6 +616,13 @@ class TransferFunctionManager(ITransferFunctionManager):
         del self.__flawed[:]
         del self.__silent[:]
         self.__global_data.clear()
+        self.__schedules.clear()
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=True)
+            self.__executor = None
+        self.__offload_pool.shutdown()
+        if self.__trigger_queue is not None:
+            self.__trigger_queue.shutdown()
         self.__initialized = False
 
     def hard_reset_brain_devices(self):
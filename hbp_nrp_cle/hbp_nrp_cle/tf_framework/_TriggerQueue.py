@@ -0,0 +1,311 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+This module decouples the transfer functions triggered by robot topics from the threads that
+deliver the messages. Triggers are queued and the transfer functions run on a dedicated thread.
+"""
+
+__author__ = ''
+
+from collections import namedtuple, deque
+from . import TFRunningException
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TriggerStatistics(namedtuple('TriggerStatistics',
+                                   ['triggered', 'run', 'coalesced', 'dropped'])):
+    """
+    Counts the triggers of a transfer function: all received triggers, the triggers that led to
+    a run, the triggers that were merged into a pending trigger and the triggers that were
+    dropped because the transfer function was inactive or not due
+    """
+    __slots__ = ()
+
+
+class _TriggerState(object):
+    """
+    Holds the pending triggers and the counters of a transfer function
+    """
+
+    def __init__(self, tf, max_rate, max_depth):
+        self.tf = tf
+        self.max_rate = max_rate
+        self.max_depth = max_depth
+        self.pending = deque()
+        self.queued = False
+        self.running = False
+        self.next_start = 0.0
+        self.triggered = 0
+        self.run = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+
+class TriggerQueue(object):
+    """
+    Runs triggered transfer functions on a dedicated thread. Every transfer function keeps at
+    most max_depth pending triggers. A trigger that arrives when this limit is reached replaces
+    the latest pending trigger, so with the default depth of 1 all triggers that arrive before
+    the transfer function runs collapse to the latest one. A transfer function is not started
+    more often than its maximum rate in wall clock time, triggers arriving in the meantime are
+    kept pending.
+    """
+
+    def __init__(self, max_rate=None, max_depth=1):
+        """
+        Creates a new trigger queue
+
+        :param max_rate: The default maximum firing rate in hertz, None for no limit
+        :param max_depth: The default maximum number of pending triggers of a transfer function
+        """
+        self.__check(max_rate, max_depth)
+        self.__max_rate = max_rate
+        self.__max_depth = max_depth
+        self.__states = {}
+        self.__ready = []
+        self.__sequence = itertools.count()
+        self.__condition = threading.Condition()
+        self.__thread = None
+        self.__stopped = False
+
+    @staticmethod
+    def __check(max_rate, max_depth):
+        """
+        Validates the given limits
+        """
+        if max_rate is not None and (not isinstance(max_rate, (int, float)) or max_rate <= 0):
+            raise ValueError("The maximum firing rate must be a positive frequency in hertz")
+        if not isinstance(max_depth, int) or max_depth < 1:
+            raise ValueError("The queue depth must be at least 1")
+
+    def __state(self, tf):
+        """
+        Gets the state of the given transfer function, must be called with the lock held
+        """
+        state = self.__states.get(id(tf))
+        if state is None:
+            state = _TriggerState(tf, self.__max_rate, self.__max_depth)
+            self.__states[id(tf)] = state
+        return state
+
+    def configure(self, tf, max_rate=None, max_depth=1):
+        """
+        Sets the limits for the given transfer function
+
+        :param tf: The transfer function
+        :param max_rate: The maximum firing rate in hertz, None for no limit
+        :param max_depth: The maximum number of pending triggers
+        """
+        self.__check(max_rate, max_depth)
+        with self.__condition:
+            state = self.__state(tf)
+            state.max_rate = max_rate
+            state.max_depth = max_depth
+            while len(state.pending) > max_depth:
+                state.pending.popleft()
+                state.coalesced += 1
+
+    def statistics(self, tf):
+        """
+        Gets the trigger counters of the given transfer function
+
+        :param tf: The transfer function
+        :return: A TriggerStatistics tuple
+        """
+        with self.__condition:
+            state = self.__states.get(id(tf))
+            if state is None:
+                return TriggerStatistics(0, 0, 0, 0)
+            return TriggerStatistics(state.triggered, state.run, state.coalesced, state.dropped)
+
+    @property
+    def pending(self):
+        """
+        Gets the number of pending triggers
+        """
+        with self.__condition:
+            return sum(len(state.pending) for state in self.__states.itervalues())
+
+    def trigger(self, tf, t):
+        """
+        Queues a run of the given transfer function. This method does not block.
+
+        :param tf: The transfer function
+        :param t: The simulation time of the trigger
+        """
+        with self.__condition:
+            state = self.__state(tf)
+            state.triggered += 1
+            if self.__stopped or not tf.active:
+                state.dropped += 1
+                return
+            if len(state.pending) >= state.max_depth:
+                state.pending[-1] = t
+                state.coalesced += 1
+            else:
+                state.pending.append(t)
+            self.__enqueue(state)
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__run, name="TriggerQueue")
+                self.__thread.daemon = True
+                self.__thread.start()
+
+    def __enqueue(self, state):
+        """
+        Marks the given transfer function as ready, must be called with the lock held
+        """
+        if not state.queued and not state.running and state.pending:
+            state.queued = True
+            heapq.heappush(self.__ready, (state.next_start, next(self.__sequence), state))
+            self.__condition.notify_all()
+
+    def __next(self):
+        """
+        Waits for the next transfer function that may be started
+
+        :return: The state of the transfer function and the simulation time, or None if the
+         queue has been stopped
+        """
+        with self.__condition:
+            while not self.__stopped:
+                if self.__ready:
+                    delay = self.__ready[0][0] - time.time()
+                    if delay <= 0:
+                        state = heapq.heappop(self.__ready)[2]
+                        state.queued = False
+                        if not state.pending:
+                            continue
+                        state.running = True
+                        if state.max_rate is not None:
+                            state.next_start = time.time() + 1.0 / state.max_rate
+                        return state, state.pending.popleft()
+                    self.__condition.wait(delay)
+                else:
+                    self.__condition.wait()
+            return None
+
+    def __run(self):
+        """
+        Runs the triggered transfer functions until the queue is stopped
+        """
+        from ._TransferFunctionManager import TransferFunctionManager
+        while True:
+            entry = self.__next()
+            if entry is None:
+                return
+            state, t = entry
+            ran = False
+            try:
+                ran = state.tf.active and state.tf.should_run(t)
+                if ran:
+                    TransferFunctionManager.run_tf(state.tf, t)
+            except TFRunningException as e:
+                logger.error("Error while running triggered transfer function %s: %s",
+                             state.tf.name, e)
+            # pylint: disable=broad-except
+            except Exception:
+                logger.exception("Error while running triggered transfer function")
+            with self.__condition:
+                state.running = False
+                if ran:
+                    state.run += 1
+                else:
+                    state.dropped += 1
+                self.__enqueue(state)
+                self.__condition.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Waits until all pending triggers have been processed
+
+        :param timeout: The maximum time to wait in seconds, None to wait indefinitely
+        :return: True if the queue is empty, False if the timeout expired
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self.__condition:
+            while any(state.pending or state.running for state in self.__states.itervalues()):
+                if self.__stopped:
+                    return False
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.__condition.wait(remaining)
+            return True
+
+    def discard(self, tf):
+        """
+        Removes the pending triggers and the counters of the given transfer function
+
+        :param tf: The transfer function
+        """
+        with self.__condition:
+            state = self.__states.pop(id(tf), None)
+            if state is not None:
+                state.pending.clear()
+            self.__condition.notify_all()
+
+    def clear(self):
+        """
+        Removes all pending triggers, e.g. after the simulation has been reset
+        """
+        with self.__condition:
+            for state in self.__states.itervalues():
+                state.pending.clear()
+            self.__condition.notify_all()
+
+    def reset_after_fork(self):
+        """
+        Makes the queue usable in a forked process. The thread of the queue does not exist there
+        and its lock may be held, so both are replaced and the pending triggers are dropped.
+        """
+        self.__condition = threading.Condition()
+        self.__thread = None
+        self.__stopped = False
+        del self.__ready[:]
+        for state in self.__states.itervalues():
+            state.pending.clear()
+            state.queued = False
+            state.running = False
+
+    def shutdown(self):
+        """
+        Stops the thread of this queue and removes all pending triggers and counters
+        """
+        with self.__condition:
+            self.__stopped = True
+            self.__states.clear()
+            del self.__ready[:]
+            self.__condition.notify_all()
+            thread = self.__thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        with self.__condition:
+            self.__thread = None
+            self.__stopped = False
@@ -3,7 +3,7 @@ This package contains the classes to specify transfer functions and connect them
 adapters of both the neuronal simulator and the world simulator
 """
 
-from hbp_nrp_cle.common import UserCodeException
+from hbp_nrp_cle.common import UserCodeException, invalidate_resources
 from hbp_nrp_excontrol.restricted_python import _inplacevar_
 from hbp_nrp_cle.tf_framework._TfApi import TfApi
 
@@ -69,6 +69,7 @@ class TFLoadingException(TFException):
 
 
 from . import config
+from hbp_nrp_cle import context as sim_context
 from ._PropertyPath import PropertyPath, RangeSegment, CustomSegment
 
 
@@ -81,7 +82,8 @@ def resolve_brain_variable(var):
     Otherwise, it is resolved for the current neural network
     """
     if isinstance(var, PropertyPath):
-        return var.select(config.brain_root, config.active_node.brain_adapter)
+        context = sim_context.current()
+        return var.select(context.brain_root, context.active_node.brain_adapter)
     return var
 
 
@@ -109,11 +111,14 @@ from ._Robot2Neuron import Robot2Neuron, MapRobotPublisher, \
     MapRobotSubscriber
 from hbp_nrp_cle.tf_framework._TransferFunction import TransferFunction, FlawedTransferFunction
 from hbp_nrp_cle.tf_framework._CSVRecorder import MapCSVRecorder, CSVRecorder
+from hbp_nrp_cle.tf_framework import _CSVRecorder
+from hbp_nrp_cle.tf_framework._BinaryRecorder import MapBinaryRecorder, BinaryRecorder
 from hbp_nrp_cle.tf_framework._NeuronMonitor import NeuronMonitor
 from hbp_nrp_cle.tf_framework._GlobalData import MapVariable, GLOBAL, TRANSFER_FUNCTION_LOCAL
 from hbp_nrp_cle.tf_framework._CleanableTransferFunctionParameter \
     import ICleanableTransferFunctionParameter
 from . import _TransferFunctionManager, _NeuronSelectors
+from ._CodeCache import CodeCache
 from ._TransferFunctionInterface import ITransferFunctionManager
 from hbp_nrp_cle.robotsim.RobotInterface import Topic, IRobotCommunicationAdapter
 import std_msgs.msg
@@ -170,6 +175,9 @@ raw_signal = IRawSignal
 
 brain = PropertyPath()
 
+# compiled code is only kept in memory, persisting it requires a directory private to the user
+code_cache = CodeCache()
+
 
 def nrange(start, stop, step=None):
     """
@@ -216,7 +224,7 @@ def initialize(name):  # -> None:
 
     :param name: The name of the TF node
     """
-    config.active_node.initialize(name)
+    sim_context.current().active_node.initialize(name)
 
 
 def set_nest_adapter(nest_adapter):  # -> None:
@@ -227,7 +235,7 @@ def set_nest_adapter(nest_adapter):  # -> None:
 
     .. WARNING:: Must be executed before tf node initialization
     """
-    config.active_node.brain_adapter = nest_adapter
+    sim_context.current().active_node.brain_adapter = nest_adapter
 
 
 def set_robot_adapter(robot_adapter):  # -> None:
@@ -238,15 +246,21 @@ def set_robot_adapter(robot_adapter):  # -> None:
 
     .. WARNING:: Must be executed before tf node initialization
     """
-    config.active_node.robot_adapter = robot_adapter
+    sim_context.current().active_node.robot_adapter = robot_adapter
 
 
-def start_new_tf_manager():
+def start_new_tf_manager(context=None):
     """
     Start a new transfer function manager
+
+    :param context: The simulation context of the manager, the active context by default
+    :return: The new transfer function manager
     """
-    config.active_node = _TransferFunctionManager.TransferFunctionManager()
-    config.csv_recorders = []
+    if context is None:
+        context = sim_context.current()
+    context.active_node = _TransferFunctionManager.TransferFunctionManager(context)
+    context.csv_recorders = []
+    return context.active_node
 
 
 def get_transfer_functions(flawed=True):
@@ -256,10 +270,10 @@ def get_transfer_functions(flawed=True):
     :return: All the transfer functions if flawed is True, only (R2N, N2R, Silent) otherwise.
     """
 
-    proper_tfs = config.active_node.n2r + \
-        config.active_node.r2n + config.active_node.silent
+    tfm = sim_context.current().active_node
+    proper_tfs = tfm.n2r + tfm.r2n + tfm.silent
 
-    return proper_tfs + config.active_node.flawed if flawed else proper_tfs
+    return proper_tfs + tfm.flawed if flawed else proper_tfs
 
 
 def get_flawed_transfer_function(name):
@@ -269,7 +283,8 @@ def get_flawed_transfer_function(name):
     :param name: The name of the flawed transfer function
     :return: The flawed transfer function with the given name
     """
-    return next((f_tf for f_tf in config.active_node.flawed if f_tf.name == name), None)
+    flawed_tfs = sim_context.current().active_node.flawed
+    return next((f_tf for f_tf in flawed_tfs if f_tf.name == name), None)
 
 
 def get_transfer_function(name):
@@ -291,7 +306,7 @@ def activate_transfer_function(tf, activate):
     :param tf: the tf to (de-)activate
     :param activate: a boolean value denoting the new activation state
     """
-    config.active_node.activate_tf(tf, activate)
+    sim_context.current().active_node.activate_tf(tf, activate)
 
 
 def get_brain_source():
@@ -301,7 +316,7 @@ def get_brain_source():
 
     :return: The source of the brain model
     """
-    return config.brain_source
+    return sim_context.current().brain_source
 
 
 def get_brain_populations():
@@ -316,7 +331,7 @@ def get_brain_populations():
         list, or a 'slice' dictionary of the following form
         {'from': 1, 'to': 10, 'step': 1}.
     """
-    return config.brain_populations
+    return sim_context.current().brain_populations
 
 
 def dump_csv_recorder_to_files():
@@ -325,7 +340,8 @@ def dump_csv_recorder_to_files():
 
     :return: an array containing a string with the CSV filename,
     an array containing the CSV headers separated by a comma
-    and an array containing the CSV values
+    and the path of the temporary CSV file holding the headers and values. The caller takes
+    ownership of the temporary file.
     """
     result = []
     for tf in get_transfer_functions(flawed=False):
@@ -333,11 +349,45 @@ def dump_csv_recorder_to_files():
             if isinstance(param, CSVRecorder):
                 name = param.get_csv_recorder_name()
                 headers = param.get_csv_headers()
-                values = param.cleanup()
-                result.append([name, headers, values])
+                path = param.cleanup()
+                result.append([name, headers, path])
+    return result
+
+
+def reset_csv_recorders_after_fork():
+    """
+    Lets the CSV recorders write to new files in a forked process rather than to the files of the
+    parent process. Must be called in the forked process before anything is recorded.
+    """
+    _CSVRecorder.reset_after_fork()
+
+
+def dump_binary_recorders_to_files():
+    """
+    Find out all binary recorders and write their values to files.
+
+    :return: an array containing a string with the filename specified by the user,
+    an array containing the column names and the path of the temporary npz or HDF5 file holding
+    the values. The caller takes ownership of the temporary file.
+    """
+    result = []
+    for tf in get_transfer_functions(flawed=False):
+        for param in tf.params[1:]:
+            if isinstance(param, BinaryRecorder):
+                result.append([param.get_recorder_name(), param.get_headers(), param.cleanup()])
     return result
 
 
+def clean_binary_recorders_files():
+    """
+    Clean out all binary recorders generated files.
+    """
+    for tf in get_transfer_functions(flawed=False):
+        for param in tf.params[1:]:
+            if isinstance(param, BinaryRecorder):
+                param.discard()
+
+
 def clean_csv_recorders_files():
     """
     Clean out all CSV recorders generated files.
@@ -345,7 +395,7 @@ def clean_csv_recorders_files():
     for tf in get_transfer_functions(flawed=False):
         for param in tf.params[1:]:
             if isinstance(param, CSVRecorder):
-                param.cleanup()
+                param.discard()
 
 
 def delete_transfer_function(name):
@@ -362,34 +412,82 @@ def delete_transfer_function(name):
     if delete_flawed_transfer_function(name):
         is_flawed_deleted = True
 
-    if tf in config.active_node.n2r:
-        config.active_node.n2r.remove(tf)
-    elif tf in config.active_node.r2n:
-        config.active_node.r2n.remove(tf)
-    elif tf in config.active_node.silent:
-        config.active_node.silent.remove(tf)
+    tfm = sim_context.current().active_node
+    if tf in tfm.n2r:
+        tfm.n2r.remove(tf)
+    elif tf in tfm.r2n:
+        tfm.r2n.remove(tf)
+    elif tf in tfm.silent:
+        tfm.silent.remove(tf)
 
     else:
         return is_flawed_deleted
 
-    tf.unregister()
+    _release_transfer_function(tfm, tf)
+    return True
 
-    brain_adapter = config.active_node.brain_adapter
-    robot_adapter = config.active_node.robot_adapter
-
-    for i in range(1, len(tf.params)):
-        if tf.params[i] in brain_adapter.detector_devices:
-            brain_adapter.unregister_spike_sink(tf.params[i])
-        elif tf.params[i] in robot_adapter.published_topics:
-            robot_adapter.unregister_publish_topic(tf.params[i])
-        elif tf.params[i] in brain_adapter.generator_devices:
-            brain_adapter.unregister_spike_source(tf.params[i])
-        elif tf.params[i] in robot_adapter.subscribed_topics:
-            robot_adapter.unregister_subscribe_topic(tf.params[i])
-        if isinstance(tf.params[i], ICleanableTransferFunctionParameter):
-            tf.params[i].cleanup()
 
-    return True
+def _restore_transfer_function(tfm, previous, state, failed_name):
+    """
+    Reinstates a transfer function whose replacement could not be loaded
+
+    :param tfm: The transfer function manager
+    :param previous: The replaced transfer function
+    :param state: The list the replaced transfer function was removed from, its index in that
+     list and its activation state
+    :param failed_name: The name of the replacement that could not be loaded
+    """
+    failed = get_transfer_function(failed_name)
+    delete_flawed_transfer_function(failed_name)
+    for tfs in (tfm.n2r, tfm.r2n, tfm.silent):
+        if failed in tfs:
+            tfs.remove(failed)
+            # the adapters the replacement has already taken over stay registered
+            kept = previous.params[1:] + [getattr(previous, 'topic', None)]
+            _release_transfer_function(tfm, failed, kept)
+            break
+    tfs, index, active = state
+    tfs.insert(index, previous)
+    previous.active = active
+
+
+def _release_transfer_function(tfm, tf, keep=()):
+    """
+    Unregisters the devices and topics of a transfer function removed from the given manager
+
+    :param tfm: The transfer function manager
+    :param tf: The removed transfer function
+    :param keep: Adapters of the transfer function taken over by another transfer function
+    """
+    topic = getattr(tf, 'topic', None)
+    if topic is not None and any(topic is adapter for adapter in keep):
+        tf.topic = None
+    tf.unregister()
+    if tf.trigger_queue is not None:
+        tf.trigger_queue.discard(tf)
+
+    brain_adapter = tfm.brain_adapter
+    robot_adapter = tfm.robot_adapter
+
+    for trigger in tf.triggers:
+        if hasattr(trigger, 'unregister_tf_trigger'):
+            trigger.unregister_tf_trigger(tf)
+
+    for param in tf.params[1:]:
+        if any(param is adapter for adapter in keep):
+            continue
+        if param in brain_adapter.detector_devices:
+            brain_adapter.unregister_spike_sink(param)
+        elif param in robot_adapter.published_topics:
+            robot_adapter.unregister_publish_topic(param)
+        elif param in brain_adapter.generator_devices:
+            brain_adapter.unregister_spike_source(param)
+        elif param in robot_adapter.subscribed_topics:
+            robot_adapter.unregister_subscribe_topic(param)
+        if isinstance(param, (CSVRecorder, BinaryRecorder)):
+            param.discard()
+        elif isinstance(param, ICleanableTransferFunctionParameter):
+            param.cleanup()
 
 
 def delete_flawed_transfer_function(name):
@@ -406,36 +504,70 @@ def delete_flawed_transfer_function(name):
     tf = get_flawed_transfer_function(name)
 
     if tf:
-        config.active_node.flawed.remove(tf)
+        sim_context.current().active_node.flawed.remove(tf)
     else:
         result = False
 
     return result
 
 
-def set_transfer_function(new_source, new_code, new_name, activation=True):
+def set_transfer_function(new_source, new_code, new_name, activation=True, old_name=None):
     """
     Apply transfer function changes made by a client
 
+    If a transfer function with the old name exists, it is replaced by the new one. Devices,
+    publishers and subscribers of the replaced transfer function whose parameter mappings did not
+    change are taken over by the new transfer function rather than created anew.
+
     :param new_source: Transfer function's updated source
-    :param new_code: Compiled code of the updated source
+    :param new_code: Compiled code of the updated source or None to compile the source in
+     restricted mode through the code cache
     :param new_name: Transfer function's updated name
-    """
+    :param activation: The desired activation state of the transfer function
+    :param old_name: The name of the replaced transfer function, defaults to the updated name
+    """
+
+    invalidate_resources()
+    tfm = sim_context.current().active_node
+    previous = get_transfer_function(old_name or new_name)
+    previous_state = None
+    if isinstance(previous, TransferFunction):
+        for tfs in (tfm.n2r, tfm.r2n, tfm.silent):
+            if previous in tfs:
+                previous_state = (tfs, tfs.index(previous), previous.active)
+                tfs.remove(previous)
+        # the replaced TF must not run anymore, yet its devices stay active until released
+        previous.active = False
+    else:
+        previous = None
 
+    tf = None
     # pylint: disable=broad-except
     try:
+        if new_code is None:
+            new_code = code_cache.compile(new_source, "<{0}>".format(new_name))
         # pylint: disable=exec-used
         exec new_code
         tf = get_transfer_function(new_name)
         if not isinstance(tf, TransferFunction):
             raise Exception("Transfer function has no decorator specifying its type")
-        config.active_node.initialize_tf(tf, activation)
+        tfm.initialize_tf(tf, activation, previous)
     except Exception as e:
         tb = sys.exc_info()[2]
         logger.error("Error while loading new transfer function")
         logger.exception(e)
-        delete_transfer_function(new_name)
+        if previous is None:
+            delete_transfer_function(new_name)
+        else:
+            # the replaced transfer function keeps running as if it had never been replaced
+            _restore_transfer_function(tfm, previous, previous_state, new_name)
+            previous = None
         raise TFLoadingException(new_name, str(e)), None, tb
+    finally:
+        if previous is not None:
+            kept = tf.params[1:] + [getattr(tf, 'topic', None)] \
+                if isinstance(tf, TransferFunction) else []
+            _release_transfer_function(tfm, previous, kept)
 
     # we set the new source in an attribute because inspect.getsource won't work after exec
     # indeed inspect.getsource is based on a source file object
@@ -453,7 +585,7 @@ def set_flawed_transfer_function(source, name="NO_NAME", error=None):
     :param name: The name of the transfer function
     :param error: the Exception raised during the compilation/loading of the code
     """
-    config.active_node.flawed.append(
+    sim_context.current().active_node.flawed.append(
         FlawedTransferFunction(name, source, error))
 
 
@@ -32,3 +32,4 @@ active_node = None
 brain_root = None
 brain_source = None
 brain_populations = None
+csv_recorders = []
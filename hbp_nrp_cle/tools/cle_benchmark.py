@@ -0,0 +1,425 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+This module contains a headless end-to-end benchmark of the closed loop engine. The engine runs
+on the mock adapters with a synthetic workload of transfer functions, brain devices and robot
+topics, so neither a ROS master, Gazebo nor NEST is required. The results are written as JSON so
+that runs can be compared to detect regressions.
+
+Example::
+
+    python cle_benchmark.py --engine pipelined --tfs 20 --devices 5 --steps 5000 \\
+        --brain-latency 0.002 --output results.json
+"""
+
+__author__ = ''
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+
+import psutil
+
+from hbp_nrp_cle.cle.DeterministicClosedLoopEngine import DeterministicClosedLoopEngine
+from hbp_nrp_cle.cle.ClosedLoopEngine import ClosedLoopEngine
+from hbp_nrp_cle.cle.PhaseLatencyRecorder import PhaseLatencyRecorder, PHASES
+from hbp_nrp_cle.mocks.robotsim import MockRobotControlAdapter, MockRobotCommunicationAdapter
+from hbp_nrp_cle.mocks.brainsim import MockBrainControlAdapter, MockBrainCommunicationAdapter
+from hbp_nrp_cle.mocks.tf_framework import MockTransferFunctionManager
+import hbp_nrp_cle.tf_framework as nrp
+from hbp_nrp_cle.tf_framework import config
+
+# device types driven by Robot2Neuron TFs with the attribute they write
+SOURCE_TYPES = [('poisson', 'rate'), ('fixed_frequency', 'rate'), ('dc_source', 'amplitude'),
+                ('ac_source', 'amplitude'), ('nc_source', 'mean')]
+# device types read by Neuron2Robot TFs with the attribute they read
+SINK_TYPES = [('population_rate', 'rate'), ('leaky_integrator_alpha', 'voltage'),
+              ('leaky_integrator_exp', 'voltage'), ('spike_recorder', 'spiked')]
+
+
+class LatencyRobotControlAdapter(MockRobotControlAdapter):
+    """
+    A mock robot control adapter that takes the given wall clock time per physics step and runs
+    asynchronously like the ROS control adapter
+    """
+
+    def __init__(self, latency):
+        """
+        Creates a new adapter
+
+        :param latency: The wall clock time of one physics step in seconds
+        """
+        super(LatencyRobotControlAdapter, self).__init__()
+        self.__latency = latency
+        self.__executor = ThreadPoolExecutor(max_workers=1)
+
+    def run_step(self, dt):
+        """
+        Runs the world simulation for the given CLE time step in seconds
+
+        :param dt: The CLE time step in seconds
+        """
+        if self.__latency > 0:
+            time.sleep(self.__latency)
+        return super(LatencyRobotControlAdapter, self).run_step(dt)
+
+    def run_step_async(self, dt):
+        """
+        Runs the world simulation for the given CLE time step in seconds in a separate thread
+
+        :param dt: The CLE time step in seconds
+        :return: a Future for the result or potential exceptions of the execution
+        """
+        future = Future()
+        future.start = time.time()
+        future.set_running_or_notify_cancel()
+
+        def __run():
+            try:
+                result = self.run_step(dt)
+                future.end = time.time()
+                future.set_result(result)
+            # pylint: disable=broad-except
+            except Exception as e:
+                future.end = time.time()
+                future.set_exception(e)
+
+        self.__executor.submit(__run)
+        return future
+
+    def shutdown(self):
+        """
+        Shuts down the world simulation
+        """
+        self.__executor.shutdown(wait=True)
+
+
+class LatencyBrainControlAdapter(MockBrainControlAdapter):
+    """
+    A mock brain control adapter that takes the given wall clock time per brain step
+    """
+
+    def __init__(self, latency):
+        """
+        Creates a new adapter
+
+        :param latency: The wall clock time of one brain step in seconds
+        """
+        super(LatencyBrainControlAdapter, self).__init__()
+        self.__latency = latency
+
+    def run_step(self, dt):
+        """
+        Runs the neuronal simulator for the given amount of simulated time
+
+        :param dt: the simulated time in milliseconds
+        """
+        if self.__latency > 0:
+            time.sleep(self.__latency)
+
+
+class BenchmarkBrainCommunicationAdapter(MockBrainCommunicationAdapter):
+    """
+    A mock brain communication adapter that does not keep the history of its refresh times, so
+    that the memory measurements are not dominated by the mock
+    """
+
+    def refresh_buffers(self, t):
+        """
+        Refreshes buffered values for time t
+
+        :param t: The brain simulation time
+        """
+        # pylint: disable=bad-super-call
+        super(MockBrainCommunicationAdapter, self).refresh_buffers(t)
+
+
+class SyntheticPopulation(object):
+    """
+    A population of the synthetic brain
+    """
+
+    def __init__(self, size):
+        """
+        Creates a new population
+
+        :param size: The number of neurons
+        """
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return SyntheticPopulation(len(range(self.size)[item]))
+        return SyntheticPopulation(1)
+
+
+class SyntheticBrain(object):
+    """
+    The brain module of the synthetic workload
+    """
+
+    def __init__(self, devices):
+        """
+        Creates a new synthetic brain
+
+        :param devices: The number of devices of each type
+        """
+        self.sources = SyntheticPopulation(devices * len(SOURCE_TYPES))
+        self.sinks = SyntheticPopulation(devices * len(SINK_TYPES))
+
+
+def generate_tf_sources(tfs, devices, throttling_rate=None):
+    """
+    Generates the source code of the synthetic transfer functions. Half of them are Robot2Neuron
+    TFs writing the values of a robot topic to spike sources, the other half are Neuron2Robot TFs
+    reading spike sinks and publishing the sum on a robot topic. The devices of each type are
+    distributed round-robin among the TFs of the respective direction.
+
+    :param tfs: The number of transfer functions
+    :param devices: The number of devices of each type
+    :param throttling_rate: The throttling rate of the TFs in Hz or None
+    :return: A list of tuples of TF name and source code
+    """
+    n_r2n = (tfs + 1) // 2
+    n_n2r = tfs - n_r2n
+    throttling = "" if throttling_rate is None else "throttling_rate={0}".format(throttling_rate)
+
+    def distribute(types, count):
+        """
+        Distributes the devices of the given types among count TFs
+        """
+        assignment = [[] for _ in range(count)]
+        index = 0
+        for type_index, (device_type, attribute) in enumerate(types):
+            for i in range(devices):
+                neuron = type_index * devices + i
+                assignment[index % count].append((device_type, attribute, neuron))
+                index += 1
+        return assignment
+
+    sources = []
+    if n_r2n:
+        for i, assigned in enumerate(distribute(SOURCE_TYPES, n_r2n)):
+            name = "bench_r2n_{0}".format(i)
+            lines = ['@nrp.MapRobotSubscriber("topic", Topic("/bench/sensor_{0}", float))'
+                     .format(i)]
+            params = ["t", "topic"]
+            body = ["    value = topic.value", "    if value is not None:"]
+            for j, (device_type, attribute, neuron) in enumerate(assigned):
+                lines.append('@nrp.MapSpikeSource("dev{0}", nrp.brain.sources[{1}], nrp.{2})'
+                             .format(j, neuron, device_type))
+                params.append("dev{0}".format(j))
+                body.append("        dev{0}.{1} = value".format(j, attribute))
+            if len(body) == 2:
+                body.append("        pass")
+            lines.append("@nrp.Robot2Neuron({0})".format(throttling))
+            lines.append("def {0}({1}):".format(name, ", ".join(params)))
+            sources.append((name, "\n".join(lines + body) + "\n"))
+    if n_n2r:
+        for i, assigned in enumerate(distribute(SINK_TYPES, n_n2r)):
+            name = "bench_n2r_{0}".format(i)
+            lines = []
+            params = ["t"]
+            terms = ["0.0"]
+            for j, (device_type, attribute, neuron) in enumerate(assigned):
+                lines.append('@nrp.MapSpikeSink("dev{0}", nrp.brain.sinks[{1}], nrp.{2})'
+                             .format(j, neuron, device_type))
+                params.append("dev{0}".format(j))
+                terms.append("float(dev{0}.{1})".format(j, attribute))
+            args = 'Topic("/bench/command_{0}", float)'.format(i)
+            if throttling:
+                args += ", " + throttling
+            lines.append("@nrp.Neuron2Robot({0})".format(args))
+            lines.append("def {0}({1}):".format(name, ", ".join(params)))
+            sources.append((name, "\n".join(lines) + "\n    return " + " + ".join(terms) + "\n"))
+    return sources
+
+
+def create_engine(options):
+    """
+    Creates a closed loop engine with the synthetic workload described by the given options
+
+    :param options: The benchmark options
+    :return: A tuple of the initialized engine and the list of subscribed robot topics
+    """
+    rca = LatencyRobotControlAdapter(options.physics_latency)
+    rca.set_time_step(options.physics_step)
+    bca = LatencyBrainControlAdapter(options.brain_latency)
+    rcm = MockRobotCommunicationAdapter()
+    bcm = BenchmarkBrainCommunicationAdapter()
+
+    if options.tf_manager == 'mock':
+        tfm = MockTransferFunctionManager()
+        tfm.sleep_time = options.tf_latency
+    else:
+        nrp.start_new_tf_manager()
+        tfm = config.active_node
+        nrp.set_nest_adapter(bcm)
+        nrp.set_robot_adapter(rcm)
+        config.brain_root = SyntheticBrain(options.devices)
+        namespace = dict(vars(nrp))
+        for name, source in generate_tf_sources(options.tfs, options.devices,
+                                                options.throttling_rate):
+            # pylint: disable=exec-used
+            exec compile(source, name, 'exec') in namespace
+            nrp.get_transfer_function(name).source = source
+
+    if options.engine == 'deterministic':
+        engine = DeterministicClosedLoopEngine(rca, rcm, bca, bcm, tfm, options.timestep)
+    else:
+        engine = ClosedLoopEngine(rca, rcm, bca, bcm, tfm, options.timestep,
+                                  max_staleness=1 if options.engine == 'pipelined' else 0)
+    engine.coalesce_steps = options.coalesce
+    engine.phase_latencies = PhaseLatencyRecorder(window=options.steps)
+    engine.initialize()
+
+    topics = []
+    if options.tf_manager != 'mock':
+        # the first parameter after the time is the mapped topic subscriber
+        for tf in tfm.r2n:
+            topics.append(tf.params[1])
+    return engine, topics
+
+
+def run_benchmark(options):
+    """
+    Runs the benchmark described by the given options
+
+    :param options: The benchmark options
+    :return: A dictionary with the benchmark results
+    """
+    if 'NRP_SIMULATION_DIR' not in os.environ:
+        os.environ['NRP_SIMULATION_DIR'] = tempfile.gettempdir()
+    engine, topics = create_engine(options)
+    process = psutil.Process(os.getpid())
+
+    # number of steps between two messages on each subscribed topic
+    topic_period = 0
+    if options.topic_rate > 0:
+        topic_period = max(int(round(1.0 / (options.topic_rate * options.timestep))), 1)
+    samples = max(options.steps // options.memory_samples, 1)
+
+    memory = [process.memory_info().rss]
+    max_coalesced_steps = engine.max_coalesced_steps
+    start_time = engine.simulation_time
+    steps = 0
+    next_message = 0
+    start = time.time()
+    while steps < options.steps:
+        if topic_period and steps >= next_message:
+            for topic in topics:
+                topic.value = float(steps)
+            next_message = (steps // topic_period + 1) * topic_period
+        # coalesced steps must not run past the requested number of steps
+        engine.max_coalesced_steps = min(max_coalesced_steps, options.steps - steps)
+        engine.run_step(options.timestep)
+        # the steps are counted in simulated time, as one call may run several coalesced steps
+        previous = steps
+        steps = int(round((engine.simulation_time - start_time) / options.timestep))
+        if steps // samples > previous // samples:
+            memory.append(process.memory_info().rss)
+    engine.stop()
+    elapsed = time.time() - start
+    memory.append(process.memory_info().rss)
+
+    histograms = engine.step_latency_histograms()
+    engine.shutdown()
+    return {
+        'options': vars(options),
+        'steps': steps,
+        'wall_time': elapsed,
+        'steps_per_second': steps / elapsed if elapsed > 0 else float('inf'),
+        'real_time_factor': engine.simulation_time / elapsed if elapsed > 0 else float('inf'),
+        'phases': dict((phase, histograms[phase]) for phase in PHASES),
+        'tf_elapsed_time': engine.tf_elapsed_time(),
+        'memory': {
+            'rss_start': memory[0],
+            'rss_end': memory[-1],
+            'rss_growth': memory[-1] - memory[0],
+            'rss_samples': memory
+        }
+    }
+
+
+def create_parser():
+    """
+    Creates the command line parser of the benchmark
+    """
+    parser = argparse.ArgumentParser(description="Headless benchmark of the closed loop engine")
+    parser.add_argument('--engine', choices=['deterministic', 'parallel', 'pipelined'],
+                        default='deterministic',
+                        help="the engine, parallel and pipelined use the ClosedLoopEngine with "
+                             "a maximum staleness of 0 and 1")
+    parser.add_argument('--tf-manager', choices=['synthetic', 'mock'], default='synthetic',
+                        help="run synthetic TFs on the TF manager or use the mock TF manager")
+    parser.add_argument('--tfs', type=int, default=10, help="number of transfer functions")
+    parser.add_argument('--devices', type=int, default=2,
+                        help="number of brain devices of each type")
+    parser.add_argument('--throttling-rate', type=float, default=None,
+                        help="throttling rate of the synthetic TFs in Hz")
+    parser.add_argument('--topic-rate', type=float, default=50.0,
+                        help="message rate of every subscribed robot topic in Hz (sim time)")
+    parser.add_argument('--steps', type=int, default=1000, help="number of CLE steps")
+    parser.add_argument('--timestep', type=float, default=0.02, help="CLE time step in s")
+    parser.add_argument('--physics-step', type=float, default=0.001,
+                        help="physics time step in s")
+    parser.add_argument('--physics-latency', type=float, default=0.0,
+                        help="wall clock time of a physics step in s")
+    parser.add_argument('--brain-latency', type=float, default=0.0,
+                        help="wall clock time of a brain step in s")
+    parser.add_argument('--tf-latency', type=float, default=0.0,
+                        help="wall clock time of a TF direction of the mock TF manager in s")
+    parser.add_argument('--coalesce', action='store_true',
+                        help="coalesce steps in which no TF is due")
+    parser.add_argument('--memory-samples', type=int, default=20,
+                        help="number of memory samples taken during the run")
+    parser.add_argument('--output', default=None, help="JSON result file, stdout if omitted")
+    return parser
+
+
+def main(argv=None):
+    """
+    Runs the benchmark from the command line
+
+    :param argv: The command line arguments
+    """
+    options = create_parser().parse_args(argv)
+    results = run_benchmark(options)
+    if options.output is None:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write("\n")
+    else:
+        with open(options.output, 'w') as result_file:
+            json.dump(results, result_file, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
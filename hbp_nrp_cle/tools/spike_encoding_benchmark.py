@@ -0,0 +1,161 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+This module contains a microbenchmark of the encoding of spike monitor messages. It compares
+the creation and serialization of one SpikeData message per spike with the encoding of the
+spikes as numpy arrays used by the neuron monitor, for an increasing number of spikes.
+
+Example::
+
+    python spike_encoding_benchmark.py --spikes 100 1000 10000 100000 --populations 4
+"""
+
+__author__ = ''
+
+import argparse
+import json
+import sys
+import timeit
+from cStringIO import StringIO
+
+import numpy as np
+from cle_ros_msgs.msg import SpikeEvent, SpikeData
+from hbp_nrp_cle.tf_framework._SpikeEncoding import encode_spikes, spike_offsets, \
+    spike_event_type
+
+
+class Population(object):
+    """
+    Stands in for a population of the given size
+    """
+
+    def __init__(self, size):
+        self.size = size
+
+
+def create_spikes(spikes, populations, neurons):
+    """
+    Creates random spikes as recorded by a spike recorder of several populations
+
+    :param spikes: The total number of spikes
+    :param populations: The number of populations
+    :param neurons: The number of neurons per population
+    :return: A list with a two-column array of neuron ids and times per population
+    """
+    random = np.random.RandomState(42)
+    return [np.column_stack([random.randint(0, neurons, count).astype(np.float64),
+                             np.sort(random.uniform(0.0, 0.02, count))])
+            for count in np.diff(np.linspace(0, spikes, populations + 1).astype(int))]
+
+
+def encode_per_spike(recorded, populations):
+    """
+    Encodes the spikes with one message per spike, as the neuron monitor used to
+
+    :param recorded: The recorded spikes
+    :param populations: The populations
+    """
+    offset = 0
+    msgs = []
+    for i, spikelist in enumerate(recorded):
+        msgs.extend(SpikeData(int(spike[0]) + offset, spike[1]) for spike in spikelist)
+        offset += populations[i].size
+    SpikeEvent(0.02, 0, msgs, "monitor", "population").serialize(StringIO())
+
+
+def encode_arrays(recorded, offsets):
+    """
+    Encodes the spikes as arrays
+
+    :param recorded: The recorded spikes
+    :param offsets: The precomputed neuron id offsets of the populations
+    """
+    spikes = encode_spikes(recorded, offsets)
+    spike_event_type(0.02, 0, spikes, "monitor", "population").serialize(StringIO())
+
+
+def measure(call, repeat):
+    """
+    Measures the time of a single call
+
+    :param call: The function to measure
+    :param repeat: The number of repetitions, the fastest one is reported
+    :return: The time per call in microseconds
+    """
+    return min(timeit.repeat(call, number=1, repeat=repeat)) * 1e6
+
+
+def run_benchmark(options):
+    """
+    Runs the microbenchmark
+
+    :param options: The parsed command line options
+    :return: A list with the encoding times for every number of spikes
+    """
+    populations = [Population(options.neurons) for _ in range(options.populations)]
+    offsets = spike_offsets(populations)
+    results = []
+    for spikes in options.spikes:
+        recorded = create_spikes(spikes, options.populations, options.neurons)
+        per_spike = measure(lambda: encode_per_spike(recorded, populations), options.repeat)
+        arrays = measure(lambda: encode_arrays(recorded, offsets), options.repeat)
+        results.append({
+            'spikes': spikes,
+            'per_spike_us': per_spike,
+            'arrays_us': arrays,
+            'arrays_ns_per_spike': arrays * 1e3 / max(spikes, 1),
+            'speedup': per_spike / arrays
+        })
+    return results
+
+
+def create_parser():
+    """
+    Creates the command line parser of the benchmark
+    """
+    parser = argparse.ArgumentParser(description="Microbenchmark of the spike monitor message "
+                                                 "encoding")
+    parser.add_argument('--spikes', type=int, nargs='+', default=[100, 1000, 10000, 100000],
+                        help="numbers of spikes per message")
+    parser.add_argument('--populations', type=int, default=4,
+                        help="number of monitored populations")
+    parser.add_argument('--neurons', type=int, default=1000,
+                        help="number of neurons per population")
+    parser.add_argument('--repeat', type=int, default=5, help="number of repetitions")
+    return parser
+
+
+def main(argv=None):
+    """
+    Runs the benchmark from the command line
+
+    :param argv: The command line arguments
+    """
+    options = create_parser().parse_args(argv)
+    json.dump(run_benchmark(options), sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write("\n")
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,175 @@
+# ---LICENSE-BEGIN - DO NOT CHANGE OR MOVE THIS HEADER
+# This file is part of the Neurorobotics Platform software
+# Copyright (C) 2014,2015,2016,2017 Human Brain Project
+# https://www.humanbrainproject.eu
+#
+# The Human Brain Project is a European Commission funded project
+# in the frame of the Horizon2020 FET Flagship plan.
+# http://ec.europa.eu/programmes/horizon2020/en/h2020-section/fet-flagships
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ---LICENSE-END
+"""
+This module contains a microbenchmark of the overhead of running a transfer function through the
+transfer function manager compared to calling its body directly. The cost of looking up the
+resources folder on every call can be reproduced with --uncached.
+
+Example::
+
+    python tf_dispatch_benchmark.py --calls 100000 --params 4
+"""
+
+__author__ = ''
+
+import argparse
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+import hbp_nrp_cle.common
+import hbp_nrp_cle.tf_framework as nrp
+from hbp_nrp_cle.tf_framework import config
+from hbp_nrp_cle.tf_framework._TransferFunctionManager import TransferFunctionManager
+from hbp_nrp_cle.mocks.robotsim import MockRobotCommunicationAdapter
+from hbp_nrp_cle.mocks.brainsim import MockBrainCommunicationAdapter
+
+
+def create_tf(params):
+    """
+    Creates and initializes a Robot2Neuron transfer function with the given number of robot
+    subscriber parameters and an empty body
+
+    :param params: The number of parameters besides the simulation time
+    :return: The transfer function
+    """
+    nrp.start_new_tf_manager()
+    nrp.set_nest_adapter(MockBrainCommunicationAdapter())
+    nrp.set_robot_adapter(MockRobotCommunicationAdapter())
+    nrp.initialize("dispatch_bench")
+    names = ["p{0}".format(i) for i in range(params)]
+    lines = ['@nrp.MapRobotSubscriber("{0}", Topic("/bench/{0}", float))'.format(name)
+             for name in names]
+    lines.append("@nrp.Robot2Neuron()")
+    lines.append("def dispatch_bench({0}):".format(", ".join(["t"] + names)))
+    lines.append("    pass")
+    source = "\n".join(lines) + "\n"
+    nrp.set_transfer_function(source, compile(source, "<dispatch_bench>", "exec"),
+                              "dispatch_bench")
+    return nrp.get_transfer_function("dispatch_bench")
+
+
+def measure(call, calls, repeat):
+    """
+    Measures the time of a single call
+
+    :param call: The function to measure
+    :param calls: The number of calls per repetition
+    :param repeat: The number of repetitions, the fastest one is reported
+    :return: The time per call in microseconds
+    """
+    return min(timeit.repeat(call, number=calls, repeat=repeat)) / calls * 1e6
+
+
+def run_benchmark(options):
+    """
+    Runs the microbenchmark
+
+    :param options: The parsed command line options
+    :return: A dictionary with the time per call of the different dispatch paths
+    """
+    simulation_dir = tempfile.mkdtemp(prefix='tf_dispatch_')
+    os.mkdir(os.path.join(simulation_dir, "resources"))
+    open(os.path.join(simulation_dir, "resources", "module.py"), 'w').close()
+    previous = os.environ.get('NRP_SIMULATION_DIR')
+    os.environ['NRP_SIMULATION_DIR'] = simulation_dir
+    try:
+        tf = create_tf(options.params)
+        func = tf._func  # pylint: disable=protected-access
+        args = [0.0] + tf.params[1:]
+        run_tf = TransferFunctionManager.run_tf
+        invalidate = hbp_nrp_cle.common.invalidate_resources
+        # every call uses a new simulation time so that the TF is due, this costs the same for
+        # all the measured paths
+        clock = itertools.count(1.0).next
+
+        def bare():
+            """
+            Calls the body of the TF directly
+            """
+            args[0] = clock()
+            func(*args)
+
+        def uncached():
+            """
+            Runs the TF with a lookup of the resources folder as before the caching
+            """
+            invalidate()
+            run_tf(tf, clock())
+
+        results = {
+            'params': options.params,
+            'calls': options.calls,
+            'bare_call_us': measure(bare, options.calls, options.repeat),
+            'tf_run_us': measure(lambda: tf.run(clock()), options.calls, options.repeat),
+            'run_tf_us': measure(lambda: run_tf(tf, clock()), options.calls, options.repeat)
+        }
+        if options.uncached:
+            results['run_tf_uncached_us'] = measure(uncached, options.calls, options.repeat)
+        results['dispatch_overhead_us'] = results['run_tf_us'] - results['bare_call_us']
+        config.active_node.shutdown()
+        return results
+    finally:
+        if previous is None:
+            del os.environ['NRP_SIMULATION_DIR']
+        else:
+            os.environ['NRP_SIMULATION_DIR'] = previous
+        hbp_nrp_cle.common.invalidate_resources()
+        shutil.rmtree(simulation_dir)
+
+
+def create_parser():
+    """
+    Creates the command line parser of the benchmark
+    """
+    parser = argparse.ArgumentParser(description="Microbenchmark of the transfer function "
+                                                 "dispatch overhead")
+    parser.add_argument('--calls', type=int, default=100000,
+                        help="number of calls per repetition")
+    parser.add_argument('--repeat', type=int, default=3, help="number of repetitions")
+    parser.add_argument('--params', type=int, default=2,
+                        help="number of parameters of the transfer function besides t")
+    parser.add_argument('--uncached', action='store_true',
+                        help="also measure the dispatch with a lookup of the resources folder "
+                             "on every call")
+    return parser
+
+
+def main(argv=None):
+    """
+    Runs the benchmark from the command line
+
+    :param argv: The command line arguments
+    """
+    options = create_parser().parse_args(argv)
+    json.dump(run_benchmark(options), sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write("\n")
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()